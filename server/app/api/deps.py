@@ -1,12 +1,14 @@
-from typing import Generator, Dict, Any
+from typing import AsyncGenerator, Awaitable, Callable, Generator, Dict, Any
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
-from supabase import Client # Import Supabase Client
+from app.db.base import Database
 
-from app.core import security
+from app.core import resilience, security
 from app.core.config import settings
-from app.db.session import supabase # Import Supabase client instead of SessionLocal
+from app.core.ratelimit import ConcurrencyLimiter, LimitExceeded, check_rate_limits
+from app.db import replicated
+from app.db.session import get_database
 from app.crud import crud_user
 
 # SQLAlchemy models and Session are no longer needed
@@ -18,18 +20,18 @@ reusable_oauth2 = OAuth2PasswordBearer(
     tokenUrl="/v1/auth/login"
 )
 
-def get_db() -> Generator[Client, None, None]:
+def get_db() -> Generator[Database, None, None]:
     """
-    A dependency that provides a Supabase client instance for each request.
+    A dependency that provides the database client for each request.
     """
     try:
-        yield supabase
+        yield get_database()
     finally:
-        # With the Supabase client, we don't need to manually close a session.
+        # The client is shared across requests, so there is no per-request session to close.
         pass
 
 def get_current_user(
-    db: Client = Depends(get_db), token: str = Depends(reusable_oauth2)
+    db: Database = Depends(get_db), token: str = Depends(reusable_oauth2)
 ) -> Dict[str, Any]:
     """
     Dependency to get the current user from a JWT token.
@@ -51,6 +53,9 @@ def get_current_user(
             detail="Could not validate credentials",
         )
 
+    # From here on, this user's recent writes keep the request's reads on the primary.
+    replicated.note_user(user_id)
+
     # Use the modified CRUD function to get the user from Supabase
     user = crud_user.get_user(db=db, user_id=user_id)
     if not user:
@@ -79,3 +84,44 @@ def get_current_employee(current_user: Dict[str, Any] = Depends(get_current_user
             status_code=403, detail="This action is only available to employees."
         )
     return current_user
+
+def request_deadline(seconds: float) -> Callable[[], Awaitable[None]]:
+    """
+    Returns a dependency that gives the request `seconds` to finish its upstream calls
+    (see app/core/resilience.py). A route-level deadline replaces a router-level one.
+    """
+    # Async, so the deadline is set in the request's own context and every thread the
+    # request hands work to inherits it.
+    async def set_request_deadline() -> None:
+        resilience.set_deadline(seconds)
+    return set_request_deadline
+
+# Shared by every /v1/ai/* route in this worker process.
+ai_limiter = ConcurrencyLimiter(
+    limit=settings.AI_MAX_CONCURRENCY,
+    max_queue=settings.AI_MAX_QUEUE,
+    timeout=settings.AI_QUEUE_TIMEOUT_SECONDS,
+)
+
+async def limit_ai_calls(current_user: Dict[str, Any] = Depends(get_current_user)) -> AsyncGenerator[None, None]:
+    """
+    Admission control for the LLM routes.
+    Applies the per-user and per-team token buckets (429) and then waits for one of
+    the AI_MAX_CONCURRENCY slots (503 if the wait queue is full or the wait times out).
+    Both responses carry a Retry-After header.
+    """
+    limits = [(f"user:{current_user['id']}", settings.AI_USER_RATE_PER_MINUTE / 60, settings.AI_USER_BURST)]
+    if current_user.get('team_id'):
+        limits.append((f"team:{current_user['team_id']}", settings.AI_TEAM_RATE_PER_MINUTE / 60, settings.AI_TEAM_BURST))
+
+    try:
+        check_rate_limits(limits)
+        granted = await ai_limiter.acquire()
+    except LimitExceeded as e:
+        detail = "Too many AI requests, please slow down." if e.status_code == 429 else "The AI service is busy, please try again shortly."
+        raise HTTPException(status_code=e.status_code, detail=detail, headers={"Retry-After": str(e.retry_after)})
+
+    try:
+        yield
+    finally:
+        ai_limiter.release(granted)
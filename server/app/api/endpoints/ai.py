@@ -1,16 +1,26 @@
-from fastapi import APIRouter, Depends, Body
-from typing import List, Dict, Any
-from app.services import gemini_service
+from fastapi import APIRouter, Depends, Body, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from typing import List, Dict, Any, Optional, Tuple
+from app.services import gemini_service, summary_service
 from app.api import deps
-from supabase import Client
-from app.crud import crud_tag
+from app.core.config import settings
+from app.core.executors import bulkhead
+from app.db.base import Database
+from app.crud import crud_feedback, crud_tag, crud_team
+from app.schemas.feedback import FeedbackFilters
 
 # The import for the SQLAlchemy UserModel is no longer needed.
 # from app.models.user import User as UserModel
 
-router = APIRouter()
+# Every route here calls Gemini, so all of them get a deadline (which starts before
+# the wait for admission) and go through admission control.
+router = APIRouter(dependencies=[
+    Depends(deps.request_deadline(settings.AI_REQUEST_DEADLINE_SECONDS)),
+    Depends(deps.limit_ai_calls),
+])
 
 @router.post("/suggest-feedback", response_model=str)
+@bulkhead("llm")
 def suggest_feedback(
     prompt: str = Body(..., embed=True), 
     current_user: Dict[str, Any] = Depends(deps.get_current_user)
@@ -18,6 +28,7 @@ def suggest_feedback(
     return gemini_service.generate_feedback_suggestion(prompt)
 
 @router.post("/rephrase", response_model=str)
+@bulkhead("llm")
 def rephrase(
     text: str = Body(..., embed=True), 
     current_user: Dict[str, Any] = Depends(deps.get_current_user)
@@ -25,8 +36,9 @@ def rephrase(
     return gemini_service.rephrase_text(text)
 
 @router.post("/suggest-tags", response_model=Dict[str, List[int]])
+@bulkhead("llm")
 def suggest_tags(
-    db: Client = Depends(deps.get_db),
+    db: Database = Depends(deps.get_db),
     text: str = Body(..., embed=True),
     current_user: Dict[str, Any] = Depends(deps.get_current_manager),
 ):
@@ -46,8 +58,9 @@ def suggest_tags(
     return {"tag_ids": tag_ids}
 
 @router.post("/generate-feedback", response_model=Dict[str, Any])
+@bulkhead("llm")
 def generate_feedback(
-    db: Client = Depends(deps.get_db),
+    db: Database = Depends(deps.get_db),
     strengths: str = Body(...),
     areas_for_improvement: str = Body(...),
     current_user: Dict[str, Any] = Depends(deps.get_current_manager),
@@ -71,3 +84,43 @@ def generate_feedback(
         "sentiment": sentiment,
         "tag_ids": tag_ids,
     }
+
+@router.get(
+    "/summary",
+    response_model=Dict[str, Any],
+    dependencies=[Depends(deps.request_deadline(settings.AI_SUMMARY_DEADLINE_SECONDS))],
+)
+async def summarize_feedback(
+    employee_id: Optional[int] = Query(None),
+    db: Database = Depends(deps.get_db),
+    current_user: Dict[str, Any] = Depends(deps.get_current_user),
+):
+    """
+    A narrative summary of a feedback history.
+    - Managers get their whole team's feedback, or one employee's with employee_id.
+    - Employees get the feedback they have received.
+    Large histories are summarized in chunks (several Gemini calls), and chunks whose
+    feedback hasn't changed are reused from earlier summaries.
+    """
+    # Async and not @bulkhead("llm"): the reads take a threadpool thread briefly, and
+    # the Gemini calls are awaited in the llm pool, so no thread waits out the summary.
+    feedback_list, subject = await run_in_threadpool(_summary_input, db, current_user, employee_id)
+    if not feedback_list:
+        raise HTTPException(status_code=404, detail="No feedback found to summarize.")
+
+    return await summary_service.summarize_feedback(feedback_list, subject=subject)
+
+def _summary_input(db: Database, current_user: Dict[str, Any], employee_id: Optional[int]) -> Tuple[List[Dict[str, Any]], str]:
+    """The feedback to summarize for the caller, and who it is about."""
+    if current_user['role'] == 'manager':
+        filters = FeedbackFilters(employee_id=employee_id)
+        feedback_list = crud_feedback.get_feedback_by_manager(db, manager_id=current_user['id'], filters=filters)
+        if employee_id is not None:
+            subject = feedback_list[0]['employee']['full_name'] if feedback_list else "this employee"
+        else:
+            team = crud_team.get_team_by_manager(db, manager_id=current_user['id'])
+            subject = f"the team {team['name']}" if team else "the team"
+    else:
+        feedback_list = crud_feedback.get_feedback_by_employee(db, employee_id=current_user['id'])
+        subject = current_user['full_name']
+    return feedback_list, subject
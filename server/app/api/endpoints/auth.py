@@ -1,7 +1,7 @@
 import logging
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from supabase import Client
+from app.db.base import Database
 
 from app.crud import crud_user
 from app.schemas import user as user_schema
@@ -9,8 +9,7 @@ from app.schemas import token as token_schema
 from app.core import security
 from app.api import deps
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Handlers and levels are set up once in app/core/logging_config.py.
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
@@ -18,7 +17,7 @@ router = APIRouter()
 @router.post("/register", response_model=user_schema.User)
 def register_user(
     *,
-    db: Client = Depends(deps.get_db),
+    db: Database = Depends(deps.get_db),
     user_in: user_schema.UserCreate,
 ):
     """
@@ -26,19 +25,17 @@ def register_user(
     - If role is 'manager', a 'team_name' must be provided to create a new team.
     - If role is 'employee', a 'team_id' must be provided to assign to a team.
     """
-    logger.info(f"Registration attempt for email: {user_in.email}")
-    logger.info(f"Incoming registration data: {user_in.model_dump_json()}")
+    logger.debug("Registration attempt", extra={"email": user_in.email, "role": user_in.role.value})
 
     user = crud_user.get_user_by_email(db, email=user_in.email)
     if user:
-        logger.warning(f"Registration failed: email {user_in.email} already exists.")
+        logger.warning("Registration failed: email already exists.", extra={"email": user_in.email})
         raise HTTPException(
             status_code=400,
             detail="A user with this email already exists in the system.",
         )
     
     try:
-        logger.info("Proceeding to create user with team.")
         user = crud_user.create_user_with_team(db=db, user_in=user_in)
         if not user:
             logger.error("create_user_with_team returned None unexpectedly.")
@@ -53,13 +50,13 @@ def register_user(
         logger.error(f"Unhandled exception during registration: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"An internal error occurred: {e}")
         
-    logger.info(f"Successfully registered user: {user.get('email')}")
+    logger.info("Registered user", extra={"user_id": user.get('id'), "role": user.get('role')})
     return user
 
 
 @router.post("/login", response_model=token_schema.Token)
 def login_for_access_token(
-    db: Client = Depends(deps.get_db),
+    db: Database = Depends(deps.get_db),
     form_data: OAuth2PasswordRequestForm = Depends()
 ):
     """
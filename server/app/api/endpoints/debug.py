@@ -0,0 +1,33 @@
+from typing import Any, Dict, List, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from app.core import profiling
+
+def require_profiling_token(x_profile_token: Optional[str] = Header(None)) -> None:
+    """The admin routes take the same X-Profile-Token that turns profiling on."""
+    if not profiling.token_is_valid(x_profile_token):
+        raise HTTPException(status_code=403, detail="A valid X-Profile-Token header is required.")
+
+router = APIRouter(dependencies=[Depends(require_profiling_token)])
+
+@router.get("/profiles")
+def list_profiles() -> List[Dict[str, Any]]:
+    """
+    Stored request profiles on this host, newest first: route, status, duration,
+    sample count and how many other profiled requests overlapped.
+    """
+    return profiling.list_profiles()
+
+@router.get("/profiles/{profile_id}")
+def read_profile(profile_id: str, format: str = Query("folded", pattern="^(folded|json)$")):
+    """
+    One profile. `folded` (the default) returns collapsed stacks, one
+    "frame;frame;frame count" line each, for flamegraph.pl or speedscope;
+    `json` returns the stored document with its metadata.
+    """
+    document = profiling.load_profile(profile_id)
+    if document is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "json":
+        return document
+    return PlainTextResponse("\n".join(document["folded"]) + "\n")
@@ -0,0 +1,131 @@
+from typing import Any, Dict, List, Optional
+from fastapi import APIRouter, Body, Depends, HTTPException, Response, status
+from fastapi.encoders import jsonable_encoder
+from app.db.base import Database
+from app.services import draft_service
+from app.schemas import draft as draft_schema
+from app.schemas import feedback as feedback_schema
+from app.api import deps
+from app.api.endpoints import feedback as feedback_endpoints
+
+router = APIRouter()
+
+# Needed before a draft can be published as feedback
+REQUIRED_TO_PUBLISH = ("employee_id", "sentiment", "feedback")
+
+def _conflict(e: draft_service.DraftConflict) -> HTTPException:
+    # The current draft comes back with the 409, so the client can rebase without another request.
+    return HTTPException(
+        status_code=409,
+        detail={"message": str(e), "current": jsonable_encoder(e.current)},
+    )
+
+@router.post("/", response_model=draft_schema.Draft, status_code=status.HTTP_201_CREATED)
+def create_draft(
+    draft_in: draft_schema.DraftCreate,
+    db: Database = Depends(deps.get_db),
+    current_user: Dict[str, Any] = Depends(deps.get_current_manager),
+):
+    """
+    Start a feedback draft. Every field is optional until the draft is published. (Manager only)
+    """
+    draft = draft_service.create_draft(db, manager_id=current_user['id'], fields=draft_in.model_dump(mode="json"))
+    if not draft:
+        raise HTTPException(status_code=500, detail="Could not create the draft.")
+    return draft
+
+@router.get("/", response_model=List[draft_schema.Draft])
+def read_drafts(
+    db: Database = Depends(deps.get_db),
+    current_user: Dict[str, Any] = Depends(deps.get_current_manager),
+):
+    """The manager's drafts, including saves not yet written to the database."""
+    return draft_service.list_drafts(db, manager_id=current_user['id'])
+
+@router.get("/{draft_id}", response_model=draft_schema.Draft)
+def read_draft(
+    draft_id: int,
+    db: Database = Depends(deps.get_db),
+    current_user: Dict[str, Any] = Depends(deps.get_current_manager),
+):
+    draft = draft_service.get_draft(db, manager_id=current_user['id'], draft_id=draft_id)
+    if not draft:
+        raise HTTPException(status_code=404, detail="Draft not found.")
+    return draft
+
+@router.patch("/{draft_id}", response_model=draft_schema.Draft)
+def save_draft(
+    draft_id: int,
+    draft_in: draft_schema.DraftUpdate,
+    db: Database = Depends(deps.get_db),
+    current_user: Dict[str, Any] = Depends(deps.get_current_manager),
+):
+    """
+    Autosave: change the fields that are sent, if the draft is still at `version`.
+    Cheap enough to call on every pause in typing; saves are buffered and written
+    to the database at most every DRAFT_DEBOUNCE_SECONDS per draft. Returns the
+    draft at its new version, which the next save must name. A stale version gets
+    a 409 whose detail carries the current draft.
+    """
+    changes = draft_in.model_dump(mode="json", exclude_unset=True, exclude={"version"})
+    if changes.get("tag_ids", []) is None:
+        changes["tag_ids"] = []
+    try:
+        draft = draft_service.save_draft(
+            db, manager_id=current_user['id'], draft_id=draft_id, version=draft_in.version, changes=changes
+        )
+    except draft_service.DraftConflict as e:
+        raise _conflict(e)
+    if not draft:
+        raise HTTPException(status_code=404, detail="Draft not found.")
+    return draft
+
+@router.delete("/{draft_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_draft(
+    draft_id: int,
+    db: Database = Depends(deps.get_db),
+    current_user: Dict[str, Any] = Depends(deps.get_current_manager),
+):
+    if not draft_service.discard_draft(db, manager_id=current_user['id'], draft_id=draft_id):
+        raise HTTPException(status_code=404, detail="Draft not found.")
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+@router.post("/{draft_id}/publish", response_model=feedback_schema.Feedback, status_code=status.HTTP_201_CREATED)
+def publish_draft(
+    draft_id: int,
+    response: Response,
+    publish_in: Optional[draft_schema.DraftPublish] = Body(None),
+    db: Database = Depends(deps.get_db),
+    current_user: Dict[str, Any] = Depends(deps.get_current_manager),
+):
+    """
+    Turn the draft into feedback through the same path as POST /v1/feedback/
+    (team check, employee notification, near-duplicate warning), then delete it.
+    The draft needs an employee, a sentiment and feedback text.
+    """
+    def publish(draft: Dict[str, Any]) -> Dict[str, Any]:
+        missing = [field for field in REQUIRED_TO_PUBLISH if not draft.get(field)]
+        if missing:
+            raise HTTPException(status_code=422, detail=f"The draft is missing: {', '.join(missing)}.")
+        feedback_in = feedback_schema.FeedbackCreate(
+            employee_id=draft['employee_id'],
+            sentiment=draft['sentiment'],
+            feedback=draft['feedback'],
+            strengths=draft.get('strengths'),
+            areas_for_improvement=draft.get('areas_for_improvement'),
+            tag_ids=draft.get('tag_ids') or [],
+        )
+        return feedback_endpoints.create_feedback(
+            db=db, feedback_in=feedback_in, response=response, current_user=current_user
+        )
+
+    try:
+        feedback = draft_service.publish_draft(
+            db, manager_id=current_user['id'], draft_id=draft_id,
+            version=publish_in.version if publish_in else None, publish=publish,
+        )
+    except draft_service.DraftConflict as e:
+        raise _conflict(e)
+    if feedback is None:
+        raise HTTPException(status_code=404, detail="Draft not found.")
+    return feedback
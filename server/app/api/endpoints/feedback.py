@@ -1,42 +1,56 @@
+import io
+import logging
 from fastapi.responses import StreamingResponse
-from app.services import pdf_service
-from typing import List, Dict, Any
-from fastapi import APIRouter, Depends, HTTPException, status
-from supabase import Client # Replaced Session with Client
+from app.services import pdf_service, search_service, similarity_service
+from typing import List, Dict, Any, Union
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from app.core.config import settings
+from app.db.base import Database
 from app.crud import crud_feedback, crud_user, crud_notification, crud_team
 from app.schemas import feedback as feedback_schema
 from app.api import deps
+from app.core.executors import bulkheads, run_in
 
 # Note: UserModel and Role are no longer imported from app.models
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 @router.post("/", response_model=feedback_schema.Feedback, status_code=status.HTTP_201_CREATED)
 def create_feedback(
     *,
-    db: Client = Depends(deps.get_db),
+    db: Database = Depends(deps.get_db),
     feedback_in: feedback_schema.FeedbackCreate,
+    response: Response,
     current_user: Dict[str, Any] = Depends(deps.get_current_manager),
 ):
     """
     Create new feedback for an employee. (Manager only)
+    If it closely matches feedback the manager wrote before, the ids of those entries are
+    listed in an X-Near-Duplicates header; the feedback is created either way.
     """
-    employee = crud_user.get_user(db, user_id=feedback_in.employee_id)
-    if not employee:
-        raise HTTPException(status_code=404, detail="Employee not found.")
-
-    # With Supabase, we must manually check the team relationship
-    if not employee.get("team_id"):
-        raise HTTPException(
-            status_code=403, detail="Employee is not assigned to any team."
-        )
-    
-    # We will need to create/modify crud_team.get_team in a later step
-    team = crud_team.get_team(db, team_id=employee["team_id"])
-    if not team or team["manager_id"] != current_user["id"]:
-         raise HTTPException(
-            status_code=403, detail="Can only give feedback to employees in your team."
-        )
+    # Fast path: the employee is on the manager's cached roster.
+    roster = crud_team.get_roster_by_manager(db, manager_id=current_user["id"])
+    if not roster or feedback_in.employee_id not in roster["member_ids"]:
+        # Not on the (possibly stale) roster: check the database to give the precise error.
+        employee = crud_user.get_user(db, user_id=feedback_in.employee_id)
+        if not employee:
+            raise HTTPException(status_code=404, detail="Employee not found.")
+
+        # With Supabase, we must manually check the team relationship
+        if not employee.get("team_id"):
+            raise HTTPException(
+                status_code=403, detail="Employee is not assigned to any team."
+            )
+
+        team = crud_team.get_team(db, team_id=employee["team_id"])
+        if not team or team["manager_id"] != current_user["id"]:
+             raise HTTPException(
+                status_code=403, detail="Can only give feedback to employees in your team."
+            )
+        # The employee joined after the roster was cached (e.g. through another worker).
+        crud_team.invalidate_roster(team["id"])
 
     new_feedback = crud_feedback.create_feedback(
         db=db, feedback_in=feedback_in, manager_id=current_user["id"]
@@ -49,30 +63,104 @@ def create_feedback(
         message=f"You have new feedback from {current_user['full_name']}."
     )
 
+    if settings.NEAR_DUPLICATE_THRESHOLD > 0:
+        try:
+            duplicates = similarity_service.near_duplicates(db, feedback=new_feedback)
+        except Exception:
+            # The warning is advisory; the feedback is already saved.
+            logger.exception("Near-duplicate check failed.")
+            duplicates = []
+        if duplicates:
+            response.headers["X-Near-Duplicates"] = ",".join(str(doc_id) for doc_id, _ in duplicates)
+
     # Re-fetch the feedback to include all relationships
     return crud_feedback.get_feedback(db, feedback_id=new_feedback['id'])
 
-@router.get("/", response_model=List[feedback_schema.Feedback])
+@router.get("/", response_model=Union[List[feedback_schema.Feedback], feedback_schema.FeedbackList, feedback_schema.FeedbackCompactList])
 def read_feedback(
-    db: Client = Depends(deps.get_db),
+    filters: feedback_schema.FeedbackFilters = Depends(),
+    include_facets: bool = False,
+    compact: bool = False,
+    db: Database = Depends(deps.get_db),
     current_user: Dict[str, Any] = Depends(deps.get_current_user),
 ):
     """
     Retrieve feedback.
     - Managers see all feedback they have given.
     - Employees see all feedback they have received.
+    Optional filters: employee_id (managers only), sentiment, tag_id, acknowledged, and a
+    created_from/created_to date range. With include_facets=true the response is
+    {"items": [...], "facets": {...}} with counts per sentiment, per tag and by
+    acknowledgement over the filtered feedback.
+    With compact=true the response is {"items": [...], "users": {...}, "tags": {...}}:
+    items carry manager_id, employee_id and tag_ids instead of the nested objects,
+    and each user and tag appears once in the maps (plus "facets" if asked for).
     """
     # Use dictionary access for 'role' and 'id'
     if current_user['role'] == 'manager':
-        return crud_feedback.get_feedback_by_manager(db, manager_id=current_user['id'])
+        feedback_list = crud_feedback.get_feedback_by_manager(db, manager_id=current_user['id'], filters=filters)
     else: # Employee
-        return crud_feedback.get_feedback_by_employee(db, employee_id=current_user['id'])
+        # Employees only ever see their own feedback
+        filters.employee_id = None
+        feedback_list = crud_feedback.get_feedback_by_employee(db, employee_id=current_user['id'], filters=filters)
+
+    facets = crud_feedback.feedback_facets(feedback_list) if include_facets else None
+    if compact:
+        return {**crud_feedback.normalize_feedback(feedback_list), "facets": facets}
+    if include_facets:
+        return {"items": feedback_list, "facets": facets}
+    return feedback_list
+
+@router.get("/search", response_model=List[feedback_schema.FeedbackSearchResult])
+def search_feedback(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    db: Database = Depends(deps.get_db),
+    current_user: Dict[str, Any] = Depends(deps.get_current_user),
+):
+    """
+    Full-text search over feedback text, strengths and areas for improvement, best match first.
+    Searches the same feedback GET / returns: given by a manager, received by an employee.
+    """
+    return search_service.search_feedback(db, q=q, user=current_user, limit=limit)
+
+@router.get("/archived", response_model=List[feedback_schema.Feedback])
+def read_archived_feedback(
+    limit: int = Query(100, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    db: Database = Depends(deps.get_db),
+    current_user: Dict[str, Any] = Depends(deps.get_current_user),
+):
+    """
+    Old acknowledged feedback that the retention job moved out of GET / (see
+    RETENTION_FEEDBACK_DAYS), newest first, as it was when archived.
+    """
+    return crud_feedback.get_archived_feedback(db, user=current_user, limit=limit, offset=offset)
+
+@router.get("/{feedback_id}/similar", response_model=List[feedback_schema.SimilarFeedback])
+def read_similar_feedback(
+    feedback_id: int,
+    limit: int = Query(5, ge=1, le=50),
+    db: Database = Depends(deps.get_db),
+    current_user: Dict[str, Any] = Depends(deps.get_current_manager),
+):
+    """
+    Feedback the manager wrote (to anyone on their team) that reads most like this one,
+    most similar first. (Manager who created it only)
+    """
+    feedback = crud_feedback.get_feedback(db, feedback_id=feedback_id)
+    if not feedback:
+        raise HTTPException(status_code=404, detail="Feedback not found")
+    if feedback['manager_id'] != current_user['id']:
+        raise HTTPException(status_code=403, detail="Not authorized to view this feedback")
+
+    return similarity_service.similar_feedback(db, feedback=feedback, limit=limit)
 
 @router.put("/{feedback_id}", response_model=feedback_schema.Feedback)
 def update_feedback(
     feedback_id: int,
     feedback_in: feedback_schema.FeedbackUpdate,
-    db: Client = Depends(deps.get_db),
+    db: Database = Depends(deps.get_db),
     current_user: Dict[str, Any] = Depends(deps.get_current_manager),
 ):
     """
@@ -89,7 +177,7 @@ def update_feedback(
 @router.patch("/{feedback_id}/acknowledge", response_model=feedback_schema.Feedback)
 def acknowledge_feedback(
     feedback_id: int,
-    db: Client = Depends(deps.get_db),
+    db: Database = Depends(deps.get_db),
     current_user: Dict[str, Any] = Depends(deps.get_current_user),
 ):
     """
@@ -115,7 +203,7 @@ def acknowledge_feedback(
 
 @router.post("/request", status_code=status.HTTP_202_ACCEPTED)
 def request_feedback(
-    db: Client = Depends(deps.get_db),
+    db: Database = Depends(deps.get_db),
     current_user: Dict[str, Any] = Depends(deps.get_current_employee),
 ):
     """
@@ -124,13 +212,13 @@ def request_feedback(
     if not current_user.get("team_id"):
         raise HTTPException(status_code=400, detail="You are not in a team.")
 
-    team = crud_team.get_team(db, team_id=current_user["team_id"])
-    if not team or not team.get("manager_id"):
+    roster = crud_team.get_roster(db, team_id=current_user["team_id"])
+    if not roster or not roster.get("manager_id"):
         raise HTTPException(status_code=404, detail="Your manager could not be found.")
 
     crud_notification.create_notification(
         db,
-        user_id=team["manager_id"],
+        user_id=roster["manager_id"],
         message=f"Your team member, {current_user['full_name']}, has requested feedback."
     )
     return {"message": "Feedback request sent successfully"}
@@ -138,7 +226,7 @@ def request_feedback(
 
 @router.get("/export/pdf", response_class=StreamingResponse)
 def export_feedback_as_pdf(
-    db: Client = Depends(deps.get_db),
+    db: Database = Depends(deps.get_db),
     current_user: Dict[str, Any] = Depends(deps.get_current_user),
 ):
     """
@@ -152,8 +240,34 @@ def export_feedback_as_pdf(
     if not feedback_list:
         raise HTTPException(status_code=404, detail="No feedback found to export.")
 
-    # Assumes pdf_service.create_feedback_pdf can handle a list of dictionaries
-    pdf_buffer = pdf_service.create_feedback_pdf(feedback_list)
+    # Rendering is CPU-bound, so it runs in the pdf process pool rather than in this
+    # thread; the pool sends back plain bytes.
+    pdf_buffer = io.BytesIO(run_in("pdf", pdf_service.render_feedback_pdf, feedback_list))
 
     headers = {'Content-Disposition': 'attachment; filename="feedback_report.pdf"'}
     return StreamingResponse(pdf_buffer, media_type='application/pdf', headers=headers)
+
+
+@router.get("/export/zip", response_class=StreamingResponse)
+def export_team_feedback_as_zip(
+    db: Database = Depends(deps.get_db),
+    current_user: Dict[str, Any] = Depends(deps.get_current_manager),
+):
+    """
+    Export the feedback a manager has given as a ZIP with one PDF per employee. (Manager only)
+    """
+    feedback_list = crud_feedback.get_feedback_by_manager(db, manager_id=current_user['id'])
+    if not feedback_list:
+        raise HTTPException(status_code=404, detail="No feedback found to export.")
+
+    # Employees render in parallel in the pdf process pool; each PDF is written to the
+    # response as soon as it is ready, in whatever order they finish. At most one
+    # render per process is queued at a time, so other exports aren't stuck behind a
+    # large team's.
+    pool = bulkheads["pdf"]
+    partitions = pdf_service.partition_by_employee(feedback_list)
+    rendered = pool.map_unordered(pdf_service.render_partition, partitions, limit=max(pool.max_workers, 1))
+    archive = pdf_service.stream_zip(result for _, result in rendered)
+
+    headers = {'Content-Disposition': 'attachment; filename="team_feedback.zip"'}
+    return StreamingResponse(archive, media_type='application/zip', headers=headers)
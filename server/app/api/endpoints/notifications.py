@@ -1,6 +1,6 @@
 from typing import List, Dict, Any
 from fastapi import APIRouter, Depends, status, Response
-from supabase import Client # Replaced Session with Client
+from app.db.base import Database
 
 from app.crud import crud_notification
 from app.schemas import notification as notification_schema
@@ -13,7 +13,7 @@ router = APIRouter()
 
 @router.get("/", response_model=List[notification_schema.Notification])
 def read_notifications(
-    db: Client = Depends(deps.get_db), # Updated type hint
+    db: Database = Depends(deps.get_db), # Updated type hint
     current_user: Dict[str, Any] = Depends(deps.get_current_user), # Updated type hint
 ):
     """
@@ -25,7 +25,7 @@ def read_notifications(
 @router.patch("/{notification_id}/read", status_code=status.HTTP_204_NO_CONTENT)
 def mark_notification_as_read(
     notification_id: int,
-    db: Client = Depends(deps.get_db), # Updated type hint
+    db: Database = Depends(deps.get_db), # Updated type hint
     current_user: Dict[str, Any] = Depends(deps.get_current_user), # Updated type hint
 ):
     """
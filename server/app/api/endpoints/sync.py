@@ -0,0 +1,68 @@
+from typing import Any, Dict, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from app.core.config import settings
+from app.db.base import Database
+from app.db.replicated import use_primary
+from app.crud import crud_change_log, crud_feedback
+from app.schemas import sync as sync_schema
+from app.api import deps
+
+router = APIRouter()
+
+def _changed_ids(changes: List[Dict[str, Any]], entity: str) -> List[int]:
+    return list(dict.fromkeys(change['entity_id'] for change in changes if change['entity'] == entity))
+
+@router.get("/", response_model=sync_schema.SyncResponse)
+def sync(
+    since: Optional[str] = Query(None, description="Token from the previous sync. Omit it to get a starting token."),
+    limit: int = Query(settings.SYNC_PAGE_SIZE, ge=1, le=settings.SYNC_PAGE_SIZE),
+    db: Database = Depends(deps.get_db),
+    current_user: Dict[str, Any] = Depends(deps.get_current_user),
+):
+    """
+    Feedback and notifications created or changed since `since`, and a new token.
+
+    Without `since` only a starting token is returned: take it, then load the full
+    lists (GET /v1/feedback, GET /v1/notifications), then sync with it from then on.
+    Changes may be delivered more than once, so apply them by id.
+    """
+    # From the primary: a replica could be missing a change, or serve a row older than
+    # the change that listed it, and the token would still move past it.
+    with use_primary():
+        return _sync(db, user_id=current_user['id'], since=since, limit=limit)
+
+def _sync(db: Database, *, user_id: int, since: Optional[str], limit: int) -> Dict[str, Any]:
+    if since is None:
+        version = crud_change_log.get_head_version(db, user_id=user_id)
+        return {"token": crud_change_log.encode_token(version)}
+
+    try:
+        since_version = crud_change_log.decode_token(since)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    changes, version, has_more = crud_change_log.get_changes(db, user_id=user_id, since=since_version, limit=limit)
+
+    feedback: List[Dict[str, Any]] = []
+    feedback_ids = _changed_ids(changes, "feedback")
+    if feedback_ids:
+        rows = db.table("feedback").select(crud_feedback.FEEDBACK_SELECT).in_("id", feedback_ids).execute().data or []
+        feedback = [row for row in rows if user_id in (row['manager_id'], row['employee_id'])]
+
+    notifications: List[Dict[str, Any]] = []
+    notification_ids = _changed_ids(changes, "notification")
+    if notification_ids:
+        notifications = (
+            db.table("notifications").select("*").in_("id", notification_ids).eq("user_id", user_id).execute().data or []
+        )
+
+    found_feedback = {row['id'] for row in feedback}
+    found_notifications = {row['id'] for row in notifications}
+    return {
+        "token": crud_change_log.encode_token(version),
+        "has_more": has_more,
+        "feedback": feedback,
+        "notifications": notifications,
+        "removed_feedback_ids": [i for i in feedback_ids if i not in found_feedback],
+        "removed_notification_ids": [i for i in notification_ids if i not in found_notifications],
+    }
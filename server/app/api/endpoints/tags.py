@@ -1,6 +1,6 @@
 from typing import List
 from fastapi import APIRouter, Depends
-from supabase import Client
+from app.db.base import Database
 from app.crud import crud_tag
 from app.schemas import tag as tag_schema
 from app.api import deps
@@ -9,7 +9,7 @@ router = APIRouter()
 
 @router.get("/", response_model=List[tag_schema.Tag])
 def read_tags(
-    db: Client = Depends(deps.get_db),
+    db: Database = Depends(deps.get_db),
 ):
     """
     Retrieve all tags.
@@ -1,18 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from supabase import Client
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from app.db.base import Database
 from typing import List, Dict, Any
 
 from app.crud import crud_team, crud_user, crud_feedback # Import crud_feedback
 from app.schemas import team as team_schema
 from app.schemas import user as user_schema
 from app.api import deps
+from app.services import directory_service
 
 router = APIRouter()
 
 @router.post("/", response_model=team_schema.Team, status_code=status.HTTP_201_CREATED)
 def create_team(
     *,
-    db: Client = Depends(deps.get_db),
+    db: Database = Depends(deps.get_db),
     team_in: team_schema.TeamCreate,
     current_user: Dict[str, Any] = Depends(deps.get_current_manager),
 ):
@@ -27,7 +28,7 @@ def create_team(
 
 @router.get("/me", response_model=team_schema.Team)
 def read_my_team(
-    db: Client = Depends(deps.get_db),
+    db: Database = Depends(deps.get_db),
     current_user: Dict[str, Any] = Depends(deps.get_current_manager),
 ):
     team = crud_team.get_team_by_manager(db, manager_id=current_user['id'])
@@ -44,7 +45,7 @@ def read_my_team(
 def add_team_member(
     team_id: int,
     user_id: int,
-    db: Client = Depends(deps.get_db),
+    db: Database = Depends(deps.get_db),
     current_user: Dict[str, Any] = Depends(deps.get_current_manager),
 ):
     team = crud_team.get_team_by_manager(db, manager_id=current_user['id'])
@@ -66,7 +67,7 @@ def add_team_member(
 
 @router.get("/me/stats", response_model=List[Dict[str, Any]])
 def get_my_team_stats(
-    db: Client = Depends(deps.get_db),
+    db: Database = Depends(deps.get_db),
     current_user: Dict[str, Any] = Depends(deps.get_current_manager),
 ):
     """
@@ -76,9 +77,22 @@ def get_my_team_stats(
     return stats
 
 @router.get("/", response_model=List[team_schema.TeamPublic])
-def read_teams(db: Client = Depends(deps.get_db)):
+def read_teams(db: Database = Depends(deps.get_db)):
     """
     Retrieve all teams. This is a public endpoint.
     """
     teams = crud_team.get_all_teams(db)
     return teams
+
+@router.get("/search", response_model=team_schema.TeamPage)
+def search_teams(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=10000),
+    db: Database = Depends(deps.get_db),
+):
+    """
+    Typeahead search of teams by the start of words in their name. Public, like
+    the team list, for the registration form.
+    """
+    return directory_service.search_teams(db, q=q, limit=limit, offset=offset)
@@ -1,10 +1,14 @@
-from fastapi import APIRouter, Depends
-from typing import Dict, Any, List
-from supabase import Client
+import json
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from typing import Dict, Any, List, Optional
+from app.db.base import Database
 
 from app.api import deps
+from app.core.config import settings
 from app.schemas import user as user_schema
 from app.crud import crud_user
+from app.services import directory_service, provisioning_service
 
 router = APIRouter()
 
@@ -16,8 +20,83 @@ def read_users_me(current_user: Dict[str, Any] = Depends(deps.get_current_user))
     return current_user
 
 @router.get("/employees", response_model=List[user_schema.User])
-def read_employees(db: Client = Depends(deps.get_db)):
+def read_employees(db: Database = Depends(deps.get_db)):
     """
     Retrieve all employees who are not yet assigned to a team.
     """
     return crud_user.get_unassigned_employees(db)
+
+@router.get("/search", response_model=user_schema.UserPage)
+def search_users(
+    q: str = Query(..., min_length=1, max_length=100),
+    role: Optional[user_schema.Role] = None,
+    team_id: Optional[int] = None,
+    unassigned: bool = False,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=10000),
+    db: Database = Depends(deps.get_db),
+    current_user: Dict[str, Any] = Depends(deps.get_current_user),
+):
+    """
+    Typeahead search of users by the start of words in their name or email, e.g.
+    "ann sm". Filters: role, team_id, and unassigned=true for users without a team
+    (the "add member" picker). Names starting with the query come first.
+    """
+    return directory_service.search_users(
+        db, q=q, role=role.value if role else None, team_id=team_id,
+        unassigned=unassigned, limit=limit, offset=offset,
+    )
+
+_bulk_row_schema = {
+    "type": "object",
+    "properties": {
+        "email": {"type": "string"},
+        "full_name": {"type": "string"},
+        "role": {"type": "string", "enum": ["manager", "employee"]},
+        "password": {"type": "string"},
+        "team_name": {"type": "string"},
+        "team_id": {"type": "integer"},
+    },
+}
+
+@router.post(
+    "/bulk",
+    response_model=user_schema.BulkProvisionResult,
+    openapi_extra={"requestBody": {"required": True, "content": {
+        "application/json": {"schema": {"type": "array", "items": _bulk_row_schema}},
+        "text/csv": {"schema": {"type": "string", "example": "email,full_name,role,password,team_name,team_id"}},
+    }}},
+)
+async def bulk_provision_users(
+    request: Request,
+    dry_run: bool = False,
+    db: Database = Depends(deps.get_db),
+    current_user: Dict[str, Any] = Depends(deps.get_current_manager),
+):
+    """
+    Create many users at once. (Manager only)
+    The body is a JSON list of rows (or {"users": [...]}) or a CSV with a header line,
+    with the same fields as /v1/auth/register. Employees may give team_name instead of
+    team_id, naming an existing team or one a manager row in the same upload creates.
+    Every row gets a result; rows with errors are skipped and the rest are created.
+    With dry_run=true everything is checked but nothing is created.
+    """
+    body = await request.body()
+    try:
+        if request.headers.get("content-type", "").startswith("text/csv"):
+            rows = provisioning_service.parse_csv(body.decode("utf-8-sig"))
+        else:
+            data = json.loads(body)
+            rows = data.get("users") if isinstance(data, dict) else data
+            if not isinstance(rows, list):
+                raise ValueError('Expected a JSON list of users or {"users": [...]}.')
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"Could not read the upload: {e}")
+
+    if len(rows) > settings.BULK_PROVISION_MAX_ROWS:
+        raise HTTPException(
+            status_code=413, detail=f"At most {settings.BULK_PROVISION_MAX_ROWS} users per upload."
+        )
+
+    # Async only to read the raw body; the work itself runs in the threadpool like a sync route.
+    return await run_in_threadpool(provisioning_service.provision_users, db, rows=rows, dry_run=dry_run)
@@ -1,5 +1,6 @@
 import os
 import sys
+from typing import Literal, Optional
 from pydantic_settings import BaseSettings
 from pydantic import ValidationError
 from dotenv import load_dotenv
@@ -8,9 +9,24 @@ from dotenv import load_dotenv
 load_dotenv()
 
 class Settings(BaseSettings):
-    # Add Supabase credentials
-    SUPABASE_URL: str
-    SUPABASE_KEY: str
+    # Database backend: "supabase" (PostgREST over HTTP), "postgres" (direct asyncpg pool)
+    # or "memory" (process-local stand-in for offline development and benchmarks)
+    DB_BACKEND: Literal["supabase", "postgres", "memory"] = "supabase"
+
+    # Add Supabase credentials (required when DB_BACKEND is "supabase")
+    SUPABASE_URL: Optional[str] = None
+    SUPABASE_KEY: Optional[str] = None
+
+    # Direct Postgres connection (required when DB_BACKEND is "postgres")
+    DATABASE_URL: Optional[str] = None
+    DB_POOL_MIN_SIZE: int = 2
+    DB_POOL_MAX_SIZE: int = 10
+    DB_STATEMENT_CACHE_SIZE: int = 256  # Prepared statements kept per connection
+
+    # Read replicas (app/db/replicated.py); reads go to the primary when none are set
+    DB_REPLICA_URLS: str = ""  # Comma-separated Postgres URLs or Supabase API URLs (same key); "memory" for a stand-in
+    DB_REPLICA_PIN_SECONDS: float = 5.0  # After a user writes, their reads go to the primary for this long
+    MEMORY_REPLICA_LAG_SECONDS: float = 1.0  # How far the memory backend's stand-in replicas trail the primary
 
     # Remove the old DATABASE_URL
     # DATABASE_URL: str 
@@ -20,6 +36,116 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int
     GEMINI_API_KEY: str
 
+    # Production server (python -m app.launcher, used by run.sh when SERVER_MODE=production)
+    WEB_CONCURRENCY: Optional[int] = None  # Worker processes; derived from available CPUs when unset
+    WORKERS_PER_CPU: float = 1.0
+    MAX_WORKERS: int = 8
+    MAX_REQUESTS: int = 0  # Recycle a worker after this many requests; 0 disables recycling
+    MAX_REQUESTS_JITTER: int = 0  # Random extra requests per worker so recycles are staggered
+    GRACEFUL_TIMEOUT_SECONDS: int = 30  # Time in-flight requests get to finish on shutdown
+    ROLLING_RESTART_GRACE_SECONDS: float = 5.0  # Boot time given to each replacement worker on SIGHUP
+
+    # Admission control for /v1/ai/* (limits apply per worker process)
+    AI_MAX_CONCURRENCY: int = 8  # LLM requests in flight at once
+    AI_MAX_QUEUE: int = 32  # Requests allowed to wait for a slot; more are rejected with 503
+    AI_QUEUE_TIMEOUT_SECONDS: float = 10.0  # Longest wait for a slot before a 503
+    AI_USER_RATE_PER_MINUTE: float = 20.0  # Token refill rate per user; 0 disables the limit
+    AI_USER_BURST: int = 5
+    AI_TEAM_RATE_PER_MINUTE: float = 60.0  # Shared by everyone on a team; 0 disables the limit
+    AI_TEAM_BURST: int = 15
+
+    # Resilience for Gemini calls (app/core/resilience.py)
+    AI_REQUEST_DEADLINE_SECONDS: float = 20.0  # Time budget of a /v1/ai/* request, including its queue wait
+    AI_SUMMARY_DEADLINE_SECONDS: float = 90.0  # /v1/ai/summary makes many calls, so it gets longer
+    AI_CALL_TIMEOUT_SECONDS: float = 15.0  # Longest a single Gemini call may take, deadline permitting
+    AI_HEDGE_ENABLED: bool = True  # Send a second request when a call outlasts the recent p95
+    AI_HEDGE_MIN_DELAY_SECONDS: float = 0.5  # Never hedge sooner than this
+    AI_HEDGE_MAX_RATIO: float = 0.1  # At most this fraction of calls may be hedged
+    AI_BREAKER_FAILURE_THRESHOLD: int = 5  # Consecutive failures that open the circuit
+    AI_BREAKER_RESET_SECONDS: float = 30.0  # How long an open circuit fails fast before a probe
+
+    # Feedback summaries (/v1/ai/summary)
+    AI_SUMMARY_CHUNK_TOKENS: int = 3000  # Budget for the feedback in one map-step prompt
+    AI_SUMMARY_PARALLELISM: int = 4  # Chunk summaries in flight at once for one request
+    AI_SUMMARY_CACHE_SIZE: int = 4096  # Chunk summaries kept per worker, keyed by content hash
+    AI_SUMMARY_MAX_REDUCE_ROUNDS: int = 3  # The last round combines whatever is left in one call
+
+    # Bulkhead executors (app/core/executors.py); 0 runs that class of work inline
+    EXECUTOR_DB_THREADS: int = 40  # anyio's default threadpool: sync routes and dependencies
+    EXECUTOR_LLM_THREADS: int = 16  # /v1/ai/* routes
+    EXECUTOR_GEMINI_THREADS: int = 32  # The Gemini calls themselves, hedges included
+    EXECUTOR_PDF_PROCESSES: int = 2  # reportlab renders
+    EXECUTOR_CRYPTO_PROCESSES: int = 2  # bcrypt hashing and verification
+
+    # Caches (per worker process)
+    ROSTER_CACHE_SIZE: int = 1024  # Teams whose roster (manager, members) is kept in memory
+    ROSTER_CACHE_TTL_SECONDS: float = 60.0  # Bounds staleness from changes made by other workers
+
+    # Feedback search (app/services/search_service.py)
+    SEARCH_BACKEND: Literal["memory", "postgres"] = "memory"  # "postgres" needs sql/002_feedback_search.sql
+    SEARCH_INDEX_REFRESH_SECONDS: float = 30.0  # How often the in-process index picks up rows added by other workers
+    SEARCH_INDEX_REBUILD_SECONDS: float = 900.0  # Full rebuild, which also picks up their edits; 0 disables
+
+    # Similar feedback and near-duplicate detection (app/services/similarity_service.py)
+    SIMILARITY_DIMENSIONS: int = 512  # Embedding width, a power of two; memory is 4 bytes x this per feedback row
+    SIMILARITY_MAX_TEAMS: int = 256  # Team matrices kept in memory per worker
+    SIMILARITY_INDEX_TTL_SECONDS: float = 300.0  # Reload interval, which picks up other workers' writes
+    SIMILARITY_MIN_SCORE: float = 0.2  # Cosine below which feedback is not reported as similar
+    NEAR_DUPLICATE_THRESHOLD: float = 0.9  # Cosine at which new feedback is flagged as a near-duplicate; 0 disables
+    SIMILARITY_LSH: bool = False  # Prefilter the near-duplicate check with MinHash/LSH on large teams
+    SIMILARITY_LSH_MIN_ROWS: int = 5000  # Team size from which the LSH prefilter is used
+
+    # User and team typeahead (app/services/directory_service.py)
+    DIRECTORY_REFRESH_SECONDS: float = 30.0  # Catch up with users and teams other workers created
+    DIRECTORY_REBUILD_SECONDS: float = 600.0  # Full reload, which also picks up their edits
+
+    # Bulk provisioning (POST /v1/users/bulk)
+    BULK_PROVISION_MAX_ROWS: int = 5000  # Larger uploads are rejected with 413
+
+    # Delta sync (GET /v1/sync)
+    SYNC_PAGE_SIZE: int = 500  # Most changes returned by one sync; the client follows has_more
+    SYNC_SETTLE_SECONDS: float = 1.0  # Age before a change is behind a token; covers in-flight writes and clock skew
+
+    # Feedback drafts (app/services/draft_service.py)
+    DRAFT_DEBOUNCE_SECONDS: float = 2.0  # A draft is written once its saves pause this long; also the least time between its writes
+    DRAFT_FLUSH_SECONDS: float = 10.0  # Longest a save waits in the buffer while saves keep coming
+
+    # Retention job (app/services/retention_service.py)
+    RETENTION_INTERVAL_SECONDS: float = 3600.0  # Time between runs; 0 disables the job
+    RETENTION_NOTIFICATION_DAYS: float = 90.0  # Read notifications older than this are archived; 0 keeps them
+    RETENTION_FEEDBACK_DAYS: float = 0.0  # Acknowledged feedback older than this moves to feedback_archive; 0 (default) keeps it
+    RETENTION_BATCH_SIZE: int = 500  # Rows moved per batch
+    RETENTION_BATCH_PAUSE_SECONDS: float = 0.5  # Pause between batches, to leave the database to requests
+    RETENTION_ARCHIVE_DIR: str = ""  # Archive notifications to gzipped JSON lines here instead of notifications_archive
+    RETENTION_LOCK_FILE: str = "/tmp/feedback-retention.lock"  # One worker per host runs the job
+
+    # Idempotency keys (app/core/idempotency.py)
+    IDEMPOTENCY_ENABLED: bool = True  # Honours Idempotency-Key on POST, PUT, PATCH and DELETE
+    IDEMPOTENCY_TTL_SECONDS: float = 86400.0  # How long a response is replayed to retries of its key
+    IDEMPOTENCY_MAX_ENTRIES: int = 10000  # Responses kept per worker; least recently used go first
+    IDEMPOTENCY_MAX_BODY_BYTES: int = 65536  # Larger responses aren't kept (a retry runs again)
+    IDEMPOTENCY_WAIT_SECONDS: float = 30.0  # How long a retry waits for its key's first attempt before a 409
+
+    # Startup
+    WARMUP_ON_STARTUP: bool = True  # Preconnect to the database and preload the tag registry
+
+    # Observability
+    DEBUG: bool = False  # Adds per-request diagnostic headers such as X-DB-Round-Trips
+    METRICS_ENABLED: bool = True  # Exposes Prometheus metrics at /metrics
+    LOG_LEVEL: str = "INFO"  # Root log level
+    LOG_FORMAT: str = "json"  # "json" (one object per line) or "text"
+    LOG_SAMPLING: str = ""  # Per-logger fraction of sub-WARNING records kept, e.g. "uvicorn.access=0.1,app.db=0.01"
+    LOG_QUEUE_SIZE: int = 10000  # Records waiting for the writer thread; more are dropped, not waited for
+
+    # Per-request profiling (app/core/profiling.py); off by default, and then costs nothing
+    PROFILING_ENABLED: bool = False  # Installs the profiling middleware and the /debug/profiles routes
+    PROFILING_TOKEN: str = ""  # X-Profile-Token value that profiles a request and opens /debug/profiles; empty disables both
+    PROFILING_SAMPLE_RATE: float = 0.0  # Fraction of all requests profiled without the header
+    PROFILING_INTERVAL_MS: float = 5.0  # Time between stack samples
+    PROFILING_MAX_SECONDS: float = 60.0  # Sampling stops after this long (long downloads)
+    PROFILING_DIR: str = "/tmp/feedback-profiles"  # Where profiles are stored, per host
+    PROFILING_MAX_PROFILES: int = 200  # Oldest profiles beyond this are deleted
+
     class Config:
         env_file = ".env"
 
@@ -0,0 +1,39 @@
+"""
+A minimal in-process publish/subscribe hub for domain events.
+
+CRUD functions publish what they changed (e.g. "feedback.created" with the new
+row); services that keep derived state, such as the search index, subscribe to
+keep it current without the CRUD layer knowing about them. Handlers run
+synchronously in the publisher's thread, so they should be quick. A failing handler
+is logged and never fails the write that published the event.
+
+Events are local to the worker process that made the change.
+"""
+import logging
+from typing import Any, Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[Dict[str, Any]], None]
+
+_subscribers: Dict[str, List[Handler]] = {}
+
+
+def subscribe(event: str, handler: Handler) -> None:
+    handlers = _subscribers.setdefault(event, [])
+    if handler not in handlers:
+        handlers.append(handler)
+
+
+def unsubscribe(event: str, handler: Handler) -> None:
+    handlers = _subscribers.get(event, [])
+    if handler in handlers:
+        handlers.remove(handler)
+
+
+def publish(event: str, payload: Dict[str, Any]) -> None:
+    for handler in list(_subscribers.get(event, ())):
+        try:
+            handler(payload)
+        except Exception:
+            logger.exception(f"Handler {getattr(handler, '__qualname__', handler)!r} failed for event {event!r}.")
@@ -0,0 +1,207 @@
+"""
+Bulkheads: separately sized executors per class of work, so a slow or CPU-heavy
+class cannot starve the others.
+
+- "db":     anyio's default threadpool, which runs every sync route and dependency
+            that has not declared another class. Sized by EXECUTOR_DB_THREADS.
+- "llm":    threads for the /v1/ai/* routes, which wait seconds for Gemini.
+- "gemini": threads making the Gemini calls themselves (see app/core/resilience.py),
+            so a route can stop waiting at its deadline and calls can be hedged.
+- "pdf":    processes for reportlab renders (CPU-bound, holds the GIL).
+- "crypto": processes for bcrypt hashing and verification (CPU-bound).
+
+Routes declare their class with the `@bulkhead("llm")` decorator; services hand
+individual calls to a pool with `run_in("crypto", fn, *args)`. A pool sized 0 runs
+its work inline in the calling thread.
+"""
+import asyncio
+import contextvars
+import functools
+import itertools
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple, TypeVar
+
+from app.core.config import settings
+from app.core.metrics import EXECUTOR_ACTIVE, EXECUTOR_QUEUE_DEPTH, EXECUTOR_SATURATION
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class Bulkhead:
+    """
+    A lazily created thread or process pool that publishes its queue depth and
+    saturation. Work submitted beyond `max_workers` waits in the executor's queue.
+    """
+
+    def __init__(self, name: str, kind: str, max_workers: int) -> None:
+        self.name = name
+        self.kind = kind  # "thread" or "process"
+        self.max_workers = max_workers
+        self._executor: Optional[Executor] = None
+        self._pending = 0  # Submitted and not yet finished
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    if self.kind == "process":
+                        # "spawn" keeps children free of the parent's threads and locks;
+                        # they import only the modules the submitted function needs.
+                        self._executor = ProcessPoolExecutor(
+                            max_workers=self.max_workers,
+                            mp_context=multiprocessing.get_context("spawn"),
+                        )
+                    else:
+                        self._executor = ThreadPoolExecutor(
+                            max_workers=self.max_workers, thread_name_prefix=f"{self.name}-pool"
+                        )
+        return self._executor
+
+    def _publish(self) -> None:
+        active = min(self._pending, self.max_workers)
+        EXECUTOR_ACTIVE.labels(pool=self.name).set(active)
+        EXECUTOR_QUEUE_DEPTH.labels(pool=self.name).set(self._pending - active)
+        EXECUTOR_SATURATION.labels(pool=self.name).set(active / self.max_workers)
+
+    def _finished(self, _: Future) -> None:
+        with self._lock:
+            self._pending -= 1
+            self._publish()
+
+    def submit(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> "Future[T]":
+        if self.kind == "thread":
+            # Carry the caller's context (e.g. per-request metrics) into the pool thread.
+            fn = functools.partial(contextvars.copy_context().run, fn)
+        future = self.executor.submit(fn, *args, **kwargs)
+        with self._lock:
+            self._pending += 1
+            self._publish()
+        future.add_done_callback(self._finished)
+        return future
+
+    def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Runs `fn` in the pool and blocks the calling thread until it returns."""
+        if self.max_workers <= 0:
+            return fn(*args, **kwargs)
+        return self.submit(fn, *args, **kwargs).result()
+
+    async def run_async(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Runs `fn` in the pool without blocking the event loop."""
+        if self.max_workers <= 0:
+            return fn(*args, **kwargs)
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def map_unordered(
+        self, fn: Callable[[T], Any], items: Iterable[T], *, limit: Optional[int] = None
+    ) -> Iterator[Tuple[T, Any]]:
+        """
+        Runs `fn` on every item in the pool and yields (item, result) pairs in the
+        order they finish. At most `limit` items are submitted at a time, so one
+        caller can't fill the whole pool. Closing the iterator early cancels what
+        hasn't started.
+        """
+        if self.max_workers <= 0:
+            for item in items:
+                yield item, fn(item)
+            return
+        pending = iter(items)
+        futures: Dict[Future, T] = {}
+        try:
+            for item in itertools.islice(pending, limit):
+                futures[self.submit(fn, item)] = item
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    item = futures.pop(future)
+                    for following in itertools.islice(pending, 1):
+                        futures[self.submit(fn, following)] = following
+                    yield item, future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def prestart(self) -> None:
+        """Starts the pool's worker processes now rather than on the first request."""
+        if self.kind == "process" and self.max_workers > 0:
+            for future in [self.executor.submit(_noop) for _ in range(self.max_workers)]:
+                future.result()
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+def _noop() -> None:
+    return None
+
+
+bulkheads: Dict[str, Bulkhead] = {
+    "llm": Bulkhead("llm", "thread", settings.EXECUTOR_LLM_THREADS),
+    "gemini": Bulkhead("gemini", "thread", settings.EXECUTOR_GEMINI_THREADS),
+    "pdf": Bulkhead("pdf", "process", settings.EXECUTOR_PDF_PROCESSES),
+    "crypto": Bulkhead("crypto", "process", settings.EXECUTOR_CRYPTO_PROCESSES),
+}
+
+
+def run_in(pool: str, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Runs `fn` in the named pool from synchronous code. Functions sent to a process
+    pool, and their arguments and results, must be picklable (module-level functions).
+    """
+    return bulkheads[pool].run(fn, *args, **kwargs)
+
+
+def bulkhead(pool: str) -> Callable[[Callable[..., T]], Callable[..., Any]]:
+    """
+    Declares the class of work a sync route does. The route runs in the named thread
+    pool instead of the shared default threadpool; its dependencies are unaffected.
+
+        @router.post("/rephrase")
+        @bulkhead("llm")
+        def rephrase(...): ...
+    """
+    if bulkheads[pool].kind != "thread":
+        raise ValueError(f"Routes can only run in thread pools, not '{pool}'.")
+
+    def decorator(func: Callable[..., T]) -> Callable[..., Any]:
+        @functools.wraps(func)  # FastAPI reads the parameters through __wrapped__
+        async def wrapper(*args: Any, **kwargs: Any) -> T:
+            return await bulkheads[pool].run_async(func, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# --- The default threadpool ("db") ---
+
+def configure_default_threadpool() -> None:
+    """Sizes anyio's default threadpool; must be called from the event loop."""
+    import anyio.to_thread
+    anyio.to_thread.current_default_thread_limiter().total_tokens = settings.EXECUTOR_DB_THREADS
+
+
+async def publish_default_threadpool_stats(interval: float = 1.0) -> None:
+    """
+    Samples anyio's default threadpool into the same gauges as the other pools.
+    Runs for the lifetime of the app (started by the lifespan hook).
+    """
+    import anyio.to_thread
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    while True:
+        statistics = limiter.statistics()
+        EXECUTOR_ACTIVE.labels(pool="db").set(statistics.borrowed_tokens)
+        EXECUTOR_QUEUE_DEPTH.labels(pool="db").set(statistics.tasks_waiting)
+        EXECUTOR_SATURATION.labels(pool="db").set(statistics.borrowed_tokens / statistics.total_tokens)
+        await asyncio.sleep(interval)
+
+
+def shutdown_all() -> None:
+    for pool in bulkheads.values():
+        pool.shutdown()
@@ -0,0 +1,49 @@
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+
+class WorkerState:
+    """
+    Lifecycle of the current server process, reported by /readyz.
+
+    A worker is ready once the lifespan startup (including warm-up) has finished and
+    stops being ready as soon as it starts draining: on SIGTERM/SIGHUP from the
+    supervisor, when it reaches its max-requests recycle limit, or on shutdown.
+    """
+
+    def __init__(self) -> None:
+        self.started_at = time.time()
+        self.ready = False
+        self.draining_reason: Optional[str] = None
+        self.max_requests: Optional[int] = None
+        # Set by the production launcher to read uvicorn's request counter.
+        self.requests_served: Optional[Callable[[], int]] = None
+        self._lock = threading.Lock()
+
+    def mark_ready(self) -> None:
+        with self._lock:
+            self.ready = True
+
+    def mark_draining(self, reason: str) -> None:
+        with self._lock:
+            if self.draining_reason is None:
+                self.draining_reason = reason
+
+    @property
+    def is_ready(self) -> bool:
+        return self.ready and self.draining_reason is None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "status": "ready" if self.is_ready else ("draining" if self.draining_reason else "starting"),
+            "pid": os.getpid(),
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+            "draining_reason": self.draining_reason,
+            "requests_served": self.requests_served() if self.requests_served else None,
+            "max_requests": self.max_requests,
+        }
+
+
+worker_state = WorkerState()
@@ -0,0 +1,215 @@
+"""
+Idempotency-Key support for write requests.
+
+A POST, PUT, PATCH or DELETE that carries an `Idempotency-Key` header runs once.
+Its response (status, headers, body) is kept for IDEMPOTENCY_TTL_SECONDS, and a
+retry with the same key gets that response back, marked `Idempotent-Replayed:
+true`, without running the route: no auth lookup, no database, no notifications.
+
+- Keys are scoped to the caller (a hash of the Authorization header), so one
+  user's key never replays another's response.
+- A retry must be the same request: the same method, path, query and body. Reusing
+  a key for a different request is a 422.
+- A retry that arrives while the first attempt is still running waits for it, up to
+  IDEMPOTENCY_WAIT_SECONDS, then replays its response. After the wait it gets a 409.
+- Responses that ask the client to try again aren't kept, so the retry runs
+  again: 5xx, and the 408, 409, 425 and 429 of RETRYABLE_STATUSES (rate limits,
+  draft version conflicts). Neither are bodies larger than
+  IDEMPOTENCY_MAX_BODY_BYTES (the exports).
+
+Responses are kept in an IdempotencyStore. The default is an LRU of
+IDEMPOTENCY_MAX_ENTRIES per worker process, so a retry that lands on another worker
+runs again. A store shared by all workers can be swapped in with `set_store`.
+Waiting for an in-flight first attempt only works within one worker.
+"""
+import asyncio
+import hashlib
+import json
+from typing import Any, Dict, List, Optional, Protocol, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.core.metrics import IDEMPOTENCY_REQUESTS
+
+_UNSAFE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+# Answers that say "not now" rather than "done": replaying them would turn a
+# momentary rate limit or conflict into one that lasts IDEMPOTENCY_TTL_SECONDS.
+RETRYABLE_STATUSES = {408, 409, 425, 429}
+
+
+class StoredResponse:
+    def __init__(
+        self, fingerprint: str, status: int, headers: List[Tuple[bytes, bytes]], body: bytes, route: Any = None
+    ) -> None:
+        self.fingerprint = fingerprint  # Hash of the request it answered
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.route = route  # The route that answered, so replays keep their metrics label
+
+
+class IdempotencyStore(Protocol):
+    def get(self, key: str) -> Optional[StoredResponse]:
+        ...
+
+    def set(self, key: str, response: StoredResponse) -> None:
+        ...
+
+
+class InMemoryIdempotencyStore:
+    """Process-local responses, least recently used dropped first."""
+
+    def __init__(self) -> None:
+        self._cache: LRUCache[StoredResponse] = LRUCache(
+            maxsize=settings.IDEMPOTENCY_MAX_ENTRIES, ttl=settings.IDEMPOTENCY_TTL_SECONDS
+        )
+
+    def get(self, key: str) -> Optional[StoredResponse]:
+        return self._cache.get(key)
+
+    def set(self, key: str, response: StoredResponse) -> None:
+        self._cache.set(key, response)
+
+
+_store: IdempotencyStore = InMemoryIdempotencyStore()
+
+# First attempts in progress in this worker: key -> (fingerprint, done).
+_in_flight: Dict[str, Tuple[str, asyncio.Event]] = {}
+
+
+def set_store(store: IdempotencyStore) -> None:
+    """Replaces the response store, e.g. with one shared by all workers."""
+    global _store
+    _store = store
+
+
+def _header(scope: Scope, name: bytes) -> Optional[bytes]:
+    return next((value for key, value in scope["headers"] if key == name), None)
+
+
+async def _send_json(send: Send, status: int, detail: str, headers: Optional[List[Tuple[bytes, bytes]]] = None) -> None:
+    body = json.dumps({"detail": detail}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())] + (headers or []),
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _replay(scope: Scope, send: Send, stored: StoredResponse) -> None:
+    IDEMPOTENCY_REQUESTS.labels(outcome="replayed").inc()
+    if stored.route is not None:
+        scope["route"] = stored.route
+    await send({
+        "type": "http.response.start",
+        "status": stored.status,
+        "headers": stored.headers + [(b"idempotent-replayed", b"true")],
+    })
+    await send({"type": "http.response.body", "body": stored.body})
+
+
+class IdempotencyMiddleware:
+    """
+    Pure ASGI middleware that runs each keyed write request once and replays its
+    response to retries.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] not in _UNSAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
+        raw_key = _header(scope, b"idempotency-key")
+        if raw_key is None:
+            await self.app(scope, receive, send)
+            return
+        if not 1 <= len(raw_key) <= 255:
+            await _send_json(send, 400, "Idempotency-Key must be 1 to 255 characters.")
+            return
+
+        # The whole body, to fingerprint it; the route is then fed the same messages.
+        messages: List[Message] = []
+        body = hashlib.sha256()
+        while True:
+            message = await receive()
+            messages.append(message)
+            if message["type"] != "http.request":
+                break
+            body.update(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+        fingerprint = hashlib.sha256(
+            b"\n".join([scope["method"].encode(), scope["path"].encode(), scope.get("query_string", b""), body.digest()])
+        ).hexdigest()
+        caller = hashlib.sha256(_header(scope, b"authorization") or b"").hexdigest()
+        key = f"{caller}:{raw_key.decode('latin-1')}"
+
+        while True:
+            stored = _store.get(key)
+            if stored is not None:
+                if stored.fingerprint != fingerprint:
+                    IDEMPOTENCY_REQUESTS.labels(outcome="mismatch").inc()
+                    await _send_json(send, 422, "This Idempotency-Key was used for a different request.")
+                    return
+                await _replay(scope, send, stored)
+                return
+            in_flight = _in_flight.get(key)
+            if in_flight is None:
+                break
+            if in_flight[0] != fingerprint:
+                IDEMPOTENCY_REQUESTS.labels(outcome="mismatch").inc()
+                await _send_json(send, 422, "This Idempotency-Key was used for a different request.")
+                return
+            IDEMPOTENCY_REQUESTS.labels(outcome="waited").inc()
+            try:
+                await asyncio.wait_for(in_flight[1].wait(), settings.IDEMPOTENCY_WAIT_SECONDS)
+            except asyncio.TimeoutError:
+                IDEMPOTENCY_REQUESTS.labels(outcome="conflict").inc()
+                await _send_json(send, 409, "A request with this Idempotency-Key is still in progress.",
+                                 [(b"retry-after", b"1")])
+                return
+            if _store.get(key) is None:
+                # The first attempt wasn't kept (retryable or too big): run this one.
+                continue
+
+        done = asyncio.Event()
+        _in_flight[key] = (fingerprint, done)
+        pending = iter(messages)
+
+        async def replay_receive() -> Message:
+            message = next(pending, None)
+            return message if message is not None else await receive()
+
+        status = 500
+        headers: List[Tuple[bytes, bytes]] = []
+        chunks: List[bytes] = []
+        size = 0
+        complete = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status, headers, size, complete
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+                if size <= settings.IDEMPOTENCY_MAX_BODY_BYTES:
+                    chunks.append(message.get("body", b""))
+                complete = not message.get("more_body", False)
+            await send(message)
+
+        try:
+            await self.app(scope, replay_receive, send_wrapper)
+        finally:
+            if (complete and status < 500 and status not in RETRYABLE_STATUSES
+                    and size <= settings.IDEMPOTENCY_MAX_BODY_BYTES):
+                _store.set(key, StoredResponse(fingerprint, status, headers, b"".join(chunks), scope.get("route")))
+                IDEMPOTENCY_REQUESTS.labels(outcome="stored").inc()
+            del _in_flight[key]
+            done.set()
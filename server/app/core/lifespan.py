@@ -0,0 +1,63 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from fastapi import FastAPI
+from starlette.concurrency import run_in_threadpool
+
+from app.core import executors
+from app.core.config import settings
+from app.core.health import worker_state
+from app.crud import crud_tag
+from app.db import session
+from app.db.base import Database
+from app.services import draft_service, retention_service
+
+logger = logging.getLogger(__name__)
+
+
+def warm_up(db: Database) -> None:
+    """
+    Pays the first-request costs up front: opens the database connection (pool for
+    Postgres, HTTP/TLS connection for Supabase) and preloads the tag registry.
+    """
+    connect = getattr(getattr(db, "wrapped", db), "connect", None)
+    if callable(connect):
+        connect()
+    tag_count = crud_tag.load_tag_registry(db)
+    # Spawning pool processes takes a moment, which the first login would otherwise pay.
+    executors.bulkheads["crypto"].prestart()
+    logger.info(f"Warm-up complete: {tag_count} tags loaded.")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """
+    Owns the application's long-lived resources: sizes the executors, creates the
+    database client on startup and optionally warms it up, and releases both on
+    shutdown. The worker reports ready (/readyz) only once startup has finished.
+    """
+    executors.configure_default_threadpool()
+    sampler = asyncio.create_task(executors.publish_default_threadpool_stats())
+    database = session.get_database()
+    if settings.WARMUP_ON_STARTUP:
+        try:
+            await run_in_threadpool(warm_up, database)
+        except Exception:
+            # A failed warm-up only costs latency on the first requests; don't refuse to start.
+            logger.warning("Warm-up failed; continuing without it.", exc_info=True)
+    retention = None
+    if settings.RETENTION_INTERVAL_SECONDS > 0:
+        retention = asyncio.create_task(retention_service.run_periodically(database))
+    worker_state.mark_ready()
+    yield
+    worker_state.mark_draining("shutdown")
+    sampler.cancel()
+    if retention is not None:
+        retention.cancel()
+        retention_service.stop()
+    # Autosaves still in the write buffer would be lost with the process.
+    await run_in_threadpool(draft_service.flush_all)
+    executors.shutdown_all()
+    session.close_database()
@@ -0,0 +1,265 @@
+"""
+Logging setup: structured, sampled, redacted and off the request path.
+
+`setup_logging()` (called once when app/main.py is imported) routes every logger,
+uvicorn's included, through one QueueHandler on the root logger:
+
+- In the calling thread, the handler only does what can't wait: it stamps the
+  current request id, applies per-logger sampling, redacts secrets, renders the
+  message and puts the record on a bounded queue. When the queue is full the
+  record is dropped (and counted) rather than blocking the request.
+- A QueueListener thread formats records (JSON by default, one object per line)
+  and writes them to stderr.
+
+Sampling (LOG_SAMPLING) keeps a fraction of a logger's records below WARNING, e.g.
+"uvicorn.access=0.1,app.db=0.01". Inside a request the decision is made per
+request id, so a sampled request keeps its whole trail. WARNING and above are
+always kept.
+
+`RequestIdMiddleware` takes the request id from an incoming X-Request-ID header
+(or makes one), returns it in the response, and puts it in a context variable
+that follows the request into threadpool and bulkhead threads.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import re
+import sys
+import time
+import uuid
+import zlib
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.metrics import LOG_RECORDS_DROPPED
+
+# Id of the request being served, or None outside a request.
+request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+# Keys whose values never reach the log, in `extra=` fields and in messages.
+REDACTED_KEYS = (
+    "password", "hashed_password", "access_token", "refresh_token", "token",
+    "authorization", "secret", "secret_key", "api_key", "gemini_api_key",
+)
+REDACTED = "[REDACTED]"
+
+# key=value, key: value and "key": "value" forms of the keys above in message text.
+_SECRET_IN_TEXT = re.compile(
+    r"""(?P<key>["']?\b(?:%s)\b["']?\s*[:=]\s*)(?P<value>"[^"]*"|'[^']*'|[^\s,;}&]+)""" % "|".join(REDACTED_KEYS),
+    re.IGNORECASE,
+)
+
+# Incoming request ids are echoed into logs and headers, so keep them tame.
+_REQUEST_ID = re.compile(r"^[A-Za-z0-9._:-]{1,128}$")
+
+# Attributes every LogRecord has; anything else came from `extra=`. uvicorn's
+# color_message duplicates the message with terminal escapes.
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {
+    "message", "asctime", "request_id", "color_message",
+}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def redact(value: Any) -> Any:
+    """`value` with secrets masked: by key in dicts and lists, by pattern in strings."""
+    if isinstance(value, dict):
+        return {
+            key: REDACTED if str(key).lower() in REDACTED_KEYS else redact(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        return [redact(item) for item in value]
+    if isinstance(value, str):
+        # Every pattern needs a ':' or '=', and most messages have neither.
+        if ":" not in value and "=" not in value:
+            return value
+        return _SECRET_IN_TEXT.sub(lambda m: m.group("key") + REDACTED, value)
+    return value
+
+
+def parse_sampling(spec: str) -> Dict[str, float]:
+    """"name=rate,name=rate" to {name: rate}, rates clamped to [0, 1]."""
+    rates: Dict[str, float] = {}
+    for part in spec.split(","):
+        name, sep, rate = part.partition("=")
+        if sep and name.strip():
+            rates[name.strip()] = min(1.0, max(0.0, float(rate)))
+    return rates
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps a fraction of each configured logger's records below WARNING."""
+
+    def __init__(self, rates: Dict[str, float]) -> None:
+        super().__init__()
+        # Longest name first, so "app.db.postgres" beats "app.db".
+        self.rates = sorted(rates.items(), key=lambda item: -len(item[0]))
+        self._cache: Dict[str, float] = {}
+
+    def rate(self, name: str) -> float:
+        if name not in self._cache:
+            self._cache[name] = next(
+                (rate for prefix, rate in self.rates if name == prefix or name.startswith(prefix + ".")), 1.0
+            )
+        return self._cache[name]
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rate(record.name)
+        if rate >= 1.0:
+            return True
+        rid = getattr(record, "request_id", None)
+        # Same answer for every record of a request, so its trail stays whole.
+        draw = (zlib.crc32(rid.encode()) % 10000) / 10000 if rid else random.random()
+        if draw < rate:
+            return True
+        LOG_RECORDS_DROPPED.labels(reason="sampled").inc()
+        return False
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamps records with the current request id, in the thread that logged them."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id.get()
+        return True
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    A QueueHandler that drops records when the queue is full and leaves formatting
+    to the listener thread: only the message and traceback text are rendered here,
+    since the arguments they refer to may change once the caller moves on.
+    """
+
+    _traceback_formatter = logging.Formatter()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Changed in place rather than copied: this handler sits on the root logger,
+        # so every other handler has already seen the record.
+        record.msg = redact(record.getMessage())
+        record.args = None
+        if record.exc_info:
+            record.exc_text = redact(record.exc_text or self._traceback_formatter.formatException(record.exc_info))
+            record.exc_info = None
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES:
+                record.__dict__[key] = REDACTED if key.lower() in REDACTED_KEYS else redact(value)
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.labels(reason="queue_full").inc()
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, message, request id and extras."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and key not in entry:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+def build_formatter(kind: str) -> logging.Formatter:
+    if kind == "json":
+        return JsonFormatter()
+    return logging.Formatter("%(asctime)s %(levelname)s [%(name)s] [%(request_id)s] %(message)s")
+
+
+def setup_logging() -> None:
+    """
+    Installs the queue handler on the root logger and starts the writer thread.
+    Safe to call more than once; later calls do nothing.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    stream = logging.StreamHandler(sys.stderr)
+    stream.setFormatter(build_formatter(settings.LOG_FORMAT))
+
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=settings.LOG_QUEUE_SIZE))
+    handler.addFilter(RequestIdFilter())
+    rates = parse_sampling(settings.LOG_SAMPLING)
+    if rates:
+        handler.addFilter(SamplingFilter(rates))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(settings.LOG_LEVEL.upper())
+
+    # uvicorn gives its loggers their own synchronous handlers; send them through ours.
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers = []
+        uvicorn_logger.propagate = True
+
+    _listener = logging.handlers.QueueListener(handler.queue, stream, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging() -> None:
+    """Writes out what is still queued and stops the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class RequestIdMiddleware:
+    """
+    Pure ASGI middleware that gives each HTTP request an id: the caller's
+    X-Request-ID if it looks sane, otherwise a new one. The id is set for the
+    request's logs and returned in the X-Request-ID response header.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = next((value for key, value in scope["headers"] if key == b"x-request-id"), b"").decode("latin-1")
+        rid = incoming if _REQUEST_ID.match(incoming) else uuid.uuid4().hex
+        token = request_id.set(rid)
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers: List = list(message.get("headers", []))
+                headers.append((b"x-request-id", rid.encode()))
+                message["headers"] = headers
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_id.reset(token)
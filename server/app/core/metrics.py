@@ -0,0 +1,249 @@
+import os
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+
+# --- Metric definitions ---
+# Every metric the service exports is declared here so the names stay in one place.
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Latency of HTTP requests, labeled by route template.",
+    ["method", "route", "status"],
+)
+
+DB_ROUND_TRIPS = Counter(
+    "db_round_trips_total",
+    "Number of PostgREST round trips (execute() calls).",
+    ["table", "operation"],
+)
+DB_ROUND_TRIP_DURATION = Histogram(
+    "db_round_trip_duration_seconds",
+    "Latency of PostgREST round trips.",
+    ["table", "operation"],
+)
+DB_ROUND_TRIP_ERRORS = Counter(
+    "db_round_trip_errors_total",
+    "PostgREST round trips that raised an exception.",
+    ["table", "operation"],
+)
+
+LLM_CALL_DURATION = Histogram(
+    "llm_call_duration_seconds",
+    "Latency of Gemini generate_content calls, labeled by service function.",
+    ["function"],
+    buckets=(0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32),
+)
+LLM_CALL_ERRORS = Counter(
+    "llm_call_errors_total",
+    "Gemini generate_content calls that raised an exception.",
+    ["function"],
+)
+
+# Resilience layer for Gemini calls (app/core/resilience.py)
+# 0 = closed, 1 = half-open, 2 = open; the most open worker is reported.
+LLM_BREAKER_STATE = Gauge(
+    "llm_circuit_breaker_state",
+    "State of the circuit breaker in front of Gemini: 0 closed, 1 half-open, 2 open.",
+    ["breaker"],
+    multiprocess_mode="livemax",
+)
+LLM_BREAKER_TRANSITIONS = Counter(
+    "llm_circuit_breaker_transitions_total",
+    "Circuit breaker state changes, labeled by the state entered.",
+    ["breaker", "state"],
+)
+# Hedge win rate: winner="hedge" / all, per function.
+LLM_HEDGES = Counter(
+    "llm_hedged_calls_total",
+    "Gemini calls that sent a hedged second request, labeled by which attempt answered first.",
+    ["function", "winner"],
+)
+LLM_DEADLINE_EXCEEDED = Counter(
+    "llm_deadline_exceeded_total",
+    "Gemini calls abandoned because the request's deadline passed.",
+    ["function"],
+)
+LLM_FALLBACKS = Counter(
+    "llm_fallbacks_total",
+    "Gemini calls answered by a local fallback because the upstream was unavailable or refused the prompt.",
+    ["function"],
+)
+
+AI_ADMISSION_REJECTIONS = Counter(
+    "ai_admission_rejections_total",
+    "Requests to /v1/ai/* turned away by rate limits or the concurrency cap.",
+    ["reason"],
+)
+AI_QUEUE_WAIT = Histogram(
+    "ai_queue_wait_seconds",
+    "Time /v1/ai/* requests waited for a concurrency slot.",
+    buckets=(0.005, 0.05, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+# "livesum" adds up the gauges of all live workers in multiprocess mode.
+AI_IN_FLIGHT = Gauge(
+    "ai_in_flight_requests",
+    "/v1/ai/* requests currently holding a concurrency slot.",
+    multiprocess_mode="livesum",
+)
+
+# Coalescing ratio: followers / (leaders + followers), per call site.
+SINGLEFLIGHT_CALLS = Counter(
+    "singleflight_calls_total",
+    "Lookups through app/core/singleflight.py; followers shared a leader's in-flight call.",
+    ["name", "role"],
+)
+
+# Logging (app/core/logging_config.py)
+LOG_RECORDS_DROPPED = Counter(
+    "log_records_dropped_total",
+    "Log records not written: sampled out, or dropped because the log queue was full.",
+    ["reason"],
+)
+
+# Draft autosave (app/services/draft_service.py). Coalescing: writes / buffered saves.
+DRAFT_SAVES = Counter(
+    "draft_saves_total",
+    "Draft autosaves received, labeled by outcome: buffered, or conflict (stale version).",
+    ["outcome"],
+)
+DRAFT_WRITES = Counter(
+    "draft_writes_total",
+    "Buffered drafts written to the database, labeled by outcome: written, conflict or error.",
+    ["outcome"],
+)
+
+# Retention job (app/services/retention_service.py)
+RETENTION_ARCHIVED = Counter(
+    "retention_archived_rows_total",
+    "Rows moved from the hot tables to their archive, labeled by entity.",
+    ["entity"],
+)
+
+# Read-replica routing (app/db/replicated.py)
+DB_READS_ROUTED = Counter(
+    "db_reads_routed_total",
+    "Selects by where they went: replica, or primary and why (pinned, forced, fallback, no_replica).",
+    ["target"],
+)
+
+# Idempotency keys (app/core/idempotency.py)
+IDEMPOTENCY_REQUESTS = Counter(
+    "idempotency_requests_total",
+    "Keyed write requests by outcome: stored, replayed, waited, conflict, mismatch.",
+    ["outcome"],
+)
+
+EXECUTOR_ACTIVE = Gauge(
+    "executor_active_tasks",
+    "Tasks running in each bulkhead executor (see app/core/executors.py).",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+EXECUTOR_QUEUE_DEPTH = Gauge(
+    "executor_queue_depth",
+    "Tasks waiting for a worker in each bulkhead executor.",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+# Fraction of the pool's workers in use; the busiest worker process is reported.
+EXECUTOR_SATURATION = Gauge(
+    "executor_saturation_ratio",
+    "Fraction of each bulkhead executor's workers that are busy.",
+    ["pool"],
+    multiprocess_mode="livemax",
+)
+
+
+# --- Per-request accounting ---
+
+class RequestStats:
+    """Mutable counters for the request currently being served."""
+
+    def __init__(self) -> None:
+        self.db_round_trips = 0
+
+
+# The middleware sets a fresh RequestStats for each request. Because the object itself is
+# mutated (not the context variable), increments made in threadpool workers are visible here.
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def current_request_stats() -> Optional[RequestStats]:
+    return _request_stats.get()
+
+
+def record_db_round_trip(table: str, operation: str, duration: float, failed: bool = False) -> None:
+    """
+    Records one PostgREST round trip in the global metrics and the current request's stats.
+    """
+    DB_ROUND_TRIPS.labels(table=table, operation=operation).inc()
+    DB_ROUND_TRIP_DURATION.labels(table=table, operation=operation).observe(duration)
+    if failed:
+        DB_ROUND_TRIP_ERRORS.labels(table=table, operation=operation).inc()
+
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.db_round_trips += 1
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """
+    Returns the Prometheus text exposition of all metrics and its content type.
+    When several workers serve the app (see app/launcher.py), metrics are aggregated
+    across all of them from PROMETHEUS_MULTIPROC_DIR.
+    """
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware that times every HTTP request by its route template
+    (e.g. /v1/feedback/{feedback_id}) and, in debug mode, reports the number of
+    database round trips the request made in an X-DB-Round-Trips header.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if settings.DEBUG:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"x-db-round-trips", str(stats.db_round_trips).encode()))
+                    message["headers"] = headers
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # The router stores the matched route in the scope; using its path template
+            # keeps the label cardinality bounded.
+            route = scope.get("route")
+            route_label = getattr(route, "path", "unmatched")
+            HTTP_REQUEST_DURATION.labels(
+                method=scope["method"], route=route_label, status=str(status_code)
+            ).observe(time.perf_counter() - start)
+            _request_stats.reset(token)
@@ -0,0 +1,267 @@
+"""
+On-demand profiling of single requests, stored as flame-graph profiles.
+
+A request is profiled when it carries `X-Profile-Token: <PROFILING_TOKEN>`, or at
+random for PROFILING_SAMPLE_RATE of requests. While at least one profiled request is
+in flight, a sampler thread reads every thread's stack (sys._current_frames()) each
+PROFILING_INTERVAL_MS and adds it to each profile in progress.
+
+Sampling rather than cProfile, because a request's work is spread over threads:
+the event loop, the threadpool running the sync route and its dependencies, and the
+bulkhead pools. Samples are wall-clock, so time spent waiting (on the database, on
+Gemini, on a pdf process) shows up. Stacks without a frame from the app/ package
+(idle workers, the loop waiting on its selector) are left out. Other requests that
+overlap a profiled one show up in it as well; each profile records how many did.
+
+Profiles are written to PROFILING_DIR as JSON (route, status, duration, folded
+stacks) and the oldest are deleted beyond PROFILING_MAX_PROFILES. The admin routes
+in app/api/endpoints/debug.py list them and return the folded stacks, which
+flamegraph.pl and speedscope read directly.
+
+With PROFILING_ENABLED off (the default) the middleware isn't installed at all.
+"""
+import datetime
+import json
+import logging
+import os
+import random
+import secrets
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+from types import CodeType, FrameType
+from typing import Any, Dict, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.logging_config import request_id
+
+logger = logging.getLogger(__name__)
+
+# Frames from files under this directory mark a stack as belonging to a request.
+_APP_DIR = str(Path(__file__).resolve().parent.parent)
+
+# Path prefixes stripped from frame labels, longest first.
+_PREFIXES = sorted(
+    {str(Path(_APP_DIR).parent)} | {path for path in sys.path if path and os.path.isdir(path)},
+    key=len, reverse=True,
+)
+
+
+def token_is_valid(token: Optional[str]) -> bool:
+    """Whether `token` is the configured PROFILING_TOKEN (never, when none is set)."""
+    return bool(settings.PROFILING_TOKEN) and token is not None and secrets.compare_digest(
+        token.encode(), settings.PROFILING_TOKEN.encode()
+    )
+
+
+class Profile:
+    """Folded stacks collected for one request."""
+
+    def __init__(self, profile_id: str) -> None:
+        self.id = profile_id
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.overlapping = 0  # Most other profiled requests in flight at once
+        self.started = time.monotonic()
+        self.truncated = False  # Sampling stopped at PROFILING_MAX_SECONDS
+
+
+class Sampler:
+    """
+    One thread, running while any profile is in progress, that samples all stacks
+    into every active profile.
+    """
+
+    def __init__(self) -> None:
+        self._active: Dict[str, Profile] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._labels: Dict[CodeType, tuple] = {}  # code -> (label, is app code)
+
+    def _label(self, code: CodeType) -> tuple:
+        cached = self._labels.get(code)
+        if cached is None:
+            filename = code.co_filename
+            short = next((filename[len(p):].lstrip("/") for p in _PREFIXES if filename.startswith(p)), filename)
+            cached = (f"{code.co_name} ({short}:{code.co_firstlineno})", filename.startswith(_APP_DIR))
+            self._labels[code] = cached
+        return cached
+
+    def _folded(self, frame: Optional[FrameType], thread_name: str) -> Optional[str]:
+        labels: List[str] = []
+        in_app = False
+        while frame is not None:
+            label, is_app = self._label(frame.f_code)
+            labels.append(label)
+            in_app = in_app or is_app
+            frame = frame.f_back
+        if not in_app:
+            return None
+        labels.append(thread_name)
+        return ";".join(reversed(labels))
+
+    def start(self, profile: Profile) -> None:
+        with self._lock:
+            self._active[profile.id] = profile
+            for other in self._active.values():
+                other.overlapping = max(other.overlapping, len(self._active) - 1)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+                self._thread.start()
+
+    def stop(self, profile: Profile) -> None:
+        with self._lock:
+            self._active.pop(profile.id, None)
+
+    def _run(self) -> None:
+        interval = settings.PROFILING_INTERVAL_MS / 1000
+        me = threading.get_ident()
+        while True:
+            with self._lock:
+                if not self._active:
+                    self._thread = None
+                    return
+                profiles = list(self._active.values())
+            # Long streams (exports) stop collecting after PROFILING_MAX_SECONDS.
+            now = time.monotonic()
+            for profile in profiles:
+                profile.truncated = profile.truncated or now - profile.started > settings.PROFILING_MAX_SECONDS
+            profiles = [profile for profile in profiles if not profile.truncated]
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            stacks = []
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                folded = self._folded(frame, names.get(ident, f"thread-{ident}"))
+                if folded is not None:
+                    stacks.append(folded)
+            with self._lock:
+                # Under the lock and only while still active: once stop() returns,
+                # the profile is no longer written to and can be saved.
+                for profile in profiles:
+                    if profile.id in self._active:
+                        profile.samples += 1
+                        profile.stacks.update(stacks)
+            time.sleep(interval)
+
+
+sampler = Sampler()
+
+
+def profile_dir() -> Path:
+    return Path(settings.PROFILING_DIR)
+
+
+def save_profile(profile: Profile, metadata: Dict[str, Any]) -> None:
+    """Writes one profile and deletes the oldest beyond PROFILING_MAX_PROFILES."""
+    directory = profile_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    document = {
+        **metadata,
+        "id": profile.id,
+        "samples": profile.samples,
+        "interval_ms": settings.PROFILING_INTERVAL_MS,
+        "overlapping_requests": profile.overlapping,
+        "truncated": profile.truncated,
+        "folded": [f"{stack} {count}" for stack, count in profile.stacks.most_common()],
+    }
+    # Write then rename, so a listing never reads half a file.
+    temporary = directory / f".{profile.id}.tmp"
+    temporary.write_text(json.dumps(document))
+    temporary.rename(directory / f"{profile.id}.json")
+
+    for old in sorted(directory.glob("*.json"))[:-settings.PROFILING_MAX_PROFILES]:
+        try:
+            old.unlink()
+        except FileNotFoundError:
+            pass  # Another worker pruned it first
+
+
+def list_profiles() -> List[Dict[str, Any]]:
+    """Metadata of the stored profiles, newest first."""
+    profiles = []
+    for path in sorted(profile_dir().glob("*.json"), reverse=True):
+        try:
+            document = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue
+        document.pop("folded", None)
+        profiles.append(document)
+    return profiles
+
+
+def load_profile(profile_id: str) -> Optional[Dict[str, Any]]:
+    if not profile_id.replace("-", "").isalnum():
+        return None
+    try:
+        return json.loads((profile_dir() / f"{profile_id}.json").read_text())
+    except (OSError, ValueError):
+        return None
+
+
+class ProfilingMiddleware:
+    """
+    Pure ASGI middleware that profiles requests with a valid X-Profile-Token header,
+    and PROFILING_SAMPLE_RATE of the others. Profiled responses carry an
+    X-Profile-Id header naming the stored profile.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"].startswith("/debug/"):
+            await self.app(scope, receive, send)
+            return
+
+        token = next((value for key, value in scope["headers"] if key == b"x-profile-token"), None)
+        if token is not None and token_is_valid(token.decode("latin-1")):
+            trigger = "header"
+        elif settings.PROFILING_SAMPLE_RATE and random.random() < settings.PROFILING_SAMPLE_RATE:
+            trigger = "sampled"
+        else:
+            await self.app(scope, receive, send)
+            return
+
+        # Sorts by time, so the oldest profiles are the first file names.
+        profile = Profile(f"{time.strftime('%Y%m%d-%H%M%S', time.gmtime())}-{uuid.uuid4().hex[:12]}")
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"x-profile-id", profile.id.encode()))
+                message["headers"] = headers
+            await send(message)
+
+        started_at = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        start = time.perf_counter()
+        sampler.start(profile)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            sampler.stop(profile)
+            duration = time.perf_counter() - start
+            route = scope.get("route")
+            try:
+                await run_in_threadpool(save_profile, profile, {
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "route": getattr(route, "path", "unmatched"),
+                    "status": status_code,
+                    "duration_ms": round(duration * 1000, 2),
+                    "started_at": started_at,
+                    "request_id": request_id.get(),
+                    "trigger": trigger,
+                })
+            except OSError:
+                # The response has been sent; losing its profile mustn't fail it.
+                logger.warning("Could not save a request profile.", exc_info=True)
@@ -0,0 +1,172 @@
+"""
+Admission control and rate limiting for expensive endpoints (the /v1/ai/* routes).
+
+Two independent mechanisms:
+
+- ConcurrencyLimiter caps how many requests may be in flight at once and lets a
+  bounded number wait for a slot. Anything beyond that, or anything that waits too
+  long, is turned away immediately with 503 instead of occupying a threadpool worker.
+- Token buckets limit how often a user (and their team as a whole) may call the
+  endpoints. Buckets live in a RateLimitStore; the default keeps them in process
+  memory, and a shared store (e.g. Redis) can be swapped in via `set_store` so the
+  limits hold across workers and replicas.
+"""
+import asyncio
+import math
+import threading
+import time
+from typing import Dict, List, Optional, Protocol, Tuple
+
+from app.core.metrics import AI_ADMISSION_REJECTIONS, AI_IN_FLIGHT, AI_QUEUE_WAIT
+
+
+class LimitExceeded(Exception):
+    """
+    Raised when a request is turned away. `status_code` is 429 for rate limits and
+    503 for overload; `retry_after` is a hint in whole seconds.
+    """
+
+    def __init__(self, status_code: int, reason: str, retry_after: int) -> None:
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+# --- Token buckets ---
+
+# (key, refill rate in tokens per second, bucket capacity)
+BucketLimit = Tuple[str, float, float]
+
+
+class RateLimitStore(Protocol):
+    def acquire(self, limits: List[BucketLimit], cost: float = 1.0) -> Optional[Tuple[str, float]]:
+        """
+        Takes `cost` tokens from every bucket in `limits`, or from none of them.
+        Returns None when the request is allowed, otherwise (key, seconds until it
+        would be allowed) for the bucket that refused it.
+        Called on the event loop, so shared implementations must answer quickly.
+        """
+        ...
+
+
+class InMemoryRateLimitStore:
+    """
+    Process-local token buckets. Each worker process enforces the limits on its own,
+    so with N workers a user can get up to N times the configured rate.
+    """
+
+    def __init__(self, max_keys: int = 100_000) -> None:
+        self.max_keys = max_keys
+        self._buckets: Dict[str, Tuple[float, float]] = {}  # key -> (tokens, last refill time)
+        self._lock = threading.Lock()
+
+    def acquire(self, limits: List[BucketLimit], cost: float = 1.0) -> Optional[Tuple[str, float]]:
+        now = time.monotonic()
+        with self._lock:
+            refilled = []
+            for key, rate, capacity in limits:
+                tokens, updated = self._buckets.get(key, (capacity, now))
+                tokens = min(capacity, tokens + (now - updated) * rate)
+                if tokens < cost:
+                    return key, (cost - tokens) / rate
+                refilled.append((key, tokens))
+
+            # Every bucket has enough tokens: charge them all.
+            for key, tokens in refilled:
+                self._buckets[key] = (tokens - cost, now)
+            if len(self._buckets) > self.max_keys:
+                self._prune()
+        return None
+
+    def _prune(self) -> None:
+        # Buckets that have not been touched for a while are full again, which is the
+        # same as not having an entry, so the oldest half can be dropped safely enough.
+        by_age = sorted(self._buckets.items(), key=lambda item: item[1][1])
+        for key, _ in by_age[: len(by_age) // 2]:
+            del self._buckets[key]
+
+
+_store: RateLimitStore = InMemoryRateLimitStore()
+
+
+def get_store() -> RateLimitStore:
+    return _store
+
+
+def set_store(store: RateLimitStore) -> None:
+    """Replaces the bucket store, e.g. with one shared by all workers."""
+    global _store
+    _store = store
+
+
+def check_rate_limits(limits: List[BucketLimit]) -> None:
+    """
+    Raises LimitExceeded (429) if any of the buckets is empty. Limits with a zero
+    rate are treated as disabled.
+    """
+    active = [limit for limit in limits if limit[1] > 0]
+    if not active:
+        return
+    refused = _store.acquire(active)
+    if refused is not None:
+        key, wait = refused
+        reason = f"{key.split(':', 1)[0]}_rate"
+        AI_ADMISSION_REJECTIONS.labels(reason=reason).inc()
+        raise LimitExceeded(429, reason, max(1, math.ceil(wait)))
+
+
+# --- Concurrency cap ---
+
+class ConcurrencyLimiter:
+    """
+    A semaphore with a bounded wait queue and a wait timeout.
+
+    Must be used from the event loop (i.e. from an async dependency), so waiting
+    requests cost nothing but a suspended coroutine. The slot is held while the
+    route runs in the threadpool and released when the dependency exits.
+    The cap applies per worker process.
+    """
+
+    def __init__(self, limit: int, max_queue: int, timeout: float) -> None:
+        self.limit = limit
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(limit)
+        self._waiting = 0
+        # Moving average of how long a slot is held, used for the Retry-After hint.
+        self._average_hold = 1.0
+
+    def _retry_after(self) -> int:
+        # Roughly the time for everything ahead of a new caller to drain.
+        return max(1, math.ceil(self._average_hold * (self._waiting + 1) / self.limit))
+
+    async def acquire(self) -> float:
+        """
+        Waits for a slot and returns the time it was granted.
+        Raises LimitExceeded (503) when the queue is full or the wait times out.
+        """
+        if self._semaphore.locked() and self._waiting >= self.max_queue:
+            AI_ADMISSION_REJECTIONS.labels(reason="queue_full").inc()
+            raise LimitExceeded(503, "queue_full", self._retry_after())
+
+        start = time.perf_counter()
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            AI_ADMISSION_REJECTIONS.labels(reason="queue_timeout").inc()
+            raise LimitExceeded(503, "queue_timeout", self._retry_after())
+        finally:
+            self._waiting -= 1
+
+        granted = time.perf_counter()
+        AI_QUEUE_WAIT.observe(granted - start)
+        AI_IN_FLIGHT.inc()
+        return granted
+
+    def release(self, granted: float) -> None:
+        held = time.perf_counter() - granted
+        self._average_hold = 0.8 * self._average_hold + 0.2 * held
+        AI_IN_FLIGHT.dec()
+        self._semaphore.release()
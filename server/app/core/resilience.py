@@ -0,0 +1,269 @@
+"""
+Resilience for calls to an upstream service (Gemini): deadlines, hedged requests and
+a circuit breaker.
+
+- Deadline: each request carries a time budget in a context variable, set by the
+  `deps.request_deadline(...)` dependency. It follows the request into executor
+  threads (they copy the caller's context), and every upstream call waits at most
+  the time that is left, capped by AI_CALL_TIMEOUT_SECONDS.
+- Hedging: if a call is still running after the p95 of recent latencies for that
+  function, an identical second call is sent and whichever answers first wins.
+  Hedges are capped at AI_HEDGE_MAX_RATIO of calls so a slow upstream isn't also
+  sent twice the traffic.
+- Circuit breaker: after AI_BREAKER_FAILURE_THRESHOLD consecutive failures (errors
+  or timeouts) calls fail immediately for AI_BREAKER_RESET_SECONDS. Then a single
+  probe is let through; its success closes the breaker, its failure reopens it.
+  The caller decides which errors are failures of the upstream. Any other error
+  (a prompt the upstream refused) counts as a successful call and is raised as
+  UpstreamRejected.
+
+Calls run in the "gemini" executor, so a caller stops waiting when its deadline
+passes even though the SDK call itself can't be interrupted; the SDK is also given
+the timeout so the thread is freed soon after.
+"""
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from contextvars import ContextVar
+from typing import Callable, Deque, Dict, Optional, TypeVar
+
+from app.core.config import settings
+from app.core.executors import bulkheads
+from app.core.metrics import (
+    LLM_BREAKER_STATE, LLM_BREAKER_TRANSITIONS, LLM_DEADLINE_EXCEEDED, LLM_HEDGES,
+)
+
+T = TypeVar("T")
+
+
+class UpstreamUnavailable(Exception):
+    """
+    The upstream call failed, was not made, or did not finish in time. Mapped to a
+    503 (504 for deadlines) with a Retry-After header by the handler in app/main.py.
+    """
+
+    status_code = 503
+
+    def __init__(self, message: str, retry_after: int = 1) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitOpen(UpstreamUnavailable):
+    pass
+
+
+class DeadlineExceeded(UpstreamUnavailable):
+    status_code = 504
+
+
+class UpstreamRejected(Exception):
+    """
+    The upstream answered but refused this request, e.g. a prompt blocked by its
+    safety filters. Sending it again would get the same answer, so it is mapped to
+    a 422 without Retry-After by the handler in app/main.py.
+    """
+
+    status_code = 422
+
+
+# --- Deadlines ---
+
+# Absolute time.monotonic() by which the current request wants its answer.
+_deadline: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+
+
+def set_deadline(seconds: float) -> None:
+    """Gives the current request `seconds` from now, replacing any earlier deadline."""
+    _deadline.set(time.monotonic() + seconds)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current request's deadline, or None without one."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def call_timeout() -> float:
+    """How long the next upstream call may take: the deadline's remainder, capped."""
+    left = remaining()
+    timeout = settings.AI_CALL_TIMEOUT_SECONDS if left is None else min(left, settings.AI_CALL_TIMEOUT_SECONDS)
+    if timeout <= 0:
+        raise DeadlineExceeded("The request's deadline has passed.")
+    return timeout
+
+
+# --- Circuit breaker ---
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a single half-open probe."""
+
+    CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+    _GAUGE = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, name: str, failure_threshold: int, reset_seconds: float) -> None:
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        LLM_BREAKER_STATE.labels(breaker=name).set(0)
+
+    def _transition(self, state: str) -> None:
+        self.state = state
+        LLM_BREAKER_STATE.labels(breaker=self.name).set(self._GAUGE[state])
+        LLM_BREAKER_TRANSITIONS.labels(breaker=self.name, state=state).inc()
+
+    def before_call(self) -> None:
+        """Raises CircuitOpen unless a call may go through now."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            wait_for = self.opened_at + self.reset_seconds - time.monotonic()
+            if self.state == self.OPEN and wait_for <= 0:
+                self._transition(self.HALF_OPEN)
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return
+        raise CircuitOpen(
+            f"The {self.name} circuit is open after repeated failures.",
+            retry_after=max(1, math.ceil(wait_for)),
+        )
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self._probing = False
+            if self.state != self.CLOSED:
+                self._transition(self.CLOSED)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == self.HALF_OPEN or (
+                self.state == self.CLOSED and self.failures >= self.failure_threshold
+            ):
+                self.opened_at = time.monotonic()
+                self._transition(self.OPEN)
+
+
+# --- Hedging ---
+
+class LatencyTracker:
+    """Recent successful call latencies per function, for the hedge delay."""
+
+    WINDOW = 200
+    MIN_SAMPLES = 20
+
+    def __init__(self) -> None:
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.hedges = 0
+
+    def record(self, function: str, seconds: float) -> None:
+        with self._lock:
+            self._latencies.setdefault(function, deque(maxlen=self.WINDOW)).append(seconds)
+
+    def hedge_delay(self, function: str) -> Optional[float]:
+        """The p95 latency of `function`, or None until there are enough samples."""
+        with self._lock:
+            samples = sorted(self._latencies.get(function, ()))
+        if len(samples) < self.MIN_SAMPLES:
+            return None
+        p95 = samples[math.ceil(len(samples) * 0.95) - 1]
+        return max(p95, settings.AI_HEDGE_MIN_DELAY_SECONDS)
+
+    def allow_hedge(self) -> bool:
+        with self._lock:
+            if self.hedges < settings.AI_HEDGE_MAX_RATIO * self.calls:
+                self.hedges += 1
+                return True
+            return False
+
+    def count_call(self) -> None:
+        with self._lock:
+            self.calls += 1
+
+
+breaker = CircuitBreaker(
+    "gemini", settings.AI_BREAKER_FAILURE_THRESHOLD, settings.AI_BREAKER_RESET_SECONDS
+)
+latencies = LatencyTracker()
+
+
+def _always(error: BaseException) -> bool:
+    return True
+
+
+def call(function: str, fn: Callable[[float], T], *, is_failure: Callable[[BaseException], bool] = _always) -> T:
+    """
+    Makes one upstream call through the breaker, within the deadline, hedging it if
+    it runs long. `fn` receives the timeout in seconds to pass on to the SDK and
+    must be safe to run twice. An error from `fn` for which `is_failure` is false
+    is the upstream's answer, not its failure: it is raised as UpstreamRejected.
+    """
+    # Timeout first: once before_call grants the half-open probe, the call must report back.
+    timeout = call_timeout()
+    breaker.before_call()
+    pool = bulkheads["gemini"]
+    start = time.monotonic()
+    latencies.count_call()
+
+    if pool.max_workers <= 0:
+        # Inline: no way to stop waiting early or to hedge, but keep the breaker.
+        try:
+            result = fn(timeout)
+        except Exception as e:
+            if not is_failure(e):
+                breaker.record_success()
+                raise UpstreamRejected(f"{function} was refused: {e}") from e
+            breaker.record_failure()
+            raise UpstreamUnavailable(f"{function} failed: {e}") from e
+        breaker.record_success()
+        latencies.record(function, time.monotonic() - start)
+        return result
+
+    end = start + timeout
+    attempts: Dict[Future, str] = {pool.submit(fn, timeout): "primary"}
+    delay = latencies.hedge_delay(function) if settings.AI_HEDGE_ENABLED else None
+    if delay is not None and delay < timeout:
+        done, _ = wait(attempts, timeout=delay)
+        if not done and latencies.allow_hedge():
+            attempts[pool.submit(fn, end - time.monotonic())] = "hedge"
+
+    pending = set(attempts)
+    error: Optional[BaseException] = None
+    try:
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, end - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                if future.exception() is None:
+                    breaker.record_success()
+                    latencies.record(function, time.monotonic() - start)
+                    if len(attempts) > 1:
+                        LLM_HEDGES.labels(function=function, winner=attempts[future]).inc()
+                    return future.result()
+                error = future.exception()
+                if not is_failure(error):
+                    # The upstream is up; it refused this prompt, and would refuse a hedge too.
+                    breaker.record_success()
+                    raise UpstreamRejected(f"{function} was refused: {error}") from error
+    finally:
+        for future in pending:
+            future.cancel()
+
+    breaker.record_failure()
+    if error is not None and not pending:
+        # Every attempt failed before the deadline.
+        raise UpstreamUnavailable(f"{function} failed: {error}") from error
+    LLM_DEADLINE_EXCEEDED.labels(function=function).inc()
+    raise DeadlineExceeded(f"{function} did not finish within {timeout:.1f}s.")
@@ -1,9 +1,10 @@
 from datetime import datetime, timedelta, timezone
-from typing import Any, Union
+from typing import Any, List, Tuple, Union
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 
 from app.core.config import settings
+from app.core.executors import bulkheads, run_in
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -35,7 +36,12 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     :param hashed_password: The stored hashed password.
     :return: True if the passwords match, False otherwise.
     """
-    return pwd_context.verify(plain_password, hashed_password)
+    # bcrypt is deliberately slow: each check keeps a core busy for a few hundred ms.
+    # (bcrypt 4.x releases the GIL while it hashes, so that isn't the reason.) It runs
+    # in the small crypto pool so a burst of logins is capped at EXECUTOR_CRYPTO_PROCESSES
+    # cores and queues there, instead of saturating the CPU and taking the threads
+    # every other request needs.
+    return run_in("crypto", _verify, plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
     """
@@ -43,4 +49,25 @@ def get_password_hash(password: str) -> str:
     :param password: The plain text password.
     :return: The hashed password as a string.
     """
-    return pwd_context.hash(password)
\ No newline at end of file
+    return run_in("crypto", _hash, password)
+
+def get_password_hashes(passwords: List[str]) -> List[str]:
+    """
+    Hashes many passwords at once, spread across the crypto process pool.
+    :param passwords: The plain text passwords.
+    :return: Their hashes, in the same order.
+    """
+    pool = bulkheads["crypto"]
+    # Feed the pool a few at a time so logins queued meanwhile aren't stuck behind the batch.
+    hashes = dict(pool.map_unordered(_hash_indexed, enumerate(passwords), limit=max(pool.max_workers, 1)))
+    return [hashes[(index, password)] for index, password in enumerate(passwords)]
+
+# Module-level so they can be sent to the process pool.
+def _verify(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+def _hash_indexed(entry: Tuple[int, str]) -> str:
+    return pwd_context.hash(entry[1])
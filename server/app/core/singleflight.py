@@ -0,0 +1,73 @@
+"""
+Single-flight request coalescing.
+
+When several callers ask for the same key at the same time, only the first (the
+leader) runs the lookup; the others wait for it and share its result or its
+exception. Nothing is cached: once the leader finishes, the next call for that key
+runs a fresh lookup. This only trims concurrent duplicates, so it is safe for reads
+whose result may change between requests.
+
+    _teams = SingleFlight("get_all_teams")
+    rows = _teams.do(key, lambda: db.table("teams").select("*").execute().data)
+"""
+import copy
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, TypeVar
+
+from app.core.metrics import SINGLEFLIGHT_CALLS
+
+T = TypeVar("T")
+
+
+class _Call:
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.followers = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls per key, made from threads (sync routes and the
+    executors), by blocking the followers until the leader finishes.
+
+    Followers receive a deep copy of the leader's result, so callers may mutate what
+    they get back (several CRUD helpers add keys to the rows they return).
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> T:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.followers += 1
+
+        if not leader:
+            SINGLEFLIGHT_CALLS.labels(name=self.name, role="follower").inc()
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+
+        SINGLEFLIGHT_CALLS.labels(name=self.name, role="leader").inc()
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            # No follower can join once the key is gone, so the count is final here.
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        # Followers copy the stored result; the leader's caller gets its own copy too
+        # so it can't change the rows while they are being copied.
+        return copy.deepcopy(call.result) if call.followers else call.result
@@ -0,0 +1,58 @@
+"""
+Database side of feedback drafts. Saves from clients go through the write buffer in
+app/services/draft_service.py, which calls these.
+"""
+from typing import List, Dict, Any, Optional
+from app.db.base import Database
+from app.db.replicated import use_primary
+
+# Columns a client edits; the rest (id, manager_id, version, timestamps) are the server's.
+DRAFT_FIELDS = ("employee_id", "strengths", "areas_for_improvement", "sentiment", "feedback", "tag_ids")
+
+
+def create_draft(db: Database, *, manager_id: int, fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    draft_data = {key: fields.get(key) for key in DRAFT_FIELDS}
+    draft_data['tag_ids'] = draft_data['tag_ids'] or []
+    draft_data['manager_id'] = manager_id
+    draft_data['version'] = 1
+    response = db.table("feedback_drafts").insert(draft_data).execute()
+    return response.data[0] if response.data else None
+
+
+# Drafts are read from the primary: saves are checked against the version read, and
+# a replica could hand back one the flusher has already written past.
+
+def get_draft(db: Database, *, draft_id: int) -> Optional[Dict[str, Any]]:
+    with use_primary():
+        response = db.table("feedback_drafts").select("*").eq("id", draft_id).limit(1).execute()
+    return response.data[0] if response.data else None
+
+
+def get_drafts_by_manager(db: Database, *, manager_id: int) -> List[Dict[str, Any]]:
+    with use_primary():
+        response = db.table("feedback_drafts").select("*").eq("manager_id", manager_id).order("id").execute()
+    return response.data or []
+
+
+def write_draft(db: Database, *, draft: Dict[str, Any], expected_version: int) -> Optional[Dict[str, Any]]:
+    """
+    Writes the draft's fields and version, but only over `expected_version`: the
+    version this worker last read or wrote. Returns None when the row has moved on
+    (another worker wrote it) or is gone.
+    """
+    update_data = {key: draft.get(key) for key in DRAFT_FIELDS}
+    update_data['tag_ids'] = update_data['tag_ids'] or []
+    update_data['version'] = draft['version']
+    response = (
+        db.table("feedback_drafts")
+        .update(update_data)
+        .eq("id", draft['id'])
+        .eq("version", expected_version)
+        .execute()
+    )
+    return response.data[0] if response.data else None
+
+
+def delete_draft(db: Database, *, draft_id: int, manager_id: int) -> bool:
+    response = db.table("feedback_drafts").delete().eq("id", draft_id).eq("manager_id", manager_id).execute()
+    return bool(response.data)
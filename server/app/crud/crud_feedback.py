@@ -1,9 +1,11 @@
 from typing import List, Dict, Any, Optional
-from supabase import Client
-from app.schemas.feedback import FeedbackCreate, FeedbackUpdate
+from app.db.base import Database
+from app.core import events
+from app.crud import crud_change_log, crud_team
+from app.schemas.feedback import FeedbackCreate, FeedbackFilters, FeedbackUpdate
 
 
-def create_feedback(db: Client, *, feedback_in: FeedbackCreate, manager_id: int) -> Optional[Dict[str, Any]]:
+def create_feedback(db: Database, *, feedback_in: FeedbackCreate, manager_id: int) -> Optional[Dict[str, Any]]:
     """
     Creates a new feedback entry in the database using Supabase, with tags.
     """
@@ -24,39 +26,147 @@ def create_feedback(db: Client, *, feedback_in: FeedbackCreate, manager_id: int)
         ]
         db.table("feedback_tags").insert(feedback_tags_data).execute()
 
+    _record_change(db, new_feedback, "created")
+    events.publish("feedback.created", new_feedback)
     return new_feedback
 
-def get_feedback_by_employee(db: Client, *, employee_id: int) -> List[Dict[str, Any]]:
+def _record_change(db: Database, feedback: Dict[str, Any], action: str) -> None:
+    # Both sides of the feedback see it, so both sync it.
+    crud_change_log.record_change(
+        db, entity="feedback", entity_id=feedback['id'], action=action,
+        user_ids=(feedback.get('manager_id'), feedback.get('employee_id')),
+    )
+
+FEEDBACK_SELECT = "*, manager:users!feedback_manager_id_fkey(*), employee:users!feedback_employee_id_fkey(*), tags(*)"
+
+# Added to FEEDBACK_SELECT for a tag filter: an inner embed of the join table keeps
+# only the feedback carrying the tag, in the same query.
+TAG_FILTER_EMBED = "feedback_tags!inner(tag_id)"
+
+def _select_columns(filters: Optional[FeedbackFilters]) -> str:
+    if filters is not None and filters.tag_id is not None:
+        return f"{FEEDBACK_SELECT}, {TAG_FILTER_EMBED}"
+    return FEEDBACK_SELECT
+
+def _apply_filters(query: Any, filters: Optional[FeedbackFilters]) -> Any:
+    """
+    Pushes the list filters down into the query.
+    """
+    if filters is None:
+        return query
+    if filters.employee_id is not None:
+        query = query.eq("employee_id", filters.employee_id)
+    if filters.sentiment is not None:
+        query = query.eq("sentiment", filters.sentiment.value)
+    if filters.acknowledged is not None:
+        query = query.eq("acknowledged", filters.acknowledged)
+    if filters.created_from is not None:
+        query = query.gte("created_at", filters.created_from.isoformat())
+    if filters.created_to is not None:
+        query = query.lt("created_at", filters.created_to.isoformat())
+    if filters.tag_id is not None:
+        # Filters the feedback_tags!inner embed, so only feedback with this tag is returned.
+        query = query.eq("feedback_tags.tag_id", filters.tag_id)
+    return query
+
+def _list_feedback(query: Any, filters: Optional[FeedbackFilters]) -> List[Dict[str, Any]]:
+    rows = _apply_filters(query, filters).order("created_at", desc=True).execute().data or []
+    for row in rows:
+        # Only there to filter on; the tags themselves are in "tags".
+        row.pop("feedback_tags", None)
+    return rows
+
+def get_feedback_by_employee(db: Database, *, employee_id: int, filters: Optional[FeedbackFilters] = None) -> List[Dict[str, Any]]:
     """
     Retrieves all feedback for a specific employee, including manager, comments with user details, and tags.
+    Optional filters are applied by the database.
     """
-    response = db.table("feedback").select(
-        "*, manager:users!feedback_manager_id_fkey(*), employee:users!feedback_employee_id_fkey(*), tags(*)"
-    ).eq("employee_id", employee_id).order("created_at", desc=True).execute()
-    
-    return response.data or []
+    query = db.table("feedback").select(_select_columns(filters)).eq("employee_id", employee_id)
+    return _list_feedback(query, filters)
 
-def get_feedback_by_manager(db: Client, *, manager_id: int) -> List[Dict[str, Any]]:
+def get_feedback_by_manager(db: Database, *, manager_id: int, filters: Optional[FeedbackFilters] = None) -> List[Dict[str, Any]]:
     """
     Retrieves all feedback submitted by a specific manager, including employee, comments with user details, and tags.
+    Optional filters are applied by the database.
     """
-    response = db.table("feedback").select(
-        "*, manager:users!feedback_manager_id_fkey(*), employee:users!feedback_employee_id_fkey(*), tags(*)"
-    ).eq("manager_id", manager_id).order("created_at", desc=True).execute()
-    
-    return response.data or []
+    query = db.table("feedback").select(_select_columns(filters)).eq("manager_id", manager_id)
+    return _list_feedback(query, filters)
+
+def feedback_facets(feedback_list: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Counts feedback per sentiment, per tag and by acknowledgement in one pass over
+    rows that already carry their tags.
+    """
+    sentiment: Dict[str, int] = {}
+    tags: Dict[int, Dict[str, Any]] = {}
+    acknowledged = 0
+    for fb in feedback_list:
+        sentiment[fb['sentiment']] = sentiment.get(fb['sentiment'], 0) + 1
+        if fb.get('acknowledged'):
+            acknowledged += 1
+        for tag in fb.get('tags') or []:
+            if tag['id'] in tags:
+                tags[tag['id']]['count'] += 1
+            else:
+                tags[tag['id']] = {"id": tag['id'], "name": tag['name'], "count": 1}
+
+    return {
+        "sentiment": sentiment,
+        "tags": sorted(tags.values(), key=lambda tag: (-tag['count'], tag['name'])),
+        "acknowledged": acknowledged,
+        "unacknowledged": len(feedback_list) - acknowledged,
+    }
+
+def normalize_feedback(feedback_list: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    The compact form of a feedback list: rows name their people and tags by id
+    (manager_id, employee_id, tag_ids), and each person and tag is sent once, in
+    the `users` and `tags` maps. A manager's list otherwise repeats the manager in
+    every row and each employee in every row about them.
+    """
+    users: Dict[int, Dict[str, Any]] = {}
+    tags: Dict[int, Dict[str, Any]] = {}
+    items = []
+    for fb in feedback_list:
+        item = {key: value for key, value in fb.items() if key not in ("manager", "employee", "tags")}
+        for role in ("manager", "employee"):
+            person = fb.get(role)
+            if person is not None:
+                # Interned by id: the first copy is kept, the rest are dropped.
+                users.setdefault(person['id'], person)
+                item[f"{role}_id"] = person['id']
+        tag_ids = []
+        for tag in fb.get('tags') or []:
+            tags.setdefault(tag['id'], tag)
+            tag_ids.append(tag['id'])
+        item['tag_ids'] = tag_ids
+        items.append(item)
+    return {"items": items, "users": users, "tags": tags}
 
-def get_feedback(db: Client, *, feedback_id: int) -> Optional[Dict[str, Any]]:
+def get_archived_feedback(db: Database, *, user: Dict[str, Any], limit: int, offset: int = 0) -> List[Dict[str, Any]]:
+    """
+    Feedback the retention job moved to feedback_archive, newest first: given by a
+    manager, received by an employee. Rows come back as they were when archived.
+    """
+    scope = "manager_id" if user['role'] == 'manager' else "employee_id"
+    response = (
+        db.table("feedback_archive").select("document")
+        .eq(scope, user['id'])
+        .order("created_at", desc=True)
+        .range(offset, offset + limit - 1)
+        .execute()
+    )
+    return [row['document'] for row in response.data or []]
+
+def get_feedback(db: Database, *, feedback_id: int) -> Optional[Dict[str, Any]]:
     """
     Retrieves a single piece of feedback by its ID, including all related user, comment, and tag data.
     """
-    response = db.table("feedback").select(
-        "*, manager:users!feedback_manager_id_fkey(*), employee:users!feedback_employee_id_fkey(*), tags(*)"
-    ).eq("id", feedback_id).single().execute()
+    response = db.table("feedback").select(FEEDBACK_SELECT).eq("id", feedback_id).single().execute()
     
     return response.data
 
-def update_feedback(db: Client, *, db_obj: Dict[str, Any], obj_in: FeedbackUpdate) -> Optional[Dict[str, Any]]:
+def update_feedback(db: Database, *, db_obj: Dict[str, Any], obj_in: FeedbackUpdate) -> Optional[Dict[str, Any]]:
     """
     Updates a feedback entry in Supabase, including its tags.
     """
@@ -88,30 +198,27 @@ def update_feedback(db: Client, *, db_obj: Dict[str, Any], obj_in: FeedbackUpdat
         else:
             db_obj["tags"] = []
 
+    _record_change(db, db_obj, "updated")
+    events.publish("feedback.updated", db_obj)
     return db_obj
 
-def acknowledge_feedback(db: Client, *, db_obj: Dict[str, Any]) -> None:
+def acknowledge_feedback(db: Database, *, db_obj: Dict[str, Any]) -> None:
     """
     Marks a feedback entry as acknowledged by the employee in Supabase.
     """
     db.table("feedback").update({"acknowledged": True}).eq("id", db_obj['id']).execute()
+    _record_change(db, db_obj, "acknowledged")
 
-def get_feedback_stats_by_manager(db: Client, *, manager_id: int) -> List[Dict[str, Any]]:
+def get_feedback_stats_by_manager(db: Database, *, manager_id: int) -> List[Dict[str, Any]]:
     """
     Retrieves aggregated feedback sentiment counts for a manager's team.
     This implementation performs the aggregation in Python for robustness.
     """
-    # Step 1: Find the team ID for the given manager
-    team_response = db.table("teams").select("id").eq("manager_id", manager_id).single().execute()
-    if not team_response.data:
-        return []
-    team_id = team_response.data['id']
-
-    # Step 2: Find all employees in that team
-    members_response = db.table("users").select("id").eq("team_id", team_id).execute()
-    if not members_response.data:
+    # Steps 1 and 2: Find the manager's team and its employees (cached roster)
+    roster = crud_team.get_roster_by_manager(db, manager_id=manager_id)
+    if not roster or not roster["member_ids"]:
         return []
-    member_ids = [member['id'] for member in members_response.data]
+    member_ids = list(roster["member_ids"])
 
     # Step 3: Get all feedback for those employees
     feedback_response = db.table("feedback").select("sentiment").in_("employee_id", member_ids).execute()
@@ -1,8 +1,9 @@
 from typing import List, Dict, Any, Optional
-from supabase import Client
+from app.db.base import Database
+from app.crud import crud_change_log
 # Note: We no longer need imports from sqlalchemy.orm or app.models
 
-def create_notification(db: Client, *, user_id: int, message: str) -> Optional[Dict[str, Any]]:
+def create_notification(db: Database, *, user_id: int, message: str) -> Optional[Dict[str, Any]]:
     """
     Create a new notification for a user in Supabase.
     """
@@ -12,17 +13,20 @@ def create_notification(db: Client, *, user_id: int, message: str) -> Optional[D
     
     if not response.data:
         return None
-        
+
+    crud_change_log.record_change(
+        db, entity="notification", entity_id=response.data[0]['id'], action="created", user_ids=[user_id]
+    )
     return response.data[0]
 
-def get_notifications_by_user(db: Client, *, user_id: int) -> List[Dict[str, Any]]:
+def get_notifications_by_user(db: Database, *, user_id: int) -> List[Dict[str, Any]]:
     """
     Get all notifications for a specific user from Supabase.
     """
     response = db.table("notifications").select("*").eq("user_id", user_id).order("created_at", desc=True).execute()
     return response.data if response.data else []
 
-def mark_notification_as_read(db: Client, *, notification_id: int, user_id: int) -> Optional[Dict[str, Any]]:
+def mark_notification_as_read(db: Database, *, notification_id: int, user_id: int) -> Optional[Dict[str, Any]]:
     """
     Mark a specific notification as read in Supabase.
     This action is atomic and only targets the specific notification for the user.
@@ -38,4 +42,7 @@ def mark_notification_as_read(db: Client, *, notification_id: int, user_id: int)
     if not response.data:
         return None
 
+    crud_change_log.record_change(
+        db, entity="notification", entity_id=notification_id, action="read", user_ids=[user_id]
+    )
     return response.data[0]
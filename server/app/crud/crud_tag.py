@@ -1,16 +1,44 @@
 from typing import List, Dict, Any
-from supabase import Client
+from app.db.base import Database
+from app.db.replicated import reads_pinned
+from app.core.singleflight import SingleFlight
 
 # Note: We no longer need imports from sqlalchemy.orm, app.models, or app.schemas for this file.
 
-def get_all_tags(db: Client) -> List[Dict[str, Any]]:
+# Tags are only ever added, never renamed or deleted, so every tag this process has
+# seen is kept in a name -> row registry. It is preloaded at startup (see
+# app/core/lifespan.py) and lets get_or_create_tags skip the database entirely
+# when all requested names are already known.
+_tag_registry: Dict[str, Dict[str, Any]] = {}
+
+# Concurrent requests for the tag list share one query.
+_all_tags_flight = SingleFlight("get_all_tags")
+
+def _register(tags: List[Dict[str, Any]]) -> None:
+    for tag in tags:
+        _tag_registry[tag['name']] = tag
+
+def get_all_tags(db: Database) -> List[Dict[str, Any]]:
     """
     Retrieves all tags from the database.
     """
-    response = db.table("tags").select("*").order("name").execute()
-    return response.data if response.data else []
+    def fetch() -> List[Dict[str, Any]]:
+        response = db.table("tags").select("*").order("name").execute()
+        tags = response.data if response.data else []
+        _register(tags)
+        return tags
+    if reads_pinned():
+        # Must see recent writes, which a shared in-flight query may predate.
+        return fetch()
+    return _all_tags_flight.do(id(db), fetch)
 
-def get_or_create_tags(db: Client, *, tags: List[str]) -> List[Dict[str, Any]]:
+def load_tag_registry(db: Database) -> int:
+    """
+    Fills the tag registry from the database and returns the number of tags loaded.
+    """
+    return len(get_all_tags(db))
+
+def get_or_create_tags(db: Database, *, tags: List[str]) -> List[Dict[str, Any]]:
     """
     For a list of tag names, get existing tags or create new ones using Supabase upsert.
     Assumes the 'tags' table has a UNIQUE constraint on the 'name' column.
@@ -18,6 +46,11 @@ def get_or_create_tags(db: Client, *, tags: List[str]) -> List[Dict[str, Any]]:
     if not tags:
         return []
 
+    # Fast path: every requested tag already exists.
+    known = [_tag_registry.get(tag_name) for tag_name in dict.fromkeys(tags)]
+    if all(known):
+        return known
+
     # Prepare a list of dictionaries for the upsert operation
     tag_data = [{"name": tag_name} for tag_name in tags]
     
@@ -33,4 +66,6 @@ def get_or_create_tags(db: Client, *, tags: List[str]) -> List[Dict[str, Any]]:
     # The 'in_' filter is perfect for fetching multiple records based on a list of values.
     fetch_response = db.table("tags").select("*").in_("name", tags).execute()
     
-    return fetch_response.data if fetch_response.data else []
+    fetched = fetch_response.data if fetch_response.data else []
+    _register(fetched)
+    return fetched
@@ -1,48 +1,123 @@
 from typing import Optional, Dict, Any
-from supabase import Client
+from app.db.base import Database
+from app.db.replicated import reads_pinned
 from app.schemas.team import TeamCreate
+from app.core import events
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.core.singleflight import SingleFlight
 
-def get_team(db: Client, *, team_id: int) -> Optional[Dict[str, Any]]:
+# Concurrent identical lookups (e.g. a whole team opening the app at once) share one query.
+_team_flight = SingleFlight("get_team")
+_all_teams_flight = SingleFlight("get_all_teams")
+
+# Team rosters: the team row, its manager and its members, keyed by team id, plus a
+# manager id -> team id index. Authorization checks ("is this employee on my team?")
+# become set lookups. Entries are dropped when membership changes in this process
+# (add_employee_to_team, registration) and expire after ROSTER_CACHE_TTL_SECONDS to
+# pick up changes made by other workers.
+_rosters: LRUCache[Dict[str, Any]] = LRUCache(settings.ROSTER_CACHE_SIZE, ttl=settings.ROSTER_CACHE_TTL_SECONDS)
+_team_id_by_manager: LRUCache[int] = LRUCache(settings.ROSTER_CACHE_SIZE, ttl=settings.ROSTER_CACHE_TTL_SECONDS)
+
+# Columns kept for each member; enough for the User response schema.
+MEMBER_COLUMNS = "id, email, full_name, role, team_id"
+
+def get_team(db: Database, *, team_id: int) -> Optional[Dict[str, Any]]:
     """
     Fetches a team by its ID from Supabase.
     """
-    response = db.table("teams").select("*").eq("id", team_id).single().execute()
-    return response.data if response.data else None
+    def fetch() -> Optional[Dict[str, Any]]:
+        response = db.table("teams").select("*").eq("id", team_id).single().execute()
+        return response.data if response.data else None
+    if reads_pinned():
+        # Must see recent writes, which a shared in-flight query may predate.
+        return fetch()
+    return _team_flight.do((id(db), team_id), fetch)
+
+def _load_roster(db: Database, team: Dict[str, Any]) -> Dict[str, Any]:
+    members_response = db.table("users").select(MEMBER_COLUMNS).eq("team_id", team['id']).execute()
+    members = members_response.data if members_response.data else []
+    roster = {
+        "team": team,
+        "manager_id": team.get("manager_id"),
+        "member_ids": frozenset(member['id'] for member in members),
+        "members": members,
+    }
+    _rosters.set(team['id'], roster)
+    if team.get("manager_id") is not None:
+        _team_id_by_manager.set(team["manager_id"], team['id'])
+    return roster
+
+def get_roster(db: Database, *, team_id: int) -> Optional[Dict[str, Any]]:
+    """
+    Returns the cached roster of a team: {"team", "manager_id", "member_ids", "members"}.
+    The roster is shared; callers must not modify it.
+    """
+    roster = _rosters.get(team_id)
+    if roster is None:
+        team = get_team(db, team_id=team_id)
+        if not team:
+            return None
+        roster = _load_roster(db, team)
+    return roster
+
+def get_roster_by_manager(db: Database, *, manager_id: int) -> Optional[Dict[str, Any]]:
+    """
+    Returns the cached roster of the team a manager runs (see get_roster).
+    """
+    team_id = _team_id_by_manager.get(manager_id)
+    if team_id is not None:
+        roster = _rosters.get(team_id)
+        if roster is not None:
+            return roster
 
-def get_team_by_manager(db: Client, *, manager_id: int) -> Optional[Dict[str, Any]]:
+    team_response = db.table("teams").select("*").eq("manager_id", manager_id).maybe_single().execute()
+    if not team_response or not team_response.data:
+        return None
+    return _load_roster(db, team_response.data)
+
+def invalidate_roster(team_id: Optional[int] = None, *, manager_id: Optional[int] = None) -> None:
+    """
+    Drops cached roster entries after a membership change.
+    """
+    if manager_id is not None:
+        team_id = team_id if team_id is not None else _team_id_by_manager.get(manager_id)
+        _team_id_by_manager.pop(manager_id)
+    if team_id is not None:
+        _rosters.pop(team_id)
+
+def get_team_by_manager(db: Database, *, manager_id: int) -> Optional[Dict[str, Any]]:
     """
-    Fetches the team managed by a specific manager.
-    This version uses two separate queries for robustness.
+    Fetches the team managed by a specific manager, with its members.
+    Served from the roster cache; the returned dictionary is the caller's to modify.
     """
-    # Step 1: Fetch the team for the manager
-    team_response = db.table("teams").select("*").eq("manager_id", manager_id).single().execute()
-    
-    if not team_response.data:
+    roster = get_roster_by_manager(db, manager_id=manager_id)
+    if not roster:
         return None
-    
-    team = team_response.data
-    
-    # Step 2: Fetch the members of that team
-    members_response = db.table("users").select("*").eq("team_id", team['id']).execute()
-    
-    # Step 3: Combine the results
-    team['members'] = members_response.data if members_response.data else []
-    
+
+    team = dict(roster["team"])
+    team['members'] = [dict(member) for member in roster["members"]]
+
     # The manager details are already part of the user object, so we don't need a separate query for it.
     # We can assume the calling function will handle fetching the manager's user object if needed.
     team['manager'] = {} # Placeholder, as the full manager object isn't strictly needed here.
 
     return team
 
-def get_all_teams(db: Client) -> list[Dict[str, Any]]:
+def get_all_teams(db: Database) -> list[Dict[str, Any]]:
     """
     Fetches all teams from Supabase.
     """
-    response = db.table("teams").select("id, name").execute()
-    return response.data if response.data else []
+    def fetch() -> list[Dict[str, Any]]:
+        response = db.table("teams").select("id, name").execute()
+        return response.data if response.data else []
+    if reads_pinned():
+        # Must see recent writes, which a shared in-flight query may predate.
+        return fetch()
+    return _all_teams_flight.do(id(db), fetch)
 
 
-def create_team(db: Client, *, team_in: TeamCreate, manager_id: int) -> Optional[Dict[str, Any]]:
+def create_team(db: Database, *, team_in: TeamCreate, manager_id: int) -> Optional[Dict[str, Any]]:
     """
     Creates a new team for a manager in Supabase.
     """
@@ -52,16 +127,20 @@ def create_team(db: Client, *, team_in: TeamCreate, manager_id: int) -> Optional
 
     if not response.data:
         return None
-        
+
+    invalidate_roster(manager_id=manager_id)
+    events.publish("team.created", response.data[0])
     return response.data[0]
 
-def add_employee_to_team(db: Client, *, team_id: int, user_id: int) -> Optional[Dict[str, Any]]:
+def add_employee_to_team(db: Database, *, team_id: int, user_id: int) -> Optional[Dict[str, Any]]:
     """
     Assigns an employee to a team by updating the user's team_id in Supabase.
     """
     response = db.table("users").update({"team_id": team_id}).eq("id", user_id).execute()
-    
+    invalidate_roster(team_id)
+
     if not response.data:
         return None
-        
+
+    events.publish("user.updated", response.data[0])
     return response.data[0]
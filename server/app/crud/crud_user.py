@@ -1,19 +1,28 @@
 from typing import Optional, Dict, Any, List
-from supabase import Client
+from app.db.base import Database
+from app.db.replicated import reads_pinned, use_primary
 from app.schemas.user import UserCreate
 from app.core.security import get_password_hash
+from app.core import events
 from app.crud import crud_team
+from app.core.singleflight import SingleFlight
 
-def get_user_by_email(db: Client, *, email: str) -> Optional[Dict[str, Any]]:
+# Every authenticated request looks its user up, so a burst of requests from the
+# same user shares one query.
+_user_flight = SingleFlight("get_user")
+
+def get_user_by_email(db: Database, *, email: str) -> Optional[Dict[str, Any]]:
     """
     Fetches a user from the database by their email address.
     """
-    response = db.table("users").select("*").eq("email", email).execute()
+    # Login and registration use this, and must see users registered a moment ago.
+    with use_primary():
+        response = db.table("users").select("*").eq("email", email).execute()
     if response.data:
         return response.data[0]
     return None
 
-def get_user(db: Client, *, user_id: str) -> Optional[Dict[str, Any]]:
+def get_user(db: Database, *, user_id: str) -> Optional[Dict[str, Any]]:
     """
     Fetches a user from the database by their ID.
     """
@@ -21,17 +30,23 @@ def get_user(db: Client, *, user_id: str) -> Optional[Dict[str, Any]]:
         user_id_int = int(user_id)
     except (ValueError, TypeError):
         return None
-    response = db.table("users").select("*").eq("id", user_id_int).single().execute()
-    return response.data if response.data else None
 
-def get_unassigned_employees(db: Client) -> List[Dict[str, Any]]:
+    def fetch() -> Optional[Dict[str, Any]]:
+        response = db.table("users").select("*").eq("id", user_id_int).single().execute()
+        return response.data if response.data else None
+    if reads_pinned():
+        # Must see recent writes, which a shared in-flight query may predate.
+        return fetch()
+    return _user_flight.do((id(db), user_id_int), fetch)
+
+def get_unassigned_employees(db: Database) -> List[Dict[str, Any]]:
     """
     Fetches all employees who are not yet assigned to a team.
     """
-    response = db.table("users").select("*").eq("role", "employee").is_("team_id", "null").execute()
+    response = db.table("users").select(crud_team.MEMBER_COLUMNS).eq("role", "employee").is_("team_id", "null").execute()
     return response.data if response.data else []
 
-def create_user_with_team(db: Client, *, user_in: UserCreate) -> Optional[Dict[str, Any]]:
+def create_user_with_team(db: Database, *, user_in: UserCreate) -> Optional[Dict[str, Any]]:
     """
     Creates a new user.
     - If the user is a manager, it also creates a new team for them.
@@ -56,29 +71,35 @@ def create_user_with_team(db: Client, *, user_in: UserCreate) -> Optional[Dict[s
         # A manager is not initially assigned a team_id
         user_data["team_id"] = None
         
-        # Create the manager user first
-        user_response = db.table("users").insert(user_data).execute()
-        if not user_response.data:
-            raise Exception("Failed to create manager user.")
-        
-        new_manager = user_response.data[0]
-        manager_id = new_manager['id']
-        
-        # Create a new team with the manager's ID
-        from app.schemas.team import TeamCreate # Local import to avoid circular dependency
-        team_to_create = TeamCreate(name=user_in.team_name)
-        new_team = crud_team.create_team(db, team_in=team_to_create, manager_id=manager_id)
-        if not new_team:
-            # Rollback or handle team creation failure
-            db.table("users").delete().eq("id", manager_id).execute()
-            raise Exception("Failed to create team for manager.")
-        
-        # Update the manager with their new team_id
-        updated_user_response = db.table("users").update({"team_id": new_team['id']}).eq("id", manager_id).execute()
-        if not updated_user_response.data:
-            # Handle the unlikely event of the update failing
-            raise Exception("Failed to assign team to manager.")
+        # The three writes below run in one transaction on backends that support it,
+        # so a failure part-way rolls everything back.
+        with db.transaction():
+            # Create the manager user first
+            user_response = db.table("users").insert(user_data).execute()
+            if not user_response.data:
+                raise Exception("Failed to create manager user.")
+            
+            new_manager = user_response.data[0]
+            manager_id = new_manager['id']
+            
+            # Create a new team with the manager's ID
+            from app.schemas.team import TeamCreate # Local import to avoid circular dependency
+            team_to_create = TeamCreate(name=user_in.team_name)
+            new_team = crud_team.create_team(db, team_in=team_to_create, manager_id=manager_id)
+            if not new_team:
+                if not db.supports_transactions:
+                    # Without a transaction, undo the user insert by hand
+                    db.table("users").delete().eq("id", manager_id).execute()
+                raise Exception("Failed to create team for manager.")
             
+            # Update the manager with their new team_id
+            updated_user_response = db.table("users").update({"team_id": new_team['id']}).eq("id", manager_id).execute()
+            if not updated_user_response.data:
+                # Handle the unlikely event of the update failing
+                raise Exception("Failed to assign team to manager.")
+
+        crud_team.invalidate_roster(new_team['id'], manager_id=manager_id)
+        events.publish("user.created", updated_user_response.data[0])
         return updated_user_response.data[0]
 
     # 3. Handle employee creation
@@ -90,7 +111,10 @@ def create_user_with_team(db: Client, *, user_in: UserCreate) -> Optional[Dict[s
         user_response = db.table("users").insert(user_data).execute()
         if not user_response.data:
             raise Exception("Failed to create employee user.")
-            
+
+        # The team has a new member
+        crud_team.invalidate_roster(user_in.team_id)
+        events.publish("user.created", user_response.data[0])
         return user_response.data[0]
     
     else:
@@ -0,0 +1,44 @@
+"""
+The database interface the CRUD layer is written against.
+
+Every backend exposes the PostgREST-style fluent builder that app/crud already uses
+(db.table("feedback").select(...).eq(...).execute()), plus transaction(). Backends that
+cannot run multi-statement transactions report supports_transactions = False and
+return a no-op context manager, so callers fall back to compensating writes.
+"""
+import contextlib
+from typing import Any, ContextManager, Protocol
+
+
+class Database(Protocol):
+    supports_transactions: bool
+
+    def table(self, table_name: str) -> Any:
+        ...
+
+    def transaction(self) -> ContextManager[None]:
+        ...
+
+
+class SupabaseDatabase:
+    """
+    Adapts a supabase Client to the Database interface. PostgREST executes each
+    request in its own transaction, so transaction() cannot group statements here.
+    """
+
+    supports_transactions = False
+
+    def __init__(self, client: Any) -> None:
+        self._client = client
+
+    def table(self, table_name: str) -> Any:
+        return self._client.table(table_name)
+
+    def rpc(self, fn: str, params: Any = None, **kwargs: Any) -> Any:
+        return self._client.rpc(fn, params or {}, **kwargs)
+
+    def transaction(self) -> ContextManager[None]:
+        return contextlib.nullcontext()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._client, name)
@@ -0,0 +1,72 @@
+import time
+from typing import Any
+
+from app.core.metrics import record_db_round_trip
+
+# Builder methods that determine what kind of statement a query sends to PostgREST.
+_OPERATIONS = {"select", "insert", "update", "upsert", "delete"}
+
+
+class InstrumentedQuery:
+    """
+    Wraps a PostgREST request builder and records a round trip when execute() is called.
+    Every chained builder call (eq, order, single, ...) returns another InstrumentedQuery,
+    so the CRUD modules can keep using the fluent API unchanged.
+    """
+
+    def __init__(self, builder: Any, table: str, operation: str = "select") -> None:
+        self._builder = builder
+        self._table = table
+        self._operation = operation
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._builder, name)
+        if not callable(attr):
+            # Properties such as `.not_` return another builder that must stay wrapped.
+            if hasattr(attr, "execute"):
+                return InstrumentedQuery(attr, self._table, self._operation)
+            return attr
+
+        operation = name if name in _OPERATIONS else self._operation
+
+        def chained(*args: Any, **kwargs: Any) -> Any:
+            result = attr(*args, **kwargs)
+            if result is None:
+                return None
+            return InstrumentedQuery(result, self._table, operation)
+
+        return chained
+
+    def execute(self) -> Any:
+        start = time.perf_counter()
+        failed = False
+        try:
+            return self._builder.execute()
+        except Exception:
+            failed = True
+            raise
+        finally:
+            record_db_round_trip(self._table, self._operation, time.perf_counter() - start, failed)
+
+
+class InstrumentedClient:
+    """
+    A thin proxy around a database client that counts and times every round trip,
+    labeled by table and operation. Attributes other than table()/rpc() pass through.
+    """
+
+    def __init__(self, client: Any) -> None:
+        self._client = client
+
+    @property
+    def wrapped(self) -> Any:
+        return self._client
+
+    def table(self, table_name: str) -> InstrumentedQuery:
+        return InstrumentedQuery(self._client.table(table_name), table_name)
+
+    def rpc(self, fn: str, params: Any = None, **kwargs: Any) -> InstrumentedQuery:
+        return InstrumentedQuery(self._client.rpc(fn, params or {}, **kwargs), f"rpc:{fn}", "rpc")
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._client, name)
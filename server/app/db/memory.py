@@ -0,0 +1,421 @@
+"""
+An in-memory stand-in for the Supabase client.
+
+It implements the part of the PostgREST query builder that app/crud uses
+(table().select().eq().order().single().execute() and friends) on top of plain
+Python lists, so the API can be exercised and benchmarked without a network.
+An optional per-call latency simulates the HTTP round trip to PostgREST.
+"""
+import contextlib
+import copy
+import datetime
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from postgrest.exceptions import APIError
+
+from app.db.relations import RELATIONS, embed_hint, parse_embed, split_select
+
+# Column defaults applied on insert, mirroring the database schema.
+TABLE_DEFAULTS: Dict[str, Dict[str, Any]] = {
+    "feedback": {"acknowledged": False, "strengths": None, "areas_for_improvement": None},
+    "notifications": {"is_read": False},
+    "users": {"team_id": None},
+    "feedback_drafts": {
+        "employee_id": None, "strengths": None, "areas_for_improvement": None,
+        "feedback": None, "sentiment": None, "version": 1, "updated_at": None,
+    },
+}
+
+# Tables whose updated_at is set on every update, like the triggers in sql/004 and sql/005.
+TABLES_WITH_UPDATED_AT = {"feedback", "notifications", "feedback_drafts"}
+
+# Tables whose primary key is not a generated "id" column.
+TABLES_WITHOUT_ID = {"feedback_tags"}
+
+
+class MemoryResponse:
+    def __init__(self, data: Any, count: Optional[int] = None) -> None:
+        self.data = data
+        self.count = count
+
+
+def _now() -> str:
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+
+def _coerce(value: Any) -> Any:
+    # PostgREST compares on the database types; the CRUD layer passes ints and strings
+    # interchangeably for ids, so normalise numeric strings before comparing.
+    if isinstance(value, str) and value.lstrip("-").isdigit():
+        return int(value)
+    return value
+
+
+class MemoryQuery:
+    """A chainable query against one table of a MemoryClient."""
+
+    def __init__(self, client: "MemoryClient", table: str) -> None:
+        self._client = client
+        self._table = table
+        self._operation = "select"
+        self._columns = "*"
+        self._payload: Any = None
+        self._on_conflict = ""
+        self._ignore_duplicates = False
+        self._filters: List[Callable[[Dict[str, Any]], bool]] = []
+        # Filters on embedded resources ("feedback_tags.tag_id"): alias -> [(column, test)].
+        self._embed_filters: Dict[str, List[tuple[str, Callable[[Any], bool]]]] = {}
+        self._order: List[tuple[str, bool]] = []
+        self._limit: Optional[int] = None
+        self._offset = 0
+        self._single = False
+        self._maybe_single = False
+        self._count: Optional[str] = None
+        self._total: Optional[int] = None  # Rows matched before offset and limit, for count=
+
+    # --- Statement type ---
+
+    def select(self, *columns: str, count: Optional[str] = None, **kwargs: Any) -> "MemoryQuery":
+        self._columns = ",".join(columns) if columns else "*"
+        self._count = count
+        return self
+
+    def insert(self, json: Any, **kwargs: Any) -> "MemoryQuery":
+        self._operation = "insert"
+        self._payload = json
+        return self
+
+    def upsert(self, json: Any, *, on_conflict: str = "", ignore_duplicates: bool = False, **kwargs: Any) -> "MemoryQuery":
+        self._operation = "upsert"
+        self._payload = json
+        self._on_conflict = on_conflict or "id"
+        self._ignore_duplicates = ignore_duplicates
+        return self
+
+    def update(self, json: Dict[str, Any], **kwargs: Any) -> "MemoryQuery":
+        self._operation = "update"
+        self._payload = json
+        return self
+
+    def delete(self, **kwargs: Any) -> "MemoryQuery":
+        self._operation = "delete"
+        return self
+
+    # --- Filters ---
+
+    def _where(self, column: str, test: Callable[[Any], bool]) -> "MemoryQuery":
+        if "." in column:
+            alias, column = column.split(".", 1)
+            self._embed_filters.setdefault(alias, []).append((column, test))
+        else:
+            self._filters.append(lambda row: test(row.get(column)))
+        return self
+
+    def eq(self, column: str, value: Any) -> "MemoryQuery":
+        return self._where(column, lambda v: _coerce(v) == _coerce(value))
+
+    def neq(self, column: str, value: Any) -> "MemoryQuery":
+        return self._where(column, lambda v: _coerce(v) != _coerce(value))
+
+    def gt(self, column: str, value: Any) -> "MemoryQuery":
+        return self._where(column, lambda v: v is not None and v > _coerce(value))
+
+    def gte(self, column: str, value: Any) -> "MemoryQuery":
+        return self._where(column, lambda v: v is not None and v >= _coerce(value))
+
+    def lt(self, column: str, value: Any) -> "MemoryQuery":
+        return self._where(column, lambda v: v is not None and v < _coerce(value))
+
+    def lte(self, column: str, value: Any) -> "MemoryQuery":
+        return self._where(column, lambda v: v is not None and v <= _coerce(value))
+
+    def in_(self, column: str, values: List[Any]) -> "MemoryQuery":
+        wanted = {_coerce(value) for value in values}
+        return self._where(column, lambda v: _coerce(v) in wanted)
+
+    def is_(self, column: str, value: Any) -> "MemoryQuery":
+        if value in (None, "null"):
+            return self._where(column, lambda v: v is None)
+        expected = value if isinstance(value, bool) else str(value).lower() == "true"
+        return self._where(column, lambda v: v is expected)
+
+    def contains(self, column: str, value: List[Any]) -> "MemoryQuery":
+        wanted = set(value)
+        return self._where(column, lambda v: wanted.issubset(set(v or [])))
+
+    # --- Modifiers ---
+
+    def order(self, column: str, *, desc: bool = False, **kwargs: Any) -> "MemoryQuery":
+        self._order.append((column, desc))
+        return self
+
+    def limit(self, size: int, **kwargs: Any) -> "MemoryQuery":
+        self._limit = size
+        return self
+
+    def range(self, start: int, end: int, **kwargs: Any) -> "MemoryQuery":
+        self._offset = start
+        self._limit = end - start + 1
+        return self
+
+    def single(self) -> "MemoryQuery":
+        self._single = True
+        return self
+
+    def maybe_single(self) -> "MemoryQuery":
+        self._maybe_single = True
+        return self
+
+    # --- Execution ---
+
+    def execute(self) -> MemoryResponse:
+        return self._client._execute(self)
+
+
+class MemoryClient:
+    """
+    A thread-safe, process-local database with the Supabase client's table() API.
+    """
+
+    supports_transactions = False
+
+    def __init__(self, latency: float = 0.0) -> None:
+        self.latency = latency
+        self.tables: Dict[str, List[Dict[str, Any]]] = {}
+        self.round_trips = 0
+        self._sequences: Dict[str, int] = {}
+        # (table, column) -> {value: [rows]}; dropped whenever the table is written to.
+        self._indexes: Dict[tuple[str, str], Dict[Any, List[Dict[str, Any]]]] = {}
+        self._lock = threading.Lock()
+
+    def table(self, table_name: str) -> MemoryQuery:
+        return MemoryQuery(self, table_name)
+
+    def rows(self, table: str) -> List[Dict[str, Any]]:
+        return self.tables.setdefault(table, [])
+
+    def transaction(self) -> contextlib.nullcontext:
+        return contextlib.nullcontext()
+
+    # --- Internals ---
+
+    def _execute(self, query: MemoryQuery) -> MemoryResponse:
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.round_trips += 1
+            handler = getattr(self, f"_do_{query._operation}")
+            if query._operation != "select":
+                self._invalidate(query._table)
+            data = handler(query)
+
+        count = (len(data) if query._total is None else query._total) if query._count else None
+        if query._single or query._maybe_single:
+            if len(data) == 1:
+                return MemoryResponse(data[0], count)
+            if query._maybe_single and not data:
+                return MemoryResponse(None, count)
+            # PostgREST answers .single() with HTTP 406 when the result is not exactly one row.
+            raise APIError({
+                "code": "PGRST116",
+                "message": "JSON object requested, multiple (or no) rows returned",
+                "details": f"The result contains {len(data)} rows",
+                "hint": None,
+            })
+        return MemoryResponse(data, count)
+
+    def _index(self, table: str, column: str) -> Dict[Any, List[Dict[str, Any]]]:
+        key = (table, column)
+        if key not in self._indexes:
+            index: Dict[Any, List[Dict[str, Any]]] = {}
+            for row in self.rows(table):
+                index.setdefault(row.get(column), []).append(row)
+            self._indexes[key] = index
+        return self._indexes[key]
+
+    def _invalidate(self, table: str) -> None:
+        for key in [key for key in self._indexes if key[0] == table]:
+            del self._indexes[key]
+
+    def _next_id(self, table: str) -> int:
+        self._sequences[table] = self._sequences.get(table, 0) + 1
+        return self._sequences[table]
+
+    def _matching(self, query: MemoryQuery) -> List[Dict[str, Any]]:
+        return [row for row in self.rows(query._table) if all(f(row) for f in query._filters)]
+
+    def _prepare_row(self, table: str, values: Dict[str, Any]) -> Dict[str, Any]:
+        row = dict(TABLE_DEFAULTS.get(table, {}))
+        row.update(values)
+        if table not in TABLES_WITHOUT_ID and row.get("id") is None:
+            row["id"] = self._next_id(table)
+        elif "id" in row:
+            self._sequences[table] = max(self._sequences.get(table, 0), row["id"])
+        row.setdefault("created_at", _now())
+        return row
+
+    def _do_select(self, query: MemoryQuery) -> List[Dict[str, Any]]:
+        rows = self._matching(query)
+        for column, desc in reversed(query._order):
+            rows.sort(key=lambda row: (row.get(column) is None, row.get(column)), reverse=desc)
+        inner = self._inner_embeds(query._columns)
+        if not (inner or query._embed_filters):
+            # Only the page is projected.
+            return [self._project(query._table, row, query._columns) for row in self._page(query, rows)]
+        # Embed filters and inner embeds decide which rows are in the result, so
+        # every matching row is projected before paging.
+        projected = (self._filter_embeds(query, inner, self._project(query._table, row, query._columns)) for row in rows)
+        return self._page(query, [row for row in projected if row is not None])
+
+    @staticmethod
+    def _page(query: MemoryQuery, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        query._total = len(rows)
+        rows = rows[query._offset:]
+        if query._limit is not None:
+            rows = rows[:query._limit]
+        return rows
+
+    @staticmethod
+    def _inner_embeds(columns: str) -> Set[str]:
+        aliases = set()
+        for item in split_select(columns):
+            embed = parse_embed(item)
+            if embed is not None and embed_hint(embed[1])[1]:
+                aliases.add(embed[0])
+        return aliases
+
+    def _filter_embeds(self, query: MemoryQuery, inner: Set[str], row: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Applies the filters on embedded resources to a projected row, as PostgREST
+        does: they filter the embedded rows, and an inner embed left empty drops the row.
+        """
+        for alias in set(query._embed_filters) | inner:
+            if alias not in row:
+                raise APIError({
+                    "code": "PGRST108",
+                    "message": f"'{alias}' is not an embedded resource in this request",
+                    "details": None,
+                    "hint": None,
+                })
+            tests = query._embed_filters.get(alias, [])
+            value = row[alias]
+            if isinstance(value, list):
+                value = [item for item in value if all(test(item.get(column)) for column, test in tests)]
+            elif value is not None and not all(test(value.get(column)) for column, test in tests):
+                value = None
+            if alias in inner and not value:
+                return None
+            row[alias] = value
+        return row
+
+    def _do_insert(self, query: MemoryQuery) -> List[Dict[str, Any]]:
+        payload = query._payload if isinstance(query._payload, list) else [query._payload]
+        created = [self._prepare_row(query._table, values) for values in payload]
+        self.rows(query._table).extend(created)
+        return copy.deepcopy(created)
+
+    def _do_upsert(self, query: MemoryQuery) -> List[Dict[str, Any]]:
+        payload = query._payload if isinstance(query._payload, list) else [query._payload]
+        keys = [key.strip() for key in query._on_conflict.split(",")]
+        table = self.rows(query._table)
+        result = []
+        for values in payload:
+            existing = next(
+                (row for row in table if all(row.get(k) == values.get(k) for k in keys)), None
+            )
+            if existing is None:
+                row = self._prepare_row(query._table, values)
+                table.append(row)
+                result.append(row)
+            elif not query._ignore_duplicates:
+                existing.update(values)
+                result.append(existing)
+        return copy.deepcopy(result)
+
+    def _do_update(self, query: MemoryQuery) -> List[Dict[str, Any]]:
+        rows = self._matching(query)
+        for row in rows:
+            row.update(query._payload)
+            if query._table in TABLES_WITH_UPDATED_AT:
+                row["updated_at"] = _now()
+        return copy.deepcopy(rows)
+
+    def _do_delete(self, query: MemoryQuery) -> List[Dict[str, Any]]:
+        doomed = self._matching(query)
+        doomed_ids = {id(row) for row in doomed}
+        self.tables[query._table] = [row for row in self.rows(query._table) if id(row) not in doomed_ids]
+        return copy.deepcopy(doomed)
+
+    def _project(self, table: str, row: Dict[str, Any], columns: str) -> Dict[str, Any]:
+        """
+        Builds the JSON object PostgREST would return for `row` under the select string.
+        """
+        result: Dict[str, Any] = {}
+        for item in split_select(columns):
+            embed = parse_embed(item)
+            if embed is None:
+                # Stored values are scalars or small lists, so a shallow copy is enough
+                # to keep callers from mutating the table.
+                if item == "*":
+                    result.update({key: copy.copy(value) for key, value in row.items()})
+                else:
+                    result[item.strip()] = copy.copy(row.get(item.strip()))
+                continue
+
+            alias, resource, inner = embed
+            relation = RELATIONS.get(table, {}).get(embed_hint(resource)[0])
+            if relation is None:
+                raise APIError({
+                    "code": "PGRST200",
+                    "message": f"Could not find a relationship between '{table}' and '{resource}'",
+                    "details": None,
+                    "hint": None,
+                })
+            result[alias] = self._embed(row, relation, inner)
+        return result
+
+    def _embed(self, row: Dict[str, Any], relation: Any, inner: str) -> Any:
+        by_id = self._index(relation.target, "id")
+        if relation.through:
+            links = self._index(relation.through, relation.column).get(row.get("id"), [])
+            targets = [t for link in links for t in by_id.get(link[relation.through_column], [])]
+            return [self._project(relation.target, t, inner) for t in targets]
+        if relation.many:
+            children = self._index(relation.target, relation.column).get(row.get("id"), [])
+            return [self._project(relation.target, t, inner) for t in children]
+        match = by_id.get(row.get(relation.column))
+        return self._project(relation.target, match[0], inner) if match else None
+
+
+class MemoryReplica(MemoryClient):
+    """
+    A read-only copy of a MemoryClient that trails it by up to `lag` seconds: a
+    stand-in for a streaming replica, to exercise replica routing without Postgres.
+    """
+
+    def __init__(self, primary: MemoryClient, lag: float, latency: float = 0.0) -> None:
+        super().__init__(latency)
+        self.primary = primary
+        self.lag = lag
+        self._synced_at = float("-inf")
+
+    def _execute(self, query: MemoryQuery) -> MemoryResponse:
+        if query._operation != "select":
+            raise APIError({
+                "code": "25006",
+                "message": f"cannot execute {query._operation.upper()} in a read-only transaction",
+                "details": None,
+                "hint": None,
+            })
+        now = time.monotonic()
+        if now - self._synced_at >= self.lag:
+            # Catch up with the primary as of now; until the next catch-up, its writes aren't seen.
+            with self.primary._lock:
+                snapshot = {table: [dict(row) for row in rows] for table, rows in self.primary.tables.items()}
+            with self._lock:
+                self.tables = snapshot
+                self._indexes.clear()
+            self._synced_at = now
+        return super()._execute(query)
@@ -0,0 +1,573 @@
+"""
+A direct Postgres backend on an asyncpg connection pool.
+
+PostgresClient implements the same fluent builder the CRUD layer uses with the
+Supabase client, but compiles each query to one parameterised SQL statement instead
+of an HTTP request to PostgREST. Embedded resources ("manager:users!...(*)",
+"tags(*)") become correlated jsonb sub-selects, so a row comes back in the same
+shape PostgREST would return.
+
+The pool lives on a private event loop thread. Callers (the CRUD functions, which
+run in FastAPI's threadpool) block on that loop. Statement text depends only on the
+query's shape, never on its values, so asyncpg's per-connection statement cache
+prepares each shape once and reuses it.
+"""
+import asyncio
+import contextlib
+import datetime
+import enum
+import json
+import re
+import threading
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import asyncpg
+from postgrest.exceptions import APIError
+
+from app.db.relations import RELATIONS, Relation, embed_hint, parse_embed, split_select
+
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+# The connection of the transaction open in the current context, if any.
+_current_connection: ContextVar[Optional[asyncpg.Connection]] = ContextVar("pg_connection", default=None)
+
+
+def _quote(identifier: str) -> str:
+    identifier = identifier.strip()
+    if not _IDENTIFIER.match(identifier):
+        raise ValueError(f"Invalid SQL identifier: {identifier!r}")
+    return f'"{identifier}"'
+
+
+def _parse_timestamp(value: str) -> datetime.datetime:
+    return datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def _to_db(value: Any, data_type: Optional[str]) -> Any:
+    """
+    Converts a value from the CRUD layer (JSON-style: ints, strings, ISO timestamps,
+    str enums) to the Python type asyncpg expects for the column's data type.
+    """
+    if value is None:
+        return None
+    if isinstance(value, enum.Enum):
+        value = value.value
+    if isinstance(value, (list, tuple)) and data_type == "ARRAY":
+        return list(value)
+    if data_type in ("bigint", "integer", "smallint"):
+        return int(value)
+    if data_type in ("timestamp with time zone", "timestamp without time zone") and isinstance(value, str):
+        parsed = _parse_timestamp(value)
+        if data_type == "timestamp without time zone":
+            return parsed.replace(tzinfo=None)
+        return parsed
+    if data_type == "date" and isinstance(value, str):
+        return datetime.date.fromisoformat(value)
+    if data_type == "boolean" and isinstance(value, str):
+        return value.lower() == "true"
+    if data_type in ("text", "character varying", "USER-DEFINED") and not isinstance(value, str):
+        return str(value)
+    return value
+
+
+class PostgresResponse:
+    def __init__(self, data: Any, count: Optional[int] = None) -> None:
+        self.data = data
+        self.count = count
+
+
+class PostgresQuery:
+    """A chainable query against one table, compiled to SQL on execute()."""
+
+    def __init__(self, client: "PostgresClient", table: str) -> None:
+        self._client = client
+        self._table = table
+        self._operation = "select"
+        self._columns = "*"
+        self._payload: Any = None
+        self._on_conflict = ""
+        self._ignore_duplicates = False
+        # (column, operator, value); operator is a comparison or "in", "is", "cs". A column
+        # such as "feedback_tags.tag_id" filters an embedded resource.
+        self._filters: List[Tuple[str, str, Any]] = []
+        self._order: List[Tuple[str, bool]] = []
+        self._limit: Optional[int] = None
+        self._offset = 0
+        self._single = False
+        self._maybe_single = False
+        self._count: Optional[str] = None
+
+    # --- Statement type ---
+
+    def select(self, *columns: str, count: Optional[str] = None, **kwargs: Any) -> "PostgresQuery":
+        self._columns = ",".join(columns) if columns else "*"
+        self._count = count
+        return self
+
+    def insert(self, json: Any, **kwargs: Any) -> "PostgresQuery":
+        self._operation = "insert"
+        self._payload = json
+        return self
+
+    def upsert(self, json: Any, *, on_conflict: str = "", ignore_duplicates: bool = False, **kwargs: Any) -> "PostgresQuery":
+        self._operation = "upsert"
+        self._payload = json
+        self._on_conflict = on_conflict or "id"
+        self._ignore_duplicates = ignore_duplicates
+        return self
+
+    def update(self, json: Dict[str, Any], **kwargs: Any) -> "PostgresQuery":
+        self._operation = "update"
+        self._payload = json
+        return self
+
+    def delete(self, **kwargs: Any) -> "PostgresQuery":
+        self._operation = "delete"
+        return self
+
+    # --- Filters ---
+
+    def _where(self, column: str, operator: str, value: Any) -> "PostgresQuery":
+        self._filters.append((column, operator, value))
+        return self
+
+    def eq(self, column: str, value: Any) -> "PostgresQuery":
+        return self._where(column, "=", value)
+
+    def neq(self, column: str, value: Any) -> "PostgresQuery":
+        return self._where(column, "<>", value)
+
+    def gt(self, column: str, value: Any) -> "PostgresQuery":
+        return self._where(column, ">", value)
+
+    def gte(self, column: str, value: Any) -> "PostgresQuery":
+        return self._where(column, ">=", value)
+
+    def lt(self, column: str, value: Any) -> "PostgresQuery":
+        return self._where(column, "<", value)
+
+    def lte(self, column: str, value: Any) -> "PostgresQuery":
+        return self._where(column, "<=", value)
+
+    def in_(self, column: str, values: List[Any]) -> "PostgresQuery":
+        return self._where(column, "in", list(values))
+
+    def is_(self, column: str, value: Any) -> "PostgresQuery":
+        return self._where(column, "is", value)
+
+    def contains(self, column: str, value: List[Any]) -> "PostgresQuery":
+        return self._where(column, "cs", list(value))
+
+    # --- Modifiers ---
+
+    def order(self, column: str, *, desc: bool = False, **kwargs: Any) -> "PostgresQuery":
+        self._order.append((column, desc))
+        return self
+
+    def limit(self, size: int, **kwargs: Any) -> "PostgresQuery":
+        self._limit = size
+        return self
+
+    def range(self, start: int, end: int, **kwargs: Any) -> "PostgresQuery":
+        self._offset = start
+        self._limit = end - start + 1
+        return self
+
+    def single(self) -> "PostgresQuery":
+        self._single = True
+        return self
+
+    def maybe_single(self) -> "PostgresQuery":
+        self._maybe_single = True
+        return self
+
+    # --- Execution ---
+
+    def execute(self) -> PostgresResponse:
+        return self._client._run(self._client._execute(self, _current_connection.get()))
+
+
+class PostgresRpc:
+    """
+    A call to a set-returning SQL function, answered like PostgREST's /rpc endpoint:
+    a list of rows as dictionaries.
+    """
+
+    def __init__(self, client: "PostgresClient", fn: str, params: Dict[str, Any]) -> None:
+        self._client = client
+        self._table = f"rpc:{fn}"
+        names = [_quote(name) for name in params]
+        arguments = ", ".join(f"{name} => ${index}" for index, name in enumerate(names, start=1))
+        self.sql = f"SELECT to_jsonb(r) AS row FROM {_quote(fn)}({arguments}) r"
+        self.args = list(params.values())
+
+    def execute(self) -> PostgresResponse:
+        return self._client._run(self._client._call(self, _current_connection.get()))
+
+
+class _Compiler:
+    """Builds the SQL text and argument list for one PostgresQuery."""
+
+    def __init__(self, query: PostgresQuery, column_types: Dict[str, Dict[str, str]]) -> None:
+        self.query = query
+        self.types = column_types
+        self.args: List[Any] = []
+        # Filters on the top-level embeds, by alias: (column, operator, value).
+        self.embed_filters: Dict[str, List[Tuple[str, str, Any]]] = {}
+        for column, operator, value in query._filters:
+            if "." in column:
+                alias, column = column.split(".", 1)
+                self.embed_filters.setdefault(alias, []).append((column, operator, value))
+
+    def param(self, table: str, column: str, value: Any) -> str:
+        self.args.append(_to_db(value, self.types.get(table, {}).get(column)))
+        return f"${len(self.args)}"
+
+    @staticmethod
+    def _relation(table: str, resource: str) -> Relation:
+        relation = RELATIONS.get(table, {}).get(resource)
+        if relation is None:
+            raise APIError({
+                "code": "PGRST200",
+                "message": f"Could not find a relationship between '{table}' and '{resource}'",
+                "details": None,
+                "hint": None,
+            })
+        return relation
+
+    @staticmethod
+    def _source(relation: Relation, child: str, link: str, ref: str) -> str:
+        """FROM ... WHERE ... for the rows of `relation` that belong to the row `ref`."""
+        target = _quote(relation.target)
+        if relation.through:
+            return (
+                f"FROM {target} {child} "
+                f"JOIN {_quote(relation.through)} {link} ON {link}.{_quote(relation.through_column)} = {child}.id "
+                f"WHERE {link}.{_quote(relation.column)} = {ref}.id"
+            )
+        if relation.many:
+            return f"FROM {target} {child} WHERE {child}.{_quote(relation.column)} = {ref}.id"
+        return f"FROM {target} {child} WHERE {child}.id = {ref}.{_quote(relation.column)}"
+
+    def _embed_conditions(self, relation: Relation, alias: str, child: str) -> str:
+        return "".join(
+            f" AND {self.condition(relation.target, child, column, operator, value)}"
+            for column, operator, value in self.embed_filters.get(alias, [])
+        )
+
+    def json_expr(self, table: str, columns: str, ref: str, depth: int) -> str:
+        """
+        A jsonb expression for the row `ref` of `table`, projected like PostgREST would.
+        """
+        parts = []
+        for item in split_select(columns):
+            embed = parse_embed(item)
+            if embed is None:
+                if item == "*":
+                    parts.append(f"to_jsonb({ref})")
+                else:
+                    parts.append(f"jsonb_build_object('{item.strip()}', {ref}.{_quote(item)})")
+                continue
+
+            alias, resource, inner = embed
+            relation = self._relation(table, embed_hint(resource)[0])
+            child = f"t{depth + 1}"
+            inner_expr = self.json_expr(relation.target, inner, child, depth + 1)
+            source = self._source(relation, child, f"j{depth + 1}", ref)
+            if depth == 0:
+                # Embed filters narrow the embedded rows, as in PostgREST.
+                source += self._embed_conditions(relation, alias, child)
+            if relation.through or relation.many:
+                sub = f"COALESCE((SELECT jsonb_agg({inner_expr}) {source}), '[]'::jsonb)"
+            else:
+                sub = f"(SELECT {inner_expr} {source})"
+            parts.append(f"jsonb_build_object('{alias}', {sub})")
+        return " || ".join(parts) if parts else "'{}'::jsonb"
+
+    def condition(self, table: str, ref: str, column: str, operator: str, value: Any) -> str:
+        """One filter on `column` of the row `ref` of `table`."""
+        target = f"{ref}.{_quote(column)}"
+        if operator == "in":
+            data_type = self.types.get(table, {}).get(column)
+            self.args.append([_to_db(v, data_type) for v in value])
+            return f"{target} = ANY(${len(self.args)})"
+        if operator == "is":
+            if value in (None, "null"):
+                return f"{target} IS NULL"
+            truthy = value if isinstance(value, bool) else str(value).lower() == "true"
+            return f"{target} IS {'TRUE' if truthy else 'FALSE'}"
+        if operator == "cs":
+            self.args.append(value)
+            return f"{target} @> ${len(self.args)}"
+        return f"{target} {operator} {self.param(table, column, value)}"
+
+    def _embeds(self) -> Dict[str, Tuple[Relation, bool]]:
+        """The top-level embeds of a select: alias -> (relation, whether it is !inner)."""
+        embeds = {}
+        if self.query._operation == "select":
+            for item in split_select(self.query._columns):
+                embed = parse_embed(item)
+                if embed is not None:
+                    resource, inner = embed_hint(embed[1])
+                    embeds[embed[0]] = (self._relation(self.query._table, resource), inner)
+        return embeds
+
+    def where(self) -> str:
+        table = self.query._table
+        clauses = [
+            self.condition(table, "t0", column, operator, value)
+            for column, operator, value in self.query._filters if "." not in column
+        ]
+        embeds = self._embeds()
+        for alias in self.embed_filters:
+            if alias not in embeds:
+                raise APIError({
+                    "code": "PGRST108",
+                    "message": f"'{alias}' is not an embedded resource in this request",
+                    "details": None,
+                    "hint": None,
+                })
+        inner = [(alias, relation) for alias, (relation, is_inner) in embeds.items() if is_inner]
+        for n, (alias, relation) in enumerate(inner, start=1):
+            # An inner embed keeps only the rows that have at least one matching embedded row.
+            child = f"e{n}"
+            source = self._source(relation, child, f"ej{n}", "t0") + self._embed_conditions(relation, alias, child)
+            clauses.append(f"EXISTS (SELECT 1 {source})")
+        return f" WHERE {' AND '.join(clauses)}" if clauses else ""
+
+    def select(self) -> str:
+        q = self.query
+        sql = f"SELECT {self.json_expr(q._table, q._columns, 't0', 0)} AS row"
+        if q._count:
+            sql += ", count(*) OVER () AS total"
+        sql += f" FROM {_quote(q._table)} t0{self.where()}"
+        if q._order:
+            sql += " ORDER BY " + ", ".join(
+                f"t0.{_quote(column)} {'DESC NULLS FIRST' if desc else 'ASC NULLS LAST'}" for column, desc in q._order
+            )
+        if q._limit is not None:
+            sql += f" LIMIT {int(q._limit)}"
+        if q._offset:
+            sql += f" OFFSET {int(q._offset)}"
+        return sql
+
+    def insert(self, upsert: bool = False) -> str:
+        q = self.query
+        rows = q._payload if isinstance(q._payload, list) else [q._payload]
+        columns = sorted({key for row in rows for key in row})
+        values = []
+        for row in rows:
+            # Columns a row does not mention take the column default, as with PostgREST.
+            cells = [self.param(q._table, c, row[c]) if c in row else "DEFAULT" for c in columns]
+            values.append(f"({', '.join(cells)})")
+        sql = (
+            f"INSERT INTO {_quote(q._table)} AS t0 ({', '.join(_quote(c) for c in columns)}) "
+            f"VALUES {', '.join(values)}"
+        )
+        if upsert:
+            keys = [key.strip() for key in q._on_conflict.split(",")]
+            updates = [c for c in columns if c not in keys]
+            sql += f" ON CONFLICT ({', '.join(_quote(k) for k in keys)})"
+            if q._ignore_duplicates or not updates:
+                sql += " DO NOTHING"
+            else:
+                sql += " DO UPDATE SET " + ", ".join(f"{_quote(c)} = EXCLUDED.{_quote(c)}" for c in updates)
+        return sql + " RETURNING to_jsonb(t0) AS row"
+
+    def update(self) -> str:
+        q = self.query
+        assignments = ", ".join(
+            f"{_quote(column)} = {self.param(q._table, column, value)}" for column, value in q._payload.items()
+        )
+        return f"UPDATE {_quote(q._table)} AS t0 SET {assignments}{self.where()} RETURNING to_jsonb(t0) AS row"
+
+    def delete(self) -> str:
+        q = self.query
+        return f"DELETE FROM {_quote(q._table)} AS t0{self.where()} RETURNING to_jsonb(t0) AS row"
+
+    def compile(self) -> str:
+        operation = self.query._operation
+        if operation == "upsert":
+            return self.insert(upsert=True)
+        return getattr(self, operation)()
+
+
+class PostgresClient:
+    """
+    Database backend that talks to Postgres directly over a pooled asyncpg connection.
+    """
+
+    supports_transactions = True
+
+    def __init__(
+        self,
+        dsn: str,
+        *,
+        min_size: int = 2,
+        max_size: int = 10,
+        statement_cache_size: int = 256,
+        command_timeout: Optional[float] = 30.0,
+    ) -> None:
+        self._dsn = dsn
+        self._pool_options = {
+            "min_size": min_size,
+            "max_size": max_size,
+            "statement_cache_size": statement_cache_size,
+            "command_timeout": command_timeout,
+        }
+        self._pool: Optional[asyncpg.Pool] = None
+        self._pool_lock: Optional[asyncio.Lock] = None
+        self._column_types: Dict[str, Dict[str, str]] = {}
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="postgres-loop", daemon=True)
+        self._thread.start()
+
+    def table(self, table_name: str) -> PostgresQuery:
+        return PostgresQuery(self, table_name)
+
+    def rpc(self, fn: str, params: Any = None, **kwargs: Any) -> PostgresRpc:
+        return PostgresRpc(self, fn, params or {})
+
+    # --- Transactions ---
+
+    @contextlib.contextmanager
+    def transaction(self) -> Iterator[None]:
+        """
+        Runs the queries issued inside the block on one connection in one transaction.
+        The transaction commits when the block exits normally and rolls back if it raises.
+        Nested blocks join the outer transaction.
+        """
+        if _current_connection.get() is not None:
+            yield
+            return
+
+        connection, transaction = self._run(self._begin())
+        token = _current_connection.set(connection)
+        try:
+            yield
+        except BaseException:
+            self._run(self._finish(connection, transaction, commit=False))
+            raise
+        else:
+            self._run(self._finish(connection, transaction, commit=True))
+        finally:
+            _current_connection.reset(token)
+
+    async def _begin(self) -> Tuple[asyncpg.Connection, Any]:
+        pool = await self._ensure_pool()
+        connection = await pool.acquire()
+        transaction = connection.transaction()
+        try:
+            await transaction.start()
+        except BaseException:
+            await pool.release(connection)
+            raise
+        return connection, transaction
+
+    async def _finish(self, connection: asyncpg.Connection, transaction: Any, *, commit: bool) -> None:
+        try:
+            if commit:
+                await transaction.commit()
+            else:
+                await transaction.rollback()
+        finally:
+            await self._pool.release(connection)
+
+    # --- Lifecycle ---
+
+    def connect(self) -> None:
+        """Opens the pool eagerly (otherwise it opens on first query)."""
+        self._run(self._ensure_pool())
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._run(self._pool.close())
+            self._pool = None
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+
+    def execute_sql(self, sql: str, *args: Any) -> str:
+        """Runs a raw statement; intended for maintenance scripts and local tooling."""
+        async def run() -> str:
+            pool = await self._ensure_pool()
+            async with pool.acquire() as connection:
+                return await connection.execute(sql, *args)
+        return self._run(run())
+
+    # --- Internals ---
+
+    def _run(self, coro: Any) -> Any:
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError("Synchronous database call made from the database event loop.")
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    async def _ensure_pool(self) -> asyncpg.Pool:
+        if self._pool is not None:
+            return self._pool
+        if self._pool_lock is None:
+            self._pool_lock = asyncio.Lock()
+        async with self._pool_lock:
+            if self._pool is None:
+                pool = await asyncpg.create_pool(self._dsn, init=self._init_connection, **self._pool_options)
+                async with pool.acquire() as connection:
+                    rows = await connection.fetch(
+                        "SELECT table_name, column_name, data_type FROM information_schema.columns "
+                        "WHERE table_schema = current_schema()"
+                    )
+                types: Dict[str, Dict[str, str]] = {}
+                for row in rows:
+                    types.setdefault(row["table_name"], {})[row["column_name"]] = row["data_type"]
+                self._column_types = types
+                self._pool = pool
+        return self._pool
+
+    @staticmethod
+    async def _init_connection(connection: asyncpg.Connection) -> None:
+        for type_name in ("json", "jsonb"):
+            await connection.set_type_codec(
+                type_name, encoder=json.dumps, decoder=json.loads, schema="pg_catalog"
+            )
+
+    async def _fetch(self, sql: str, args: List[Any], connection: Optional[asyncpg.Connection]) -> List[asyncpg.Record]:
+        pool = await self._ensure_pool()
+        try:
+            if connection is not None:
+                return await connection.fetch(sql, *args)
+            async with pool.acquire() as pooled:
+                return await pooled.fetch(sql, *args)
+        except asyncpg.PostgresError as e:
+            raise APIError({
+                "code": e.sqlstate,
+                "message": str(e),
+                "details": getattr(e, "detail", None),
+                "hint": getattr(e, "hint", None),
+            }) from e
+
+    async def _call(self, rpc: PostgresRpc, connection: Optional[asyncpg.Connection]) -> PostgresResponse:
+        records = await self._fetch(rpc.sql, rpc.args, connection)
+        return PostgresResponse([record["row"] for record in records])
+
+    async def _execute(self, query: PostgresQuery, connection: Optional[asyncpg.Connection]) -> PostgresResponse:
+        await self._ensure_pool()  # Column types are needed to compile
+        compiler = _Compiler(query, self._column_types)
+        records = await self._fetch(compiler.compile(), compiler.args, connection)
+
+        data = [record["row"] for record in records]
+        count = None
+        if query._count:
+            count = records[0]["total"] if records else 0
+
+        if query._single or query._maybe_single:
+            if len(data) == 1:
+                return PostgresResponse(data[0], count)
+            if query._maybe_single and not data:
+                return PostgresResponse(None, count)
+            raise APIError({
+                "code": "PGRST116",
+                "message": "JSON object requested, multiple (or no) rows returned",
+                "details": f"The result contains {len(data)} rows",
+                "hint": None,
+            })
+        return PostgresResponse(data, count)
@@ -0,0 +1,88 @@
+"""
+Foreign-key relationships between the tables in the Supabase schema.
+
+PostgREST resolves embedded resources in a select such as
+"*, manager:users!feedback_manager_id_fkey(*), tags(*)" from the database catalog.
+Backends that do not talk to PostgREST (the in-memory stand-in used for benchmarks)
+resolve the same embeds from this map instead.
+"""
+from typing import Dict, NamedTuple, Optional, Tuple
+
+
+class Relation(NamedTuple):
+    # The table the embedded rows come from.
+    target: str
+    # For a many-to-one embed: the column on the parent row that points at target.id.
+    # For a one-to-many embed: the column on target that points back at the parent's id.
+    column: str
+    many: bool = False
+    # For a many-to-many embed: the join table and its column pointing at target.id
+    # (`column` is then the join table's column pointing at the parent).
+    through: Optional[str] = None
+    through_column: Optional[str] = None
+
+
+# Keyed by parent table, then by the resource name used inside the select string.
+RELATIONS: Dict[str, Dict[str, Relation]] = {
+    "feedback": {
+        "users!feedback_manager_id_fkey": Relation("users", "manager_id"),
+        "users!feedback_employee_id_fkey": Relation("users", "employee_id"),
+        "tags": Relation("tags", "feedback_id", many=True, through="feedback_tags", through_column="tag_id"),
+        "feedback_tags": Relation("feedback_tags", "feedback_id", many=True),
+    },
+    "teams": {
+        "users!teams_manager_id_fkey": Relation("users", "manager_id"),
+        "users!users_team_id_fkey": Relation("users", "team_id", many=True),
+    },
+    "users": {
+        "teams!users_team_id_fkey": Relation("teams", "team_id"),
+    },
+}
+
+
+def split_select(columns: str) -> list[str]:
+    """
+    Splits a PostgREST select string on top-level commas, leaving embedded
+    resource column lists such as "tags(id, name)" intact.
+    """
+    parts, depth, current = [], 0, []
+    for char in columns:
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        if char == "," and depth == 0:
+            parts.append("".join(current).strip())
+            current = []
+        else:
+            current.append(char)
+    if "".join(current).strip():
+        parts.append("".join(current).strip())
+    return parts
+
+
+def parse_embed(item: str) -> Optional[tuple[str, str, str]]:
+    """
+    Parses an embedded resource such as "manager:users!feedback_manager_id_fkey(*)"
+    into (alias, resource, inner_columns). Returns None for plain columns.
+    """
+    if "(" not in item or not item.endswith(")"):
+        return None
+    head, inner = item[:-1].split("(", 1)
+    alias, _, resource = head.rpartition(":")
+    resource = resource.strip()
+    # Without an explicit alias, PostgREST names the embed after the table.
+    alias = alias.strip() or resource.split("!")[0]
+    return alias, resource, inner
+
+
+def embed_hint(resource: str) -> Tuple[str, bool]:
+    """
+    Splits PostgREST's "!inner" hint off an embedded resource:
+    "feedback_tags!inner" -> ("feedback_tags", True). An inner embed drops the
+    parent rows it leaves empty, so filters on it ("feedback_tags.tag_id") filter
+    the parents too.
+    """
+    if resource.endswith("!inner"):
+        return resource[:-len("!inner")], True
+    return resource, False
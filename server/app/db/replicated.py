@@ -0,0 +1,280 @@
+"""
+Read-replica routing with read-your-writes.
+
+With DB_REPLICA_URLS set, session.create_database() puts the primary and its
+replicas behind one ReplicatedDatabase, so the CRUD layer keeps calling
+db.table(...) as before. A query is routed when it executes, by what it is:
+
+- inserts, updates, upserts, deletes, and RPCs other than READ_ONLY_RPCS go to
+  the primary;
+- selects go to the replicas in turn, unless they must see the primary:
+  - inside db.transaction() or a `use_primary()` block;
+  - later in a request that has already written;
+  - for a user who wrote in the last DB_REPLICA_PIN_SECONDS (read-your-writes).
+    Writes mark their user in a RecentWriteStore; the default one is per process,
+    and `set_recent_write_store` swaps in one shared by all workers.
+- a select that fails on a replica is retried on the primary, and that replica
+  is left alone for REPLICA_COOLDOWN_SECONDS. A .single() that finds no row
+  there is retried on the primary too, in case the row hasn't reached the
+  replica yet, but the replica stays in rotation.
+
+The request's user comes from deps.get_current_user (note_user()), and the
+per-request state from ReplicaRoutingMiddleware.
+"""
+import contextlib
+import itertools
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Protocol, Tuple
+
+from postgrest.exceptions import APIError
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.metrics import DB_READS_ROUTED
+
+# Functions called through db.rpc() that only read.
+READ_ONLY_RPCS = {"search_feedback"}
+
+_WRITES = {"insert", "update", "upsert", "delete"}
+
+# How long a replica that failed a read is skipped.
+REPLICA_COOLDOWN_SECONDS = 30.0
+
+# Who the request is for and whether it has written. A dict set once per request,
+# because sync dependencies and routes run in copies of the request's context: they
+# can't set a context variable for each other, but they share this object.
+_request: ContextVar[Optional[Dict[str, Any]]] = ContextVar("db_request", default=None)
+
+# Set by use_primary() and transaction().
+_force_primary: ContextVar[bool] = ContextVar("db_force_primary", default=False)
+
+
+class RecentWriteStore(Protocol):
+    def mark(self, user_id: int, seconds: float) -> None:
+        """Pins the user's reads to the primary for the next `seconds`."""
+        ...
+
+    def is_pinned(self, user_id: int) -> bool:
+        ...
+
+
+class InMemoryRecentWriteStore:
+    """
+    Process-local markers. A user's write pins their reads on the worker that took
+    the write; another worker may still read from a replica in that window.
+    """
+
+    def __init__(self) -> None:
+        self._until: Dict[int, float] = {}
+        self._lock = threading.Lock()
+
+    def mark(self, user_id: int, seconds: float) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._until[user_id] = now + seconds
+            if len(self._until) > 10000:
+                # Expired markers only matter until they expire.
+                self._until = {key: until for key, until in self._until.items() if until > now}
+
+    def is_pinned(self, user_id: int) -> bool:
+        return self._until.get(user_id, 0.0) > time.monotonic()
+
+
+_store: RecentWriteStore = InMemoryRecentWriteStore()
+
+
+def set_recent_write_store(store: RecentWriteStore) -> None:
+    """Replaces the recent-write markers, e.g. with a store shared by all workers."""
+    global _store
+    _store = store
+
+
+def note_user(user_id: Any) -> None:
+    """Records who the current request is for, so their recent writes pin its reads."""
+    state = _request.get()
+    if state is not None and str(user_id).isdigit():
+        state["user_id"] = int(user_id)
+
+
+@contextlib.contextmanager
+def use_primary() -> Iterator[None]:
+    """Sends every query in the block to the primary, e.g. for read-then-write checks."""
+    token = _force_primary.set(True)
+    try:
+        yield
+    finally:
+        _force_primary.reset(token)
+
+
+def _note_write() -> None:
+    state = _request.get()
+    if state is None:
+        return
+    state["wrote"] = True
+    if state["user_id"] is not None and settings.DB_REPLICA_PIN_SECONDS > 0:
+        _store.mark(state["user_id"], settings.DB_REPLICA_PIN_SECONDS)
+
+
+def _pinned_reason() -> Optional[str]:
+    if _force_primary.get():
+        return "forced"
+    state = _request.get()
+    if state is not None:
+        if state["wrote"]:
+            return "pinned"
+        if state["user_id"] is not None and _store.is_pinned(state["user_id"]):
+            return "pinned"
+    return None
+
+
+def reads_pinned() -> bool:
+    """
+    Whether selects in this context must see the primary's latest state. Coalesced
+    lookups (app/core/singleflight.py) run their own query when it is set, since a
+    query already in flight for another caller may have started before the write
+    this one has to see.
+    """
+    return _pinned_reason() is not None
+
+
+def _maybe_lag(error: APIError) -> bool:
+    # .single() found no row: on a replica, the row may just not have arrived yet.
+    return getattr(error, "code", None) == "PGRST116"
+
+
+class RoutedQuery:
+    """
+    Records a fluent query and decides where it goes when it executes, building it
+    on that database's client then.
+    """
+
+    def __init__(self, db: "ReplicatedDatabase", table: str, rpc: Optional[Tuple[str, Any, Dict[str, Any]]] = None) -> None:
+        self._db = db
+        self._table = table
+        self._rpc = rpc
+        self._calls: List[Tuple[str, tuple, Dict[str, Any]]] = []
+        self._write = rpc is not None and rpc[0] not in READ_ONLY_RPCS
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        def chained(*args: Any, **kwargs: Any) -> "RoutedQuery":
+            if name in _WRITES:
+                self._write = True
+            self._calls.append((name, args, kwargs))
+            return self
+
+        return chained
+
+    def build(self, client: Any) -> Any:
+        if self._rpc is not None:
+            fn, params, kwargs = self._rpc
+            builder = client.rpc(fn, params, **kwargs)
+        else:
+            builder = client.table(self._table)
+        for name, args, kwargs in self._calls:
+            builder = getattr(builder, name)(*args, **kwargs)
+        return builder
+
+    def execute(self) -> Any:
+        if self._write:
+            _note_write()
+            return self.build(self._db.primary).execute()
+        replica = self._db.pick_replica()
+        if replica is None:
+            return self.build(self._db.primary).execute()
+        try:
+            return self.build(replica).execute()
+        except APIError as e:
+            if not _maybe_lag(e):
+                raise  # The query's own error; the primary would say the same
+        except Exception:
+            self._db.mark_failed(replica)
+        DB_READS_ROUTED.labels(target="primary_fallback").inc()
+        return self.build(self._db.primary).execute()
+
+
+class ReplicatedDatabase:
+    """A primary and its read replicas, behind the one-client Database interface."""
+
+    def __init__(self, primary: Any, replicas: List[Any]) -> None:
+        self.primary = primary
+        self.replicas = replicas
+        self._next = itertools.cycle(range(len(replicas)))
+        self._down_until = [0.0] * len(replicas)
+        self._lock = threading.Lock()
+
+    @property
+    def supports_transactions(self) -> bool:
+        return self.primary.supports_transactions
+
+    def table(self, table_name: str) -> RoutedQuery:
+        return RoutedQuery(self, table_name)
+
+    def rpc(self, fn: str, params: Any = None, **kwargs: Any) -> RoutedQuery:
+        return RoutedQuery(self, f"rpc:{fn}", (fn, params or {}, kwargs))
+
+    @contextlib.contextmanager
+    def transaction(self) -> Iterator[None]:
+        # Reads inside a transaction must see its writes, so they stay on the primary too.
+        with self.primary.transaction(), use_primary():
+            yield
+
+    def pick_replica(self) -> Optional[Any]:
+        """The replica for the next read, or None when it must go to the primary."""
+        reason = _pinned_reason()
+        if reason is not None:
+            DB_READS_ROUTED.labels(target=f"primary_{reason}").inc()
+            return None
+        now = time.monotonic()
+        with self._lock:
+            for _ in range(len(self.replicas)):
+                index = next(self._next)
+                if self._down_until[index] <= now:
+                    DB_READS_ROUTED.labels(target="replica").inc()
+                    return self.replicas[index]
+        DB_READS_ROUTED.labels(target="primary_no_replica").inc()
+        return None
+
+    def mark_failed(self, replica: Any) -> None:
+        with self._lock:
+            self._down_until[self.replicas.index(replica)] = time.monotonic() + REPLICA_COOLDOWN_SECONDS
+
+    def connect(self) -> None:
+        for database in [self.primary, *self.replicas]:
+            connect = getattr(database, "connect", None)
+            if callable(connect):
+                connect()
+
+    def close(self) -> None:
+        for database in [self.primary, *self.replicas]:
+            close = getattr(database, "close", None)
+            if callable(close):
+                close()
+
+    def __getattr__(self, name: str) -> Any:
+        # execute_sql and other backend extras act on the primary.
+        return getattr(self.primary, name)
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Pure ASGI middleware that gives each HTTP request the state replica routing
+    reads: its user (filled in by note_user()) and whether it has written.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = _request.set({"user_id": None, "wrote": False})
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request.reset(token)
@@ -1,28 +1,101 @@
-import os
-from supabase import create_client, Client
-from dotenv import load_dotenv
-
-# Load environment variables from .env file
-load_dotenv()
-
-# It's best practice to store your credentials as environment variables
-# You can get these from your Supabase project's API settings.
-# Ensure your .env file has these variables:
-# SUPABASE_URL=your_supabase_project_url
-# SUPABASE_KEY=your_supabase_anon_key
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-
-if not SUPABASE_URL or not SUPABASE_KEY:
-    raise ValueError("Supabase URL and Key must be set in environment variables.")
-
-# Initialize the Supabase client
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-
-# The original SQLAlchemy engine and SessionLocal are no longer needed
-# and have been replaced by the Supabase client.
-#
-# DATABASE_URL = os.getenv("DATABASE_URL")
-#
-# engine = create_engine(DATABASE_URL)
-# SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
\ No newline at end of file
+import threading
+from typing import Optional
+
+from app.core.config import settings
+from app.db.base import Database, SupabaseDatabase
+from app.db.instrumented import InstrumentedClient
+
+# The client is created on first use (normally by the application lifespan hook in
+# app/main.py) rather than at import time, so importing the app stays cheap.
+_database: Optional[Database] = None
+_lock = threading.Lock()
+
+
+def create_database() -> Database:
+    """
+    Creates the database client for the backend selected by settings.DB_BACKEND.
+    Every backend exposes the same table() builder API and is wrapped so that each
+    round trip is counted and timed (see app/core/metrics.py).
+    """
+    if settings.DB_BACKEND == "supabase":
+        # It's best practice to store your credentials as environment variables
+        # You can get these from your Supabase project's API settings.
+        # Ensure your .env file has these variables:
+        # SUPABASE_URL=your_supabase_project_url
+        # SUPABASE_KEY=your_supabase_anon_key
+        if not settings.SUPABASE_URL or not settings.SUPABASE_KEY:
+            raise ValueError("Supabase URL and Key must be set in environment variables.")
+        # The supabase package pulls in several HTTP and realtime clients; import it
+        # only when this backend is actually used.
+        from supabase import create_client
+        database = SupabaseDatabase(create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY))
+
+    elif settings.DB_BACKEND == "postgres":
+        if not settings.DATABASE_URL:
+            raise ValueError("DATABASE_URL must be set when DB_BACKEND is 'postgres'.")
+        # Imported here so asyncpg is only required by deployments that use it.
+        from app.db.postgres import PostgresClient
+        database = PostgresClient(
+            settings.DATABASE_URL,
+            min_size=settings.DB_POOL_MIN_SIZE,
+            max_size=settings.DB_POOL_MAX_SIZE,
+            statement_cache_size=settings.DB_STATEMENT_CACHE_SIZE,
+        )
+
+    else:
+        from app.db.memory import MemoryClient
+        database = MemoryClient()
+
+    replica_urls = [url.strip() for url in settings.DB_REPLICA_URLS.split(",") if url.strip()]
+    if replica_urls:
+        from app.db.replicated import ReplicatedDatabase
+        database = ReplicatedDatabase(database, [create_replica(database, url) for url in replica_urls])
+
+    return InstrumentedClient(database)
+
+
+def create_replica(primary: Database, url: str) -> Database:
+    """
+    A read replica of `primary` for the same backend: a Supabase read replica's API
+    URL (with the primary's key), a Postgres standby's connection string, or, for
+    the memory backend, a copy that trails the primary by MEMORY_REPLICA_LAG_SECONDS.
+    """
+    if settings.DB_BACKEND == "supabase":
+        from supabase import create_client
+        return SupabaseDatabase(create_client(url, settings.SUPABASE_KEY))
+
+    if settings.DB_BACKEND == "postgres":
+        from app.db.postgres import PostgresClient
+        return PostgresClient(
+            url,
+            min_size=settings.DB_POOL_MIN_SIZE,
+            max_size=settings.DB_POOL_MAX_SIZE,
+            statement_cache_size=settings.DB_STATEMENT_CACHE_SIZE,
+        )
+
+    from app.db.memory import MemoryReplica
+    return MemoryReplica(primary, lag=settings.MEMORY_REPLICA_LAG_SECONDS)
+
+
+def get_database() -> Database:
+    """
+    Returns the process-wide database client, creating it on first use.
+    """
+    global _database
+    if _database is None:
+        with _lock:
+            if _database is None:
+                _database = create_database()
+    return _database
+
+
+def close_database() -> None:
+    """
+    Releases the database client's resources (connection pools, loop threads).
+    """
+    global _database
+    with _lock:
+        database, _database = _database, None
+    close = getattr(getattr(database, "wrapped", database), "close", None)
+    if callable(close):
+        close()
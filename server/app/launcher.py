@@ -0,0 +1,204 @@
+"""
+Production server launcher: `python -m app.launcher`.
+
+Starts a supervisor process and a pool of uvicorn workers sharing one socket:
+
+- The worker count comes from WEB_CONCURRENCY, or else from the CPUs actually
+  available to the container (cgroup CPU quota and CPU affinity, not the host's
+  core count) times WORKERS_PER_CPU, capped at MAX_WORKERS.
+- uvloop and httptools are selected explicitly, falling back to asyncio/h11 with a
+  warning if they are not installed.
+- MAX_REQUESTS recycles a worker after that many requests (plus up to
+  MAX_REQUESTS_JITTER more, so workers don't all restart at once); the supervisor
+  replaces it.
+- SIGHUP performs a rolling restart: each worker's replacement is started and
+  given ROLLING_RESTART_GRACE_SECONDS to boot before the old worker is stopped, so
+  capacity never drops by more than one worker.
+- SIGTERM/SIGINT shut down gracefully, giving in-flight requests up to
+  GRACEFUL_TIMEOUT_SECONDS.
+"""
+import logging
+import math
+import os
+import random
+import shutil
+import signal
+import tempfile
+import time
+from importlib.util import find_spec
+from pathlib import Path
+from typing import Optional
+
+import uvicorn
+from uvicorn.supervisors.multiprocess import Multiprocess, Process
+
+from app.core.config import settings
+
+logger = logging.getLogger("uvicorn.error")
+
+
+def _cgroup_cpu_limit() -> Optional[float]:
+    """
+    Returns the container's CPU quota in cores, or None when it is unlimited.
+    Supports cgroup v2 (cpu.max) and v1 (cpu.cfs_quota_us / cpu.cfs_period_us).
+    """
+    try:
+        quota, period = Path("/sys/fs/cgroup/cpu.max").read_text().split()
+        if quota != "max":
+            return int(quota) / int(period)
+        return None
+    except (OSError, ValueError):
+        pass
+    try:
+        quota = int(Path("/sys/fs/cgroup/cpu/cpu.cfs_quota_us").read_text())
+        period = int(Path("/sys/fs/cgroup/cpu/cpu.cfs_period_us").read_text())
+        if quota > 0 and period > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def available_cpus() -> float:
+    """
+    The number of CPUs this process can actually use.
+    """
+    try:
+        cpus: float = len(os.sched_getaffinity(0))
+    except AttributeError:  # pragma: no cover - not available on macOS
+        cpus = os.cpu_count() or 1
+    limit = _cgroup_cpu_limit()
+    if limit is not None:
+        cpus = min(cpus, limit)
+    return cpus
+
+
+def worker_count() -> int:
+    if settings.WEB_CONCURRENCY:
+        return settings.WEB_CONCURRENCY
+    derived = math.ceil(available_cpus() * settings.WORKERS_PER_CPU)
+    return max(1, min(settings.MAX_WORKERS, derived))
+
+
+def _pick(preferred: str, fallback: str, module: str) -> str:
+    if find_spec(module) is not None:
+        return preferred
+    logger.warning(f"{module} is not installed; falling back to {fallback}.")
+    return fallback
+
+
+class WorkerServer(uvicorn.Server):
+    """
+    uvicorn.Server that reports its lifecycle to app.core.health.worker_state and
+    applies a per-worker jitter to the max-requests limit.
+    """
+
+    def __init__(self, config: uvicorn.Config, max_requests_jitter: int = 0) -> None:
+        super().__init__(config)
+        self.max_requests_jitter = max_requests_jitter
+
+    def run(self, sockets=None) -> None:
+        # Runs in the worker process, after the supervisor has spawned it.
+        if self.config.limit_max_requests and self.max_requests_jitter:
+            self.config.limit_max_requests += random.randint(0, self.max_requests_jitter)
+
+        from app.core.health import worker_state
+        worker_state.max_requests = self.config.limit_max_requests
+        worker_state.requests_served = lambda: self.server_state.total_requests
+        super().run(sockets=sockets)
+
+    def handle_exit(self, sig: int, frame) -> None:
+        from app.core.health import worker_state
+        worker_state.mark_draining(f"signal {signal.Signals(sig).name}")
+        super().handle_exit(sig, frame)
+
+    async def on_tick(self, counter: int) -> bool:
+        should_exit = await super().on_tick(counter)
+        if should_exit:
+            from app.core.health import worker_state
+            limit = self.config.limit_max_requests
+            if limit is not None and self.server_state.total_requests >= limit:
+                worker_state.mark_draining("max-requests")
+            else:
+                worker_state.mark_draining("shutdown")
+        return should_exit
+
+
+class RollingMultiprocess(Multiprocess):
+    """
+    uvicorn's supervisor with surge-style rolling restarts on SIGHUP and cleanup of
+    dead workers' metric files in Prometheus multiprocess mode.
+    """
+
+    def restart_all(self) -> None:
+        for index, old in enumerate(list(self.processes)):
+            replacement = Process(self.config, self.target, self.sockets)
+            replacement.start()
+            deadline = time.monotonic() + settings.ROLLING_RESTART_GRACE_SECONDS
+            while time.monotonic() < deadline and not self.should_exit.is_set():
+                time.sleep(0.1)
+            self.processes[index] = replacement
+            old.terminate()
+            old.join()
+            _mark_metrics_dead(old.pid)
+            logger.info(f"Replaced worker [{old.pid}] with [{replacement.pid}]")
+
+    def keep_subprocess_alive(self) -> None:
+        # The workers uvicorn replaced are the dead ones. Pinging them here as well
+        # would leave a slow worker's pong to answer uvicorn's ping instead.
+        before = {process.pid for process in self.processes}
+        super().keep_subprocess_alive()
+        for pid in before - {process.pid for process in self.processes}:
+            _mark_metrics_dead(pid)
+
+
+def _mark_metrics_dead(pid: Optional[int]) -> None:
+    if pid is not None and os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(pid)
+
+
+def _prepare_metrics_dir() -> None:
+    """
+    With several workers each process keeps its own metrics; prometheus_client's
+    multiprocess mode aggregates them from files in a shared directory, which must
+    be empty when the server starts. Workers inherit the variable from here.
+    """
+    directory = os.environ.get("PROMETHEUS_MULTIPROC_DIR") or os.path.join(tempfile.gettempdir(), "feedback-metrics")
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory, exist_ok=True)
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = directory
+
+
+def main() -> None:
+    workers = worker_count()
+    if workers > 1:
+        _prepare_metrics_dir()
+
+    config = uvicorn.Config(
+        "app.main:app",
+        host="0.0.0.0",
+        port=int(os.environ.get("PORT", "8000")),
+        workers=workers,
+        loop=_pick("uvloop", "asyncio", "uvloop"),
+        http=_pick("httptools", "h11", "httptools"),
+        proxy_headers=True,
+        forwarded_allow_ips="*",
+        limit_max_requests=settings.MAX_REQUESTS or None,
+        timeout_graceful_shutdown=settings.GRACEFUL_TIMEOUT_SECONDS,
+    )
+    server = WorkerServer(config, max_requests_jitter=settings.MAX_REQUESTS_JITTER)
+    logger.info(
+        f"Starting {workers} worker(s) on {available_cpus():g} available CPU(s) "
+        f"with loop={config.loop} http={config.http}"
+    )
+
+    if workers == 1:
+        server.run()
+        return
+    sock = config.bind_socket()
+    RollingMultiprocess(config, target=server.run, sockets=[sock]).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,57 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from app.api.endpoints import auth, teams, feedback, notifications, ai, users, tags
+from app.core.config import settings
+from app.core.health import worker_state
+from app.core.idempotency import IdempotencyMiddleware
+from app.core.lifespan import lifespan
+from app.core.logging_config import RequestIdMiddleware, setup_logging
+from app.core.metrics import MetricsMiddleware, render_metrics
+from app.core.profiling import ProfilingMiddleware
+from app.core.resilience import UpstreamRejected, UpstreamUnavailable
+from app.db.replicated import ReplicaRoutingMiddleware
+from app.api.endpoints import auth, teams, feedback, notifications, ai, users, tags, sync, drafts, debug
 
-app = FastAPI(title="Smart Feedback System API")
+setup_logging()
 
+app = FastAPI(title="Smart Feedback System API", lifespan=lifespan)
+
+if settings.IDEMPOTENCY_ENABLED:
+    # Innermost: replays get fresh CORS headers, and are counted and logged like any request.
+    app.add_middleware(IdempotencyMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # This is permissive for now
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
     allow_headers=["*"],
+    expose_headers=["X-Near-Duplicates", "X-Request-ID", "Idempotent-Replayed"],  # Lets the web client read the warning on POST /v1/feedback/, quote request ids and spot replays
 )
+app.add_middleware(MetricsMiddleware)
+if settings.PROFILING_ENABLED:
+    # Inside RequestIdMiddleware, so profiles carry the request id.
+    app.add_middleware(ProfilingMiddleware)
+if settings.DB_REPLICA_URLS:
+    # Tracks each request's user and writes, which decide whether its reads may use a replica.
+    app.add_middleware(ReplicaRoutingMiddleware)
+app.add_middleware(RequestIdMiddleware)
+
+@app.exception_handler(UpstreamUnavailable)
+def upstream_unavailable(request: Request, exc: UpstreamUnavailable):
+    """Gemini is failing fast (circuit open) or didn't answer within the request's deadline."""
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": "The AI service is unavailable, please try again shortly."},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+@app.exception_handler(UpstreamRejected)
+def upstream_rejected(request: Request, exc: UpstreamRejected):
+    """Gemini answered, but refused the prompt (e.g. its safety filters blocked it)."""
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": "The AI service declined this request. Try rephrasing it."},
+    )
 
 @app.get("/", tags=["Root"])
 def read_root():
@@ -21,6 +62,24 @@ def health_check():
     """Simple health check endpoint."""
     return {"status": "ok"}
 
+@app.get("/readyz", tags=["Health Check"])
+def readiness_check(response: Response):
+    """
+    Readiness of this worker: 503 while it is starting up or draining
+    (shutting down, being replaced, or recycling after MAX_REQUESTS).
+    """
+    state = worker_state.snapshot()
+    if not worker_state.is_ready:
+        response.status_code = 503
+    return state
+
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", tags=["Health Check"], include_in_schema=False)
+    def metrics():
+        """Prometheus scrape endpoint."""
+        body, content_type = render_metrics()
+        return Response(content=body, media_type=content_type)
+
 # Add the new users router to the application
 app.include_router(users.router, prefix="/v1/users", tags=["Users"])
 app.include_router(auth.router, prefix="/v1/auth", tags=["Auth"])
@@ -29,3 +88,7 @@ app.include_router(feedback.router, prefix="/v1/feedback", tags=["Feedback"])
 app.include_router(notifications.router, prefix="/v1/notifications", tags=["Notifications"])
 app.include_router(ai.router, prefix="/v1/ai", tags=["AI"])
 app.include_router(tags.router, prefix="/v1/tags", tags=["Tags"])
+app.include_router(sync.router, prefix="/v1/sync", tags=["Sync"])
+app.include_router(drafts.router, prefix="/v1/drafts", tags=["Drafts"])
+if settings.PROFILING_ENABLED:
+    app.include_router(debug.router, prefix="/debug", tags=["Debug"], include_in_schema=False)
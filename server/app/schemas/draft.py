@@ -0,0 +1,33 @@
+from pydantic import BaseModel
+from typing import List, Optional
+import datetime
+from .feedback import Sentiment
+
+class DraftFields(BaseModel):
+    # Everything is optional until the draft is published
+    employee_id: Optional[int] = None
+    strengths: Optional[str] = None
+    areas_for_improvement: Optional[str] = None
+    sentiment: Optional[Sentiment] = None
+    feedback: Optional[str] = None
+    tag_ids: Optional[List[int]] = None
+
+class DraftCreate(DraftFields):
+    pass
+
+class DraftUpdate(DraftFields):
+    # The version the client last saw; a save against any other version is a 409.
+    # Only the fields that are sent are changed.
+    version: int
+
+class DraftPublish(BaseModel):
+    # When given, publishing an older version than the current one is a 409
+    version: Optional[int] = None
+
+class Draft(DraftFields):
+    id: int
+    manager_id: int
+    version: int
+    tag_ids: List[int] = []
+    created_at: datetime.datetime
+    updated_at: Optional[datetime.datetime] = None
@@ -1,6 +1,6 @@
 import enum
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Dict, List, Optional
 import datetime
 from .user import User
 from .tag import Tag
@@ -39,3 +39,52 @@ class Feedback(FeedbackBase):
 
     class Config:
         from_attributes = True
+
+class FeedbackSearchResult(Feedback):
+    # Relevance of the match; only comparable within one search
+    score: float
+
+class SimilarFeedback(Feedback):
+    # Cosine similarity of the texts, 0 to 1
+    score: float
+
+class FeedbackFilters(BaseModel):
+    """
+    Query parameters for GET /v1/feedback. All are optional and combine with AND.
+    """
+    employee_id: Optional[int] = None
+    sentiment: Optional[Sentiment] = None
+    tag_id: Optional[int] = None
+    acknowledged: Optional[bool] = None
+    created_from: Optional[datetime.datetime] = None  # inclusive
+    created_to: Optional[datetime.datetime] = None  # exclusive
+
+class TagFacet(Tag):
+    count: int
+
+class FeedbackFacets(BaseModel):
+    sentiment: Dict[str, int]
+    tags: List[TagFacet]
+    acknowledged: int
+    unacknowledged: int
+
+class FeedbackList(BaseModel):
+    # Returned instead of a plain list when include_facets=true
+    items: List[Feedback]
+    facets: FeedbackFacets
+
+class CompactFeedback(FeedbackBase):
+    id: int
+    manager_id: int
+    employee_id: int
+    acknowledged: bool
+    created_at: datetime.datetime
+    updated_at: Optional[datetime.datetime] = None
+    tag_ids: List[int] = []
+
+class FeedbackCompactList(BaseModel):
+    # Returned when compact=true: people and tags are sent once and referenced by id
+    items: List[CompactFeedback]
+    users: Dict[int, User]
+    tags: Dict[int, Tag]
+    facets: Optional[FeedbackFacets] = None  # With include_facets=true
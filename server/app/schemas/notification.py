@@ -1,4 +1,5 @@
 from pydantic import BaseModel
+from typing import Optional
 import datetime
 
 class NotificationBase(BaseModel):
@@ -11,6 +12,7 @@ class Notification(NotificationBase):
     id: int
     is_read: bool
     created_at: datetime.datetime
+    updated_at: Optional[datetime.datetime] = None
 
     class Config:
         from_attributes = True
@@ -0,0 +1,16 @@
+from pydantic import BaseModel
+from typing import List
+from .feedback import Feedback
+from .notification import Notification
+
+class SyncResponse(BaseModel):
+    # Pass as ?since= on the next sync.
+    token: str
+    # More changes are waiting; sync again straight away with the new token.
+    has_more: bool = False
+    # Current state of every row created or changed since the previous token.
+    feedback: List[Feedback] = []
+    notifications: List[Notification] = []
+    # Rows that changed but no longer exist (or are no longer visible to the user).
+    removed_feedback_ids: List[int] = []
+    removed_notification_ids: List[int] = []
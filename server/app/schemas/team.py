@@ -22,3 +22,8 @@ class Team(TeamBase):
 class TeamPublic(BaseModel):
     id: int
     name: str
+
+class TeamPage(BaseModel):
+    items: List[TeamPublic]
+    # Pass as ?offset= for the next page; None on the last page.
+    next_offset: Optional[int] = None
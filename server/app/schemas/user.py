@@ -1,6 +1,6 @@
 import enum
 from pydantic import BaseModel, EmailStr
-from typing import Optional
+from typing import List, Literal, Optional
 
 # Moved the Role Enum from the old models file to here
 class Role(str, enum.Enum):
@@ -30,3 +30,22 @@ class User(UserBase):
     class Config:
         # Pydantic v2 uses `from_attributes` instead of `orm_mode`
         from_attributes = True
+
+class UserPage(BaseModel):
+    items: List[User]
+    # Pass as ?offset= for the next page; None on the last page.
+    next_offset: Optional[int] = None
+
+class BulkUserResult(BaseModel):
+    row: int  # 1-based position in the upload
+    email: Optional[str] = None
+    status: Literal["created", "would_create", "error"]
+    id: Optional[int] = None
+    team_id: Optional[int] = None
+    error: Optional[str] = None
+
+class BulkProvisionResult(BaseModel):
+    dry_run: bool
+    created: int
+    failed: int
+    results: List[BulkUserResult]
@@ -0,0 +1,338 @@
+"""
+Typeahead search over the user and team directories.
+
+Each directory is a sorted array of (term, rank) pairs held in memory per worker:
+every word of a user's name and their email (whole, and its local part) or of a
+team's name, case- and accent-folded. A prefix query is two binary searches for
+the range of terms starting with it; a query of several words intersects their
+ranges, so "ann sm" finds Ann Smith. Matches are ordered with names that start
+with the query first, then alphabetically.
+
+The directories load on the first search, follow this worker's writes through the
+user.created / user.updated / team.created events that crud_user, crud_team and
+bulk provisioning publish, pick up other workers' new rows every
+DIRECTORY_REFRESH_SECONDS and are rebuilt every DIRECTORY_REBUILD_SECONDS (which
+also picks up their edits). Only public columns are loaded.
+"""
+import itertools
+import operator
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, bisect_right, insort
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from app.core import events
+from app.core.config import settings
+from app.db.base import Database
+
+USER_COLUMNS = "id, email, full_name, role, team_id"
+TEAM_COLUMNS = "id, name"
+
+PAGE_SIZE = 1000  # PostgREST's default max-rows
+
+_WORD = re.compile(r"[^\W_]+")
+
+_second = operator.itemgetter(1)
+
+
+def fold(text: Optional[str]) -> str:
+    """Lower case without accents, so "José" is found by "jose"."""
+    if not text:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def user_terms(user: Dict[str, Any]) -> Set[str]:
+    email = fold(user.get("email"))
+    return (set(_WORD.findall(fold(user.get("full_name")))) | {email, email.split("@")[0]}) - {""}
+
+
+def team_terms(team: Dict[str, Any]) -> Set[str]:
+    return set(_WORD.findall(fold(team.get("name"))))
+
+
+class PrefixIndex:
+    """
+    Sorted (term, rank) pairs over a set of entries.
+
+    Every entry has an integer rank that follows name order (ranks are spaced
+    RANK_GAP apart, so a new entry takes the midpoint between its neighbours). The
+    pairs carry ranks rather than ids, so ordering a query's matches is a plain
+    sort of ints, and the names starting with the query are one slice of the sorted
+    names, already in order: for the usual typeahead query the page comes straight
+    from there and the matches are never sorted at all.
+
+    Adding or replacing an entry inserts its terms in place (a memmove per term),
+    so writes keep the index current without a rebuild. When two neighbours have
+    no room left between their ranks, the smallest surrounding run with enough room
+    is spread out evenly (ranks keep their order, so the pairs stay sorted).
+    """
+
+    RANK_GAP = 1 << 20
+    MIN_SPACING = 1 << 10  # Spacing a respaced run gets, at least
+
+    def __init__(self, terms: Callable[[Dict[str, Any]], Set[str]], name_field: str) -> None:
+        self._terms = terms
+        self._name_field = name_field
+        self.pairs: List[Tuple[str, int]] = []  # (term, rank), sorted
+        self.names: List[Tuple[str, int]] = []  # (folded name, rank), sorted
+        self.by_rank: Dict[int, Dict[str, Any]] = {}
+        self.rank_of: Dict[int, int] = {}  # id -> rank
+        self._entry_terms: Dict[int, Set[str]] = {}  # id -> terms
+        self._lock = threading.RLock()
+
+    @classmethod
+    def build(cls, terms: Callable[[Dict[str, Any]], Set[str]], name_field: str, rows: Iterable[Dict[str, Any]]) -> "PrefixIndex":
+        """Builds an index with a few sorts rather than by inserting row by row."""
+        index = cls(terms, name_field)
+        index._load(list(rows))
+        return index
+
+    def _load(self, rows: List[Dict[str, Any]]) -> None:
+        entries = sorted((fold(row.get(self._name_field)), row["id"], row) for row in rows)
+        self.names, self.by_rank, self.rank_of, self._entry_terms = [], {}, {}, {}
+        pairs = []
+        for position, (name, entry_id, row) in enumerate(entries, start=1):
+            rank = position * self.RANK_GAP
+            self.names.append((name, rank))
+            self.by_rank[rank] = dict(row)
+            self.rank_of[entry_id] = rank
+            self._entry_terms[entry_id] = self._terms(row)
+            pairs.extend((term, rank) for term in self._entry_terms[entry_id])
+        pairs.sort()
+        self.pairs = pairs
+
+    def _remove(self, entry_id: int) -> None:
+        rank = self.rank_of.pop(entry_id)
+        old = self.by_rank.pop(rank)
+        del self.names[bisect_left(self.names, (fold(old.get(self._name_field)), rank))]
+        for term in self._entry_terms.pop(entry_id):
+            del self.pairs[bisect_left(self.pairs, (term, rank))]
+
+    def upsert(self, row: Dict[str, Any]) -> None:
+        with self._lock:
+            entry_id = row["id"]
+            rank = self.rank_of.get(entry_id)
+            if rank is not None:
+                # Partial rows (e.g. an update that only returned team_id) keep the rest.
+                row = {**self.by_rank[rank], **row}
+                if fold(row.get(self._name_field)) == fold(self.by_rank[rank].get(self._name_field)) \
+                        and self._terms(row) == self._entry_terms[entry_id]:
+                    self.by_rank[rank] = dict(row)
+                    return
+                self._remove(entry_id)
+
+            name = fold(row.get(self._name_field))
+            position = bisect_right(self.names, (name, float("inf")))
+            before = self.names[position - 1][1] if position else 0
+            after = self.names[position][1] if position < len(self.names) else before + 2 * self.RANK_GAP
+            if after - before < 2:
+                self._respace(position)
+                before = self.names[position - 1][1] if position else 0
+                after = self.names[position][1] if position < len(self.names) else before + 2 * self.RANK_GAP
+            rank = (before + after) // 2
+            self.names.insert(position, (name, rank))
+            self.by_rank[rank] = dict(row)
+            self.rank_of[entry_id] = rank
+            self._entry_terms[entry_id] = self._terms(row)
+            for term in self._entry_terms[entry_id]:
+                insort(self.pairs, (term, rank))
+
+    def _respace(self, position: int) -> None:
+        """
+        Makes room for a new entry at `position` in names: finds the smallest run
+        around it (doubling) whose rank span allows MIN_SPACING per entry, and spreads
+        the run's ranks evenly with a free slot at `position`.
+        """
+        count = len(self.names)
+        size = 1
+        while True:
+            low, high = max(0, position - size), min(count, position + size)
+            floor = self.names[low - 1][1] if low else 0
+            # Past the last entry there is always room.
+            ceiling = self.names[high][1] if high < count else floor + (high - low + 2) * self.RANK_GAP
+            step = (ceiling - floor) // (high - low + 2)
+            if step >= self.MIN_SPACING:
+                break
+            size *= 2
+
+        moves = []  # (old rank, new rank) for each entry in the run
+        for index in range(low, high):
+            slot = index - low + 1 + (index >= position)  # slot position - low + 1 stays free
+            moves.append((self.names[index][1], floor + step * slot))
+        # Ranks moving up are renamed from the top and those moving down from the
+        # bottom, so every (term, rank) pair is still where bisect expects it.
+        ordered = sorted((m for m in moves if m[1] > m[0]), reverse=True) + sorted(m for m in moves if m[1] < m[0])
+        for old_rank, new_rank in ordered:
+            entry = self.by_rank.pop(old_rank)
+            self.by_rank[new_rank] = entry
+            self.rank_of[entry["id"]] = new_rank
+            for term in self._entry_terms[entry["id"]]:
+                self.pairs[bisect_left(self.pairs, (term, old_rank))] = (term, new_rank)
+        for index, (_, new_rank) in zip(range(low, high), moves):
+            self.names[index] = (self.names[index][0], new_rank)
+
+    def _range(self, word: str) -> Tuple[int, int]:
+        """The slice of `pairs` whose terms start with `word`."""
+        low = bisect_left(self.pairs, (word,))
+        return low, bisect_left(self.pairs, (word + "\U0010ffff",), low)
+
+    def _ordered(self, words: List[str], phrase: str) -> Iterator[int]:
+        """
+        Ranks of the entries matching every word, best first: names that start with
+        the phrase (a slice of `names`, already in order), then the other matches in
+        name order. The second part is only computed if the page needs it.
+        """
+        low = bisect_left(self.names, (phrase,))
+        high = bisect_left(self.names, (phrase + "\U0010ffff",), low)
+        # A name starting with the phrase has words starting with each query word.
+        yield from map(_second, self.names[low:high])
+
+        # Smallest range first, so the others only narrow it down. An entry can
+        # appear more than once in a range (two of its terms match).
+        ranges = sorted((self._range(word) for word in words), key=lambda r: r[1] - r[0])
+        if len(ranges) == 1:
+            ranks = sorted(map(_second, self.pairs[ranges[0][0]:ranges[0][1]]))
+        else:
+            matched = set(map(_second, self.pairs[ranges[0][0]:ranges[0][1]]))
+            for start, end in ranges[1:]:
+                if not matched:
+                    break
+                matched.intersection_update(map(_second, self.pairs[start:end]))
+            ranks = sorted(matched)
+        first = bisect_left(ranks, self.names[low][1]) if low < len(self.names) else len(ranks)
+        last = bisect_left(ranks, self.names[high][1]) if high < len(self.names) else len(ranks)
+        previous = None
+        for rank in itertools.chain(ranks[:first], ranks[last:]):
+            if rank != previous:
+                yield rank
+            previous = rank
+
+    def search(
+        self, q: str, *, limit: int, offset: int = 0, where: Optional[Callable[[Dict[str, Any]], bool]] = None
+    ) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        Entries with a term starting with each word of `q` (and passing `where`),
+        names starting with `q` first, then by name. Returns the page at `offset`
+        and whether there are more.
+        """
+        words = _WORD.findall(fold(q))
+        if not words:
+            return [], False
+        page: List[Dict[str, Any]] = []
+        skip = offset
+        with self._lock:
+            for rank in self._ordered(list(dict.fromkeys(words)), " ".join(words)):
+                entry = self.by_rank[rank]
+                if where is not None and not where(entry):
+                    continue
+                if skip:
+                    skip -= 1
+                    continue
+                if len(page) == limit:
+                    return page, True
+                page.append(dict(entry))
+        return page, False
+
+
+# --- The process-wide directories ---
+
+class Directory:
+    """One table's PrefixIndex, loaded lazily and kept current like the search index."""
+
+    def __init__(self, table: str, columns: str, terms: Callable[[Dict[str, Any]], Set[str]], name_field: str) -> None:
+        self.table = table
+        self.columns = columns
+        self.terms = terms
+        self.name_field = name_field
+        self.index: Optional[PrefixIndex] = None
+        self.loaded_at = 0.0
+        self.refreshed_at = 0.0
+        # Highest id read from the database, where the next refresh starts. Events
+        # don't move it: another worker may have committed a lower id meanwhile.
+        self.fetched_id = 0
+        self._lock = threading.Lock()
+
+    def _fetch(self, db: Database, *, after_id: int = 0) -> Iterable[Dict[str, Any]]:
+        while True:
+            rows = (
+                db.table(self.table).select(self.columns)
+                .gt("id", after_id).order("id").limit(PAGE_SIZE).execute()
+            ).data or []
+            yield from rows
+            if len(rows) < PAGE_SIZE:
+                return
+            after_id = rows[-1]["id"]
+
+    def _catch_up(self, db: Database, index: PrefixIndex, after_id: int) -> int:
+        """Upserts rows with id > after_id into `index`. Returns the highest id read."""
+        for row in self._fetch(db, after_id=after_id):
+            index.upsert(row)
+            after_id = max(after_id, row["id"])
+        return after_id
+
+    def ensure(self, db: Database) -> PrefixIndex:
+        now = time.monotonic()
+        if self.index is not None and now - self.loaded_at <= settings.DIRECTORY_REBUILD_SECONDS \
+                and now - self.refreshed_at <= settings.DIRECTORY_REFRESH_SECONDS:
+            return self.index
+        # Only the first load waits; later, the thread that gets the lock does the
+        # work and the others search the current index until it is swapped in.
+        if not self._lock.acquire(blocking=self.index is None):
+            return self.index
+        try:
+            now = time.monotonic()
+            if self.index is None or now - self.loaded_at > settings.DIRECTORY_REBUILD_SECONDS:
+                rows = list(self._fetch(db))
+                fresh = PrefixIndex.build(self.terms, self.name_field, rows)
+                fetched_id = self._catch_up(db, fresh, max((row["id"] for row in rows), default=0))
+                self.index, self.loaded_at, self.refreshed_at, self.fetched_id = fresh, now, now, fetched_id
+            elif now - self.refreshed_at > settings.DIRECTORY_REFRESH_SECONDS:
+                self.fetched_id = self._catch_up(db, self.index, self.fetched_id)
+                self.refreshed_at = now
+        finally:
+            self._lock.release()
+        return self.index
+
+    def on_written(self, row: Dict[str, Any]) -> None:
+        # Until the first search loads the index there is nothing to keep current.
+        if self.index is not None and "id" in row:
+            public = {key.strip(): row[key.strip()] for key in self.columns.split(",") if key.strip() in row}
+            self.index.upsert(public)
+
+
+users = Directory("users", USER_COLUMNS, user_terms, "full_name")
+teams = Directory("teams", TEAM_COLUMNS, team_terms, "name")
+
+events.subscribe("user.created", users.on_written)
+events.subscribe("user.updated", users.on_written)
+events.subscribe("team.created", teams.on_written)
+
+
+# --- Search ---
+
+def search_users(
+    db: Database, *, q: str, role: Optional[str] = None, team_id: Optional[int] = None,
+    unassigned: bool = False, limit: int = 20, offset: int = 0,
+) -> Dict[str, Any]:
+    """
+    Users whose name or email has words starting with those of `q`, optionally only
+    one role, one team's members or users without a team. Public fields only.
+    """
+    def where(user: Dict[str, Any]) -> bool:
+        return (role is None or user.get("role") == role) \
+            and (team_id is None or user.get("team_id") == team_id) \
+            and (not unassigned or user.get("team_id") is None)
+
+    filtered = role is not None or team_id is not None or unassigned
+    items, has_more = users.ensure(db).search(q, limit=limit, offset=offset, where=where if filtered else None)
+    return {"items": items, "next_offset": offset + limit if has_more else None}
+
+
+def search_teams(db: Database, *, q: str, limit: int = 20, offset: int = 0) -> Dict[str, Any]:
+    """Teams whose name has words starting with those of `q`."""
+    items, has_more = teams.ensure(db).search(q, limit=limit, offset=offset)
+    return {"items": items, "next_offset": offset + limit if has_more else None}
@@ -0,0 +1,241 @@
+"""
+Feedback drafts with buffered autosave.
+
+Clients save a draft as often as they like, every few keystrokes if they want. Each
+save is a partial update naming the version it was made against; a save against
+any other version raises DraftConflict (a 409), so a stale tab can't overwrite
+newer text. Every accepted save bumps the version.
+
+Accepted saves only change this worker's write buffer. A flusher thread writes a
+draft once its saves pause for DRAFT_DEBOUNCE_SECONDS, or DRAFT_FLUSH_SECONDS after
+its first unwritten save if they keep coming. Saves to one draft are coalesced into
+at most one database write per DRAFT_DEBOUNCE_SECONDS, however fast it is typed.
+Written drafts leave the buffer, and the next save reads the row back.
+
+Each worker has its own buffer. A flush only overwrites the version the worker read
+(crud_draft.write_draft), so when two workers buffer saves to one draft, the later
+flush fails instead of overwriting the earlier one. Its saves are dropped and the
+draft's next save on that worker gets a 409 carrying the stored draft.
+Saves still buffered when a worker is killed are lost; a normal shutdown writes
+them (flush_all, from app/core/lifespan.py).
+"""
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from app.core.config import settings
+from app.core.metrics import DRAFT_SAVES, DRAFT_WRITES
+from app.crud import crud_draft
+from app.db.base import Database
+
+logger = logging.getLogger(__name__)
+
+
+class DraftConflict(Exception):
+    """A save or publish named a version other than the draft's current one."""
+
+    def __init__(self, current: Optional[Dict[str, Any]]) -> None:
+        super().__init__("The draft has changed since this version.")
+        self.current = current  # The draft as it is now, to rebase on
+
+
+class _Entry:
+    """A draft with saves that aren't in the database yet."""
+
+    def __init__(self, db: Database, draft: Dict[str, Any]) -> None:
+        self.db = db
+        self.draft = draft
+        self.stored_version = draft['version']  # What the row holds, as far as this worker knows
+        self.first_save = 0.0  # Monotonic time of the first unwritten save
+        self.last_save = 0.0
+
+    @property
+    def dirty(self) -> bool:
+        return self.draft['version'] != self.stored_version
+
+    def due(self) -> float:
+        return min(self.last_save + settings.DRAFT_DEBOUNCE_SECONDS, self.first_save + settings.DRAFT_FLUSH_SECONDS)
+
+
+_entries: Dict[int, _Entry] = {}
+_conflicted: Set[int] = set()  # Drafts whose buffered saves lost to another worker's
+_publishing: Set[int] = set()
+_lock = threading.Condition()
+_flusher: Optional[threading.Thread] = None
+
+
+def _visible(draft: Optional[Dict[str, Any]], manager_id: int) -> Optional[Dict[str, Any]]:
+    # Someone else's draft looks the same as a missing one.
+    return draft if draft is not None and draft['manager_id'] == manager_id else None
+
+
+def create_draft(db: Database, *, manager_id: int, fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Creates a draft at version 1. Written straight away, so it has an id."""
+    return crud_draft.create_draft(db, manager_id=manager_id, fields=fields)
+
+
+def get_draft(db: Database, *, manager_id: int, draft_id: int) -> Optional[Dict[str, Any]]:
+    """The draft with its buffered saves applied, or None if it isn't the manager's."""
+    with _lock:
+        entry = _entries.get(draft_id)
+        if entry is not None:
+            return _visible(dict(entry.draft), manager_id)
+    return _visible(crud_draft.get_draft(db, draft_id=draft_id), manager_id)
+
+
+def list_drafts(db: Database, *, manager_id: int) -> List[Dict[str, Any]]:
+    """The manager's drafts, oldest first, with buffered saves applied."""
+    drafts = crud_draft.get_drafts_by_manager(db, manager_id=manager_id)
+    with _lock:
+        return [dict(_entries[draft['id']].draft) if draft['id'] in _entries else draft for draft in drafts]
+
+
+def save_draft(
+    db: Database, *, manager_id: int, draft_id: int, version: int, changes: Dict[str, Any]
+) -> Optional[Dict[str, Any]]:
+    """
+    Applies `changes` to the draft if it is at `version`, and returns it at the next
+    version. Returns None if the draft isn't the manager's; raises DraftConflict if
+    it isn't at `version`. Doesn't touch the database unless the draft has to be
+    read into the buffer first.
+    """
+    while True:
+        with _lock:
+            entry = _entries.get(draft_id)
+            if entry is not None:
+                if entry.draft['manager_id'] != manager_id:
+                    return None
+                if draft_id in _publishing or entry.draft['version'] != version:
+                    DRAFT_SAVES.labels(outcome="conflict").inc()
+                    raise DraftConflict(dict(entry.draft))
+                now = time.monotonic()
+                if not entry.dirty:
+                    entry.first_save = now
+                entry.last_save = now
+                entry.draft.update(changes)
+                entry.draft['version'] += 1
+                DRAFT_SAVES.labels(outcome="buffered").inc()
+                _start_flusher()
+                _lock.notify()
+                return dict(entry.draft)
+            conflicted = draft_id in _conflicted
+            _conflicted.discard(draft_id)
+
+        stored = _visible(crud_draft.get_draft(db, draft_id=draft_id), manager_id)
+        if stored is None:
+            return None
+        if conflicted:
+            DRAFT_SAVES.labels(outcome="conflict").inc()
+            raise DraftConflict(stored)
+        with _lock:
+            # Another save to the same draft may have read it in meanwhile; then that copy stays.
+            _entries.setdefault(draft_id, _Entry(db, stored))
+
+
+def discard_draft(db: Database, *, manager_id: int, draft_id: int) -> bool:
+    """Deletes the draft and any buffered saves. False if it isn't the manager's."""
+    with _lock:
+        entry = _entries.get(draft_id)
+        if entry is not None and entry.draft['manager_id'] == manager_id:
+            del _entries[draft_id]
+        _conflicted.discard(draft_id)
+    return crud_draft.delete_draft(db, draft_id=draft_id, manager_id=manager_id)
+
+
+def publish_draft(
+    db: Database, *, manager_id: int, draft_id: int, version: Optional[int],
+    publish: Callable[[Dict[str, Any]], Any],
+) -> Any:
+    """
+    Hands the draft (with buffered saves) to `publish`, which creates the feedback,
+    then deletes the draft. Returns what `publish` returned, or None if the draft
+    isn't the manager's. If `publish` raises, the draft is left as it was.
+    Raises DraftConflict for a stale `version`, or while the draft is being published.
+    """
+    with _lock:
+        if draft_id in _publishing:
+            raise DraftConflict(dict(_entries[draft_id].draft) if draft_id in _entries else None)
+        _publishing.add(draft_id)
+    try:
+        draft = get_draft(db, manager_id=manager_id, draft_id=draft_id)
+        if draft is None:
+            return None
+        if version is not None and draft['version'] != version:
+            raise DraftConflict(draft)
+        result = publish(draft)
+        discard_draft(db, manager_id=manager_id, draft_id=draft_id)
+        return result
+    finally:
+        with _lock:
+            _publishing.discard(draft_id)
+
+
+def _start_flusher() -> None:
+    # Called with _lock held. The thread exits once nothing is left to write.
+    global _flusher
+    if _flusher is None:
+        _flusher = threading.Thread(target=_run_flusher, name="draft-flusher", daemon=True)
+        _flusher.start()
+
+
+def _run_flusher() -> None:
+    global _flusher
+    while True:
+        with _lock:
+            while True:
+                dirty = [entry for entry in _entries.values() if entry.dirty]
+                if not dirty:
+                    _flusher = None
+                    return
+                now = time.monotonic()
+                due = [entry for entry in dirty if entry.due() <= now]
+                if due:
+                    break
+                _lock.wait(min(entry.due() for entry in dirty) - now)
+        for entry in due:
+            _flush(entry)
+
+
+def _flush(entry: _Entry) -> None:
+    """Writes one entry's draft, outside the lock so saves carry on meanwhile."""
+    with _lock:
+        draft = dict(entry.draft)
+        expected = entry.stored_version
+    draft_id = draft['id']
+    try:
+        written = crud_draft.write_draft(entry.db, draft=draft, expected_version=expected)
+    except Exception:
+        logger.warning("Could not write draft %s; will retry.", draft_id, exc_info=True)
+        DRAFT_WRITES.labels(outcome="error").inc()
+        with _lock:
+            entry.first_save = entry.last_save = time.monotonic()
+        return
+
+    with _lock:
+        buffered = _entries.get(draft_id) is entry
+        if written is None:
+            # Moved on in another worker, or deleted. Our saves lose; tell the client on its next one.
+            DRAFT_WRITES.labels(outcome="conflict").inc()
+            if buffered:
+                del _entries[draft_id]
+                _conflicted.add(draft_id)
+            logger.info("Draft %s changed elsewhere; dropped buffered saves.", draft_id, extra={"version": draft['version']})
+            return
+        DRAFT_WRITES.labels(outcome="written").inc()
+        entry.stored_version = draft['version']
+        if not buffered:
+            return
+        if entry.dirty:
+            # Saved again while this write was in flight; those go out next time.
+            entry.first_save = time.monotonic()
+        else:
+            del _entries[draft_id]
+
+
+def flush_all() -> None:
+    """Writes every buffered save now. Called on shutdown."""
+    with _lock:
+        dirty = [entry for entry in _entries.values() if entry.dirty]
+    for entry in dirty:
+        _flush(entry)
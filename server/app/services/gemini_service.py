@@ -1,8 +1,68 @@
-import google.generativeai as genai
+import logging
+import re
+import threading
+import time
+from typing import Any
+from app.core import resilience
 from app.core.config import settings
+from app.core.metrics import LLM_CALL_DURATION, LLM_CALL_ERRORS, LLM_FALLBACKS
 
-genai.configure(api_key=settings.GEMINI_API_KEY)
-model = genai.GenerativeModel('gemini-1.5-flash')
+logger = logging.getLogger(__name__)
+
+# The Gemini SDK is the most expensive import in the app, so the model is created on
+# first use. Assigning `model` directly (e.g. a stand-in in benchmarks) skips that.
+model: Any = None
+_model_lock = threading.Lock()
+
+def get_model() -> Any:
+    """
+    Returns the shared GenerativeModel, importing and configuring the SDK on first call.
+    """
+    global model
+    if model is None:
+        with _model_lock:
+            if model is None:
+                import google.generativeai as genai
+                genai.configure(api_key=settings.GEMINI_API_KEY)
+                model = genai.GenerativeModel('gemini-1.5-flash')
+    return model
+
+def _is_upstream_failure(error: BaseException) -> bool:
+    """
+    Whether an error from the SDK means Gemini itself is failing, and so counts
+    against the circuit breaker: transport errors, timeouts, and API errors with a
+    5xx or 429 status. Anything else is Gemini's answer to this prompt, e.g. the
+    ValueError `response.text` raises when the safety filters blocked it, or a 400.
+    """
+    if isinstance(error, OSError):  # Connection errors and timeouts
+        return True
+    # Already imported along with the SDK by the time a call can fail.
+    from google.api_core import exceptions
+    if isinstance(error, exceptions.RetryError):
+        return True
+    if isinstance(error, exceptions.GoogleAPICallError):
+        return error.code is None or error.code >= 500 or error.code in (408, 429)
+    return False
+
+def _generate(function: str, prompt: str) -> str:
+    """
+    Sends a prompt to the model and returns the response text.
+    The call goes through the resilience layer (deadline, hedging, circuit breaker) and
+    raises resilience.UpstreamUnavailable when it can't be made or doesn't finish in time,
+    or resilience.UpstreamRejected when Gemini refuses the prompt.
+    Every call is timed and failures are counted, labeled by the calling service function.
+    """
+    def generate(timeout: float) -> str:
+        return get_model().generate_content(prompt, request_options={"timeout": timeout}).text
+
+    start = time.perf_counter()
+    try:
+        return resilience.call(function, generate, is_failure=_is_upstream_failure)
+    except Exception:
+        LLM_CALL_ERRORS.labels(function=function).inc()
+        raise
+    finally:
+        LLM_CALL_DURATION.labels(function=function).observe(time.perf_counter() - start)
 
 def generate_feedback_suggestion(prompt: str) -> str:
     """
@@ -13,8 +73,7 @@ def generate_feedback_suggestion(prompt: str) -> str:
         "The tone should be professional and encouraging. The points are: "
         f"'{prompt}'"
     )
-    response = model.generate_content(full_prompt)
-    return response.text
+    return _generate("generate_feedback_suggestion", full_prompt)
 
 def rephrase_text(text: str) -> str:
     """
@@ -25,22 +84,53 @@ def rephrase_text(text: str) -> str:
         "while retaining the core message. Here is the text: "
         f"'{text}'"
     )
-    response = model.generate_content(prompt)
-    return response.text
+    return _generate("rephrase_text", prompt)
+
+# The tags the model chooses from, with word stems that suggest each one. The stems
+# drive the local fallback when Gemini is unavailable.
+TAG_KEYWORDS = {
+    "Leadership": ("lead", "mentor", "ownership", "owned", "initiative", "guid"),
+    "Communication": ("communicat", "clarif", "present", "listen", "explain", "document", "writ"),
+    "Teamwork": ("team", "collaborat", "help", "support", "pair", "together"),
+    "Technical Skills": ("technical", "code", "coding", "design", "architect", "test", "debug", "refactor"),
+    "Problem Solving": ("problem", "solv", "unblock", "root cause", "fix", "investigat", "incident"),
+    "Creativity": ("creativ", "idea", "innovat", "novel", "prototype"),
+    "Time Management": ("deadline", "time", "prioriti", "late", "schedul", "estimat", "deliver"),
+    "Adaptability": ("adapt", "flexib", "change", "learn", "new role", "pivot"),
+}
+
+def _local_tags(text: str, limit: int = 3) -> list[str]:
+    """
+    Picks tags by counting keyword stems in the text; the degraded answer to
+    suggest_tags_for_feedback while Gemini is unavailable.
+    """
+    lowered = text.lower()
+    scores = {
+        tag: sum(len(re.findall(r"\b" + re.escape(stem), lowered)) for stem in stems)
+        for tag, stems in TAG_KEYWORDS.items()
+    }
+    ranked = sorted((tag for tag, score in scores.items() if score), key=lambda tag: -scores[tag])
+    return ranked[:limit]
 
 def suggest_tags_for_feedback(text: str) -> list[str]:
     """
     Suggests relevant tags based on the feedback content.
+    Falls back to keyword matching against the same tag list if Gemini is unavailable
+    or refuses the prompt.
     """
     prompt = (
         "Based on the following feedback content, suggest up to 3 relevant tags "
-        "from this list: [Leadership, Communication, Teamwork, Technical Skills, "
-        "Problem Solving, Creativity, Time Management, Adaptability]. "
+        f"from this list: [{', '.join(TAG_KEYWORDS)}]. "
         "Return only a comma-separated list of the tag names. "
         f"Content: '{text}'"
     )
-    response = model.generate_content(prompt)
-    tags = [tag.strip() for tag in response.text.split(',')]
+    try:
+        response_text = _generate("suggest_tags_for_feedback", prompt)
+    except (resilience.UpstreamUnavailable, resilience.UpstreamRejected) as e:
+        logger.warning(f"Suggesting tags locally: {e}")
+        LLM_FALLBACKS.labels(function="suggest_tags_for_feedback").inc()
+        return _local_tags(text)
+    tags = [tag.strip() for tag in response_text.split(',')]
     return tags
 
 def generate_comprehensive_feedback(strengths: str, areas_for_improvement: str) -> str:
@@ -52,17 +142,48 @@ def generate_comprehensive_feedback(strengths: str, areas_for_improvement: str)
         "The tone should be professional, balanced, and encouraging. "
         f"Strengths: '{strengths}'. Areas for Improvement: '{areas_for_improvement}'"
     )
-    response = model.generate_content(prompt)
-    return response.text
+    return _generate("generate_comprehensive_feedback", prompt)
 
 def analyze_sentiment(text: str) -> str:
     """
     Analyzes the sentiment of the feedback text.
+    Answers 'neutral' if Gemini is unavailable or refuses the prompt, so the manager
+    can still adjust it.
     """
     prompt = (
         "Analyze the overall sentiment of the following feedback text. "
         "Respond with only one word: 'positive', 'neutral', or 'negative'. "
         f"Text: '{text}'"
     )
-    response = model.generate_content(prompt)
-    return response.text.lower().strip()
+    try:
+        response_text = _generate("analyze_sentiment", prompt)
+    except (resilience.UpstreamUnavailable, resilience.UpstreamRejected) as e:
+        logger.warning(f"Defaulting sentiment to neutral: {e}")
+        LLM_FALLBACKS.labels(function="analyze_sentiment").inc()
+        return "neutral"
+    return response_text.lower().strip()
+
+def summarize_feedback_chunk(entries: str) -> str:
+    """
+    Summarizes one chunk of a feedback history (the map step of a team summary).
+    """
+    prompt = (
+        "The following are workplace feedback entries, oldest first. Summarize them in one short "
+        "paragraph: the recurring strengths, the recurring areas for improvement, and any change "
+        "over time. Mention people by name where the entries do. Do not invent details. "
+        f"Entries:\n{entries}"
+    )
+    return _generate("summarize_feedback_chunk", prompt)
+
+def combine_feedback_summaries(summaries: str, subject: str) -> str:
+    """
+    Merges partial summaries of a feedback history into one narrative (the reduce step).
+    """
+    prompt = (
+        f"The following are summaries of consecutive parts of the feedback history for {subject}, "
+        "oldest first. Combine them into a single narrative summary of a few paragraphs covering "
+        "the main strengths, the main areas for improvement and how they have developed over time. "
+        "The tone should be professional and balanced. "
+        f"Summaries:\n{summaries}"
+    )
+    return _generate("combine_feedback_summaries", prompt)
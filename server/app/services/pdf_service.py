@@ -1,9 +1,9 @@
 from io import BytesIO
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak
-from reportlab.lib.styles import getSampleStyleSheet
-from typing import List, Dict, Any
+from typing import Iterable, Iterator, List, Dict, Any, Tuple
 import datetime
+import functools
+import re
+import zipfile
 
 # The import for the SQLAlchemy Feedback model is no longer needed.
 # from app.models.feedback import Feedback
@@ -17,10 +17,25 @@ def parse_iso_datetime(iso_str: str) -> datetime.datetime:
     return datetime.datetime.fromisoformat(iso_str)
 
 
+@functools.lru_cache(maxsize=1)
+def _styles() -> Any:
+    """
+    The stylesheet, built once per process. In the pdf pool that means once per
+    worker rather than once per render; renders only read it.
+    """
+    # reportlab is only needed for exports, so it is imported on first use
+    # instead of when the app starts.
+    from reportlab.lib.styles import getSampleStyleSheet
+    return getSampleStyleSheet()
+
+
 def create_feedback_pdf(feedback_list: List[Dict[str, Any]]) -> BytesIO:
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak
+
     buffer = BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=letter)
-    styles = getSampleStyleSheet()
+    styles = _styles()
     story = []
 
     for feedback in feedback_list:
@@ -78,3 +93,69 @@ def create_feedback_pdf(feedback_list: List[Dict[str, Any]]) -> BytesIO:
     doc.build(story)
     buffer.seek(0)
     return buffer
+
+
+def render_feedback_pdf(feedback_list: List[Dict[str, Any]]) -> bytes:
+    """The same report as create_feedback_pdf, as bytes (cheaper to send back from the pdf pool)."""
+    return create_feedback_pdf(feedback_list).getvalue()
+
+
+def render_partition(partition: Tuple[str, List[Dict[str, Any]]]) -> Tuple[str, bytes]:
+    """Renders one (file name, feedback) group from partition_by_employee; runs in the pdf pool."""
+    name, feedback_list = partition
+    return name, render_feedback_pdf(feedback_list)
+
+
+def partition_by_employee(feedback_list: List[Dict[str, Any]]) -> List[Tuple[str, List[Dict[str, Any]]]]:
+    """
+    Splits feedback into one group per employee, each with the file name its PDF
+    gets in a team export. Groups keep the order of `feedback_list`.
+    """
+    groups: Dict[Any, List[Dict[str, Any]]] = {}
+    for feedback in feedback_list:
+        groups.setdefault(feedback.get('employee_id'), []).append(feedback)
+
+    partitions = []
+    for employee_id, rows in groups.items():
+        name = (rows[0].get('employee') or {}).get('full_name') or 'employee'
+        slug = re.sub(r'[^A-Za-z0-9]+', '-', name).strip('-').lower() or 'employee'
+        partitions.append((f"{slug}-{employee_id}.pdf", rows))
+    return partitions
+
+
+class _ZipSink:
+    """
+    A write-only, unseekable file for zipfile. Whatever has been written since the
+    last `take()` is handed to the response, so the archive streams out entry by
+    entry instead of being assembled in memory first.
+    """
+
+    def __init__(self) -> None:
+        self._chunks: List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_zip(files: Iterable[Tuple[str, bytes]]) -> Iterator[bytes]:
+    """
+    Yields a ZIP archive of (name, content) pairs, one chunk per file as soon as
+    it is available, then the central directory.
+    """
+    sink = _ZipSink()
+    # PDFs are already compressed, so entries are stored rather than deflated.
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED) as archive:
+        for name, content in files:
+            info = zipfile.ZipInfo(name, date_time=datetime.datetime.now().timetuple()[:6])
+            archive.writestr(info, content)
+            yield sink.take()
+    yield sink.take()
@@ -0,0 +1,253 @@
+"""
+Bulk user provisioning: onboarding a whole organisation in one request.
+
+Rows (from CSV or JSON) have the POST /v1/auth/register fields. Employees name their
+team either by team_id or by team_name, which may be an existing team or one created
+by a manager row in the same upload, so a single file can set up a new org.
+
+Instead of register's per-user round trips, a batch costs a fixed handful:
+- existing emails and named teams are looked up with `in_` queries,
+- passwords are hashed in parallel across the crypto process pool,
+- managers, their teams and employees are inserted BATCH_SIZE rows at a time, and
+  managers get their team_id with one upsert per batch.
+
+Every row gets a result. Rows that fail validation are reported and skipped; the
+valid rows are written together, in a transaction where the backend has one (and
+otherwise undone by hand if a write fails), so a failed write creates nobody.
+"""
+import csv
+import io
+import logging
+from typing import Any, Dict, Iterable, List
+
+from pydantic import ValidationError
+
+from app.core import events
+from app.core.security import get_password_hashes
+from app.crud import crud_team
+from app.db.base import Database
+from app.schemas.user import UserCreate
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+# Emails per lookup; keeps the PostgREST query string well under URL length limits.
+LOOKUP_CHUNK = 200
+
+CSV_COLUMNS = ("email", "full_name", "role", "password", "team_name", "team_id")
+
+
+def parse_csv(text: str) -> List[Dict[str, Any]]:
+    """Rows of a CSV with a header line; empty cells become None."""
+    reader = csv.DictReader(io.StringIO(text))
+    missing = {"email", "full_name", "role", "password"} - set(reader.fieldnames or ())
+    if missing:
+        raise ValueError(f"CSV is missing column(s): {', '.join(sorted(missing))}.")
+    return [
+        {key.strip(): (value.strip() or None) if isinstance(value, str) else value
+         for key, value in row.items() if key}
+        for row in reader
+    ]
+
+
+def _chunks(values: List[Any], size: int) -> Iterable[List[Any]]:
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _error(result: Dict[str, Any], message: str) -> None:
+    result["status"] = "error"
+    result["error"] = message
+
+
+def provision_users(db: Database, *, rows: List[Dict[str, Any]], dry_run: bool = False) -> Dict[str, Any]:
+    """
+    Validates and creates the users in `rows`. Returns per-row results in input order
+    (row numbers start at 1) and totals. With dry_run nothing is hashed or written and
+    valid rows report "would_create".
+    """
+    results: List[Dict[str, Any]] = []
+    valid: List[tuple] = []  # (result, UserCreate)
+    seen_emails = set()
+
+    # 1. Validate each row on its own.
+    for number, raw in enumerate(rows, start=1):
+        result: Dict[str, Any] = {"row": number, "email": raw.get("email") if isinstance(raw, dict) else None, "status": "pending"}
+        results.append(result)
+        try:
+            user_in = UserCreate.model_validate(raw)
+        except ValidationError as e:
+            first = e.errors()[0]
+            _error(result, f"{'.'.join(str(part) for part in first['loc']) or 'row'}: {first['msg']}")
+            continue
+        result["email"] = user_in.email
+        email = user_in.email.lower()
+        if email in seen_emails:
+            _error(result, "Duplicate email in this upload.")
+            continue
+        seen_emails.add(email)
+        if user_in.role.value == "manager" and not user_in.team_name:
+            _error(result, "Managers need a team_name.")
+            continue
+        if user_in.role.value == "employee" and user_in.team_id is None and not user_in.team_name:
+            _error(result, "Employees need a team_id or a team_name.")
+            continue
+        valid.append((result, user_in))
+
+    # 2. Emails already registered, in a few `in_` queries rather than one per row.
+    emails = [user_in.email for _, user_in in valid]
+    existing = set()
+    for chunk in _chunks(emails, LOOKUP_CHUNK):
+        response = db.table("users").select("email").in_("email", chunk).execute()
+        existing.update(row["email"].lower() for row in response.data or [])
+
+    # 3. Resolve employees' teams: by id (must exist), by name (existing, or created here).
+    new_team_names = {
+        user_in.team_name for _, user_in in valid if user_in.role.value == "manager"
+    }
+    wanted_ids = list({user_in.team_id for _, user_in in valid if user_in.role.value == "employee" and user_in.team_id is not None})
+    wanted_names = list({
+        user_in.team_name for _, user_in in valid
+        if user_in.role.value == "employee" and user_in.team_id is None
+    } | new_team_names)
+    teams_by_id: Dict[int, Dict[str, Any]] = {}
+    teams_by_name: Dict[str, Dict[str, Any]] = {}
+    for chunk in _chunks(wanted_ids, LOOKUP_CHUNK):
+        for team in db.table("teams").select("id, name").in_("id", chunk).execute().data or []:
+            teams_by_id[team["id"]] = team
+    for chunk in _chunks(wanted_names, LOOKUP_CHUNK):
+        for team in db.table("teams").select("id, name").in_("name", chunk).execute().data or []:
+            teams_by_name[team["name"]] = team
+
+    managers: List[tuple] = []
+    employees: List[tuple] = []
+    claimed_names = set()
+    for result, user_in in valid:
+        if user_in.email.lower() in existing:
+            _error(result, "A user with this email already exists.")
+        elif user_in.role.value == "manager":
+            if user_in.team_name in teams_by_name:
+                _error(result, f"Team '{user_in.team_name}' already exists.")
+            elif user_in.team_name in claimed_names:
+                _error(result, f"Team '{user_in.team_name}' is created by another row in this upload.")
+            else:
+                claimed_names.add(user_in.team_name)
+                managers.append((result, user_in))
+        elif user_in.team_id is not None:
+            if user_in.team_id not in teams_by_id:
+                _error(result, f"Team {user_in.team_id} does not exist.")
+            else:
+                employees.append((result, user_in))
+        elif user_in.team_name not in teams_by_name and user_in.team_name not in new_team_names:
+            _error(result, f"Team '{user_in.team_name}' does not exist.")
+        else:
+            employees.append((result, user_in))
+
+    # A team named by a manager row whose manager failed validation won't be created.
+    for result, user_in in employees:
+        if user_in.team_id is None and user_in.team_name not in teams_by_name and user_in.team_name not in claimed_names:
+            _error(result, f"Team '{user_in.team_name}' is not created: its manager's row has an error.")
+    employees = [(result, user_in) for result, user_in in employees if result["status"] == "pending"]
+
+    if dry_run:
+        for result, _ in managers + employees:
+            result["status"] = "would_create"
+    elif managers or employees:
+        _create(db, managers, employees, teams_by_id, teams_by_name)
+
+    return {
+        "dry_run": dry_run,
+        "created": sum(result["status"] == "created" for result in results),
+        "failed": sum(result["status"] == "error" for result in results),
+        "results": results,
+    }
+
+
+def _create(
+    db: Database,
+    managers: List[tuple],
+    employees: List[tuple],
+    teams_by_id: Dict[int, Dict[str, Any]],
+    teams_by_name: Dict[str, Dict[str, Any]],
+) -> None:
+    # bcrypt is the slow part, so all of it happens up front, across processes.
+    hashes = get_password_hashes([user_in.password for _, user_in in managers + employees])
+    manager_hashes, employee_hashes = hashes[:len(managers)], hashes[len(managers):]
+
+    created_users: List[int] = []
+    created_teams: List[int] = []
+    published: List[tuple] = []  # (event, row), sent once the whole batch is in
+    try:
+        with db.transaction():
+            # Managers first (without a team), then their teams, then point each
+            # manager at their team.
+            for batch in _chunks(list(zip(managers, manager_hashes)), BATCH_SIZE):
+                user_rows = db.table("users").insert([
+                    {"email": user_in.email, "full_name": user_in.full_name, "role": "manager",
+                     "hashed_password": hashed, "team_id": None}
+                    for (_, user_in), hashed in batch
+                ]).execute().data or []
+                if len(user_rows) != len(batch):
+                    raise Exception("Failed to create manager users.")
+                created_users.extend(row["id"] for row in user_rows)
+
+                team_rows = db.table("teams").insert([
+                    {"name": user_in.team_name, "manager_id": row["id"]}
+                    for ((_, user_in), _), row in zip(batch, user_rows)
+                ]).execute().data or []
+                if len(team_rows) != len(batch):
+                    raise Exception("Failed to create teams.")
+                created_teams.extend(team["id"] for team in team_rows)
+
+                # Full rows, since an upsert inserts (and so checks NOT NULL) before it updates.
+                updated = db.table("users").upsert([
+                    {**row, "team_id": team["id"]} for row, team in zip(user_rows, team_rows)
+                ], on_conflict="id").execute().data or []
+                if len(updated) != len(batch):
+                    raise Exception("Failed to assign teams to managers.")
+
+                for (((result, _), _), row, team) in zip(batch, user_rows, team_rows):
+                    result.update(status="created", id=row["id"], team_id=team["id"])
+                    teams_by_name[team["name"]] = team
+                published.extend(("team.created", team) for team in team_rows)
+                published.extend(("user.created", row) for row in updated)
+
+            for batch in _chunks(list(zip(employees, employee_hashes)), BATCH_SIZE):
+                values = []
+                for (_, user_in), hashed in batch:
+                    team = teams_by_id[user_in.team_id] if user_in.team_id is not None else teams_by_name[user_in.team_name]
+                    values.append({"email": user_in.email, "full_name": user_in.full_name, "role": "employee",
+                                   "hashed_password": hashed, "team_id": team["id"]})
+                user_rows = db.table("users").insert(values).execute().data or []
+                if len(user_rows) != len(batch):
+                    raise Exception("Failed to create employee users.")
+                created_users.extend(row["id"] for row in user_rows)
+                for ((result, _), _), row in zip(batch, user_rows):
+                    result.update(status="created", id=row["id"], team_id=row["team_id"])
+                published.extend(("user.created", row) for row in user_rows)
+    except Exception as e:
+        logger.error(f"Bulk provisioning failed after {len(created_users)} user(s): {e}", exc_info=True)
+        if not db.supports_transactions:
+            # Without a transaction, undo the writes by hand. Deleting the managers
+            # cascades to their teams.
+            for chunk in _chunks(created_users, LOOKUP_CHUNK):
+                db.table("users").delete().in_("id", chunk).execute()
+            for chunk in _chunks(created_teams, LOOKUP_CHUNK):
+                db.table("teams").delete().in_("id", chunk).execute()
+        for result, _ in managers + employees:
+            result.pop("id", None)
+            result.pop("team_id", None)
+            _error(result, "Not created: the batch write failed and was rolled back.")
+        return
+    finally:
+        # Rosters of every team that gained members (and the new teams' managers).
+        for team_id in {result.get("team_id") for result, _ in managers + employees} - {None}:
+            crud_team.invalidate_roster(team_id)
+        for result, _ in managers:
+            if result.get("id") is not None:
+                crud_team.invalidate_roster(manager_id=result["id"])
+
+    # Only once everything is committed, so listeners never see rows that get rolled back.
+    for event, row in published:
+        events.publish(event, row)
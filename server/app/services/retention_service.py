@@ -0,0 +1,204 @@
+"""
+Retention: moves old rows out of the hot tables so they stay the size of what is
+actually read.
+
+- Read notifications older than RETENTION_NOTIFICATION_DAYS go to the
+  notifications_archive table, or, with RETENTION_ARCHIVE_DIR set, to gzipped JSON
+  lines in that directory (one file per day).
+- With RETENTION_FEEDBACK_DAYS set, acknowledged feedback older than that goes to
+  feedback_archive, stored as the document GET /v1/feedback returned (people and
+  tags included). GET /v1/feedback/archived reads it back.
+
+Work is done RETENTION_BATCH_SIZE rows at a time, oldest first, with a pause
+between batches so the job never holds locks or the database for long. Each
+batch is copied to the archive, then deleted, then reported to delta sync as
+"archived" (removed from the client's lists). Once a feedback batch is committed,
+a feedback.archived event per row takes it out of this worker's search and
+similarity indexes. The copy is idempotent by id, so a
+batch that fails halfway is simply redone by the next run.
+
+The lifespan hook runs the job every RETENTION_INTERVAL_SECONDS. Only the worker
+holding the lock on RETENTION_LOCK_FILE runs it; the others skip that round.
+"""
+import asyncio
+import datetime
+import fcntl
+import gzip
+import json
+import logging
+import os
+import random
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+from app.core import events
+from app.core.config import settings
+from app.core.metrics import RETENTION_ARCHIVED
+from app.crud import crud_change_log, crud_feedback
+from app.db.base import Database
+from app.db.replicated import use_primary
+
+logger = logging.getLogger(__name__)
+
+NOTIFICATION_COLUMNS = ("id", "user_id", "message", "is_read", "created_at", "updated_at")
+
+# Set on shutdown; a run in progress stops after its current batch.
+_stop = threading.Event()
+
+
+def _cutoff(days: float) -> str:
+    return (datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=days)).isoformat()
+
+
+@contextmanager
+def _job_lock() -> Iterator[bool]:
+    """Yields whether this process got the job lock; never waits for it."""
+    with open(settings.RETENTION_LOCK_FILE, "a") as handle:
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def _write_archive_file(rows: List[Dict[str, Any]]) -> None:
+    directory = Path(settings.RETENTION_ARCHIVE_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"notifications-{datetime.date.today():%Y%m%d}.jsonl.gz"
+    # Appending starts a new gzip member; gzip readers read them as one stream.
+    with gzip.open(path, "at", encoding="utf-8") as archive:
+        for row in rows:
+            archive.write(json.dumps(row, default=str) + "\n")
+        archive.flush()
+        os.fsync(archive.fileno())
+
+
+def archive_notifications(db: Database, *, older_than_days: float) -> int:
+    """Archives read notifications older than `older_than_days`. Returns how many."""
+    cutoff = _cutoff(older_than_days)
+    total = 0
+    while not _stop.is_set():
+        rows = (
+            db.table("notifications").select("*")
+            .eq("is_read", True)
+            .lt("created_at", cutoff)
+            .order("created_at")
+            .limit(settings.RETENTION_BATCH_SIZE)
+            .execute()
+        ).data or []
+        if not rows:
+            break
+        archived = [{column: row.get(column) for column in NOTIFICATION_COLUMNS} for row in rows]
+        ids = [row['id'] for row in rows]
+
+        with db.transaction():
+            if settings.RETENTION_ARCHIVE_DIR:
+                _write_archive_file(archived)
+            else:
+                db.table("notifications_archive").upsert(archived, on_conflict="id", ignore_duplicates=True).execute()
+            db.table("notifications").delete().in_("id", ids).execute()
+            crud_change_log.record_changes(db, [
+                {"user_id": row['user_id'], "entity": "notification", "entity_id": row['id'], "action": "archived"}
+                for row in rows
+            ])
+
+        total += len(rows)
+        RETENTION_ARCHIVED.labels(entity="notification").inc(len(rows))
+        if len(rows) < settings.RETENTION_BATCH_SIZE:
+            break
+        _stop.wait(settings.RETENTION_BATCH_PAUSE_SECONDS)
+    return total
+
+
+def archive_feedback(db: Database, *, older_than_days: float) -> int:
+    """Archives acknowledged feedback older than `older_than_days`. Returns how many."""
+    cutoff = _cutoff(older_than_days)
+    total = 0
+    while not _stop.is_set():
+        rows = (
+            db.table("feedback").select(crud_feedback.FEEDBACK_SELECT)
+            .eq("acknowledged", True)
+            .lt("created_at", cutoff)
+            .order("created_at")
+            .limit(settings.RETENTION_BATCH_SIZE)
+            .execute()
+        ).data or []
+        if not rows:
+            break
+        ids = [row['id'] for row in rows]
+
+        with db.transaction():
+            # Copied with its tags first: deleting the row drops its feedback_tags.
+            db.table("feedback_archive").upsert([
+                {"id": row['id'], "manager_id": row['manager_id'], "employee_id": row['employee_id'],
+                 "created_at": row['created_at'], "document": row}
+                for row in rows
+            ], on_conflict="id").execute()
+            # Only what is still acknowledged; anything un-acknowledged meanwhile stays hot.
+            deleted = db.table("feedback").delete().in_("id", ids).eq("acknowledged", True).execute().data or []
+            deleted_ids = {row['id'] for row in deleted}
+            kept = [feedback_id for feedback_id in ids if feedback_id not in deleted_ids]
+            if kept:
+                db.table("feedback_archive").delete().in_("id", kept).execute()
+            crud_change_log.record_changes(db, [
+                {"user_id": user_id, "entity": "feedback", "entity_id": row['id'], "action": "archived"}
+                for row in rows if row['id'] in deleted_ids
+                for user_id in (row['manager_id'], row['employee_id'])
+            ])
+
+        for row in rows:
+            if row['id'] in deleted_ids:
+                events.publish("feedback.archived", {
+                    "id": row['id'], "manager_id": row['manager_id'], "employee_id": row['employee_id'],
+                })
+        total += len(deleted_ids)
+        RETENTION_ARCHIVED.labels(entity="feedback").inc(len(deleted_ids))
+        if len(rows) < settings.RETENTION_BATCH_SIZE:
+            break
+        _stop.wait(settings.RETENTION_BATCH_PAUSE_SECONDS)
+    return total
+
+
+def run_retention(db: Database) -> Dict[str, int]:
+    """One pass of the job, if no other process on this host is running it."""
+    # On the primary: each batch reads the rows it is about to move.
+    with _job_lock() as acquired, use_primary():
+        if not acquired:
+            logger.info("Retention job is running elsewhere; skipping this round.")
+            return {}
+        archived = {"notifications": 0, "feedback": 0}
+        if settings.RETENTION_NOTIFICATION_DAYS > 0:
+            archived["notifications"] = archive_notifications(db, older_than_days=settings.RETENTION_NOTIFICATION_DAYS)
+        if settings.RETENTION_FEEDBACK_DAYS > 0:
+            archived["feedback"] = archive_feedback(db, older_than_days=settings.RETENTION_FEEDBACK_DAYS)
+        logger.info("Retention job finished.", extra={"archived": archived})
+        return archived
+
+
+async def run_periodically(db: Database) -> None:
+    """
+    Runs the job every RETENTION_INTERVAL_SECONDS for the lifetime of the app
+    (started by the lifespan hook). The first run comes after a random part of the
+    interval, so restarted workers don't all try at once.
+    """
+    _stop.clear()
+    delay = random.uniform(0.1, 1.0) * settings.RETENTION_INTERVAL_SECONDS
+    while True:
+        await asyncio.sleep(delay)
+        delay = settings.RETENTION_INTERVAL_SECONDS
+        try:
+            # Not anyio's threadpool: a long run shouldn't hold a request thread.
+            await asyncio.to_thread(run_retention, db)
+        except Exception:
+            logger.warning("Retention job failed; retrying next round.", exc_info=True)
+
+
+def stop() -> None:
+    """Asks a run in progress to stop after its current batch."""
+    _stop.set()
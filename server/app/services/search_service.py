@@ -0,0 +1,349 @@
+"""
+Full-text search over feedback.
+
+Two backends, chosen with SEARCH_BACKEND:
+
+- "memory" (default): an in-process inverted index ranked with BM25 over the
+  feedback, strengths and areas_for_improvement fields. It is loaded from the
+  database on the first search, kept current by the feedback.created/updated/
+  archived events this process publishes, and caught up with rows written by other workers
+  every SEARCH_INDEX_REFRESH_SECONDS (new rows) and SEARCH_INDEX_REBUILD_SECONDS
+  (full rebuild, which also picks up their edits).
+- "postgres": the search_feedback SQL function from sql/002_feedback_search.sql,
+  a tsvector column with a GIN index ranked by ts_rank_cd, called through
+  db.rpc(). Always current, but the ranking is Postgres's rather than BM25.
+
+Either way results are scoped like GET /v1/feedback: managers search the feedback
+they gave, employees the feedback they received.
+"""
+import heapq
+import math
+import re
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.core import events
+from app.core.config import settings
+from app.crud.crud_feedback import FEEDBACK_SELECT
+from app.db.base import Database
+
+SEARCH_FIELDS = ("feedback", "strengths", "areas_for_improvement")
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be been but by for from has have he her his i if in into is it its "
+    "of on or our she so that the their them they this to was we were what when which who "
+    "will with you your".split()
+)
+
+# The columns needed to index a row and to scope it.
+INDEX_COLUMNS = "id, manager_id, employee_id, " + ", ".join(SEARCH_FIELDS)
+
+
+PAGE_SIZE = 1000  # PostgREST's default max-rows
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    if not text:
+        return []
+    return [token for token in _TOKEN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class InvertedIndex:
+    """
+    A compact BM25 inverted index with incremental updates.
+
+    Every indexed version of a document gets a new slot number. A term's postings
+    are two parallel arrays (slots, term frequencies) that only ever grow, so they
+    stay sorted by slot and cost 6 bytes per entry instead of a dict entry's ~50;
+    at 100k documents that is the difference between tens and hundreds of MiB.
+    Updating or removing a document just marks its old slot dead. Dead slots are
+    skipped when scoring and dropped by `compact()`, which runs automatically once
+    they make up COMPACT_RATIO of all slots. Until then document frequencies still
+    count them, which skews idf very slightly.
+
+    Each manager's and employee's slots are listed too (also sorted), so a scoped
+    query binary-searches the caller's few slots in each posting list instead of
+    walking all of it.
+    """
+
+    COMPACT_RATIO = 0.25
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75) -> None:
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Tuple[array, array]] = {}
+        self.slot_doc = array("q")
+        self.slot_length = array("I")
+        self.live = bytearray()
+        self.doc_slot: Dict[int, int] = {}
+        self.by_manager: Dict[Any, array] = {}
+        self.by_employee: Dict[Any, array] = {}
+        self.total_length = 0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.doc_slot)
+
+    def add(self, row: Dict[str, Any]) -> None:
+        """Indexes a feedback row, replacing any previous version of it."""
+        doc_id = row["id"]
+        counts: Dict[str, int] = {}
+        for field in SEARCH_FIELDS:
+            for token in tokenize(row.get(field)):
+                counts[token] = counts.get(token, 0) + 1
+
+        with self._lock:
+            self.remove(doc_id)
+            slot = len(self.slot_doc)
+            for term, tf in counts.items():
+                posting = self.postings.get(term)
+                if posting is None:
+                    posting = self.postings[term] = (array("I"), array("H"))
+                posting[0].append(slot)
+                posting[1].append(min(tf, 65535))
+            length = sum(counts.values())
+            self.slot_doc.append(doc_id)
+            self.slot_length.append(length)
+            self.live.append(1)
+            self.doc_slot[doc_id] = slot
+            self.by_manager.setdefault(row.get("manager_id"), array("I")).append(slot)
+            self.by_employee.setdefault(row.get("employee_id"), array("I")).append(slot)
+            self.total_length += length
+
+    def remove(self, doc_id: int) -> None:
+        with self._lock:
+            slot = self.doc_slot.pop(doc_id, None)
+            if slot is None:
+                return
+            self.live[slot] = 0
+            self.total_length -= self.slot_length[slot]
+            dead = len(self.slot_doc) - len(self.doc_slot)
+            if dead > 1000 and dead > self.COMPACT_RATIO * len(self.slot_doc):
+                self.compact()
+
+    def compact(self) -> None:
+        """Renumbers the live slots and drops dead ones from every list."""
+        with self._lock:
+            remap = array("q", [-1]) * len(self.slot_doc)
+            next_slot = 0
+            for slot, alive in enumerate(self.live):
+                if alive:
+                    remap[slot] = next_slot
+                    next_slot += 1
+
+            def keep(slots: array) -> array:
+                return array("I", [remap[slot] for slot in slots if remap[slot] >= 0])
+
+            for term, (slots, tfs) in list(self.postings.items()):
+                kept = [(remap[slot], tf) for slot, tf in zip(slots, tfs) if remap[slot] >= 0]
+                if kept:
+                    self.postings[term] = (array("I", [s for s, _ in kept]), array("H", [tf for _, tf in kept]))
+                else:
+                    del self.postings[term]
+            self.by_manager = {key: kept for key, slots in self.by_manager.items() if (kept := keep(slots))}
+            self.by_employee = {key: kept for key, slots in self.by_employee.items() if (kept := keep(slots))}
+            live_slots = [slot for slot, alive in enumerate(self.live) if alive]
+            self.slot_doc = array("q", [self.slot_doc[slot] for slot in live_slots])
+            self.slot_length = array("I", [self.slot_length[slot] for slot in live_slots])
+            self.live = bytearray(b"\x01") * len(live_slots)
+            self.doc_slot = {doc_id: slot for slot, doc_id in enumerate(self.slot_doc)}
+
+    def search(
+        self,
+        query: str,
+        *,
+        manager_id: Any = None,
+        employee_id: Any = None,
+        limit: int = 20,
+    ) -> List[Tuple[int, float]]:
+        """
+        Returns up to `limit` (doc_id, score) pairs, best first. Passing manager_id or
+        employee_id restricts the search to that person's documents.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+
+        with self._lock:
+            n = len(self.doc_slot)
+            if n == 0:
+                return []
+            average_length = self.total_length / n
+            k1, b = self.k1, self.b
+            live, slot_length = self.live, self.slot_length
+
+            scope: Optional[array] = None
+            if manager_id is not None:
+                scope = self.by_manager.get(manager_id, array("I"))
+            elif employee_id is not None:
+                scope = self.by_employee.get(employee_id, array("I"))
+
+            scores: Dict[int, float] = {}
+            for term in terms:
+                posting = self.postings.get(term)
+                if not posting:
+                    continue
+                slots, tfs = posting
+                # Dead slots are in both counts, so idf stays positive before compaction.
+                df = len(slots)
+                idf = math.log(1 + (len(slot_length) - df + 0.5) / (df + 0.5))
+                if scope is None:
+                    matches: Iterable[Tuple[int, int]] = zip(slots, tfs)
+                else:
+                    matches = _intersect(scope, slots, tfs)
+                for slot, tf in matches:
+                    if live[slot]:
+                        norm = k1 * (1 - b + b * slot_length[slot] / average_length)
+                        scores[slot] = scores.get(slot, 0.0) + idf * tf * (k1 + 1) / (tf + norm)
+
+            top = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+            return [(self.slot_doc[slot], score) for slot, score in top]
+
+
+def _intersect(scope: array, slots: array, tfs: array) -> Iterator[Tuple[int, int]]:
+    """Yields (slot, tf) for the slots of `scope` that occur in the sorted posting."""
+    if len(scope) * 8 < len(slots):
+        # Few of the caller's documents against a long posting list: binary search.
+        for slot in scope:
+            position = bisect_left(slots, slot)
+            if position < len(slots) and slots[position] == slot:
+                yield slot, tfs[position]
+    else:
+        wanted = set(scope)
+        for slot, tf in zip(slots, tfs):
+            if slot in wanted:
+                yield slot, tf
+
+
+# --- The process-wide index ---
+
+_index = InvertedIndex()
+_index_lock = threading.Lock()
+_loaded_at: Optional[float] = None
+_refreshed_at = 0.0
+# Highest id read from the database: where the next refresh starts. Rows added by
+# this worker's events don't move it; another worker may have committed a lower id
+# that no event here will report.
+_fetched_id = 0
+
+
+def _fetch_rows(db: Database, *, after_id: int = 0) -> Iterable[Dict[str, Any]]:
+    """Pages through feedback rows with id > after_id, in id order."""
+    while True:
+        response = (
+            db.table("feedback").select(INDEX_COLUMNS)
+            .gt("id", after_id).order("id").limit(PAGE_SIZE).execute()
+        )
+        rows = response.data or []
+        yield from rows
+        if len(rows) < PAGE_SIZE:
+            return
+        after_id = rows[-1]["id"]
+
+
+def _load_rows(db: Database, index: InvertedIndex, *, after_id: int = 0) -> int:
+    """Adds rows with id > after_id to `index`. Returns the highest id read, the next cursor."""
+    for row in _fetch_rows(db, after_id=after_id):
+        index.add(row)
+        after_id = max(after_id, row["id"])
+    return after_id
+
+
+def build_index(db: Database) -> InvertedIndex:
+    index = InvertedIndex()
+    _load_rows(db, index)
+    return index
+
+
+def ensure_index(db: Database) -> InvertedIndex:
+    """
+    Returns the index, loading it on first use and catching up with other workers'
+    writes when the refresh or rebuild interval has passed.
+    """
+    global _index, _loaded_at, _refreshed_at, _fetched_id
+    now = time.monotonic()
+    rebuild_due = _loaded_at is None or (
+        settings.SEARCH_INDEX_REBUILD_SECONDS and now - _loaded_at > settings.SEARCH_INDEX_REBUILD_SECONDS
+    )
+    refresh_due = now - _refreshed_at > settings.SEARCH_INDEX_REFRESH_SECONDS
+    if not (rebuild_due or refresh_due):
+        return _index
+
+    # Only the first load makes searches wait: after that, one request does the work
+    # and the others keep searching the current index until the new one is swapped in.
+    if not _index_lock.acquire(blocking=_loaded_at is None):
+        return _index
+    try:
+        # Another thread may have done the work while this one waited.
+        now = time.monotonic()
+        if _loaded_at is None or (
+            settings.SEARCH_INDEX_REBUILD_SECONDS and now - _loaded_at > settings.SEARCH_INDEX_REBUILD_SECONDS
+        ):
+            # Built off to the side and swapped in. Events published during the build
+            # go to the old index; the catch-up below picks up any rows they added.
+            fresh = InvertedIndex()
+            fetched_id = _load_rows(db, fresh)
+            fetched_id = _load_rows(db, fresh, after_id=fetched_id)
+            _index, _loaded_at, _refreshed_at, _fetched_id = fresh, now, now, fetched_id
+        elif now - _refreshed_at > settings.SEARCH_INDEX_REFRESH_SECONDS:
+            _fetched_id = _load_rows(db, _index, after_id=_fetched_id)
+            _refreshed_at = now
+    finally:
+        _index_lock.release()
+    return _index
+
+
+def _on_feedback_written(row: Dict[str, Any]) -> None:
+    # Until the first search loads the index there is nothing to keep current.
+    if _loaded_at is not None and all(field in row for field in ("id", "manager_id", "employee_id")):
+        _index.add(row)
+
+
+def _on_feedback_archived(row: Dict[str, Any]) -> None:
+    if _loaded_at is not None:
+        _index.remove(row["id"])
+
+
+events.subscribe("feedback.created", _on_feedback_written)
+events.subscribe("feedback.updated", _on_feedback_written)
+events.subscribe("feedback.archived", _on_feedback_archived)
+
+
+# --- Search ---
+
+def _ranked_ids(db: Database, *, q: str, user: Dict[str, Any], limit: int) -> List[Tuple[int, float]]:
+    scope = {"manager_id": user["id"]} if user.get("role") == "manager" else {"employee_id": user["id"]}
+
+    if settings.SEARCH_BACKEND == "postgres":
+        response = db.rpc("search_feedback", {
+            "query": q,
+            "viewer_manager_id": scope.get("manager_id"),
+            "viewer_employee_id": scope.get("employee_id"),
+            "max_results": limit,
+        }).execute()
+        return [(hit["id"], hit["score"]) for hit in response.data or []]
+
+    return ensure_index(db).search(q, limit=limit, **scope)
+
+
+def search_feedback(db: Database, *, q: str, user: Dict[str, Any], limit: int = 20) -> List[Dict[str, Any]]:
+    """
+    Returns the caller's feedback matching `q`, best match first, each row with a
+    `score` and the same embedded manager, employee and tags as GET /v1/feedback.
+    """
+    hits = _ranked_ids(db, q=q, user=user, limit=limit)
+    if not hits:
+        return []
+
+    response = db.table("feedback").select(FEEDBACK_SELECT).in_("id", [doc_id for doc_id, _ in hits]).execute()
+    rows = {row["id"]: row for row in response.data or []}
+    results = []
+    for doc_id, score in hits:
+        # A row can vanish between ranking and fetching; skip it.
+        if doc_id in rows:
+            results.append({**rows[doc_id], "score": round(score, 4)})
+    return results
@@ -0,0 +1,341 @@
+"""
+Similar-feedback lookup and near-duplicate detection.
+
+Each feedback row is embedded locally (no external service) as a signed, hashed
+bag of word unigrams, word bigrams and character trigrams, L2-normalised, so the
+dot product of two embeddings is their cosine similarity. A team's embeddings live
+in one contiguous float32 NumPy matrix, and a lookup scores the whole team with a
+single matrix-vector product followed by an argpartition top-k.
+
+A team's feedback is all written by its manager, so matrices are keyed by
+manager_id. They load on first use, are kept current by the feedback.created/
+updated/archived events this process publishes, and are reloaded after
+SIMILARITY_INDEX_TTL_SECONDS to pick up other workers' writes. At most
+SIMILARITY_MAX_TEAMS teams are held per worker.
+
+With SIMILARITY_LSH enabled, teams with at least SIMILARITY_LSH_MIN_ROWS rows
+also keep MinHash signatures in banded LSH buckets; the near-duplicate check then
+only scores rows that share a bucket with the new feedback instead of the whole
+matrix.
+"""
+import functools
+import re
+import threading
+import zlib
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from app.core import events
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.crud.crud_feedback import FEEDBACK_SELECT
+from app.db.base import Database
+from app.services.search_service import INDEX_COLUMNS, PAGE_SIZE, SEARCH_FIELDS
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+# Relative weight of each kind of feature in an embedding.
+WORD_WEIGHT = 1.0
+BIGRAM_WEIGHT = 1.0
+TRIGRAM_WEIGHT = 0.5
+
+# MinHash/LSH: 16 bands of 4 rows puts the 50% detection point near Jaccard 0.5
+# on word 3-shingles, well below the similarity of an actual near-duplicate.
+LSH_BANDS = 16
+LSH_ROWS = 4
+_MINHASH_PRIME = 4294967291  # Largest prime below 2**32; a*h + b stays inside uint64
+
+
+def _text(row: Dict[str, Any]) -> str:
+    return " ".join(row.get(field) or "" for field in SEARCH_FIELDS).lower()
+
+
+@functools.lru_cache(maxsize=65536)
+def _word_features(word: str) -> Tuple[Tuple[int, ...], Tuple[float, ...]]:
+    """Hashes and weights of a word and its character trigrams (cached: vocabularies are small)."""
+    # Character trigrams make "communicates" and "communication" overlap.
+    padded = f"<{word}>"
+    grams = [padded[j:j + 3] for j in range(len(padded) - 2)]
+    hashes = (zlib.crc32(word.encode()),) + tuple(zlib.crc32(gram.encode()) for gram in grams)
+    return hashes, (WORD_WEIGHT,) + (TRIGRAM_WEIGHT,) * len(grams)
+
+
+def embed(text: str, dimensions: int):
+    """
+    Returns the unit-length embedding of `text` as a float32 vector (all zeros for
+    text with no words). `dimensions` must be a power of two.
+    """
+    import numpy as np
+
+    words = _WORD.findall(text.lower())
+    vector = np.zeros(dimensions, dtype=np.float32)
+    if not words:
+        return vector
+
+    # crc32 rather than hash(): str hashes are salted per process, and the
+    # embeddings must agree across workers and restarts.
+    hashes: List[int] = []
+    weights: List[float] = []
+    for i, word in enumerate(words):
+        word_hashes, word_weights = _word_features(word)
+        hashes.extend(word_hashes)
+        weights.extend(word_weights)
+        if i:
+            hashes.append(zlib.crc32(f"{words[i - 1]} {word}".encode()))
+            weights.append(BIGRAM_WEIGHT)
+
+    hashed = np.array(hashes, dtype=np.uint32)
+    signs = np.where(hashed >> np.uint32(31), -1.0, 1.0)
+    summed = np.bincount(hashed & np.uint32(dimensions - 1), weights=signs * weights, minlength=dimensions)
+    # Sublinear term frequency, so a word repeated ten times doesn't dominate.
+    vector[:] = np.sign(summed) * np.log1p(np.abs(summed))
+    norm = np.linalg.norm(vector)
+    if norm:
+        vector /= norm
+    return vector
+
+
+def _minhash(text: str, a, b):
+    """MinHash signature of the word 3-shingles of `text`, one value per (a, b) pair."""
+    import numpy as np
+
+    words = _WORD.findall(text.lower())
+    shingles = [" ".join(words[i:i + 3]).encode() for i in range(max(len(words) - 2, 1))]
+    hashes = np.fromiter((zlib.crc32(s) for s in shingles), dtype=np.uint64, count=len(shingles))
+    return ((a[:, None] * hashes[None, :] + b[:, None]) % _MINHASH_PRIME).min(axis=1)
+
+
+class TeamIndex:
+    """
+    The embeddings of one team's feedback.
+
+    Rows are appended to a preallocated matrix that doubles when full, so adding
+    feedback is amortised O(dimensions). An update overwrites its row in place; a
+    removed row is zeroed and marked dead rather than compacted, since teams
+    rarely delete feedback.
+    """
+
+    def __init__(self, dimensions: int, capacity: int = 64, lsh: bool = False) -> None:
+        import numpy as np
+
+        self.dimensions = dimensions
+        self.matrix = np.zeros((capacity, dimensions), dtype=np.float32)
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.live = np.zeros(capacity, dtype=bool)
+        self.row_of: Dict[int, int] = {}
+        self.size = 0
+        self._lock = threading.Lock()
+
+        self.lsh = lsh
+        if lsh:
+            rng = np.random.default_rng(0)  # Fixed, so signatures are comparable across reloads
+            count = LSH_BANDS * LSH_ROWS
+            self._a = rng.integers(1, _MINHASH_PRIME, size=count, dtype=np.uint64)
+            self._b = rng.integers(0, _MINHASH_PRIME, size=count, dtype=np.uint64)
+            self._buckets: Dict[Tuple[int, bytes], Set[int]] = {}
+            self._row_buckets: Dict[int, List[Tuple[int, bytes]]] = {}
+
+    def __len__(self) -> int:
+        return len(self.row_of)
+
+    def _bucket_keys(self, text: str) -> List[Tuple[int, bytes]]:
+        signature = _minhash(text, self._a, self._b)
+        return [
+            (band, signature[band * LSH_ROWS:(band + 1) * LSH_ROWS].tobytes())
+            for band in range(LSH_BANDS)
+        ]
+
+    def add(self, row: Dict[str, Any]) -> None:
+        """Embeds a feedback row, replacing any previous version of it."""
+        import numpy as np
+
+        text = _text(row)
+        vector = embed(text, self.dimensions)
+        keys = self._bucket_keys(text) if self.lsh else None
+        with self._lock:
+            slot = self.row_of.get(row["id"])
+            if slot is None:
+                if self.size == len(self.ids):
+                    capacity = 2 * len(self.ids)
+                    matrix = np.zeros((capacity, self.dimensions), dtype=np.float32)
+                    matrix[:self.size] = self.matrix[:self.size]
+                    self.matrix = matrix
+                    grow = capacity - self.size
+                    self.ids = np.concatenate([self.ids, np.zeros(grow, dtype=np.int64)])
+                    self.live = np.concatenate([self.live, np.zeros(grow, dtype=bool)])
+                slot = self.size
+                self.size += 1
+                self.row_of[row["id"]] = slot
+                self.ids[slot] = row["id"]
+            self.matrix[slot] = vector
+            self.live[slot] = True
+            if keys is not None:
+                self._unbucket(slot)
+                for key in keys:
+                    self._buckets.setdefault(key, set()).add(slot)
+                self._row_buckets[slot] = keys
+
+    def remove(self, feedback_id: int) -> None:
+        with self._lock:
+            slot = self.row_of.pop(feedback_id, None)
+            if slot is None:
+                return
+            self.matrix[slot] = 0.0
+            self.live[slot] = False
+            if self.lsh:
+                self._unbucket(slot)
+
+    def _unbucket(self, slot: int) -> None:
+        for key in self._row_buckets.pop(slot, ()):
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.discard(slot)
+                if not bucket:
+                    del self._buckets[key]
+
+    def vector(self, feedback_id: int):
+        slot = self.row_of.get(feedback_id)
+        return None if slot is None else self.matrix[slot].copy()
+
+    def candidates(self, text: str) -> List[int]:
+        """Slots sharing at least one LSH bucket with `text`."""
+        found: Set[int] = set()
+        for key in self._bucket_keys(text):
+            found |= self._buckets.get(key, set())
+        return sorted(found)
+
+    def top_k(
+        self,
+        vector,
+        k: int,
+        *,
+        exclude_id: Optional[int] = None,
+        min_score: float = 0.0,
+        slots: Optional[List[int]] = None,
+    ) -> List[Tuple[int, float]]:
+        """
+        The `k` most similar live rows to `vector` as (feedback_id, cosine) pairs,
+        best first. `slots` restricts scoring to those rows (the LSH candidates).
+        """
+        import numpy as np
+
+        with self._lock:
+            if slots is None:
+                scores = self.matrix[:self.size] @ vector
+                live = self.live[:self.size].copy()
+                ids = self.ids[:self.size].copy()
+            else:
+                picked = np.asarray(slots, dtype=np.intp)
+                scores = self.matrix[picked] @ vector
+                live = self.live[picked]
+                ids = self.ids[picked]
+        if exclude_id is not None:
+            live &= ids != exclude_id
+        live &= scores >= min_score
+        candidates = np.flatnonzero(live)
+        if not len(candidates) or k <= 0:
+            return []
+        if len(candidates) > k:
+            # O(n) selection of the top k, then sort only those.
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(int(ids[i]), float(scores[i])) for i in candidates]
+
+
+# --- Per-team indexes ---
+
+_indexes: "LRUCache[TeamIndex]" = LRUCache(
+    maxsize=settings.SIMILARITY_MAX_TEAMS, ttl=settings.SIMILARITY_INDEX_TTL_SECONDS
+)
+_load_lock = threading.Lock()
+
+
+def _fetch_team_rows(db: Database, manager_id: int):
+    """Pages through the feedback written by `manager_id`, in id order."""
+    after_id = 0
+    while True:
+        response = (
+            db.table("feedback").select(INDEX_COLUMNS)
+            .eq("manager_id", manager_id).gt("id", after_id).order("id").limit(PAGE_SIZE).execute()
+        )
+        rows = response.data or []
+        yield from rows
+        if len(rows) < PAGE_SIZE:
+            return
+        after_id = rows[-1]["id"]
+
+
+def build_team_index(db: Database, manager_id: int) -> TeamIndex:
+    rows = list(_fetch_team_rows(db, manager_id))
+    lsh = settings.SIMILARITY_LSH and len(rows) >= settings.SIMILARITY_LSH_MIN_ROWS
+    index = TeamIndex(settings.SIMILARITY_DIMENSIONS, capacity=max(64, len(rows)), lsh=lsh)
+    for row in rows:
+        index.add(row)
+    return index
+
+
+def ensure_team_index(db: Database, manager_id: int) -> TeamIndex:
+    index = _indexes.get(manager_id)
+    if index is not None:
+        return index
+    with _load_lock:
+        # Another thread may have loaded it while this one waited.
+        index = _indexes.get(manager_id)
+        if index is None:
+            index = build_team_index(db, manager_id)
+            _indexes.set(manager_id, index)
+    return index
+
+
+def _on_feedback_written(row: Dict[str, Any]) -> None:
+    # Teams that aren't loaded will read the row from the database when they are.
+    index = _indexes.get(row.get("manager_id"))
+    if index is not None and "id" in row:
+        index.add(row)
+
+
+def _on_feedback_archived(row: Dict[str, Any]) -> None:
+    index = _indexes.get(row.get("manager_id"))
+    if index is not None:
+        index.remove(row["id"])
+
+
+events.subscribe("feedback.created", _on_feedback_written)
+events.subscribe("feedback.updated", _on_feedback_written)
+events.subscribe("feedback.archived", _on_feedback_archived)
+
+
+# --- Lookups ---
+
+def similar_feedback(db: Database, *, feedback: Dict[str, Any], limit: int = 5) -> List[Dict[str, Any]]:
+    """
+    Returns the team's feedback most similar to `feedback`, best first, each row
+    with a `score` (cosine similarity) and the same embedded manager, employee and
+    tags as GET /v1/feedback. Matches below SIMILARITY_MIN_SCORE are left out.
+    """
+    index = ensure_team_index(db, feedback["manager_id"])
+    vector = index.vector(feedback["id"])
+    if vector is None:
+        vector = embed(_text(feedback), index.dimensions)
+    hits = index.top_k(vector, limit, exclude_id=feedback["id"], min_score=settings.SIMILARITY_MIN_SCORE)
+    if not hits:
+        return []
+
+    response = db.table("feedback").select(FEEDBACK_SELECT).in_("id", [doc_id for doc_id, _ in hits]).execute()
+    rows = {row["id"]: row for row in response.data or []}
+    return [{**rows[doc_id], "score": round(score, 4)} for doc_id, score in hits if doc_id in rows]
+
+
+def near_duplicates(db: Database, *, feedback: Dict[str, Any], limit: int = 5) -> List[Tuple[int, float]]:
+    """
+    Ids and scores of the team's other feedback whose similarity to `feedback` is
+    at least NEAR_DUPLICATE_THRESHOLD, best first.
+    """
+    index = ensure_team_index(db, feedback["manager_id"])
+    text = _text(feedback)
+    vector = index.vector(feedback["id"])
+    if vector is None:
+        vector = embed(text, index.dimensions)
+    slots = index.candidates(text) if index.lsh else None
+    return index.top_k(
+        vector, limit, exclude_id=feedback["id"], min_score=settings.NEAR_DUPLICATE_THRESHOLD, slots=slots
+    )
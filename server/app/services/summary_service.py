@@ -0,0 +1,141 @@
+"""
+Narrative summaries of a feedback history, built map-reduce style.
+
+The history (oldest first) is packed into chunks of at most AI_SUMMARY_CHUNK_TOKENS
+estimated tokens. Each chunk is summarized by Gemini (map), up to
+AI_SUMMARY_PARALLELISM at a time in the llm pool, and the chunk summaries are
+combined in a final call (reduce). If the summaries themselves exceed the budget
+they are chunked and combined again, so any history size fits the model's context.
+Once a round can't pack them any tighter, or after AI_SUMMARY_MAX_REDUCE_ROUNDS,
+the rest are cut to an equal share of the budget and combined in one last call.
+
+Everything is awaited: the calls run in the llm pool and the request holds no
+thread while it waits for them.
+
+Chunk summaries are cached by a hash of the chunk's text. Because chunks are packed
+oldest first, new feedback only changes the last chunk: a repeat summary costs one
+map call for that chunk plus the reduce.
+"""
+import asyncio
+import functools
+import hashlib
+from typing import Any, Callable, Dict, List, Tuple
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.core.executors import bulkheads
+from app.services import gemini_service
+
+# Rough size of a token in characters for English text. Only used to keep prompts
+# well inside the context window, so an estimate is enough (and needs no API call).
+CHARS_PER_TOKEN = 4
+
+# Bump when the prompts change so cached summaries from the old ones aren't reused.
+PROMPT_VERSION = "1"
+
+_summaries: "LRUCache[str]" = LRUCache(maxsize=settings.AI_SUMMARY_CACHE_SIZE)
+
+
+def format_entry(feedback: Dict[str, Any]) -> str:
+    """One feedback row as a line of prompt text."""
+    date = (feedback.get('created_at') or '')[:10] or 'undated'
+    employee = (feedback.get('employee') or {}).get('full_name', 'an employee')
+    parts = [f"[{date}] To {employee} ({feedback.get('sentiment') or 'unknown'} sentiment): {feedback.get('feedback') or ''}"]
+    if feedback.get('strengths'):
+        parts.append(f"Strengths: {feedback['strengths']}")
+    if feedback.get('areas_for_improvement'):
+        parts.append(f"Areas for improvement: {feedback['areas_for_improvement']}")
+    return " ".join(parts)
+
+
+def chunk_texts(texts: List[str], max_tokens: int) -> List[str]:
+    """
+    Packs texts, in order, into newline-joined chunks of at most `max_tokens`
+    estimated tokens. A single text longer than that is truncated to fit.
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    chunks: List[str] = []
+    current: List[str] = []
+    size = 0
+    for text in texts:
+        text = text[:max_chars]
+        if current and size + len(text) + 1 > max_chars:
+            chunks.append("\n".join(current))
+            current, size = [], 0
+        current.append(text)
+        size += len(text) + 1
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+def _key(step: str, text: str) -> str:
+    return hashlib.sha256(f"{PROMPT_VERSION}:{step}:{text}".encode()).hexdigest()
+
+
+async def _generate_all(step: str, generate: Callable[[str], str], texts: List[str]) -> Tuple[List[str], int]:
+    """
+    Runs `generate` on every text not already in the cache, AI_SUMMARY_PARALLELISM
+    at a time in the llm pool. Returns the outputs in order and how many were cached.
+    """
+    outputs: Dict[str, str] = {}
+    for text in texts:
+        cached = _summaries.get(_key(step, text))
+        if cached is not None:
+            outputs[text] = cached
+    missing = [text for text in dict.fromkeys(texts) if text not in outputs]
+
+    slots = asyncio.Semaphore(settings.AI_SUMMARY_PARALLELISM)
+
+    async def run(text: str) -> None:
+        async with slots:
+            output = await bulkheads["llm"].run_async(generate, text)
+        _summaries.set(_key(step, text), output)
+        outputs[text] = output
+
+    tasks = [asyncio.ensure_future(run(text)) for text in missing]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        # After a failure, the calls that haven't started yet never do.
+        for task in tasks:
+            task.cancel()
+    return [outputs[text] for text in texts], len(texts) - len(missing)
+
+
+def _squeeze(texts: List[str], max_tokens: int) -> str:
+    """All of `texts` in one chunk, each cut to an equal share of `max_tokens`."""
+    share = max_tokens * CHARS_PER_TOKEN // len(texts) - 1
+    return "\n".join(text[:share] for text in texts)
+
+
+async def summarize_feedback(feedback_list: List[Dict[str, Any]], *, subject: str) -> Dict[str, Any]:
+    """
+    Summarizes `feedback_list` (any order; it is sorted oldest first). Returns the
+    summary with the number of entries, map chunks and chunk summaries served from
+    the cache.
+    """
+    rows = sorted(feedback_list, key=lambda row: (row.get('created_at') or '', row.get('id') or 0))
+    chunks = chunk_texts([format_entry(row) for row in rows], settings.AI_SUMMARY_CHUNK_TOKENS)
+    summaries, cached = await _generate_all("map", gemini_service.summarize_feedback_chunk, chunks)
+
+    # Reduce, in more than one round if the summaries don't fit in one prompt.
+    combine = functools.partial(gemini_service.combine_feedback_summaries, subject=subject)
+    rounds = 0
+    while summaries:
+        rounds += 1
+        groups = chunk_texts(summaries, settings.AI_SUMMARY_CHUNK_TOKENS)
+        if len(groups) > 1 and (len(groups) == len(summaries) or rounds >= settings.AI_SUMMARY_MAX_REDUCE_ROUNDS):
+            # Another round wouldn't shrink the list (each summary fills most of a
+            # prompt) or this is the last one allowed: combine everything at once.
+            groups = [_squeeze(summaries, settings.AI_SUMMARY_CHUNK_TOKENS)]
+        summaries, _ = await _generate_all(f"reduce:{subject}", combine, groups)
+        if len(summaries) == 1:
+            break
+
+    return {
+        "summary": summaries[0] if summaries else "",
+        "feedback_count": len(rows),
+        "chunks": len(chunks),
+        "cached_chunks": cached,
+    }
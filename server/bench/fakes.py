@@ -0,0 +1,118 @@
+"""
+Local stand-ins for the external services, used by the benchmark harness.
+"""
+import random
+import time
+from typing import Any, Dict, List
+
+from app.db.memory import MemoryClient
+
+TAG_NAMES = [
+    "Leadership", "Communication", "Teamwork", "Technical Skills",
+    "Problem Solving", "Creativity", "Time Management", "Adaptability",
+]
+
+WORDS = (
+    "delivered shipped owned mentored clarified improved documented reviewed planned "
+    "estimated communicated escalated collaborated unblocked tested refactored designed "
+    "presented negotiated prioritised deadline project customer quality release sprint "
+    "meeting roadmap incident stakeholder feature backlog metrics onboarding"
+).split()
+
+
+class FakeResponse:
+    def __init__(self, text: str) -> None:
+        self.text = text
+
+
+class FakeGenerativeModel:
+    """
+    Mimics google.generativeai.GenerativeModel.generate_content with a configurable
+    latency (mean plus uniform jitter) and canned, prompt-appropriate answers.
+    """
+
+    def __init__(self, latency: float = 0.5, jitter: float = 0.0, seed: int = 0) -> None:
+        self.latency = latency
+        self.jitter = jitter
+        self.calls = 0
+        self._random = random.Random(seed)
+
+    def generate_content(self, prompt: str, **kwargs: Any) -> FakeResponse:
+        self.calls += 1
+        delay = self.latency + self._random.uniform(0, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+        if "Respond with only one word" in prompt:
+            return FakeResponse("positive")
+        if "comma-separated list of the tag names" in prompt:
+            return FakeResponse(", ".join(self._random.sample(TAG_NAMES, 2)))
+        return FakeResponse(" ".join(self._random.choices(WORDS, k=80)))
+
+
+def sentence(rng: random.Random, words: int = 20) -> str:
+    return " ".join(rng.choices(WORDS, k=words)).capitalize() + "."
+
+
+def seed_database(
+    client: MemoryClient,
+    *,
+    hashed_password: str,
+    teams: int = 5,
+    employees_per_team: int = 10,
+    feedback_per_employee: int = 10,
+    seed: int = 0,
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Populates the in-memory database with managers, teams, employees, tags and feedback.
+    Everything is written through the same builder API the CRUD layer uses.
+    Returns the created managers and employees so the harness can issue tokens for them.
+    """
+    rng = random.Random(seed)
+    tags = client.table("tags").insert([{"name": name} for name in TAG_NAMES]).execute().data
+    managers, employees = [], []
+    feedback_rows, feedback_tag_rows = [], []
+
+    for team_index in range(teams):
+        manager = client.table("users").insert({
+            "email": f"manager{team_index}@example.com",
+            "full_name": f"Manager {team_index}",
+            "role": "manager",
+            "hashed_password": hashed_password,
+        }).execute().data[0]
+        team = client.table("teams").insert({
+            "name": f"Team {team_index}", "manager_id": manager["id"],
+        }).execute().data[0]
+        manager = client.table("users").update({"team_id": team["id"]}).eq("id", manager["id"]).execute().data[0]
+        managers.append(manager)
+
+        members = client.table("users").insert([
+            {
+                "email": f"employee{team_index}-{n}@example.com",
+                "full_name": f"Employee {team_index}-{n}",
+                "role": "employee",
+                "hashed_password": hashed_password,
+                "team_id": team["id"],
+            }
+            for n in range(employees_per_team)
+        ]).execute().data
+        employees.extend(members)
+
+        for member in members:
+            for _ in range(feedback_per_employee):
+                feedback_rows.append({
+                    "employee_id": member["id"],
+                    "manager_id": manager["id"],
+                    "strengths": sentence(rng),
+                    "areas_for_improvement": sentence(rng),
+                    "feedback": sentence(rng, 60),
+                    "sentiment": rng.choice(["positive", "neutral", "negative"]),
+                })
+
+    if feedback_rows:
+        created = client.table("feedback").insert(feedback_rows).execute().data
+        for row in created:
+            for tag in rng.sample(tags, 2):
+                feedback_tag_rows.append({"feedback_id": row["id"], "tag_id": tag["id"]})
+        client.table("feedback_tags").insert(feedback_tag_rows).execute()
+
+    return {"managers": managers, "employees": employees, "tags": tags}
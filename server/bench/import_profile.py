@@ -0,0 +1,78 @@
+"""
+Measures the cost of importing the application, which every worker pays on start.
+
+Runs `python -X importtime -c "import app.main"` in fresh interpreters and reports
+the median total plus the most expensive top-level imports of the last run.
+
+Usage (from the server/ directory):
+    python -m bench.import_profile
+    python -m bench.import_profile --runs 10 --top 25 --module app.main
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+# Same placeholders as bench.run: settings must load, nothing is contacted.
+PLACEHOLDER_ENV = {
+    "SUPABASE_URL": "http://localhost:54321",
+    "SUPABASE_KEY": "benchmark-key",
+    "SECRET_KEY": "benchmark-secret",
+    "ALGORITHM": "HS256",
+    "ACCESS_TOKEN_EXPIRE_MINUTES": "60",
+    "GEMINI_API_KEY": "benchmark-key",
+}
+
+
+def profile_once(module: str) -> Tuple[int, List[Tuple[int, int, str]]]:
+    """
+    Imports `module` in a fresh interpreter and returns its cumulative import time in
+    microseconds plus (cumulative_us, depth, name) for every module imported.
+    """
+    env = {**PLACEHOLDER_ENV, **os.environ}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=env, check=True,
+    )
+    entries, total = [], 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append((int(cumulative), depth, name.strip()))
+        if name.strip() == module:
+            total = int(cumulative)
+    return total, entries
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    totals, entries = [], []
+    for _ in range(args.runs):
+        total, entries = profile_once(args.module)
+        totals.append(total)
+
+    print(f"import {args.module}: median {statistics.median(totals) / 1000:.0f} ms over {args.runs} runs "
+          f"(min {min(totals) / 1000:.0f} ms, max {max(totals) / 1000:.0f} ms)\n")
+
+    # Show the heaviest imports near the top of the tree; deeper entries are already
+    # included in their parents' cumulative time.
+    shallow: Dict[str, int] = {}
+    for cumulative, depth, name in entries:
+        if 1 <= depth <= 3 and name != args.module:
+            shallow[name] = max(shallow.get(name, 0), cumulative)
+    print(f"{'cumulative ms':>14}  module")
+    for name, cumulative in sorted(shallow.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"{cumulative / 1000:>14.1f}  {name}")
+
+
+if __name__ == "__main__":
+    main()
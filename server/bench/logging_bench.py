@@ -0,0 +1,126 @@
+"""
+Cost of logging on the request path.
+
+Times logger.info() calls as the request thread sees them, with the records
+written to a file:
+- inline:       a StreamHandler with the old text format, as logging.basicConfig set up
+- queue:        app/core/logging_config.py's queue handler with JSON in the writer thread
+- queue+sample: the same with the logger sampled at --sample-rate
+
+--sink-latency adds a delay to every write, as a slow disk or a full stderr pipe
+to a log shipper would; inline logging pays it in the request, the queue doesn't.
+Reports per-call latency percentiles and how long the writer took to drain.
+
+Usage (from the server/ directory):
+    python -m bench.logging_bench
+    python -m bench.logging_bench --records 50000 --sink-latency 0.2
+"""
+import argparse
+import logging
+import logging.handlers
+import os
+import queue
+import statistics
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+for _name, _value in {
+    "SECRET_KEY": "benchmark-secret",
+    "ALGORITHM": "HS256",
+    "ACCESS_TOKEN_EXPIRE_MINUTES": "60",
+    "GEMINI_API_KEY": "benchmark-key",
+}.items():
+    os.environ.setdefault(_name, _value)
+
+from app.core import logging_config  # noqa: E402
+
+
+class SlowStreamHandler(logging.StreamHandler):
+    def __init__(self, stream, latency: float) -> None:
+        super().__init__(stream)
+        self.latency = latency
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if self.latency:
+            time.sleep(self.latency)
+        super().emit(record)
+
+
+def run(mode: str, args: argparse.Namespace, path: str) -> Dict[str, float]:
+    logger = logging.getLogger(f"bench.{mode}")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    sink = open(path, "w")
+    stream = SlowStreamHandler(sink, args.sink_latency / 1000)
+    listener: Optional[logging.handlers.QueueListener] = None
+
+    if mode == "inline":
+        stream.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+        logger.addHandler(stream)
+    else:
+        stream.setFormatter(logging_config.JsonFormatter())
+        handler = logging_config.NonBlockingQueueHandler(queue.Queue(maxsize=args.queue_size))
+        handler.addFilter(logging_config.RequestIdFilter())
+        if mode == "queue+sample":
+            handler.addFilter(logging_config.SamplingFilter({logger.name: args.sample_rate}))
+        logger.addHandler(handler)
+        listener = logging.handlers.QueueListener(handler.queue, stream)
+        listener.start()
+
+    token = logging_config.request_id.set(None)
+    timings: List[float] = []
+    try:
+        for n in range(args.records):
+            if mode == "queue+sample":
+                # A new "request" every 10 records, as sampling is decided per request id.
+                logging_config.request_id.set(f"req-{n // 10}")
+            start = time.perf_counter()
+            logger.info("Feedback %s listed for user %s", n, n % 97, extra={"count": 25, "route": "/v1/feedback/"})
+            timings.append(time.perf_counter() - start)
+        drain_start = time.perf_counter()
+        if listener is not None:
+            listener.stop()
+        drain = time.perf_counter() - drain_start
+    finally:
+        logging_config.request_id.reset(token)
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+        sink.close()
+
+    timings.sort()
+    with open(path) as written:
+        lines = sum(1 for _ in written)
+    return {
+        "mean_us": statistics.fmean(timings) * 1e6,
+        "p50_us": timings[len(timings) // 2] * 1e6,
+        "p99_us": timings[int(len(timings) * 0.99)] * 1e6,
+        "max_us": timings[-1] * 1e6,
+        "drain_s": drain,
+        "written": lines,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=20000)
+    parser.add_argument("--sink-latency", type=float, default=0.0, help="Milliseconds added to every write.")
+    parser.add_argument("--sample-rate", type=float, default=0.1)
+    parser.add_argument("--queue-size", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    print(f"{args.records:,} records, sink latency {args.sink_latency}ms\n")
+    header = f"{'mode':<14}{'mean us':>10}{'p50 us':>10}{'p99 us':>10}{'max us':>11}{'drain s':>10}{'written':>10}"
+    print(header)
+    print("-" * len(header))
+    with tempfile.TemporaryDirectory() as directory:
+        for mode in ("inline", "queue", "queue+sample"):
+            result = run(mode, args, os.path.join(directory, f"{mode}.log"))
+            print(f"{mode:<14}{result['mean_us']:>10.1f}{result['p50_us']:>10.1f}{result['p99_us']:>10.1f}"
+                  f"{result['max_us']:>11.1f}{result['drain_s']:>10.2f}{result['written']:>10,}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+"""
+Size and serialization cost of GET /v1/feedback/ in its two formats.
+
+Builds a manager's feedback list as the database returns it (each row with its
+manager, employee and tags embedded) and turns it into the response body the way
+FastAPI does: validated and serialized through the route's response model, then
+rendered by JSONResponse.
+- nested:  the default format, people and tags inside every row
+- compact: compact=true, rows referencing users and tags sent once
+           (crud_feedback.normalize_feedback, timed as part of the request)
+
+Reports the body size (raw and gzipped) and the time to build it.
+
+Usage (from the server/ directory):
+    python -m bench.payload_bench
+    python -m bench.payload_bench --rows 2000 --employees 40 --tags 12
+"""
+import argparse
+import datetime
+import gzip
+import os
+import random
+import statistics
+import sys
+import time
+from typing import Any, Dict, List
+
+for _name, _value in {
+    "SUPABASE_URL": "http://localhost:54321",
+    "SUPABASE_KEY": "benchmark-key",
+    "SECRET_KEY": "benchmark-secret",
+    "ALGORITHM": "HS256",
+    "ACCESS_TOKEN_EXPIRE_MINUTES": "60",
+    "GEMINI_API_KEY": "benchmark-key",
+}.items():
+    os.environ.setdefault(_name, _value)
+
+from fastapi.responses import JSONResponse  # noqa: E402
+
+from app.crud import crud_feedback  # noqa: E402
+from app.main import app  # noqa: E402
+
+SENTIMENTS = ("positive", "neutral", "negative")
+
+
+def _user(user_id: int, role: str, team_id: int) -> Dict[str, Any]:
+    return {
+        "id": user_id, "email": f"user{user_id}@example.com", "full_name": f"Person Number {user_id}",
+        "role": role, "team_id": team_id, "hashed_password": "$2b$12$" + "x" * 53,
+        "created_at": "2025-01-01T09:00:00+00:00", "updated_at": "2025-01-01T09:00:00+00:00",
+    }
+
+
+def build_rows(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    """A manager's feedback rows, with a fresh copy of each embedded object per row as PostgREST returns them."""
+    rng = random.Random(args.seed)
+    tag_names = [f"tag-{n}" for n in range(args.tags)]
+    start = datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc)
+    rows = []
+    for n in range(args.rows):
+        employee_id = 2 + rng.randrange(args.employees)
+        tag_ids = rng.sample(range(1, args.tags + 1), k=min(args.tags, rng.randint(0, 3)))
+        created = (start + datetime.timedelta(minutes=n * 37)).isoformat()
+        rows.append({
+            "id": n + 1, "manager_id": 1, "employee_id": employee_id,
+            "strengths": "Clear written updates and careful reviews. " * 2,
+            "areas_for_improvement": "Could delegate more of the release work.",
+            "sentiment": rng.choice(SENTIMENTS), "feedback": "Good quarter overall; see the notes above. " * 3,
+            "acknowledged": rng.random() < 0.5, "created_at": created, "updated_at": created,
+            "manager": _user(1, "manager", 1),
+            "employee": _user(employee_id, "employee", 1),
+            "tags": [{"id": tag_id, "name": tag_names[tag_id - 1]} for tag_id in tag_ids],
+        })
+    return rows
+
+
+def _response_field():
+    route = next(route for route in app.routes if getattr(route, "path", None) == "/v1/feedback/" and "GET" in route.methods)
+    return route.response_field
+
+
+def render(field: Any, content: Any) -> bytes:
+    # What fastapi.routing.serialize_response and JSONResponse do with a route's return value.
+    value, errors = field.validate(content, {}, loc=("response",))
+    assert not errors, errors
+    return JSONResponse(field.serialize(value)).body
+
+
+def run(fmt: str, rows: List[Dict[str, Any]], args: argparse.Namespace) -> Dict[str, float]:
+    field = _response_field()
+    timings: List[float] = []
+    body = b""
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        content: Any = crud_feedback.normalize_feedback(rows) if fmt == "compact" else rows
+        body = render(field, content)
+        timings.append(time.perf_counter() - start)
+    return {
+        "bytes": len(body),
+        "gzip_bytes": len(gzip.compress(body, compresslevel=6)),
+        "median_ms": statistics.median(timings) * 1000,
+        "min_ms": min(timings) * 1000,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2000, help="Feedback rows in the list.")
+    parser.add_argument("--employees", type=int, default=40, help="Distinct employees the rows are about.")
+    parser.add_argument("--tags", type=int, default=12)
+    parser.add_argument("--repeat", type=int, default=20, help="Timed renders per format.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rows = build_rows(args)
+    print(f"{args.rows:,} rows, {args.employees} employees, {args.tags} tags, {args.repeat} renders\n")
+    header = f"{'format':<10}{'bytes':>12}{'gzip bytes':>12}{'median ms':>11}{'min ms':>9}"
+    print(header)
+    print("-" * len(header))
+    results = {}
+    for fmt in ("nested", "compact"):
+        results[fmt] = result = run(fmt, rows, args)
+        print(f"{fmt:<10}{result['bytes']:>12,}{result['gzip_bytes']:>12,}{result['median_ms']:>11.1f}{result['min_ms']:>9.1f}")
+    nested, compact = results["nested"], results["compact"]
+    print(f"\ncompact is {compact['bytes'] / nested['bytes']:.0%} of the bytes "
+          f"({compact['gzip_bytes'] / nested['gzip_bytes']:.0%} gzipped) "
+          f"in {compact['median_ms'] / nested['median_ms']:.0%} of the time")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""
+Wall-clock scaling of the team PDF export with the number of pdf pool processes.
+
+Builds a synthetic team (default 40 employees with 6 feedback entries each),
+renders it once as the single combined report GET /v1/feedback/export/pdf
+produces, then as the per-employee ZIP from GET /v1/feedback/export/zip with
+1, 2, 4, ... processes up to the machine's core count. Reports total time, time
+to the first ZIP chunk and speedup over one process.
+
+Usage (from the server/ directory):
+    python -m bench.pdf_bench
+    python -m bench.pdf_bench --employees 100 --workers 1 2 4 8
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from typing import Any, Dict, List
+
+for _name, _value in {
+    "SECRET_KEY": "benchmark-secret",
+    "ALGORITHM": "HS256",
+    "ACCESS_TOKEN_EXPIRE_MINUTES": "60",
+    "GEMINI_API_KEY": "benchmark-key",
+}.items():
+    os.environ.setdefault(_name, _value)
+
+from app.core.executors import Bulkhead  # noqa: E402
+from app.services import pdf_service  # noqa: E402
+from bench.fakes import TAG_NAMES, sentence  # noqa: E402
+
+
+def make_feedback(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    rng = random.Random(args.seed)
+    manager = {"id": 1, "full_name": "Morgan Manager"}
+    rows = []
+    for employee_id in range(2, args.employees + 2):
+        employee = {"id": employee_id, "full_name": f"Employee {employee_id}"}
+        for _ in range(args.feedback_per_employee):
+            rows.append({
+                "id": len(rows) + 1,
+                "employee_id": employee_id,
+                "manager": manager,
+                "employee": employee,
+                "created_at": "2025-06-01T09:30:00",
+                "sentiment": rng.choice(["positive", "neutral", "negative"]),
+                "strengths": sentence(rng, 40),
+                "areas_for_improvement": sentence(rng, 40),
+                "feedback": sentence(rng, 120),
+                "tags": [{"name": name} for name in rng.sample(TAG_NAMES, 2)],
+            })
+    return rows
+
+
+def time_zip(rows: List[Dict[str, Any]], workers: int) -> Dict[str, float]:
+    pool = Bulkhead("pdf", "process", workers)
+    pool.prestart()  # Process start-up is a one-off cost in the server, so keep it out
+    try:
+        start = time.perf_counter()
+        first = None
+        size = 0
+        partitions = pdf_service.partition_by_employee(rows)
+        rendered = pool.map_unordered(pdf_service.render_partition, partitions)
+        for chunk in pdf_service.stream_zip(result for _, result in rendered):
+            if first is None and chunk:
+                first = time.perf_counter() - start
+            size += len(chunk)
+        return {"total": time.perf_counter() - start, "first": first or 0.0, "bytes": size}
+    finally:
+        pool.shutdown()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--employees", type=int, default=40)
+    parser.add_argument("--feedback-per-employee", type=int, default=6)
+    parser.add_argument("--workers", type=int, nargs="+", help="Pool sizes to try (default: powers of two up to the core count).")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    workers = args.workers or sorted({1 << n for n in range(cores.bit_length()) if 1 << n <= cores} | {cores})
+    rows = make_feedback(args)
+    print(f"{len(rows):,} feedback entries for {args.employees} employees on {cores} core(s)\n")
+
+    pdf_service.render_feedback_pdf(rows[:1])  # Import reportlab and build the styles first
+    start = time.perf_counter()
+    single = pdf_service.render_feedback_pdf(rows)
+    baseline = time.perf_counter() - start
+    print(f"Single combined PDF (inline): {baseline:.2f}s, {len(single) / 2**20:.1f} MiB\n")
+
+    header = f"{'processes':>10}{'total s':>10}{'first chunk s':>15}{'speedup':>10}{'vs single':>11}"
+    print(header)
+    print("-" * len(header))
+    reference = None
+    for count in workers:
+        result = time_zip(rows, count)
+        reference = reference or result["total"]
+        print(f"{count:>10}{result['total']:>10.2f}{result['first']:>15.2f}"
+              f"{reference / result['total']:>9.2f}x{baseline / result['total']:>10.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
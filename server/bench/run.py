@@ -0,0 +1,302 @@
+"""
+Offline load test for the API.
+
+Drives the FastAPI app in-process (no sockets) against the in-memory database and a
+fake Gemini model, runs each flow at a fixed concurrency and reports latency
+percentiles and throughput. Results can be saved as a named baseline and later runs
+compared against it.
+
+Usage (from the server/ directory):
+    python -m bench.run --concurrency 16 --requests 200
+    python -m bench.run --flows list_feedback,stats --save-baseline main
+    python -m bench.run --compare main --threshold 0.15
+    python -m bench.run --backend postgres --database-url postgresql://localhost/feedback_bench
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List
+
+# The settings object refuses to load without these; the values are never used
+# to contact anything because both external services are replaced below.
+for _name, _value in {
+    "SUPABASE_URL": "http://localhost:54321",
+    "SUPABASE_KEY": "benchmark-key",
+    "SECRET_KEY": "benchmark-secret",
+    "ALGORITHM": "HS256",
+    "ACCESS_TOKEN_EXPIRE_MINUTES": "60",
+    "GEMINI_API_KEY": "benchmark-key",
+    # A handful of seeded managers drive all AI traffic; per-user limits would
+    # turn the ai_generate flow into a 429 benchmark.
+    "AI_USER_RATE_PER_MINUTE": "0",
+    "AI_TEAM_RATE_PER_MINUTE": "0",
+}.items():
+    os.environ.setdefault(_name, _value)
+
+import httpx  # noqa: E402
+
+from app.api import deps  # noqa: E402
+from app.core import security  # noqa: E402
+from app.core.metrics import DB_ROUND_TRIPS  # noqa: E402
+from app.db.instrumented import InstrumentedClient  # noqa: E402
+from app.db.memory import MemoryClient  # noqa: E402
+from app.main import app  # noqa: E402
+from app.services import gemini_service  # noqa: E402
+from bench.fakes import FakeGenerativeModel, seed_database  # noqa: E402
+
+BASELINE_DIR = Path(__file__).parent / "baselines"
+PASSWORD = "benchmark-password"
+
+
+class BenchContext:
+    def __init__(self, client: httpx.AsyncClient, seeded: Dict[str, List[Dict[str, Any]]], seed: int) -> None:
+        self.client = client
+        self.managers = seeded["managers"]
+        self.employees = seeded["employees"]
+        self.tags = seeded["tags"]
+        self.random = random.Random(seed)
+        self.tokens = {
+            user["id"]: security.create_access_token(subject=user["id"])
+            for user in self.managers + self.employees
+        }
+
+    def auth(self, user: Dict[str, Any]) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.tokens[user['id']]}"}
+
+    def manager(self) -> Dict[str, Any]:
+        return self.random.choice(self.managers)
+
+    def employee_of(self, manager: Dict[str, Any]) -> Dict[str, Any]:
+        return self.random.choice([e for e in self.employees if e["team_id"] == manager["team_id"]])
+
+
+# --- Flows: each issues one request and returns the response ---
+
+async def flow_login(ctx: BenchContext) -> httpx.Response:
+    user = ctx.random.choice(ctx.managers + ctx.employees)
+    return await ctx.client.post("/v1/auth/login", data={"username": user["email"], "password": PASSWORD})
+
+
+async def flow_list_feedback(ctx: BenchContext) -> httpx.Response:
+    return await ctx.client.get("/v1/feedback/", headers=ctx.auth(ctx.manager()))
+
+
+async def flow_create_feedback(ctx: BenchContext) -> httpx.Response:
+    manager = ctx.manager()
+    employee = ctx.employee_of(manager)
+    body = {
+        "employee_id": employee["id"],
+        "strengths": "Owns the release process end to end.",
+        "areas_for_improvement": "Share design decisions earlier.",
+        "feedback": "Great quarter; keep writing things down.",
+        "sentiment": "positive",
+        "tag_ids": [ctx.tags[0]["id"]],
+    }
+    return await ctx.client.post("/v1/feedback/", json=body, headers=ctx.auth(manager))
+
+
+async def flow_stats(ctx: BenchContext) -> httpx.Response:
+    return await ctx.client.get("/v1/teams/me/stats", headers=ctx.auth(ctx.manager()))
+
+
+async def flow_ai_generate(ctx: BenchContext) -> httpx.Response:
+    body = {"strengths": "Clear communicator", "areas_for_improvement": "Estimates"}
+    return await ctx.client.post("/v1/ai/generate-feedback", json=body, headers=ctx.auth(ctx.manager()))
+
+
+async def flow_pdf_export(ctx: BenchContext) -> httpx.Response:
+    return await ctx.client.get("/v1/feedback/export/pdf", headers=ctx.auth(ctx.random.choice(ctx.employees)))
+
+
+async def flow_herd(ctx: BenchContext) -> httpx.Response:
+    # Thundering herd: one team opening the app at once. Every request comes from the
+    # same manager and reads the same team and tag lists, so with single-flight
+    # coalescing db/req drops well below the 2 queries each request would make alone.
+    manager = ctx.managers[0]
+    path = ctx.random.choice(["/v1/teams/", "/v1/tags/"])
+    return await ctx.client.get(path, headers=ctx.auth(manager))
+
+
+FLOWS: Dict[str, Callable[[BenchContext], Awaitable[httpx.Response]]] = {
+    "login": flow_login,
+    "list_feedback": flow_list_feedback,
+    "create_feedback": flow_create_feedback,
+    "stats": flow_stats,
+    "ai_generate": flow_ai_generate,
+    "pdf_export": flow_pdf_export,
+    "herd": flow_herd,
+}
+
+
+def db_round_trips() -> float:
+    """Total database round trips recorded so far, across all tables and operations."""
+    return sum(
+        sample.value
+        for metric in DB_ROUND_TRIPS.collect()
+        for sample in metric.samples
+        if sample.name.endswith("_total")
+    )
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def run_flow(ctx: BenchContext, flow: str, *, concurrency: int, requests: int, model: FakeGenerativeModel) -> Dict[str, Any]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+    db_before, llm_before = db_round_trips(), model.calls
+
+    async def one() -> None:
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            response = await FLOWS[flow](ctx)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    wall = time.perf_counter() - wall_start
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "rps": requests / wall if wall else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "db_calls_per_request": (db_round_trips() - db_before) / requests,
+        "llm_calls_per_request": (model.calls - llm_before) / requests,
+    }
+
+
+def print_report(results: Dict[str, Dict[str, Any]]) -> None:
+    header = f"{'flow':<16}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'db/req':>8}{'llm/req':>8}{'errors':>8}"
+    print(header)
+    print("-" * len(header))
+    for flow, r in results.items():
+        print(
+            f"{flow:<16}{r['rps']:>9.1f}{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}"
+            f"{r['db_calls_per_request']:>8.1f}{r['llm_calls_per_request']:>8.1f}{r['errors']:>8}"
+        )
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """
+    Returns a description of every flow whose p95 grew or throughput fell by more than `threshold`.
+    """
+    regressions = []
+    for flow, current in results.items():
+        previous = baseline["results"].get(flow)
+        if not previous:
+            continue
+        if current["p95_ms"] > previous["p95_ms"] * (1 + threshold):
+            regressions.append(f"{flow}: p95 {previous['p95_ms']:.1f}ms -> {current['p95_ms']:.1f}ms")
+        if current["rps"] < previous["rps"] * (1 - threshold):
+            regressions.append(f"{flow}: rps {previous['rps']:.1f} -> {current['rps']:.1f}")
+    return regressions
+
+
+def create_backend(args: argparse.Namespace) -> Any:
+    if args.backend == "memory":
+        return MemoryClient(latency=args.db_latency)
+
+    # The Postgres run starts from empty tables so seeding is repeatable.
+    # Apply sql/*.sql to the target database first.
+    from app.db.postgres import PostgresClient
+    db = PostgresClient(args.database_url)
+    db.execute_sql("TRUNCATE users, teams, tags, feedback, feedback_tags, notifications, change_log, feedback_drafts, notifications_archive, feedback_archive RESTART IDENTITY CASCADE")
+    return db
+
+
+async def main(args: argparse.Namespace) -> int:
+    if args.backend == "postgres" and not args.database_url:
+        print("--database-url is required with --backend postgres", file=sys.stderr)
+        return 2
+    db = create_backend(args)
+    model = FakeGenerativeModel(latency=args.llm_latency, jitter=args.llm_jitter, seed=args.seed)
+    seeded = seed_database(
+        db,
+        hashed_password=security.get_password_hash(PASSWORD),
+        teams=args.teams,
+        employees_per_team=args.employees_per_team,
+        feedback_per_employee=args.feedback_per_employee,
+        seed=args.seed,
+    )
+
+    instrumented = InstrumentedClient(db)
+    app.dependency_overrides[deps.get_db] = lambda: instrumented
+    gemini_service.model = model
+
+    flows = [flow.strip() for flow in args.flows.split(",") if flow.strip()]
+    unknown = set(flows) - set(FLOWS)
+    if unknown:
+        print(f"Unknown flows: {', '.join(sorted(unknown))}", file=sys.stderr)
+        return 2
+
+    results: Dict[str, Dict[str, Any]] = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        ctx = BenchContext(client, seeded, args.seed)
+        for flow in flows:
+            results[flow] = await run_flow(
+                ctx, flow, concurrency=args.concurrency, requests=args.requests, model=model
+            )
+
+    print_report(results)
+    config = {key: value for key, value in vars(args).items() if key not in ("save_baseline", "compare", "database_url")}
+
+    if args.save_baseline:
+        BASELINE_DIR.mkdir(exist_ok=True)
+        path = BASELINE_DIR / f"{args.save_baseline}.json"
+        path.write_text(json.dumps({"config": config, "results": results}, indent=2))
+        print(f"\nSaved baseline to {path}")
+
+    if args.compare:
+        baseline = json.loads((BASELINE_DIR / f"{args.compare}.json").read_text())
+        if baseline["config"] != config:
+            print("\nWarning: baseline was recorded with a different configuration.")
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print("\nRegressions against baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"\nNo regressions beyond {args.threshold:.0%} against baseline '{args.compare}'.")
+    return 0
+
+
+def parse_args(argv: List[str] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--flows", default=",".join(FLOWS), help="Comma-separated flows to run.")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200, help="Requests per flow.")
+    parser.add_argument("--backend", choices=["memory", "postgres"], default="memory")
+    parser.add_argument("--database-url", help="Postgres DSN for --backend postgres.")
+    parser.add_argument("--db-latency", type=float, default=0.005, help="Simulated PostgREST round trip (memory backend), seconds.")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="Simulated Gemini latency, seconds.")
+    parser.add_argument("--llm-jitter", type=float, default=0.2, help="Extra uniform Gemini latency, seconds.")
+    parser.add_argument("--teams", type=int, default=5)
+    parser.add_argument("--employees-per-team", type=int, default=10)
+    parser.add_argument("--feedback-per-employee", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save-baseline", metavar="NAME", help="Write results to bench/baselines/NAME.json.")
+    parser.add_argument("--compare", metavar="NAME", help="Compare against bench/baselines/NAME.json.")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed relative regression.")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(parse_args())))
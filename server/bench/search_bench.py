@@ -0,0 +1,192 @@
+"""
+Query latency of feedback search at scale.
+
+Generates a synthetic corpus (default 100k documents, Zipf-distributed vocabulary,
+~100 words each across the three searchable fields), indexes it and times queries
+of different selectivity, both unscoped and scoped to one manager's feedback as the
+API does. Also reports index build time, size and incremental update cost.
+
+Usage (from the server/ directory):
+    python -m bench.search_bench
+    python -m bench.search_bench --docs 20000 --queries 500
+    python -m bench.search_bench --database-url postgresql://localhost/feedback_bench
+
+With --database-url the corpus is written to that database (tables from sql/*.sql,
+truncated first) and queries go through the search_feedback SQL function instead.
+"""
+import argparse
+import itertools
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Tuple
+
+for _name, _value in {
+    "SECRET_KEY": "benchmark-secret",
+    "ALGORITHM": "HS256",
+    "ACCESS_TOKEN_EXPIRE_MINUTES": "60",
+    "GEMINI_API_KEY": "benchmark-key",
+}.items():
+    os.environ.setdefault(_name, _value)
+
+from app.services.search_service import InvertedIndex  # noqa: E402
+from bench.fakes import WORDS  # noqa: E402
+
+
+def make_vocabulary(size: int) -> Tuple[List[str], List[float]]:
+    """Real-looking words first, then synthetic ones; weights follow Zipf's law."""
+    vocabulary = WORDS + [f"term{n}" for n in range(size - len(WORDS))]
+    weights = [1 / rank for rank in range(1, len(vocabulary) + 1)]
+    return vocabulary, weights
+
+
+def make_corpus(args: argparse.Namespace) -> Tuple[List[Dict[str, Any]], List[str]]:
+    rng = random.Random(args.seed)
+    vocabulary, weights = make_vocabulary(args.vocabulary)
+    cumulative = list(itertools.accumulate(weights))
+
+    def text(words: int) -> str:
+        return " ".join(rng.choices(vocabulary, cum_weights=cumulative, k=words))
+
+    rows = []
+    for doc_id in range(1, args.docs + 1):
+        rows.append({
+            "id": doc_id,
+            "manager_id": rng.randrange(args.managers) + 1,
+            "employee_id": rng.randrange(args.employees) + args.managers + 1,
+            "strengths": text(20),
+            "areas_for_improvement": text(20),
+            "feedback": text(60),
+        })
+    return rows, vocabulary
+
+
+def make_queries(vocabulary: List[str], count: int, seed: int) -> Dict[str, List[str]]:
+    rng = random.Random(seed + 1)
+    head, tail = vocabulary[:20], vocabulary[len(vocabulary) // 2:]
+    return {
+        "common term": [rng.choice(head) for _ in range(count)],
+        "rare term": [rng.choice(tail) for _ in range(count)],
+        "3 terms": [" ".join(rng.sample(vocabulary[:2000], 3)) for _ in range(count)],
+    }
+
+
+def time_queries(search: Callable[[str], Any], queries: List[str]) -> Dict[str, float]:
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        search(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return {
+        "p50": statistics.median(latencies),
+        "p95": latencies[int(len(latencies) * 0.95) - 1],
+        "p99": latencies[int(len(latencies) * 0.99) - 1],
+    }
+
+
+def print_latencies(results: Dict[Tuple[str, str], Dict[str, float]]) -> None:
+    header = f"{'query':<14}{'scope':<10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    print(header)
+    print("-" * len(header))
+    for (kind, scope), r in results.items():
+        print(f"{kind:<14}{scope:<10}{r['p50']:>10.2f}{r['p95']:>10.2f}{r['p99']:>10.2f}")
+
+
+def run_memory(args: argparse.Namespace, rows: List[Dict[str, Any]], queries: Dict[str, List[str]]) -> None:
+    if args.measure_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    index = InvertedIndex()
+    for row in rows:
+        index.add(row)
+    build = time.perf_counter() - start
+    print(f"Indexed {len(index):,} documents, {len(index.postings):,} terms in {build:.1f}s "
+          f"({len(index) / build:,.0f} docs/s)")
+    if args.measure_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"Index memory (tracemalloc peak): {peak / 2**20:,.0f} MiB")
+
+    rng = random.Random(args.seed + 2)
+    start = time.perf_counter()
+    for doc_id in range(args.docs + 1, args.docs + 1001):
+        index.add({**rng.choice(rows), "id": doc_id})
+    added = time.perf_counter() - start
+    start = time.perf_counter()
+    for row in rng.sample(rows, 1000):
+        index.add({**row, "feedback": row["strengths"]})
+    updated = time.perf_counter() - start
+    print(f"Incremental: add {added:.3f} ms/doc, update {updated:.3f} ms/doc\n")
+
+    results = {}
+    for kind, texts in queries.items():
+        results[(kind, "all")] = time_queries(lambda q: index.search(q, limit=20), texts)
+        results[(kind, "manager")] = time_queries(
+            lambda q: index.search(q, manager_id=rng.randrange(args.managers) + 1, limit=20), texts
+        )
+    print_latencies(results)
+
+
+def run_postgres(args: argparse.Namespace, rows: List[Dict[str, Any]], queries: Dict[str, List[str]]) -> None:
+    from app.db.postgres import PostgresClient
+    db = PostgresClient(args.database_url)
+    db.execute_sql("TRUNCATE users, teams, tags, feedback, feedback_tags, feedback_search, notifications RESTART IDENTITY CASCADE")
+
+    people = [
+        {"id": n, "email": f"user{n}@example.com", "full_name": f"User {n}",
+         "role": "manager" if n <= args.managers else "employee", "hashed_password": "x"}
+        for n in range(1, args.managers + args.employees + 1)
+    ]
+    for offset in range(0, len(people), 1000):
+        db.table("users").insert(people[offset:offset + 1000]).execute()
+    start = time.perf_counter()
+    for offset in range(0, len(rows), 1000):
+        batch = [{**row, "sentiment": "neutral"} for row in rows[offset:offset + 1000]]
+        db.table("feedback").insert(batch).execute()
+    db.execute_sql("ANALYZE feedback")
+    print(f"Loaded {len(rows):,} documents in {time.perf_counter() - start:.1f}s (GIN index maintained on insert)\n")
+
+    rng = random.Random(args.seed + 2)
+
+    def search(q: str, manager_id: Any = None) -> Any:
+        return db.rpc("search_feedback", {
+            "query": q, "viewer_manager_id": manager_id, "viewer_employee_id": None, "max_results": 20,
+        }).execute()
+
+    results = {}
+    for kind, texts in queries.items():
+        results[(kind, "all")] = time_queries(search, texts)
+        results[(kind, "manager")] = time_queries(
+            lambda q: search(q, manager_id=rng.randrange(args.managers) + 1), texts
+        )
+    print_latencies(results)
+    db.close()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=100_000)
+    parser.add_argument("--vocabulary", type=int, default=20_000)
+    parser.add_argument("--managers", type=int, default=200)
+    parser.add_argument("--employees", type=int, default=2_000)
+    parser.add_argument("--queries", type=int, default=200, help="Queries per query type and scope.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--measure-memory", action="store_true", help="Trace allocations while indexing (slower).")
+    parser.add_argument("--database-url", help="Benchmark the Postgres tsvector backend instead.")
+    args = parser.parse_args()
+
+    rows, vocabulary = make_corpus(args)
+    queries = make_queries(vocabulary, args.queries, args.seed)
+    if args.database_url:
+        run_postgres(args, rows, queries)
+    else:
+        run_memory(args, rows, queries)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,6 +3,14 @@ set -e
 
 # Default to port 8000 if PORT is not set
 PORT=${PORT:-8000}
+export PORT
+
+if [ "${SERVER_MODE:-single}" = "production" ]; then
+    # Multi-process server: worker count sized from the container's CPUs,
+    # uvloop/httptools, max-requests recycling and rolling restarts on SIGHUP.
+    # See app/launcher.py for the settings it reads.
+    exec python -m app.launcher
+fi
 
 # Start uvicorn
 exec uvicorn app.main:app --host 0.0.0.0 --port "$PORT" --forwarded-allow-ips='*'
@@ -0,0 +1,59 @@
+-- Reference schema for the Smart Feedback database.
+-- Mirrors the tables the Supabase project exposes through PostgREST, including the
+-- foreign-key constraint names the API uses to disambiguate embeds
+-- (e.g. users!feedback_manager_id_fkey). Use it to create a local Postgres for
+-- DB_BACKEND=postgres; files in this directory are applied in name order.
+
+CREATE TABLE IF NOT EXISTS users (
+    id bigserial PRIMARY KEY,
+    email text NOT NULL UNIQUE,
+    full_name text NOT NULL,
+    role text NOT NULL CHECK (role IN ('manager', 'employee')),
+    hashed_password text NOT NULL,
+    team_id bigint,
+    created_at timestamptz NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS teams (
+    id bigserial PRIMARY KEY,
+    name text NOT NULL,
+    manager_id bigint CONSTRAINT teams_manager_id_fkey REFERENCES users (id) ON DELETE CASCADE,
+    created_at timestamptz NOT NULL DEFAULT now()
+);
+
+ALTER TABLE users DROP CONSTRAINT IF EXISTS users_team_id_fkey;
+ALTER TABLE users ADD CONSTRAINT users_team_id_fkey
+    FOREIGN KEY (team_id) REFERENCES teams (id) ON DELETE SET NULL;
+
+CREATE TABLE IF NOT EXISTS tags (
+    id bigserial PRIMARY KEY,
+    name text NOT NULL UNIQUE,
+    created_at timestamptz NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS feedback (
+    id bigserial PRIMARY KEY,
+    employee_id bigint NOT NULL CONSTRAINT feedback_employee_id_fkey REFERENCES users (id) ON DELETE CASCADE,
+    manager_id bigint NOT NULL CONSTRAINT feedback_manager_id_fkey REFERENCES users (id) ON DELETE CASCADE,
+    strengths text,
+    areas_for_improvement text,
+    feedback text NOT NULL,
+    sentiment text NOT NULL CHECK (sentiment IN ('positive', 'neutral', 'negative')),
+    acknowledged boolean NOT NULL DEFAULT false,
+    created_at timestamptz NOT NULL DEFAULT now(),
+    updated_at timestamptz
+);
+
+CREATE TABLE IF NOT EXISTS feedback_tags (
+    feedback_id bigint NOT NULL REFERENCES feedback (id) ON DELETE CASCADE,
+    tag_id bigint NOT NULL REFERENCES tags (id) ON DELETE CASCADE,
+    PRIMARY KEY (feedback_id, tag_id)
+);
+
+CREATE TABLE IF NOT EXISTS notifications (
+    id bigserial PRIMARY KEY,
+    user_id bigint NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+    message text NOT NULL,
+    is_read boolean NOT NULL DEFAULT false,
+    created_at timestamptz NOT NULL DEFAULT now()
+);
@@ -0,0 +1,62 @@
+-- Full-text search for SEARCH_BACKEND=postgres (see app/services/search_service.py).
+-- Search documents live in a side table kept current by a trigger, so `select *` on
+-- feedback returns the same columns as before while ranking reads a stored tsvector
+-- instead of re-parsing the text of every match.
+
+CREATE TABLE IF NOT EXISTS feedback_search (
+    feedback_id bigint PRIMARY KEY REFERENCES feedback (id) ON DELETE CASCADE,
+    document tsvector NOT NULL
+);
+CREATE INDEX IF NOT EXISTS feedback_search_document_idx ON feedback_search USING gin (document);
+
+CREATE OR REPLACE FUNCTION feedback_search_document(feedback text, strengths text, areas_for_improvement text)
+RETURNS tsvector
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT setweight(to_tsvector('english'::regconfig, coalesce(feedback, '')), 'A')
+        || setweight(to_tsvector('english'::regconfig, coalesce(strengths, '')), 'B')
+        || setweight(to_tsvector('english'::regconfig, coalesce(areas_for_improvement, '')), 'B')
+$$;
+
+CREATE OR REPLACE FUNCTION feedback_search_sync() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO feedback_search (feedback_id, document)
+    VALUES (NEW.id, feedback_search_document(NEW.feedback, NEW.strengths, NEW.areas_for_improvement))
+    ON CONFLICT (feedback_id) DO UPDATE SET document = EXCLUDED.document;
+    RETURN NEW;
+END
+$$;
+
+DROP TRIGGER IF EXISTS feedback_search_sync ON feedback;
+CREATE TRIGGER feedback_search_sync
+    AFTER INSERT OR UPDATE OF feedback, strengths, areas_for_improvement ON feedback
+    FOR EACH ROW EXECUTE FUNCTION feedback_search_sync();
+
+-- Backfill rows that existed before the trigger.
+INSERT INTO feedback_search (feedback_id, document)
+SELECT id, feedback_search_document(feedback, strengths, areas_for_improvement)
+FROM feedback
+ON CONFLICT (feedback_id) DO NOTHING;
+
+-- Matches any of the query's words (like the in-process BM25 index), ranked by
+-- ts_rank_cd, restricted to the viewer's feedback. Called with db.rpc("search_feedback", ...).
+CREATE OR REPLACE FUNCTION search_feedback(
+    query text,
+    viewer_manager_id bigint DEFAULT NULL,
+    viewer_employee_id bigint DEFAULT NULL,
+    max_results integer DEFAULT 20
+)
+RETURNS TABLE (id bigint, score real)
+LANGUAGE sql STABLE AS $$
+    WITH q AS (
+        SELECT nullif(replace(plainto_tsquery('english'::regconfig, query)::text, '&', '|'), '')::tsquery AS tsq
+    )
+    SELECT f.id, ts_rank_cd(s.document, q.tsq) AS score
+    FROM q
+    JOIN feedback_search s ON s.document @@ q.tsq
+    JOIN feedback f ON f.id = s.feedback_id
+    WHERE (viewer_manager_id IS NULL OR f.manager_id = viewer_manager_id)
+      AND (viewer_employee_id IS NULL OR f.employee_id = viewer_employee_id)
+    ORDER BY score DESC, f.id DESC
+    LIMIT max_results
+$$;
@@ -0,0 +1,19 @@
+-- Indexes for the feedback list and its filters (GET /v1/feedback).
+-- Every list query is scoped to one manager or one employee and sorted newest first,
+-- so each scope gets a (scope, created_at DESC) index; the most selective filters
+-- get their own where they would otherwise scan a large manager's whole history.
+
+CREATE INDEX IF NOT EXISTS feedback_manager_created_idx ON feedback (manager_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS feedback_employee_created_idx ON feedback (employee_id, created_at DESC);
+
+-- ?employee_id= for managers, and ?sentiment=
+CREATE INDEX IF NOT EXISTS feedback_manager_employee_created_idx ON feedback (manager_id, employee_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS feedback_manager_sentiment_created_idx ON feedback (manager_id, sentiment, created_at DESC);
+
+-- ?acknowledged=false: the pending set is small and is what people look at.
+CREATE INDEX IF NOT EXISTS feedback_manager_unacknowledged_idx ON feedback (manager_id, created_at DESC)
+    WHERE NOT acknowledged;
+
+-- ?tag_id= looks up feedback by tag; the primary key (feedback_id, tag_id) only
+-- serves the opposite direction.
+CREATE INDEX IF NOT EXISTS feedback_tags_tag_idx ON feedback_tags (tag_id, feedback_id);
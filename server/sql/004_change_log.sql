@@ -0,0 +1,35 @@
+-- Change feed for GET /v1/sync (see app/crud/crud_change_log.py).
+-- crud_feedback and crud_notification append one row per affected user whenever they
+-- create or change a row, so a client asks "what changed for me since version N"
+-- with a single index range scan instead of refetching its whole history.
+
+CREATE TABLE IF NOT EXISTS change_log (
+    id bigserial PRIMARY KEY,  -- the version; sync tokens encode one
+    user_id bigint NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+    entity text NOT NULL CHECK (entity IN ('feedback', 'notification')),
+    entity_id bigint NOT NULL,
+    action text NOT NULL,
+    created_at timestamptz NOT NULL DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS change_log_user_idx ON change_log (user_id, id);
+
+-- updated_at on every change, whoever makes it.
+ALTER TABLE notifications ADD COLUMN IF NOT EXISTS updated_at timestamptz;
+
+CREATE OR REPLACE FUNCTION set_updated_at() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.updated_at = now();
+    RETURN NEW;
+END
+$$;
+
+DROP TRIGGER IF EXISTS feedback_set_updated_at ON feedback;
+CREATE TRIGGER feedback_set_updated_at
+    BEFORE UPDATE ON feedback
+    FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+
+DROP TRIGGER IF EXISTS notifications_set_updated_at ON notifications;
+CREATE TRIGGER notifications_set_updated_at
+    BEFORE UPDATE ON notifications
+    FOR EACH ROW EXECUTE FUNCTION set_updated_at();
@@ -0,0 +1,25 @@
+-- Unpublished feedback (see app/services/draft_service.py).
+-- Autosaves are buffered per worker and written here at most once per
+-- DRAFT_FLUSH_SECONDS per draft. `version` goes up with every save a client makes;
+-- a save naming an older version is rejected, and a flush only overwrites the
+-- version it last read, so two workers can't silently overwrite each other.
+
+CREATE TABLE IF NOT EXISTS feedback_drafts (
+    id bigserial PRIMARY KEY,
+    manager_id bigint NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+    employee_id bigint REFERENCES users (id) ON DELETE SET NULL,
+    strengths text,
+    areas_for_improvement text,
+    feedback text,
+    sentiment text CHECK (sentiment IN ('positive', 'neutral', 'negative')),
+    tag_ids bigint[] NOT NULL DEFAULT '{}',
+    version integer NOT NULL DEFAULT 1,
+    created_at timestamptz NOT NULL DEFAULT now(),
+    updated_at timestamptz
+);
+CREATE INDEX IF NOT EXISTS feedback_drafts_manager_idx ON feedback_drafts (manager_id, id);
+
+DROP TRIGGER IF EXISTS feedback_drafts_set_updated_at ON feedback_drafts;
+CREATE TRIGGER feedback_drafts_set_updated_at
+    BEFORE UPDATE ON feedback_drafts
+    FOR EACH ROW EXECUTE FUNCTION set_updated_at();
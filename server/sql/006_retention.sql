@@ -0,0 +1,36 @@
+-- Retention (see app/services/retention_service.py).
+-- Read notifications older than RETENTION_NOTIFICATION_DAYS move to
+-- notifications_archive, and optionally acknowledged feedback older than
+-- RETENTION_FEEDBACK_DAYS moves to feedback_archive, so the hot tables only hold
+-- what lists and syncs actually read.
+
+CREATE TABLE IF NOT EXISTS notifications_archive (
+    id bigint PRIMARY KEY,  -- the id it had in notifications
+    user_id bigint NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+    message text NOT NULL,
+    is_read boolean NOT NULL,
+    created_at timestamptz NOT NULL,
+    updated_at timestamptz,
+    archived_at timestamptz NOT NULL DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS notifications_archive_user_idx ON notifications_archive (user_id, created_at DESC);
+
+-- The whole feedback as GET /v1/feedback returned it (people and tags included), so
+-- reading it back needs no joins and survives tag renames.
+CREATE TABLE IF NOT EXISTS feedback_archive (
+    id bigint PRIMARY KEY,  -- the id it had in feedback
+    manager_id bigint NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+    employee_id bigint NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+    created_at timestamptz NOT NULL,
+    archived_at timestamptz NOT NULL DEFAULT now(),
+    document jsonb NOT NULL
+);
+CREATE INDEX IF NOT EXISTS feedback_archive_manager_idx ON feedback_archive (manager_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS feedback_archive_employee_idx ON feedback_archive (employee_id, created_at DESC);
+
+-- GET /v1/notifications lists a user's notifications newest first.
+CREATE INDEX IF NOT EXISTS notifications_user_created_idx ON notifications (user_id, created_at DESC);
+
+-- The job's batches: oldest read notifications, and acknowledged feedback by age.
+CREATE INDEX IF NOT EXISTS notifications_read_created_idx ON notifications (created_at) WHERE is_read;
+CREATE INDEX IF NOT EXISTS feedback_acknowledged_created_idx ON feedback (created_at) WHERE acknowledged;
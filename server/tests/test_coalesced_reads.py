@@ -0,0 +1,70 @@
+import threading
+
+import pytest
+
+from app.crud import crud_team, crud_user
+from app.db.replicated import use_primary
+
+
+class _SlowDb:
+    """Answers every query with `row`, holding the first one until `release` is set."""
+
+    def __init__(self, row):
+        self.row = row
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.queries = 0
+        self._lock = threading.Lock()
+
+    def table(self, name):
+        return self
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self
+
+    def execute(self):
+        with self._lock:
+            self.queries += 1
+            first = self.queries == 1
+        if first:
+            self.started.set()
+            self.release.wait(5)
+        return type("Response", (), {"data": dict(self.row)})()
+
+
+@pytest.mark.parametrize("lookup", [
+    lambda db: crud_user.get_user(db, user_id="7"),
+    lambda db: crud_team.get_team(db, team_id=7),
+])
+def test_pinned_reads_dont_join_a_query_in_flight(lookup):
+    db = _SlowDb({"id": 7, "name": "stale"})
+    leader = threading.Thread(target=lookup, args=(db,))
+    leader.start()
+    assert db.started.wait(5)
+    try:
+        db.row = {"id": 7, "name": "fresh"}
+        # A read pinned to the primary runs its own query instead of waiting for
+        # (and sharing) the one that started before its write.
+        with use_primary():
+            assert lookup(db)["name"] == "fresh"
+        assert db.queries == 2
+    finally:
+        db.release.set()
+        leader.join()
+
+
+def test_unpinned_reads_share_the_query_in_flight():
+    db = _SlowDb({"id": 7, "name": "shared"})
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(crud_user.get_user(db, user_id="7"))) for _ in range(3)]
+    threads[0].start()
+    assert db.started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    # Give the followers time to join the leader's call.
+    threading.Event().wait(0.1)
+    db.release.set()
+    for thread in threads:
+        thread.join()
+    assert db.queries == 1
+    assert [user["name"] for user in results] == ["shared"] * 3
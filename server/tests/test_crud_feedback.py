@@ -0,0 +1,68 @@
+from app.crud import crud_feedback
+from app.schemas.feedback import FeedbackFilters
+
+
+class _CountingDb:
+    """Counts the queries issued through the builder."""
+
+    def __init__(self, db):
+        self._db = db
+        self.tables = []
+
+    def table(self, name):
+        self.tables.append(name)
+        return self._db.table(name)
+
+
+def _setup(db):
+    users = db.table("users").insert([
+        {"email": "ann@example.com", "full_name": "Ann", "role": "manager", "hashed_password": "x"},
+        {"email": "dee@example.com", "full_name": "Dee", "role": "manager", "hashed_password": "x"},
+        {"email": "bob@example.com", "full_name": "Bob", "role": "employee", "hashed_password": "x"},
+    ]).execute().data
+    ann, dee, bob = users
+    tags = db.table("tags").insert([{"name": "Teamwork"}, {"name": "Ownership"}]).execute().data
+
+    def feedback(manager, tag_ids):
+        row = db.table("feedback").insert({
+            "manager_id": manager["id"], "employee_id": bob["id"], "sentiment": "positive", "feedback": "Noted.",
+        }).execute().data[0]
+        if tag_ids:
+            db.table("feedback_tags").insert([{"feedback_id": row["id"], "tag_id": tag_id} for tag_id in tag_ids]).execute()
+        return row
+
+    teamwork, ownership = tags[0]["id"], tags[1]["id"]
+    rows = {
+        "ann_both": feedback(ann, [teamwork, ownership]),
+        "ann_teamwork": feedback(ann, [teamwork]),
+        "ann_untagged": feedback(ann, []),
+        "dee_ownership": feedback(dee, [ownership]),
+    }
+    return ann, bob, teamwork, ownership, rows
+
+
+def test_tag_filter_is_one_query_within_the_callers_scope(db):
+    ann, bob, teamwork, ownership, rows = _setup(db)
+
+    counting = _CountingDb(db)
+    result = crud_feedback.get_feedback_by_manager(counting, manager_id=ann["id"], filters=FeedbackFilters(tag_id=ownership))
+    assert counting.tables == ["feedback"]
+    assert [row["id"] for row in result] == [rows["ann_both"]["id"]]
+    # All the row's tags, not just the one filtered on, and no join-table rows.
+    assert sorted(tag["id"] for tag in result[0]["tags"]) == [teamwork, ownership]
+    assert "feedback_tags" not in result[0]
+
+    result = crud_feedback.get_feedback_by_employee(db, employee_id=bob["id"], filters=FeedbackFilters(tag_id=teamwork))
+    assert sorted(row["id"] for row in result) == sorted([rows["ann_both"]["id"], rows["ann_teamwork"]["id"]])
+
+
+def test_unused_tag_returns_nothing(db):
+    ann, _, _, _, _ = _setup(db)
+    assert crud_feedback.get_feedback_by_manager(db, manager_id=ann["id"], filters=FeedbackFilters(tag_id=999)) == []
+
+
+def test_no_tag_filter_keeps_untagged_feedback(db):
+    ann, _, _, _, rows = _setup(db)
+    result = crud_feedback.get_feedback_by_manager(db, manager_id=ann["id"], filters=FeedbackFilters())
+    assert len(result) == 3
+    assert all("feedback_tags" not in row for row in result)
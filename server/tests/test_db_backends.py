@@ -0,0 +1,236 @@
+"""
+The fluent query builder on each backend: the in-memory stand-in and the Postgres
+compiler must answer the CRUD layer's queries the way PostgREST does.
+"""
+import pytest
+from postgrest.exceptions import APIError
+
+from app.crud.crud_feedback import FEEDBACK_SELECT
+from app.db.postgres import PostgresQuery, _Compiler
+
+COLUMN_TYPES = {
+    "feedback": {"id": "bigint", "manager_id": "bigint", "employee_id": "bigint", "acknowledged": "boolean",
+                 "created_at": "timestamp with time zone", "sentiment": "text"},
+    "users": {"id": "bigint", "team_id": "bigint", "email": "text"},
+}
+
+
+def _compile(query: PostgresQuery):
+    compiler = _Compiler(query, COLUMN_TYPES)
+    return compiler.compile(), compiler.args
+
+
+def _people(db):
+    users = db.table("users").insert([
+        {"email": "ann@example.com", "full_name": "Ann", "role": "manager", "hashed_password": "x"},
+        {"email": "bob@example.com", "full_name": "Bob", "role": "employee", "hashed_password": "x"},
+        {"email": "cy@example.com", "full_name": "Cy", "role": "employee", "hashed_password": "x"},
+    ]).execute().data
+    return {user["full_name"]: user for user in users}
+
+
+def _feedback(db, people, **values):
+    row = {"manager_id": people["Ann"]["id"], "employee_id": people["Bob"]["id"],
+           "sentiment": "positive", "feedback": "Good work."}
+    row.update(values)
+    return db.table("feedback").insert(row).execute().data[0]
+
+
+# --- Compiled SQL (no database needed) ---
+
+def test_select_compiles_filters_to_parameters():
+    query = PostgresQuery(None, "feedback").select("*").eq("manager_id", "7").in_("id", ["1", 2]).order("created_at", desc=True).limit(5)
+    sql, args = _compile(query)
+    assert sql == (
+        'SELECT to_jsonb(t0) AS row FROM "feedback" t0 WHERE t0."manager_id" = $1 AND t0."id" = ANY($2) '
+        'ORDER BY t0."created_at" DESC NULLS FIRST LIMIT 5'
+    )
+    # Converted to the column types, so asyncpg accepts them.
+    assert args == [7, [1, 2]]
+
+
+def test_statement_text_does_not_depend_on_values():
+    first, _ = _compile(PostgresQuery(None, "feedback").select("*").eq("manager_id", 1).is_("acknowledged", "true"))
+    second, _ = _compile(PostgresQuery(None, "feedback").select("*").eq("manager_id", 2).is_("acknowledged", "true"))
+    assert first == second
+
+
+def test_embeds_compile_to_correlated_subselects():
+    sql, _ = _compile(PostgresQuery(None, "feedback").select(FEEDBACK_SELECT))
+    assert "jsonb_build_object('manager', (SELECT to_jsonb(t1) FROM \"users\" t1 WHERE t1.id = t0.\"manager_id\"))" in sql
+    assert 'JOIN "feedback_tags" j1 ON j1."tag_id" = t1.id WHERE j1."feedback_id" = t0.id' in sql
+
+
+def test_unknown_embed_is_a_pgrst200():
+    with pytest.raises(APIError) as error:
+        _compile(PostgresQuery(None, "feedback").select("*, nothing(*)"))
+    assert error.value.code == "PGRST200"
+
+
+def test_inner_embed_filter_compiles_to_exists():
+    query = PostgresQuery(None, "feedback").select("id, feedback_tags!inner(tag_id)").eq("feedback_tags.tag_id", 3)
+    sql, args = _compile(query)
+    assert 'EXISTS (SELECT 1 FROM "feedback_tags" e1 WHERE e1."feedback_id" = t0.id AND e1."tag_id" = $2)' in sql
+    # Once for the embedded rows, once for the parent rows.
+    assert args == [3, 3]
+
+
+def test_unknown_embed_filter_is_a_pgrst108():
+    with pytest.raises(APIError) as error:
+        _compile(PostgresQuery(None, "feedback").select("id").eq("feedback_tags.tag_id", 3))
+    assert error.value.code == "PGRST108"
+
+
+def test_identifiers_are_checked():
+    with pytest.raises(ValueError):
+        _compile(PostgresQuery(None, "feedback").select("*").eq('id"; DROP TABLE users; --', 1))
+
+
+def test_upsert_compiles_on_conflict():
+    query = PostgresQuery(None, "feedback").upsert([{"id": 1, "sentiment": "neutral"}], on_conflict="id")
+    sql, _ = _compile(query)
+    assert sql.endswith('ON CONFLICT ("id") DO UPDATE SET "sentiment" = EXCLUDED."sentiment" RETURNING to_jsonb(t0) AS row')
+    query = PostgresQuery(None, "feedback").upsert([{"id": 1, "sentiment": "neutral"}], on_conflict="id", ignore_duplicates=True)
+    assert "DO NOTHING" in _compile(query)[0]
+
+
+# --- Both backends ---
+
+def test_insert_returns_rows_with_defaults(db):
+    people = _people(db)
+    row = _feedback(db, people)
+    assert row["id"] and row["acknowledged"] is False and row["strengths"] is None
+    assert row["created_at"]
+
+
+def test_filters(db):
+    people = _people(db)
+    first = _feedback(db, people, sentiment="negative")
+    second = _feedback(db, people, employee_id=people["Cy"]["id"], acknowledged=True)
+
+    def ids(query):
+        return sorted(row["id"] for row in query.execute().data)
+
+    feedback = lambda: db.table("feedback").select("id")  # noqa: E731
+    assert ids(feedback().eq("sentiment", "negative")) == [first["id"]]
+    assert ids(feedback().neq("sentiment", "negative")) == [second["id"]]
+    assert ids(feedback().eq("employee_id", str(people["Cy"]["id"]))) == [second["id"]]
+    assert ids(feedback().gt("id", first["id"])) == [second["id"]]
+    assert ids(feedback().lte("id", first["id"])) == [first["id"]]
+    assert ids(feedback().in_("id", [first["id"], second["id"], 999])) == [first["id"], second["id"]]
+    assert ids(feedback().in_("id", [])) == []
+    assert ids(feedback().is_("acknowledged", "true")) == [second["id"]]
+    assert ids(feedback().is_("strengths", "null")) == [first["id"], second["id"]]
+
+
+def test_order_limit_and_range(db):
+    people = _people(db)
+    rows = [_feedback(db, people, feedback=f"Note {n}") for n in range(5)]
+    ids = [row["id"] for row in rows]
+    result = db.table("feedback").select("id").order("id", desc=True).limit(2).execute().data
+    assert [row["id"] for row in result] == ids[::-1][:2]
+    result = db.table("feedback").select("id").order("id").range(1, 3).execute().data
+    assert [row["id"] for row in result] == ids[1:4]
+
+
+def test_count(db):
+    people = _people(db)
+    for _ in range(3):
+        _feedback(db, people)
+    response = db.table("feedback").select("id", count="exact").limit(1).execute()
+    assert len(response.data) == 1
+    assert response.count == 3  # The whole result, not the page
+
+
+def test_single_and_maybe_single(db):
+    people = _people(db)
+    assert db.table("users").select("*").eq("id", people["Bob"]["id"]).single().execute().data["full_name"] == "Bob"
+    assert db.table("users").select("*").eq("id", 999).maybe_single().execute().data is None
+    with pytest.raises(APIError) as error:
+        db.table("users").select("*").eq("role", "employee").single().execute()
+    assert error.value.code == "PGRST116"
+
+
+def test_embeds(db):
+    people = _people(db)
+    tags = db.table("tags").insert([{"name": "Teamwork"}, {"name": "Ownership"}]).execute().data
+    row = _feedback(db, people)
+    db.table("feedback_tags").insert([{"feedback_id": row["id"], "tag_id": tag["id"]} for tag in tags]).execute()
+    untagged = _feedback(db, people)
+
+    result = db.table("feedback").select(FEEDBACK_SELECT).order("id").execute().data
+    assert result[0]["manager"]["full_name"] == "Ann"
+    assert result[0]["employee"]["full_name"] == "Bob"
+    assert sorted(tag["name"] for tag in result[0]["tags"]) == ["Ownership", "Teamwork"]
+    assert result[1]["id"] == untagged["id"] and result[1]["tags"] == []
+
+    team = db.table("teams").insert({"name": "Core", "manager_id": people["Ann"]["id"]}).execute().data[0]
+    db.table("users").update({"team_id": team["id"]}).in_("id", [people["Bob"]["id"], people["Cy"]["id"]]).execute()
+    team = db.table("teams").select("*, members:users!users_team_id_fkey(id, full_name)").eq("id", team["id"]).single().execute().data
+    assert sorted(member["full_name"] for member in team["members"]) == ["Bob", "Cy"]
+    assert set(team["members"][0]) == {"id", "full_name"}
+
+
+def test_inner_embed_filters_the_parent_rows(db):
+    people = _people(db)
+    tags = db.table("tags").insert([{"name": "Teamwork"}, {"name": "Ownership"}]).execute().data
+    rows = [_feedback(db, people) for _ in range(3)]
+    db.table("feedback_tags").insert([
+        {"feedback_id": rows[0]["id"], "tag_id": tags[0]["id"]},
+        {"feedback_id": rows[1]["id"], "tag_id": tags[0]["id"]},
+        {"feedback_id": rows[1]["id"], "tag_id": tags[1]["id"]},
+    ]).execute()
+
+    response = (db.table("feedback").select("id, feedback_tags!inner(tag_id)", count="exact")
+                .eq("feedback_tags.tag_id", tags[1]["id"]).execute())
+    assert [row["id"] for row in response.data] == [rows[1]["id"]]
+    assert response.data[0]["feedback_tags"] == [{"tag_id": tags[1]["id"]}]
+    assert response.count == 1
+
+    # Without !inner the parent rows all stay, with the embed filtered.
+    result = (db.table("feedback").select("id, feedback_tags(tag_id)")
+              .eq("feedback_tags.tag_id", tags[0]["id"]).order("id").execute().data)
+    assert [row["feedback_tags"] for row in result] == [[{"tag_id": tags[0]["id"]}], [{"tag_id": tags[0]["id"]}], []]
+
+
+def test_update_and_delete_return_affected_rows(db):
+    people = _people(db)
+    row = _feedback(db, people)
+    updated = db.table("feedback").update({"acknowledged": True}).eq("id", row["id"]).execute().data
+    assert [r["acknowledged"] for r in updated] == [True]
+    assert db.table("feedback").update({"acknowledged": True}).eq("id", 999).execute().data == []
+    deleted = db.table("feedback").delete().eq("id", row["id"]).execute().data
+    assert [r["id"] for r in deleted] == [row["id"]]
+    assert db.table("feedback").select("id").execute().data == []
+
+
+def test_upsert(db):
+    tag = db.table("tags").insert({"name": "Focus"}).execute().data[0]
+    db.table("tags").upsert([{"id": tag["id"], "name": "Deep focus"}], on_conflict="id").execute()
+    assert db.table("tags").select("name").eq("id", tag["id"]).single().execute().data["name"] == "Deep focus"
+    ignored = db.table("tags").upsert([{"id": tag["id"], "name": "Ignored"}], on_conflict="id", ignore_duplicates=True).execute().data
+    assert ignored == []
+    assert db.table("tags").select("name").eq("id", tag["id"]).single().execute().data["name"] == "Deep focus"
+
+
+# --- Postgres only ---
+
+def test_transaction_rolls_back_on_error(postgres_db):
+    with pytest.raises(RuntimeError):
+        with postgres_db.transaction():
+            postgres_db.table("tags").insert({"name": "Rolled back"}).execute()
+            raise RuntimeError("boom")
+    assert postgres_db.table("tags").select("id").execute().data == []
+
+    with postgres_db.transaction():
+        postgres_db.table("tags").insert({"name": "Kept"}).execute()
+        # Reads in the block see its writes.
+        assert len(postgres_db.table("tags").select("id").execute().data) == 1
+    assert len(postgres_db.table("tags").select("id").execute().data) == 1
+
+
+def test_database_errors_surface_as_api_errors(postgres_db):
+    postgres_db.table("tags").insert({"name": "Unique"}).execute()
+    with pytest.raises(APIError) as error:
+        postgres_db.table("tags").insert({"name": "Unique"}).execute()
+    assert error.value.code == "23505"
@@ -0,0 +1,85 @@
+import threading
+
+import pytest
+
+from app.core import events
+from app.core.config import settings
+from app.services import directory_service
+
+
+@pytest.fixture
+def users(monkeypatch):
+    directory = directory_service.Directory("users", directory_service.USER_COLUMNS, directory_service.user_terms, "full_name")
+    monkeypatch.setattr(directory_service, "users", directory)
+    # Stands in for the module's subscriptions, which feed the replaced directory.
+    events.subscribe("user.created", directory.on_written)
+    events.subscribe("user.updated", directory.on_written)
+    yield directory
+    events.unsubscribe("user.created", directory.on_written)
+    events.unsubscribe("user.updated", directory.on_written)
+
+
+def _user(db, name, **values):
+    row = {"email": f"{name.lower().replace(' ', '.')}@example.com", "full_name": name,
+           "role": "employee", "hashed_password": "x", **values}
+    return db.table("users").insert(row).execute().data[0]
+
+
+def _names(db, q, **filters):
+    return [user["full_name"] for user in directory_service.search_users(db, q=q, **filters)["items"]]
+
+
+def test_prefix_search(memory_db, users):
+    _user(memory_db, "Dana Scully")
+    _user(memory_db, "Fox Mulder", role="manager")
+    _user(memory_db, "Walter Skinner")
+    assert _names(memory_db, "sc") == ["Dana Scully"]
+    assert _names(memory_db, "fox mul") == ["Fox Mulder"]
+    assert _names(memory_db, "s") == ["Dana Scully", "Walter Skinner"]
+    assert _names(memory_db, "m", role="manager") == ["Fox Mulder"]
+    assert _names(memory_db, "", role="manager") == []  # An empty query matches nothing
+
+
+def test_events_update_entries_in_place(memory_db, users):
+    dana = _user(memory_db, "Dana Scully")
+    assert _names(memory_db, "dana", unassigned=True) == ["Dana Scully"]
+
+    # add_employee_to_team publishes the updated row; only public columns are kept.
+    team = memory_db.table("teams").insert({"name": "X-Files"}).execute().data[0]
+    events.publish("user.updated", {"id": dana["id"], "team_id": team["id"], "hashed_password": "x"})
+    assert _names(memory_db, "dana", unassigned=True) == []
+    [entry] = directory_service.search_users(memory_db, q="dana", team_id=team["id"])["items"]
+    # A partial row keeps the fields it didn't carry.
+    assert entry == {"id": dana["id"], "email": dana["email"], "full_name": "Dana Scully",
+                     "role": "employee", "team_id": team["id"]}
+
+
+def test_searches_during_a_rebuild_use_the_current_index(memory_db, users, monkeypatch):
+    _user(memory_db, "Dana Scully")
+    assert _names(memory_db, "dana") == ["Dana Scully"]
+    _user(memory_db, "Dana Katz")  # Registered on another worker
+
+    started, release = threading.Event(), threading.Event()
+    fetch = users._fetch
+
+    def slow_fetch(db, *, after_id=0):
+        started.set()
+        release.wait(5)
+        return fetch(db, after_id=after_id)
+
+    monkeypatch.setattr(users, "_fetch", slow_fetch)
+    monkeypatch.setattr(settings, "DIRECTORY_REBUILD_SECONDS", 0.0)
+    rebuild = threading.Thread(target=users.ensure, args=(memory_db,))
+    rebuild.start()
+    try:
+        assert started.wait(5)
+        searched = []
+        search = threading.Thread(target=lambda: searched.append(_names(memory_db, "dana")))
+        search.start()
+        search.join(1)
+        assert not search.is_alive()  # Served from the old index, without waiting
+        assert searched == [["Dana Scully"]]
+    finally:
+        release.set()
+        rebuild.join()
+    assert _names(memory_db, "dana") == ["Dana Katz", "Dana Scully"]
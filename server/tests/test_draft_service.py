@@ -0,0 +1,145 @@
+import time
+
+import pytest
+
+from app.core.config import settings
+from app.crud import crud_draft
+from app.services import draft_service
+from app.services.draft_service import DraftConflict
+
+
+@pytest.fixture(autouse=True)
+def _fresh_buffer(monkeypatch):
+    monkeypatch.setattr(draft_service, "_entries", {})
+    monkeypatch.setattr(draft_service, "_conflicted", set())
+    monkeypatch.setattr(draft_service, "_publishing", set())
+    # Long enough that nothing is written unless a test waits for it or flushes.
+    monkeypatch.setattr(settings, "DRAFT_DEBOUNCE_SECONDS", 60.0)
+    monkeypatch.setattr(settings, "DRAFT_FLUSH_SECONDS", 60.0)
+    yield
+    draft_service._entries.clear()
+    with draft_service._lock:
+        draft_service._lock.notify_all()  # Lets an idle flusher see the empty buffer and exit
+    _wait_for(lambda: draft_service._flusher is None)
+
+
+@pytest.fixture
+def writes(monkeypatch):
+    """The versions crud_draft.write_draft was asked to write."""
+    calls = []
+    write_draft = crud_draft.write_draft
+
+    def recording_write(db, *, draft, expected_version):
+        calls.append(draft["version"])
+        return write_draft(db, draft=draft, expected_version=expected_version)
+
+    monkeypatch.setattr(crud_draft, "write_draft", recording_write)
+    return calls
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def _draft(db):
+    return draft_service.create_draft(db, manager_id=1, fields={"feedback": "Draft"})
+
+
+def _save(db, draft_id, version, text):
+    return draft_service.save_draft(db, manager_id=1, draft_id=draft_id, version=version, changes={"feedback": text})
+
+
+def _stored(db, draft_id):
+    return crud_draft.get_draft(db, draft_id=draft_id)
+
+
+def test_save_against_a_stale_version_is_a_conflict(memory_db):
+    draft = _draft(memory_db)
+    assert _save(memory_db, draft["id"], 1, "First")["version"] == 2
+    with pytest.raises(DraftConflict) as conflict:
+        _save(memory_db, draft["id"], 1, "From a stale tab")
+    assert conflict.value.current["version"] == 2
+    assert conflict.value.current["feedback"] == "First"
+    assert draft_service.get_draft(memory_db, manager_id=1, draft_id=draft["id"])["feedback"] == "First"
+    # Someone else's draft is missing, not a conflict.
+    assert draft_service.save_draft(memory_db, manager_id=2, draft_id=draft["id"], version=2, changes={}) is None
+
+
+def test_saves_coalesce_into_one_write_per_debounce(memory_db, writes, monkeypatch):
+    monkeypatch.setattr(settings, "DRAFT_DEBOUNCE_SECONDS", 0.2)
+    draft = _draft(memory_db)
+    for version in range(1, 6):
+        _save(memory_db, draft["id"], version, f"Typed {version}")
+    # Buffered: the row hasn't been written yet.
+    assert _stored(memory_db, draft["id"])["version"] == 1
+
+    _wait_for(lambda: _stored(memory_db, draft["id"])["version"] == 6)
+    assert writes == [6]
+    assert _stored(memory_db, draft["id"])["feedback"] == "Typed 5"
+    # Written drafts leave the buffer.
+    _wait_for(lambda: draft["id"] not in draft_service._entries)
+
+
+def test_a_flush_that_loses_to_another_worker_conflicts_the_next_save(memory_db, writes):
+    draft = _draft(memory_db)
+    _save(memory_db, draft["id"], 1, "This worker")
+    # Another worker buffered its own save from version 1 and wrote it first.
+    crud_draft.write_draft(memory_db, draft={**draft, "feedback": "Other worker", "version": 2}, expected_version=1)
+
+    draft_service.flush_all()
+    assert _stored(memory_db, draft["id"])["feedback"] == "Other worker"
+    assert draft["id"] in draft_service._conflicted
+
+    # The client hears about it on its next save, with the stored draft to rebase on...
+    with pytest.raises(DraftConflict) as conflict:
+        _save(memory_db, draft["id"], 2, "This worker again")
+    assert conflict.value.current["feedback"] == "Other worker"
+    # ...and a save made against that goes through.
+    assert _save(memory_db, draft["id"], 2, "Rebased")["version"] == 3
+
+
+def test_save_during_publish_is_a_conflict(memory_db):
+    draft = _draft(memory_db)
+    _save(memory_db, draft["id"], 1, "Ready")
+    raced = []
+
+    def publish(current):
+        with pytest.raises(DraftConflict):
+            _save(memory_db, draft["id"], current["version"], "Too late")
+        raced.append(current["feedback"])
+        return "published"
+
+    assert draft_service.publish_draft(memory_db, manager_id=1, draft_id=draft["id"], version=2, publish=publish) == "published"
+    # Published with the buffered save, and the draft is gone from the buffer and the table.
+    assert raced == ["Ready"]
+    assert draft_service.get_draft(memory_db, manager_id=1, draft_id=draft["id"]) is None
+    assert draft["id"] not in draft_service._entries
+
+
+def test_failed_publish_leaves_the_draft(memory_db):
+    draft = _draft(memory_db)
+    _save(memory_db, draft["id"], 1, "Ready")
+
+    def publish(current):
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        draft_service.publish_draft(memory_db, manager_id=1, draft_id=draft["id"], version=2, publish=publish)
+    assert _save(memory_db, draft["id"], 2, "Still editable")["version"] == 3
+
+
+def test_flush_all_writes_everything_buffered(memory_db, writes):
+    drafts = [_draft(memory_db) for _ in range(3)]
+    for draft in drafts:
+        _save(memory_db, draft["id"], 1, f"Draft {draft['id']}")
+        _save(memory_db, draft["id"], 2, f"Draft {draft['id']}, edited")
+
+    draft_service.flush_all()
+    assert writes == [3, 3, 3]
+    for draft in drafts:
+        stored = _stored(memory_db, draft["id"])
+        assert (stored["version"], stored["feedback"]) == (3, f"Draft {draft['id']}, edited")
+    assert draft_service._entries == {}
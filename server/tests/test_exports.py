@@ -0,0 +1,48 @@
+import io
+import zipfile
+
+import pytest
+
+from app.core.executors import bulkheads
+from app.services import pdf_service
+
+
+@pytest.fixture
+def pdf_inline(monkeypatch):
+    # Renders in this process instead of spawning pdf workers.
+    monkeypatch.setattr(bulkheads["pdf"], "max_workers", 0)
+
+
+def test_pdf_export_renders_to_bytes(api, pdf_inline, monkeypatch):
+    rendered = []
+    render = pdf_service.render_feedback_pdf
+
+    def recording_render(feedback_list):
+        rendered.append(len(feedback_list))
+        return render(feedback_list)
+
+    monkeypatch.setattr(pdf_service, "render_feedback_pdf", recording_render)
+    manager = api.managers[0]
+    response = api.client.get("/v1/feedback/export/pdf", headers=api.auth(manager))
+    assert response.status_code == 200
+    assert response.content.startswith(b"%PDF")
+    assert rendered == [len(api.team_of(manager)) * 2]
+
+
+def test_zip_export_queues_one_render_per_process(api, monkeypatch):
+    pool = bulkheads["pdf"]
+    limits = []
+
+    def map_unordered(fn, items, *, limit=None):
+        limits.append(limit)
+        for item in items:
+            yield item, fn(item)
+
+    monkeypatch.setattr(pool, "max_workers", 3)
+    monkeypatch.setattr(pool, "map_unordered", map_unordered)
+    manager = api.managers[0]
+    response = api.client.get("/v1/feedback/export/zip", headers=api.auth(manager))
+    assert response.status_code == 200
+    assert limits == [3]
+    names = zipfile.ZipFile(io.BytesIO(response.content)).namelist()
+    assert len(names) == len(api.team_of(manager))
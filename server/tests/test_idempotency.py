@@ -0,0 +1,109 @@
+import asyncio
+from typing import List
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from app.core import idempotency
+
+
+@pytest.fixture(autouse=True)
+def _fresh_store():
+    idempotency.set_store(idempotency.InMemoryIdempotencyStore())
+    yield
+    idempotency.set_store(idempotency.InMemoryIdempotencyStore())
+
+
+def _app(statuses: List[int], delay: float = 0.0):
+    """An app whose POST /items answers with `statuses` in turn, counting its runs."""
+    calls = []
+
+    async def create(request: Request) -> JSONResponse:
+        calls.append(await request.json())
+        if delay:
+            await asyncio.sleep(delay)
+        status = statuses[min(len(calls), len(statuses)) - 1]
+        return JSONResponse({"run": len(calls)}, status_code=status)
+
+    app = idempotency.IdempotencyMiddleware(Starlette(routes=[Route("/items", create, methods=["POST"])]))
+    return app, calls
+
+
+def test_retry_replays_the_stored_response():
+    app, calls = _app([201])
+    client = TestClient(app)
+    first = client.post("/items", json={"a": 1}, headers={"Idempotency-Key": "k"})
+    retry = client.post("/items", json={"a": 1}, headers={"Idempotency-Key": "k"})
+    assert first.status_code == retry.status_code == 201
+    assert retry.json() == {"run": 1}
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert "idempotent-replayed" not in first.headers
+    assert len(calls) == 1
+
+
+def test_retry_after_a_429_runs_again():
+    app, calls = _app([429, 201])
+    client = TestClient(app)
+    assert client.post("/items", json={"a": 1}, headers={"Idempotency-Key": "k"}).status_code == 429
+    retry = client.post("/items", json={"a": 1}, headers={"Idempotency-Key": "k"})
+    assert retry.status_code == 201
+    assert "idempotent-replayed" not in retry.headers
+    assert len(calls) == 2
+    # The success is what later retries get.
+    assert client.post("/items", json={"a": 1}, headers={"Idempotency-Key": "k"}).json() == {"run": 2}
+    assert len(calls) == 2
+
+
+@pytest.mark.parametrize("status", [408, 409, 425, 500, 503])
+def test_retryable_statuses_are_not_stored(status):
+    app, calls = _app([status, 201])
+    client = TestClient(app)
+    client.post("/items", json={}, headers={"Idempotency-Key": "k"})
+    assert client.post("/items", json={}, headers={"Idempotency-Key": "k"}).status_code == 201
+    assert len(calls) == 2
+
+
+def test_key_reused_for_another_request_is_rejected():
+    app, calls = _app([201])
+    client = TestClient(app)
+    client.post("/items", json={"a": 1}, headers={"Idempotency-Key": "k"})
+    assert client.post("/items", json={"a": 2}, headers={"Idempotency-Key": "k"}).status_code == 422
+    assert len(calls) == 1
+
+
+def test_keys_are_scoped_to_the_caller():
+    app, calls = _app([201])
+    client = TestClient(app)
+    client.post("/items", json={}, headers={"Idempotency-Key": "k", "Authorization": "Bearer one"})
+    other = client.post("/items", json={}, headers={"Idempotency-Key": "k", "Authorization": "Bearer two"})
+    assert "idempotent-replayed" not in other.headers
+    assert len(calls) == 2
+
+
+def test_requests_without_a_key_are_untouched():
+    app, calls = _app([201])
+    client = TestClient(app)
+    client.post("/items", json={})
+    client.post("/items", json={})
+    assert len(calls) == 2
+
+
+def test_concurrent_duplicate_waits_for_the_first():
+    app, calls = _app([201], delay=0.2)
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await asyncio.gather(*[
+                client.post("/items", json={"a": 1}, headers={"Idempotency-Key": "k"}) for _ in range(3)
+            ])
+
+    responses = asyncio.run(run())
+    assert [response.status_code for response in responses] == [201, 201, 201]
+    assert {response.json()["run"] for response in responses} == {1}
+    assert sorted(response.headers.get("idempotent-replayed", "") for response in responses) == ["", "true", "true"]
+    assert len(calls) == 1
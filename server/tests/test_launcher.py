@@ -0,0 +1,56 @@
+import threading
+from itertools import count
+
+from uvicorn.supervisors import multiprocess
+
+from app import launcher
+
+_pids = count(100)
+
+
+class _Process:
+    """Stands in for uvicorn's worker Process; `alive` says how it answers a ping."""
+
+    def __init__(self, *args, alive=True):
+        self.pid = next(_pids)
+        self.alive = alive
+        self.pings = 0
+
+    def is_alive(self, timeout=5):
+        self.pings += 1
+        return self.alive
+
+    def start(self):
+        pass
+
+    def kill(self):
+        pass
+
+    def join(self):
+        pass
+
+
+def _supervisor(processes):
+    # Not through __init__, which installs signal handlers.
+    supervisor = launcher.RollingMultiprocess.__new__(launcher.RollingMultiprocess)
+    supervisor.config = supervisor.target = supervisor.sockets = None
+    supervisor.should_exit = threading.Event()
+    supervisor.processes = processes
+    return supervisor
+
+
+def test_only_replaced_workers_are_marked_dead(monkeypatch):
+    marked = []
+    monkeypatch.setattr(launcher, "_mark_metrics_dead", marked.append)
+    monkeypatch.setattr(multiprocess, "Process", _Process)
+    alive, dead = _Process(), _Process(alive=False)
+    supervisor = _supervisor([alive, dead])
+
+    supervisor.keep_subprocess_alive()
+    assert marked == [dead.pid]
+    assert supervisor.processes[0] is alive and supervisor.processes[1] is not dead
+    # One ping per check, so the pipe's pings and pongs stay paired.
+    assert alive.pings == 1 and dead.pings == 1
+
+    supervisor.keep_subprocess_alive()
+    assert marked == [dead.pid]
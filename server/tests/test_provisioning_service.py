@@ -0,0 +1,111 @@
+import pytest
+
+from app.core import events
+from app.services import provisioning_service
+
+
+@pytest.fixture(autouse=True)
+def published(monkeypatch):
+    sent = []
+    monkeypatch.setattr(provisioning_service, "get_password_hashes", lambda passwords: [f"hashed:{p}" for p in passwords])
+    monkeypatch.setattr(events, "publish", lambda event, payload: sent.append((event, payload)))
+    return sent
+
+
+def _row(email, role, **values):
+    return {"email": email, "full_name": email.split("@")[0].title(), "role": role, "password": "secret", **values}
+
+
+def _org():
+    return [
+        _row("ann@example.com", "manager", team_name="Platform"),
+        _row("bob@example.com", "employee", team_name="Platform"),
+        _row("cat@example.com", "employee", team_name="Platform"),
+        _row("dan@example.com", "employee", team_name="Nowhere"),
+    ]
+
+
+def test_dry_run_writes_nothing(db, published):
+    report = provisioning_service.provision_users(db, rows=_org(), dry_run=True)
+    assert (report["dry_run"], report["created"], report["failed"]) == (True, 0, 1)
+    assert [result["status"] for result in report["results"]] == ["would_create"] * 3 + ["error"]
+    assert db.table("users").select("id").execute().data == []
+    assert db.table("teams").select("id").execute().data == []
+    assert published == []
+
+
+def test_employees_join_a_team_created_by_an_earlier_row(db, published):
+    report = provisioning_service.provision_users(db, rows=_org())
+    assert (report["created"], report["failed"]) == (3, 1)
+    ann, bob, cat, dan = report["results"]
+    assert dan == {"row": 4, "email": "dan@example.com", "status": "error", "error": "Team 'Nowhere' does not exist."}
+
+    team = db.table("teams").select("id, name, manager_id").execute().data
+    assert team == [{"id": ann["team_id"], "name": "Platform", "manager_id": ann["id"]}]
+    users = db.table("users").select("id, email, role, team_id, hashed_password").order("id").execute().data
+    assert [(user["email"], user["team_id"]) for user in users] == [
+        ("ann@example.com", ann["team_id"]), ("bob@example.com", ann["team_id"]), ("cat@example.com", ann["team_id"]),
+    ]
+    assert {user["hashed_password"] for user in users} == {"hashed:secret"}
+    assert bob["team_id"] == cat["team_id"] == ann["team_id"]
+    assert sorted(event for event, _ in published) == ["team.created"] + ["user.created"] * 3
+
+    # A second upload finds the team by name, and the existing emails.
+    report = provisioning_service.provision_users(db, rows=[
+        _row("ann@example.com", "employee", team_name="Platform"),
+        _row("eve@example.com", "employee", team_name="Platform"),
+        _row("fay@example.com", "manager", team_name="Platform"),
+    ])
+    assert [result.get("error") for result in report["results"]] == [
+        "A user with this email already exists.", None, "Team 'Platform' already exists.",
+    ]
+    assert report["results"][1]["team_id"] == ann["team_id"]
+
+
+def test_rows_fail_when_their_manager_row_does(db):
+    db.table("users").insert({"email": "zed@example.com", "full_name": "Zed", "role": "employee", "hashed_password": "x"}).execute()
+    report = provisioning_service.provision_users(db, rows=[
+        _row("ann@example.com", "manager", team_name="Platform"),
+        _row("ann@example.com", "manager", team_name="Platform"),
+        _row("bob@example.com", "manager", team_name="Platform"),
+        _row("zed@example.com", "manager", team_name="Infra"),
+        _row("cat@example.com", "employee", team_name="Infra"),
+        _row("not-an-email", "employee", team_name="Platform"),
+    ], dry_run=True)
+    errors = [result.get("error") for result in report["results"]]
+    assert errors[:5] == [
+        None,
+        "Duplicate email in this upload.",
+        "Team 'Platform' is created by another row in this upload.",
+        "A user with this email already exists.",
+        "Team 'Infra' is not created: its manager's row has an error.",
+    ]
+    assert errors[5].startswith("email:")
+
+
+def test_a_failed_write_rolls_back_the_whole_batch(db, published, monkeypatch):
+    table = db.table
+
+    def failing_table(name):
+        query = table(name)
+        if name == "users":
+            insert = query.insert
+
+            def insert_or_fail(values, *args, **kwargs):
+                if any(value["role"] == "employee" for value in values):
+                    raise RuntimeError("connection lost")
+                return insert(values, *args, **kwargs)
+            query.insert = insert_or_fail
+        return query
+
+    monkeypatch.setattr(db, "table", failing_table)
+    report = provisioning_service.provision_users(db, rows=_org())
+    monkeypatch.undo()
+
+    assert (report["created"], report["failed"]) == (0, 4)
+    for result in report["results"][:3]:
+        assert result["error"] == "Not created: the batch write failed and was rolled back."
+        assert "id" not in result and "team_id" not in result
+    assert db.table("users").select("id").execute().data == []
+    assert db.table("teams").select("id").execute().data == []
+    assert published == []
@@ -0,0 +1,94 @@
+import pytest
+from google.api_core import exceptions
+
+from app.core import resilience
+from app.core.executors import bulkheads
+from app.services import gemini_service
+
+
+class _Model:
+    """Stands in for the GenerativeModel: each call raises `error`, or answers `text`."""
+
+    def __init__(self, error=None, text="positive"):
+        self.error = error
+        self.text = text
+        self.calls = 0
+
+    def generate_content(self, prompt, **kwargs):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        return self
+
+
+class _BlockedResponse:
+    @property
+    def text(self):
+        # What the SDK raises when the safety filters blocked the prompt.
+        raise ValueError("The `response.text` quick accessor only works when the response contains a valid `Part`")
+
+
+class _BlockedModel(_Model):
+    def generate_content(self, prompt, **kwargs):
+        self.calls += 1
+        return _BlockedResponse()
+
+
+@pytest.fixture(autouse=True, params=["pool", "inline"])
+def _breaker(request, monkeypatch):
+    monkeypatch.setattr(resilience, "breaker", resilience.CircuitBreaker("test", 2, 60.0))
+    monkeypatch.setattr(resilience, "latencies", resilience.LatencyTracker())
+    if request.param == "inline":
+        monkeypatch.setattr(bulkheads["gemini"], "max_workers", 0)
+
+
+@pytest.mark.parametrize("make_model", [
+    _BlockedModel,
+    lambda: _Model(exceptions.InvalidArgument("Request contains an invalid argument.")),
+])
+def test_refused_prompts_dont_open_the_breaker(make_model, monkeypatch):
+    model = make_model()
+    monkeypatch.setattr(gemini_service, "model", model)
+    for _ in range(5):
+        # Fallbacks still answer...
+        assert gemini_service.analyze_sentiment("fine work") == "neutral"
+        # ...and calls without one report the refusal, which a retry wouldn't change.
+        with pytest.raises(resilience.UpstreamRejected):
+            gemini_service.rephrase_text("fine work")
+    assert resilience.breaker.state == resilience.CircuitBreaker.CLOSED
+    assert model.calls == 10
+
+
+@pytest.mark.parametrize("error", [
+    exceptions.InternalServerError("boom"),
+    exceptions.TooManyRequests("quota"),
+    ConnectionResetError("reset"),
+    TimeoutError("timed out"),
+])
+def test_upstream_failures_open_the_breaker(error, monkeypatch):
+    model = _Model(error)
+    monkeypatch.setattr(gemini_service, "model", model)
+    for _ in range(2):
+        with pytest.raises(resilience.UpstreamUnavailable):
+            gemini_service.rephrase_text("fine work")
+    assert resilience.breaker.state == resilience.CircuitBreaker.OPEN
+    with pytest.raises(resilience.CircuitOpen):
+        gemini_service.rephrase_text("fine work")
+    assert model.calls == 2
+
+
+def test_a_refusal_resets_the_failure_count(monkeypatch):
+    monkeypatch.setattr(gemini_service, "model", _Model(exceptions.ServiceUnavailable("down")))
+    with pytest.raises(resilience.UpstreamUnavailable):
+        gemini_service.rephrase_text("fine work")
+    monkeypatch.setattr(gemini_service, "model", _BlockedModel())
+    with pytest.raises(resilience.UpstreamRejected):
+        gemini_service.rephrase_text("fine work")
+    assert resilience.breaker.failures == 0
+
+
+def test_refused_prompt_is_a_422(api, monkeypatch):
+    monkeypatch.setattr(gemini_service, "model", _BlockedModel())
+    response = api.client.post("/v1/ai/rephrase", json={"text": "fine work"}, headers=api.auth(api.managers[0]))
+    assert response.status_code == 422
+    assert "retry-after" not in response.headers
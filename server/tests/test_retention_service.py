@@ -0,0 +1,51 @@
+import pytest
+
+from app.core.config import settings
+from app.services import retention_service, search_service, similarity_service
+
+
+@pytest.fixture(autouse=True)
+def _fresh_indexes(monkeypatch):
+    monkeypatch.setattr(search_service, "_index", search_service.InvertedIndex())
+    monkeypatch.setattr(search_service, "_loaded_at", None)
+    monkeypatch.setattr(search_service, "_refreshed_at", 0.0)
+    monkeypatch.setattr(search_service, "_fetched_id", 0)
+    monkeypatch.setattr(similarity_service, "_indexes", similarity_service.LRUCache(maxsize=10))
+    monkeypatch.setattr(settings, "SEARCH_BACKEND", "memory")
+
+
+def _people(db):
+    return db.table("users").insert([
+        {"email": "ann@example.com", "full_name": "Ann", "role": "manager", "hashed_password": "x"},
+        {"email": "bob@example.com", "full_name": "Bob", "role": "employee", "hashed_password": "x"},
+    ]).execute().data
+
+
+def _feedback(db, text, **values):
+    row = {"manager_id": 1, "employee_id": 2, "sentiment": "positive", "feedback": text, **values}
+    return db.table("feedback").insert(row).execute().data[0]
+
+
+def test_archived_feedback_leaves_the_indexes(db):
+    _people(db)  # Ids 1 and 2
+    old = [_feedback(db, f"steady migration work {n}", acknowledged=True, created_at="2020-01-01T00:00:00+00:00")
+           for n in range(3)]
+    recent = _feedback(db, "steady migration work again", acknowledged=True)
+    unacknowledged = _feedback(db, "steady migration work, unread", created_at="2020-01-01T00:00:00+00:00")
+
+    user = {"id": 1, "role": "manager"}
+    assert len(search_service.search_feedback(db, q="migration", user=user, limit=10)) == 5
+    team = similarity_service.ensure_team_index(db, 1)
+    assert len(team) == 5
+
+    assert retention_service.archive_feedback(db, older_than_days=30) == 3
+
+    # Both indexes drop the rows at once rather than at their next rebuild, so the
+    # archived rows don't take slots from the ones still there.
+    hits = search_service.search_feedback(db, q="migration", user=user, limit=2)
+    assert len(hits) == 2
+    assert {hit["id"] for hit in hits} == {recent["id"], unacknowledged["id"]}
+    assert len(team) == 2
+    similar = similarity_service.similar_feedback(db, feedback=recent, limit=2)
+    assert [row["id"] for row in similar] == [unacknowledged["id"]]
+    assert not {row["id"] for row in old} & set(team.row_of)
@@ -0,0 +1,79 @@
+import threading
+import time
+
+import pytest
+
+from app.core import events
+from app.core.config import settings
+from app.services import search_service
+
+
+@pytest.fixture(autouse=True)
+def _fresh_index(monkeypatch):
+    monkeypatch.setattr(search_service, "_index", search_service.InvertedIndex())
+    monkeypatch.setattr(search_service, "_loaded_at", None)
+    monkeypatch.setattr(search_service, "_refreshed_at", 0.0)
+    monkeypatch.setattr(search_service, "_fetched_id", 0)
+    monkeypatch.setattr(settings, "SEARCH_BACKEND", "memory")
+
+
+def _insert(db, text):
+    return db.table("feedback").insert({
+        "manager_id": 1, "employee_id": 2, "sentiment": "positive", "feedback": text,
+    }).execute().data[0]
+
+
+def _found(db, q):
+    return [doc_id for doc_id, _ in search_service.ensure_index(db).search(q, manager_id=1)]
+
+
+def test_search_ranks_matches(memory_db):
+    strong = _insert(memory_db, "migration migration plan")
+    weak = _insert(memory_db, "migration and more words about the weekly planning")
+    _insert(memory_db, "unrelated")
+    assert _found(memory_db, "migration") == [strong["id"], weak["id"]]
+
+
+def test_refresh_picks_up_lower_ids_after_a_local_event(memory_db, monkeypatch):
+    _insert(memory_db, "first quarterly review")
+    assert len(_found(memory_db, "quarterly")) == 1
+
+    # Another worker commits a row this worker hears nothing about...
+    other_worker = _insert(memory_db, "quarterly roadmap from elsewhere")
+    # ...then this worker writes a higher id and indexes it from its own event.
+    local = _insert(memory_db, "quarterly goals written here")
+    events.publish("feedback.created", local)
+    assert local["id"] in _found(memory_db, "quarterly")
+
+    monkeypatch.setattr(settings, "SEARCH_INDEX_REFRESH_SECONDS", 0.0)
+    assert other_worker["id"] in _found(memory_db, "quarterly")
+
+
+def test_searches_during_a_rebuild_use_the_current_index(memory_db, monkeypatch):
+    row = _insert(memory_db, "quarterly review")
+    assert _found(memory_db, "quarterly") == [row["id"]]
+
+    started, release = threading.Event(), threading.Event()
+    load_rows = search_service._load_rows
+
+    def slow_load_rows(db, index, *, after_id=0):
+        started.set()
+        release.wait(5)
+        return load_rows(db, index, after_id=after_id)
+
+    monkeypatch.setattr(search_service, "_load_rows", slow_load_rows)
+    monkeypatch.setattr(settings, "SEARCH_INDEX_REBUILD_SECONDS", 0.001)
+    time.sleep(0.01)
+    rebuild = threading.Thread(target=search_service.ensure_index, args=(memory_db,))
+    rebuild.start()
+    try:
+        assert started.wait(5)
+        searched = []
+        search = threading.Thread(target=lambda: searched.append(_found(memory_db, "quarterly")))
+        search.start()
+        search.join(1)
+        assert not search.is_alive()  # Didn't wait for the rebuild
+        assert searched == [[row["id"]]]
+    finally:
+        release.set()
+        rebuild.join()
@@ -0,0 +1,86 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.core.config import settings
+from app.services import gemini_service, summary_service
+
+
+@pytest.fixture(autouse=True)
+def _fresh_cache(monkeypatch):
+    monkeypatch.setattr(summary_service, "_summaries", summary_service.LRUCache(maxsize=1000))
+    monkeypatch.setattr(settings, "AI_SUMMARY_CHUNK_TOKENS", 100)  # 400 characters
+
+
+def _rows(count):
+    return [{"id": n, "created_at": f"2025-01-{n + 1:02d}", "sentiment": "positive", "feedback": "x" * 150,
+             "employee": {"full_name": "Bob"}} for n in range(count)]
+
+
+def test_summary_maps_and_reduces_in_the_llm_pool(monkeypatch):
+    threads = []
+
+    def chunk(entries):
+        threads.append(threading.current_thread().name)
+        return "short"
+
+    monkeypatch.setattr(gemini_service, "summarize_feedback_chunk", chunk)
+    monkeypatch.setattr(gemini_service, "combine_feedback_summaries", lambda summaries, subject: f"about {subject}")
+
+    result = asyncio.run(summary_service.summarize_feedback(_rows(6), subject="Bob"))
+    assert result == {"summary": "about Bob", "feedback_count": 6, "chunks": 3, "cached_chunks": 0}
+    assert len(threads) == 3 and all(name.startswith("llm-pool") for name in threads)
+
+    # The unchanged chunks come from the cache.
+    assert asyncio.run(summary_service.summarize_feedback(_rows(6), subject="Bob"))["cached_chunks"] == 3
+
+
+def test_reduce_stops_when_the_summaries_dont_shrink(monkeypatch):
+    combined = []
+
+    def combine(summaries, subject):
+        combined.append(summaries)
+        return "y" * 300  # Too long for two to share a prompt
+
+    monkeypatch.setattr(gemini_service, "summarize_feedback_chunk", lambda entries: "z" * 300)
+    monkeypatch.setattr(gemini_service, "combine_feedback_summaries", combine)
+
+    result = asyncio.run(summary_service.summarize_feedback(_rows(6), subject="Bob"))
+    assert result["summary"] == "y" * 300
+    # One call, with every chunk summary cut to fit the budget.
+    assert len(combined) == 1
+    assert len(combined[0]) <= settings.AI_SUMMARY_CHUNK_TOKENS * summary_service.CHARS_PER_TOKEN
+    assert combined[0].count("\n") == 2
+
+
+def test_reduce_rounds_are_capped(monkeypatch):
+    calls = []
+
+    def combine(summaries, subject):
+        calls.append(summaries)
+        return summaries[:150]  # Two fit in a prompt, so every round halves the list
+
+    monkeypatch.setattr(settings, "AI_SUMMARY_MAX_REDUCE_ROUNDS", 2)
+    monkeypatch.setattr(gemini_service, "summarize_feedback_chunk", lambda entries: entries[:150])
+    monkeypatch.setattr(gemini_service, "combine_feedback_summaries", combine)
+
+    rows = [dict(row, feedback=f"{n:x}" * 150) for n, row in enumerate(_rows(16))]
+    result = asyncio.run(summary_service.summarize_feedback(rows, subject="Bob"))
+    assert result["chunks"] == 8
+    # Round one: 8 summaries into 4. Round two is the last: all 4 in one call.
+    assert len(calls) == 5
+
+
+def test_summary_route(api, monkeypatch):
+    from app.api.endpoints import ai
+    # Awaits the summary rather than holding a threadpool thread for it.
+    assert asyncio.iscoroutinefunction(ai.summarize_feedback)
+
+    monkeypatch.setattr(gemini_service, "summarize_feedback_chunk", lambda entries: "short")
+    monkeypatch.setattr(gemini_service, "combine_feedback_summaries", lambda summaries, subject: f"about {subject}")
+    manager = api.managers[0]
+    response = api.client.get("/v1/ai/summary", headers=api.auth(manager))
+    assert response.status_code == 200
+    assert response.json()["summary"].startswith("about the team")
+    assert response.json()["feedback_count"] == len(api.team_of(manager)) * 2
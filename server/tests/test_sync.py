@@ -0,0 +1,85 @@
+import datetime
+
+import pytest
+
+from app.core.config import settings
+from app.crud import crud_change_log
+
+
+def _ago(seconds):
+    return (datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=seconds)).isoformat()
+
+
+def _log(db, *ages, user_id=1, entity="feedback"):
+    """One change per age in seconds, oldest first; returns their ids."""
+    rows = db.table("change_log").insert([
+        {"user_id": user_id, "entity": entity, "entity_id": n, "action": "updated", "created_at": _ago(age)}
+        for n, age in enumerate(ages, start=1)
+    ]).execute().data
+    return [row["id"] for row in rows]
+
+
+def test_token_round_trip():
+    assert crud_change_log.decode_token(crud_change_log.encode_token(42)) == 42
+    for token in ("", "not-a-token", crud_change_log.encode_token(1)[:-2] + "!!"):
+        with pytest.raises(ValueError):
+            crud_change_log.decode_token(token)
+
+
+def test_token_stops_before_unsettled_changes(memory_db):
+    ids = _log(memory_db, 60, 60, 60, 0, 0)
+    _log(memory_db, 60, user_id=2)  # Someone else's
+
+    changes, version, has_more = crud_change_log.get_changes(memory_db, user_id=1, since=0, limit=10)
+    # Every change is returned, but the token only covers the settled ones...
+    assert [change["id"] for change in changes] == ids
+    assert version == ids[2]
+    assert not has_more
+    # ...so the unsettled ones come back on the next sync.
+    changes, version, _ = crud_change_log.get_changes(memory_db, user_id=1, since=version, limit=10)
+    assert [change["id"] for change in changes] == ids[3:]
+    assert version == ids[2]
+    assert crud_change_log.get_head_version(memory_db, user_id=1) == ids[2]
+
+
+def test_has_more_only_when_the_token_reached_the_page_end(memory_db):
+    ids = _log(memory_db, 60, 60, 60, 60)
+    changes, version, has_more = crud_change_log.get_changes(memory_db, user_id=1, since=0, limit=2)
+    assert (len(changes), version, has_more) == (2, ids[1], True)
+
+    # The page ends in unsettled changes: syncing again at once would return the
+    # same page, so the client isn't told to.
+    ids = _log(memory_db, 0, 0, 0)
+    changes, version, has_more = crud_change_log.get_changes(memory_db, user_id=1, since=ids[0] - 1, limit=2)
+    assert (len(changes), version, has_more) == (2, ids[0] - 1, False)
+
+
+def test_sync_reports_removed_rows(api, monkeypatch):
+    monkeypatch.setattr(settings, "SYNC_SETTLE_SECONDS", 0.0)
+    manager = api.managers[0]
+    headers = api.auth(manager)
+    token = api.client.get("/v1/sync/", headers=headers).json()["token"]
+
+    employee = api.team_of(manager)[0]
+    feedback = api.db.table("feedback").select("id").eq("manager_id", manager["id"]).limit(2).execute().data
+    kept, archived = feedback[0]["id"], feedback[1]["id"]
+    api.db.table("feedback").delete().eq("id", archived).execute()
+    notification = api.db.table("notifications").insert({"user_id": manager["id"], "message": "Hi"}).execute().data[0]
+    api.db.table("notifications").delete().eq("id", notification["id"]).execute()
+    crud_change_log.record_changes(api.db, [
+        {"user_id": manager["id"], "entity": "feedback", "entity_id": kept, "action": "updated"},
+        {"user_id": manager["id"], "entity": "feedback", "entity_id": archived, "action": "archived"},
+        {"user_id": manager["id"], "entity": "notification", "entity_id": notification["id"], "action": "created"},
+        {"user_id": employee["id"], "entity": "feedback", "entity_id": kept, "action": "updated"},
+    ])
+
+    body = api.client.get("/v1/sync/", params={"since": token}, headers=headers).json()
+    assert [row["id"] for row in body["feedback"]] == [kept]
+    assert body["removed_feedback_ids"] == [archived]
+    assert body["notifications"] == []
+    assert body["removed_notification_ids"] == [notification["id"]]
+    assert body["has_more"] is False
+
+    # Nothing new since the returned token.
+    body = api.client.get("/v1/sync/", params={"since": body["token"]}, headers=headers).json()
+    assert body["feedback"] == [] and body["removed_feedback_ids"] == []